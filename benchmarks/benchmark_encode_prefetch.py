@@ -0,0 +1,169 @@
+"""Benchmark for the background prefetch in encode_precomputed_activations.
+
+Writes synthetic activation shards, then measures:
+    - I/O time: reading and transferring every batch without encoding
+    - compute time: encoding batches that are already on the device
+    - encode_precomputed_activations with prefetch_depth=0 (I/O and compute in sequence)
+    - encode_precomputed_activations with prefetch (I/O overlapped with compute)
+
+With prefetching, the wall-clock time should approach max(I/O, compute) instead of their sum.
+Shards are evicted from the page cache before each run where the OS supports it. On a fast disk
+the reads are cheap, so use --simulated_read_latency to emulate slower storage.
+With --quantize the shards are written as int8, which cuts the I/O time.
+
+Usage:
+    python benchmarks/benchmark_encode_prefetch.py --num_samples 4096 --d_sae 16384
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import torch
+
+import sae_bench_utils.activation_collection as activation_collection
+import sae_bench_utils.activation_quantization as activation_quantization
+import sae_bench_utils.activation_shards as activation_shards
+import sae_bench_utils.general_utils as general_utils
+from custom_saes.vanilla_sae import VanillaSAE
+
+
+def evict_from_page_cache(activation_dir: str):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for filename in os.listdir(activation_dir):
+        with open(os.path.join(activation_dir, filename), "rb") as f:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def write_shards(
+    activation_dir: str,
+    num_samples: int,
+    seq_len: int,
+    d_model: int,
+    num_chunks: int,
+    quantize: bool,
+):
+    chunk_size = (num_samples + num_chunks - 1) // num_chunks
+    quantization_params = activation_quantization.calibrate([torch.randn(4096, d_model)])
+    for chunk_idx in range(num_chunks):
+        num_chunk_samples = min(chunk_size, num_samples - chunk_idx * chunk_size)
+        shard_path = activation_collection.get_activation_shard_path(
+            activation_dir, chunk_idx, num_chunks
+        )
+        with activation_shards.ActivationShardWriter(shard_path) as writer:
+            for _ in range(0, num_chunk_samples, 64):
+                acts_BLD = torch.randn(min(64, num_chunk_samples), seq_len, d_model)
+                if quantize:
+                    acts_BLD = activation_quantization.quantize(acts_BLD, quantization_params)
+                writer.append("activations", acts_BLD)
+            writer.write("tokens", torch.randint(0, 1000, (num_chunk_samples, seq_len)))
+            if quantize:
+                params = quantization_params.to_dict()
+                writer.write("scale", params["scale"])
+                writer.write("zero_point", params["zero_point"])
+                writer.metadata.update({"quantization": "int8", "dtype": params["dtype"]})
+
+
+def with_simulated_latency(latency: float):
+    """Adds a sleep to every batch read, emulating slower storage."""
+    iter_batches = activation_collection._iter_precomputed_batches
+
+    def slow_iter_batches(*args, **kwargs):
+        for batch in iter_batches(*args, **kwargs):
+            time.sleep(latency)
+            yield batch
+
+    activation_collection._iter_precomputed_batches = slow_iter_batches
+
+
+def synchronize(device: str):
+    if device == "cuda":
+        torch.cuda.synchronize()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prefetching of precomputed activations")
+    parser.add_argument("--num_samples", type=int, default=2048)
+    parser.add_argument("--seq_len", type=int, default=128)
+    parser.add_argument("--d_model", type=int, default=512)
+    parser.add_argument("--d_sae", type=int, default=2048)
+    parser.add_argument("--num_chunks", type=int, default=4)
+    parser.add_argument("--sae_batch_size", type=int, default=32)
+    parser.add_argument("--prefetch_depth", type=int, default=2)
+    parser.add_argument("--simulated_read_latency", type=float, default=0.0)
+    parser.add_argument("--quantize", action="store_true")
+    args = parser.parse_args()
+
+    device = general_utils.setup_environment()
+
+    if args.simulated_read_latency > 0:
+        with_simulated_latency(args.simulated_read_latency)
+
+    sae = VanillaSAE(args.d_model, args.d_sae)
+    with torch.no_grad():
+        sae.W_enc.normal_(std=args.d_model**-0.5)
+    sae = sae.to(device=device)
+
+    with tempfile.TemporaryDirectory() as activation_dir:
+        write_shards(
+            activation_dir,
+            args.num_samples,
+            args.seq_len,
+            args.d_model,
+            args.num_chunks,
+            args.quantize,
+        )
+
+        evict_from_page_cache(activation_dir)
+        start = time.perf_counter()
+        batches = []
+        for _, resid_copies, quantization_params in activation_collection._iter_precomputed_batches(
+            activation_dir, args.num_chunks, args.sae_batch_size, [torch.device(device)]
+        ):
+            resid_BLD = next(iter(resid_copies.values()))[0]
+            if quantization_params is not None:
+                quantization_params = next(iter(quantization_params.values()))
+            batches.append((resid_BLD, quantization_params))
+        synchronize(device)
+        io_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sae_acts = []
+        for resid_BLD, quantization_params in batches:
+            if quantization_params is not None:
+                resid_BLD = activation_quantization.dequantize(resid_BLD, quantization_params)
+            attn_mask_BL = torch.ones(resid_BLD.shape[:2], dtype=torch.bool)
+            sae_acts.append(
+                activation_collection._encode_masked(sae, resid_BLD, attn_mask_BL, None, None)
+            )
+        torch.cat(sae_acts, dim=0)
+        synchronize(device)
+        compute_time = time.perf_counter() - start
+        del batches, sae_acts
+
+        timings = {}
+        for prefetch_depth in [0, args.prefetch_depth]:
+            evict_from_page_cache(activation_dir)
+            start = time.perf_counter()
+            activation_collection.encode_precomputed_activations(
+                sae,
+                args.sae_batch_size,
+                args.num_chunks,
+                activation_dir,
+                prefetch_depth=prefetch_depth,
+            )
+            synchronize(device)
+            timings[prefetch_depth] = time.perf_counter() - start
+
+    print(f"I/O only:                      {io_time:.2f}s")
+    print(f"Compute only:                  {compute_time:.2f}s")
+    print(f"I/O + compute:                 {io_time + compute_time:.2f}s")
+    print(f"max(I/O, compute):             {max(io_time, compute_time):.2f}s")
+    print(f"prefetch_depth=0:              {timings[0]:.2f}s")
+    print(f"prefetch_depth={args.prefetch_depth}:              {timings[args.prefetch_depth]:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
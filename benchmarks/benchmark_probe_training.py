@@ -0,0 +1,95 @@
+"""Benchmark of the top-k probes of the sparse probing eval: one sklearn LogisticRegression per
+(k, class) probe against the batched solver, cold-started from zero for every k and warm-started
+from the previous k's solution.
+
+Uses synthetic SAE activations with one informative latent per class. Both paths see the same
+random state, so they train and test each probe on the same datapoints and their test accuracies
+should agree closely.
+
+Usage:
+    python benchmarks/benchmark_probe_training.py --num_classes 5 --d_sae 16384
+"""
+
+import argparse
+import time
+
+import torch
+
+import evals.sparse_probing.probe_training as probe_training
+
+
+def make_class_activations(
+    num_classes: int, num_datapoints: int, d_sae: int, seed: int
+) -> dict[str, torch.Tensor]:
+    """Sparse non-negative activations, with a latent that fires more often for each class."""
+    generator = torch.Generator().manual_seed(seed)
+    activations = {}
+    for class_idx in range(num_classes):
+        acts_BF = torch.rand(num_datapoints, d_sae, generator=generator)
+        acts_BF = acts_BF * (torch.rand(num_datapoints, d_sae, generator=generator) < 0.02)
+        acts_BF[:, class_idx] += torch.rand(num_datapoints, generator=generator) < 0.7
+        activations[f"class_{class_idx}"] = acts_BF
+    return activations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sparse probing top-k probes")
+    parser.add_argument("--num_classes", type=int, default=5)
+    parser.add_argument("--num_train", type=int, default=4000)
+    parser.add_argument("--num_test", type=int, default=1000)
+    parser.add_argument("--d_sae", type=int, default=4096)
+    parser.add_argument("--k_values", type=int, nargs="+", default=[1, 2, 5, 10, 20, 50])
+    args = parser.parse_args()
+
+    train_activations = make_class_activations(
+        args.num_classes, args.num_train, args.d_sae, seed=0
+    )
+    test_activations = make_class_activations(args.num_classes, args.num_test, args.d_sae, seed=1)
+
+    torch.manual_seed(42)
+    start = time.perf_counter()
+    sklearn_test_accuracies = {}
+    sklearn_num_iterations = {}
+    for k in args.k_values:
+        probes, sklearn_test_accuracies[k] = probe_training.train_probe_on_activations(
+            train_activations, test_activations, select_top_k=k
+        )
+        sklearn_num_iterations[k] = {
+            class_name: int(probe.n_iter_[0]) for class_name, probe in probes.items()
+        }
+    sklearn_time = time.perf_counter() - start
+
+    batched_results = {}
+    for warm_start in [False, True]:
+        torch.manual_seed(42)
+        start = time.perf_counter()
+        test_accuracies, num_iterations = probe_training.train_top_k_probes_on_activations(
+            train_activations, test_activations, args.k_values, warm_start=warm_start
+        )
+        batched_results[warm_start] = (
+            test_accuracies,
+            num_iterations,
+            time.perf_counter() - start,
+        )
+
+    cold_test_accuracies, cold_num_iterations, cold_time = batched_results[False]
+    warm_test_accuracies, warm_num_iterations, warm_time = batched_results[True]
+    print(
+        f"{'k':>4} {'class':>10} {'sklearn acc':>12} {'cold acc':>9} {'warm acc':>9} "
+        f"{'sklearn iters':>14} {'cold iters':>11} {'warm iters':>11}"
+    )
+    for k in args.k_values:
+        for class_name in train_activations:
+            print(
+                f"{k:>4} {class_name:>10} {sklearn_test_accuracies[k][class_name]:>12.4f} "
+                f"{cold_test_accuracies[k][class_name]:>9.4f} "
+                f"{warm_test_accuracies[k][class_name]:>9.4f} "
+                f"{sklearn_num_iterations[k][class_name]:>14} "
+                f"{cold_num_iterations[k][class_name]:>11} "
+                f"{warm_num_iterations[k][class_name]:>11}"
+            )
+    print(f"sklearn: {sklearn_time:.2f}s, cold: {cold_time:.2f}s, warm: {warm_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Scaling benchmark for the blockwise feature-wise weight-based metrics of the core eval.
+
+For each SAE width, measures the time and, on CUDA, the peak memory beyond the SAE weights of
+get_featurewise_weight_based_metrics. The max decoder cosine similarity takes O(d_sae^2 * d_in)
+compute, so it is only run up to --max_d_sae_for_max_cosine_sim.
+
+The peak memory should be roughly constant across widths for a fixed --block_size, while a
+full d_sae x d_sae similarity matrix would need 4 * d_sae^2 bytes, e.g. 4 TB at 1M latents.
+
+Usage:
+    python benchmarks/benchmark_weight_metrics.py --d_in 2304 --d_sae 16384 65536 262144
+"""
+
+import argparse
+import time
+
+import torch
+
+import evals.core.main as core
+import sae_bench_utils.general_utils as general_utils
+from custom_saes.custom_sae_config import CustomSAEConfig
+from custom_saes.vanilla_sae import VanillaSAE
+
+
+def synchronize(device: str):
+    if device == "cuda":
+        torch.cuda.synchronize()
+
+
+def benchmark(
+    sae: VanillaSAE, device: str, block_size: int, compute_max_decoder_cosine_sim: bool
+) -> tuple[float, float | None]:
+    """Seconds taken and, on CUDA, the peak memory in GiB allocated beyond the SAE."""
+    if device == "cuda":
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats()
+        baseline_memory = torch.cuda.memory_allocated()
+
+    synchronize(device)
+    start = time.perf_counter()
+    core.get_featurewise_weight_based_metrics(
+        sae,  # type: ignore
+        block_size=block_size,
+        compute_max_decoder_cosine_sim=compute_max_decoder_cosine_sim,
+    )
+    synchronize(device)
+    elapsed = time.perf_counter() - start
+
+    peak_memory = None
+    if device == "cuda":
+        peak_memory = (torch.cuda.max_memory_allocated() - baseline_memory) / 1024**3
+    return elapsed, peak_memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the feature-wise weight metrics")
+    parser.add_argument("--d_in", type=int, default=768)
+    parser.add_argument("--d_sae", type=int, nargs="+", default=[4096, 16384, 65536])
+    parser.add_argument("--block_size", type=int, default=core.DEFAULT_WEIGHT_METRICS_BLOCK_SIZE)
+    parser.add_argument("--max_d_sae_for_max_cosine_sim", type=int, default=65536)
+    args = parser.parse_args()
+
+    device = general_utils.setup_environment()
+
+    print(f"{'d_sae':>10} {'max cosine':>10} {'time (s)':>10} {'peak (GiB)':>11}")
+    for d_sae in args.d_sae:
+        sae = VanillaSAE(args.d_in, d_sae)
+        with torch.no_grad():
+            sae.W_enc.normal_()
+            sae.W_dec.normal_()
+        sae.cfg = CustomSAEConfig(
+            model_name="", d_in=args.d_in, d_sae=d_sae, hook_layer=0, hook_name=""
+        )
+        sae = sae.to(device=device)
+
+        for compute_max_decoder_cosine_sim in [False, True]:
+            if compute_max_decoder_cosine_sim and d_sae > args.max_d_sae_for_max_cosine_sim:
+                continue
+            elapsed, peak_memory = benchmark(
+                sae, device, args.block_size, compute_max_decoder_cosine_sim
+            )
+            peak = f"{peak_memory:.2f}" if peak_memory is not None else "n/a"
+            max_cosine = str(compute_max_decoder_cosine_sim)
+            print(f"{d_sae:>10} {max_cosine:>10} {elapsed:>10.2f} {peak:>11}")
+
+        del sae
+
+
+if __name__ == "__main__":
+    main()
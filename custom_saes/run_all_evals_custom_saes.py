@@ -91,6 +91,7 @@ def run_evals(
                 output_folder="eval_results/core",
                 verbose=True,
                 dtype=llm_dtype,
+                force_rerun=force_rerun,
             )
         ),
         "scr": (
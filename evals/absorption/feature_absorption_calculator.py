@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 import torch
 from sae_lens import SAE
@@ -12,6 +13,7 @@ from evals.absorption.prompting import (
     first_letter_formatter,
 )
 from evals.absorption.util import batchify
+from sae_bench_utils import activation_collection
 
 EPS = 1e-8
 
@@ -84,13 +86,12 @@ class FeatureAbsorptionCalculator:
         """
         self._validate_prompts_are_same_length(prompts)
         results: list[SpellingPrompt] = []
+        layer = activation_collection.get_layer_from_hook_name(sae.cfg.hook_name)
         for batch in batchify(prompts, batch_size=self.batch_size):
-            sae_in = self.model.run_with_cache([p.base for p in batch])[1][
-                sae.cfg.hook_name
-            ]
+            sae_in = self._get_word_token_activations(batch, sae.cfg.hook_name, layer)
             sae_acts = sae.encode(sae_in)
             split_feats_active = (
-                sae_acts[:, self.word_token_pos, main_feature_ids]
+                sae_acts[:, main_feature_ids]
                 .sum(dim=-1)
                 .float()
                 .tolist()
@@ -100,6 +101,22 @@ class FeatureAbsorptionCalculator:
                     results.append(prompt)
         return results
 
+    def _get_word_token_activations(
+        self, prompts: list[SpellingPrompt], hook_name: str, layer: Optional[int]
+    ) -> torch.Tensor:
+        """
+        Activations at word_token_pos, gathered inside the hook so the activations at the other positions are never kept.
+        """
+        return activation_collection.get_llm_activations_reduced(
+            self.model.to_tokens([p.base for p in prompts]),
+            self.model,
+            batch_size=len(prompts),
+            layer=layer,
+            hook_name=hook_name,
+            reducer=activation_collection.position_reducer(self.word_token_pos),
+            show_progress=False,
+        )
+
     def _build_prompts(self, words: list[str]) -> list[SpellingPrompt]:
         return [
             create_icl_prompt(
@@ -173,10 +190,9 @@ class FeatureAbsorptionCalculator:
         )
         hook_point = f"blocks.{layer}.hook_resid_post"
         for batch_prompts in batchify(prompts, batch_size=self.batch_size):
-            batch_acts = self.model.run_with_cache(
-                [p.base for p in batch_prompts],
-                names_filter=[hook_point],
-            )[1][hook_point][:, self.word_token_pos, :]
+            batch_acts = self._get_word_token_activations(
+                batch_prompts, hook_point, layer
+            )
             batch_sae_acts = sae.encode(batch_acts)
             batch_sae_probe_projections = batch_sae_acts * cos_sims.to(
                 batch_sae_acts.device
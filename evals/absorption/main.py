@@ -18,10 +18,12 @@ from evals.absorption.feature_absorption import run_feature_absortion_experiment
 from evals.absorption.k_sparse_probing import run_k_sparse_probing_experiment
 from sae_bench_utils import (
     activation_collection,
+    batch_size_planner,
     general_utils,
     get_eval_uuid,
     get_sae_lens_version,
     get_sae_bench_version,
+    sae_pipeline,
 )
 from sae_bench_utils.sae_selection_utils import get_saes_from_regex
 from transformer_lens import HookedTransformer
@@ -58,24 +60,13 @@ def run_eval(
         config.model_name, device=device, dtype=llm_dtype
     )
 
-    for sae_release, sae_id in tqdm(
-        selected_saes, desc="Running SAE evaluation on all selected SAEs"
+    # The next SAE is loaded and results are written in the background, while an SAE is evaluated
+    result_writer = sae_pipeline.ResultWriter()
+    for sae_release, sae_id, sae, _ in tqdm(
+        sae_pipeline.iter_saes(selected_saes, device, llm_dtype),
+        total=len(selected_saes),
+        desc="Running SAE evaluation on all selected SAEs",
     ):
-        del_sae = False
-        # Handle both pretrained SAEs (identified by string) and custom SAEs (passed as objects)
-        if isinstance(sae_id, str):
-            sae = SAE.from_pretrained(
-                release=sae_release,
-                sae_id=sae_id,
-                device=device,
-            )[0]
-            # If loading from pretrained, we delete the SAE object after use
-            del_sae = True
-        else:
-            sae = sae_id
-            sae_id = "custom_sae"
-
-        sae = sae.to(device=device, dtype=llm_dtype)
 
         k_sparse_probing_results = run_k_sparse_probing_experiment(
             model=model,
@@ -157,13 +148,14 @@ def run_eval(
         sae_result_file = sae_result_file.replace("/", "_")
         sae_result_path = os.path.join(output_path, sae_result_file)
 
-        eval_output.to_json_file(sae_result_path, indent=2)
+        result_writer.submit(eval_output.to_json_file, sae_result_path, indent=2)
 
-        if del_sae:
-            del sae
+        del sae
         gc.collect()
         torch.cuda.empty_cache()
 
+    result_writer.close()
+
     return results_dict
 
 
@@ -246,7 +238,7 @@ def arg_parser():
         "--llm_batch_size",
         type=int,
         default=None,
-        help="Batch size for LLM. If None, will be populated using LLM_NAME_TO_BATCH_SIZE",
+        help="Batch size for LLM. If None, will be planned from the model dimensions and free memory",
     )
     parser.add_argument(
         "--llm_dtype",
@@ -271,16 +263,19 @@ def create_config_and_selected_saes(args) -> tuple[AbsorptionEvalConfig, list[tu
         model_name=args.model_name,
     )
 
-    if args.llm_batch_size is not None:
-        config.llm_batch_size = args.llm_batch_size
-    else:
-        config.llm_batch_size = activation_collection.LLM_NAME_TO_BATCH_SIZE[config.model_name]
-
     if args.llm_dtype is not None:
         config.llm_dtype = args.llm_dtype
     else:
         config.llm_dtype = activation_collection.LLM_NAME_TO_DTYPE[config.model_name]
 
+    if args.llm_batch_size is not None:
+        config.llm_batch_size = args.llm_batch_size
+    else:
+        # The prompts are much shorter than the 128 tokens planned for
+        config.llm_batch_size = batch_size_planner.plan_llm_batch_size(
+            config.model_name, 128, config.llm_dtype
+        )
+
     if args.random_seed is not None:
         config.random_seed = args.random_seed
 
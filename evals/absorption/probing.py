@@ -20,6 +20,7 @@ from transformer_lens import HookedTransformer
 from evals.absorption.prompting import Formatter, SpellingPrompt, create_icl_prompt
 from evals.absorption.util import DEFAULT_DEVICE, batchify
 from evals.absorption.vocab import LETTERS
+from sae_bench_utils import activation_collection
 
 
 class LinearProbe(nn.Module):
@@ -314,6 +315,8 @@ def gen_and_save_df_acts_probing(
         A tuple containing the train and test task DataFrames and memory-mapped activation tensors.
     """
     d_model = model.cfg.d_model
+    layer = activation_collection.get_layer_from_hook_name(hook_point)
+    position_reducer = activation_collection.position_reducer(position_idx)
 
     def process_dataset(dataset, prefix):
         df = pd.DataFrame(
@@ -337,11 +340,17 @@ def gen_and_save_df_acts_probing(
                 batchify(dataset, batch_size, show_progress=True)
             ):
                 batch_prompts = [prompt.base for prompt, _ in batch]
-                cache = model.run_with_cache(batch_prompts, names_filter=[hook_point])[
-                    1
-                ]
+                # Only keep the activations at position_idx, gathered inside the hook
                 acts = (
-                    cache[hook_point][:, position_idx, :]
+                    activation_collection.get_llm_activations_reduced(
+                        model.to_tokens(batch_prompts),
+                        model,
+                        batch_size=len(batch),
+                        layer=layer,
+                        hook_name=hook_point,
+                        reducer=position_reducer,
+                        show_progress=False,
+                    )
                     .cpu()
                     .to(torch.float32)
                     .numpy()
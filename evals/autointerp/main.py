@@ -33,7 +33,9 @@ from sae_bench_utils.indexing_utils import (
 )
 import sae_bench_utils.dataset_utils as dataset_utils
 import sae_bench_utils.activation_collection as activation_collection
+import sae_bench_utils.batch_size_planner as batch_size_planner
 import sae_bench_utils.general_utils as general_utils
+import sae_bench_utils.sae_pipeline as sae_pipeline
 
 
 from sae_bench_utils import (
@@ -366,7 +368,8 @@ class AutoInterp:
         """
         dataset_size, seq_len = self.tokenized_dataset.shape
 
-        acts = activation_collection.collect_sae_activations(
+        # Sparse, so memory scales with the number of activations rather than the number of latents
+        acts = activation_collection.collect_sae_activations_sparse(
             self.tokenized_dataset,
             self.model,
             self.sae,
@@ -399,29 +402,34 @@ class AutoInterp:
             )
 
             # (2/3) Get top-scoring examples
+            latent_acts = acts.latent(i)
             top_indices = get_k_largest_indices(
-                acts[..., i],
+                latent_acts,
                 k=self.cfg.n_top_ex,
                 buffer=self.cfg.buffer,
                 no_overlap=self.cfg.no_overlap,
             )
+            # Only nonzero activations are stored, if there aren't enough we assume this is a dead feature & continue
+            if len(top_indices) < self.cfg.n_top_ex:
+                continue
             top_toks = index_with_buffer(
                 self.tokenized_dataset, top_indices, buffer=self.cfg.buffer
             )
-            top_values = index_with_buffer(acts[..., i], top_indices, buffer=self.cfg.buffer)
+            top_values = index_with_buffer(latent_acts, top_indices, buffer=self.cfg.buffer)
             act_threshold = self.cfg.act_threshold_frac * top_values.max().item()
 
             # (3/3) Get importance-weighted examples, using a threshold so they're disjoint from top examples
             # Also, if we don't have enough values, then we assume this is a dead feature & continue
             threshold = top_values[:, self.cfg.buffer].min().item()
-            acts_thresholded = torch.where(acts[..., i] >= threshold, 0.0, acts[..., i])
-            if acts_thresholded[:, self.cfg.buffer : -self.cfg.buffer].max() < 1e-6:
+            acts_thresholded = latent_acts.filter(latent_acts.values < threshold)
+            iw_candidates = acts_thresholded.crop(self.cfg.buffer)
+            if len(iw_candidates) < self.cfg.n_iw_sampled_ex or iw_candidates.values.max() < 1e-6:
                 continue
             iw_indices = get_iw_sample_indices(
                 acts_thresholded, k=self.cfg.n_iw_sampled_ex, buffer=self.cfg.buffer
             )
             iw_toks = index_with_buffer(self.tokenized_dataset, iw_indices, buffer=self.cfg.buffer)
-            iw_values = index_with_buffer(acts[..., i], iw_indices, buffer=self.cfg.buffer)
+            iw_values = index_with_buffer(latent_acts, iw_indices, buffer=self.cfg.buffer)
 
             # Get random values to use for splitting
             rand_top_ex_split_indices = torch.randperm(self.cfg.n_top_ex)
@@ -540,26 +548,13 @@ def run_eval(
         config.model_name, device=device, dtype=llm_dtype
     )
 
-    for sae_release, sae_id in tqdm(
-        selected_saes, desc="Running SAE evaluation on all selected SAEs"
+    # The next SAE is loaded and results are written in the background, while an SAE is evaluated
+    result_writer = sae_pipeline.ResultWriter()
+    for sae_release, sae_id, sae, sparsity in tqdm(
+        sae_pipeline.iter_saes(selected_saes, device, llm_dtype),
+        total=len(selected_saes),
+        desc="Running SAE evaluation on all selected SAEs",
     ):
-        del_sae = False
-
-        # Handle both pretrained SAEs (identified by string) and custom SAEs (passed as objects)
-        if isinstance(sae_id, str):
-            sae, _, sparsity = SAE.from_pretrained(
-                release=sae_release,
-                sae_id=sae_id,
-                device=device,
-            )
-            # If loading from pretrained, we delete the SAE object after use
-            del_sae = True
-        else:
-            sae = sae_id
-            sae_id = "custom_sae"
-            sparsity = None
-
-        sae = sae.to(device=device, dtype=llm_dtype)
 
         artifacts_folder = os.path.join(artifacts_base_folder, EVAL_TYPE_ID_AUTOINTERP)
 
@@ -619,13 +614,14 @@ def run_eval(
 
             results_dict[f"{sae_release}_{sae_id}"] = asdict(eval_output)
 
-            eval_output.to_json_file(sae_result_path, indent=2)
+            result_writer.submit(eval_output.to_json_file, sae_result_path, indent=2)
 
-        if del_sae:
-            del sae
+        del sae
         gc.collect()
         torch.cuda.empty_cache()
 
+    result_writer.close()
+
     return results_dict
 
 
@@ -636,16 +632,18 @@ def create_config_and_selected_saes(
         model_name=args.model_name,
     )
 
-    if args.llm_batch_size is not None:
-        config.llm_batch_size = args.llm_batch_size
-    else:
-        config.llm_batch_size = activation_collection.LLM_NAME_TO_BATCH_SIZE[config.model_name]
-
     if args.llm_dtype is not None:
         config.llm_dtype = args.llm_dtype
     else:
         config.llm_dtype = activation_collection.LLM_NAME_TO_DTYPE[config.model_name]
 
+    if args.llm_batch_size is not None:
+        config.llm_batch_size = args.llm_batch_size
+    else:
+        config.llm_batch_size = batch_size_planner.plan_llm_batch_size(
+            config.model_name, config.llm_context_size, config.llm_dtype
+        )
+
     if args.random_seed is not None:
         config.random_seed = args.random_seed
 
@@ -690,7 +688,7 @@ def arg_parser():
         "--llm_batch_size",
         type=int,
         default=None,
-        help="Batch size for LLM. If None, will be populated using LLM_NAME_TO_BATCH_SIZE",
+        help="Batch size for LLM. If None, will be planned from the model dimensions and free memory",
     )
     parser.add_argument(
         "--llm_dtype",
@@ -77,6 +77,16 @@ class CoreEvalConfig(BaseEvalConfig):
         title="Compute Featurewise Weight-Based Metrics",
         description="Compute featurewise weight-based metrics",
     )
+    compute_featurewise_max_decoder_cosine_sim: bool = Field(
+        default=False,
+        title="Compute Featurewise Max Decoder Cosine Similarity",
+        description="With the featurewise weight-based metrics, also compute the highest cosine similarity of each latent's decoder direction with that of any other latent. This takes O(d_sae^2 * d_in) compute",
+    )
+    weight_metrics_block_size: int = Field(
+        default=16384,
+        title="Weight Metrics Block Size",
+        description="Number of latents processed at a time by the featurewise weight-based metrics, which bounds their peak memory",
+    )
     exclude_special_tokens_from_reconstruction: bool = Field(
         default=False,
         title="Exclude Special Tokens from Reconstruction",
@@ -87,3 +97,23 @@ class CoreEvalConfig(BaseEvalConfig):
         title="Verbose",
         description="Enable verbose output",
     )
+    max_saes_per_group: int = Field(
+        default=1,
+        title="Max SAEs Per Group",
+        description="Evaluate up to this many consecutive SAEs at the same hook together, sharing the clean and zero-ablated runs and the LLM activations. Every SAE of a group is held in memory at once",
+    )
+    checkpoint_every_n_batches: int = Field(
+        default=0,
+        title="Checkpoint Every N Batches",
+        description="Save the accumulated metrics every this many batches, so that an interrupted run resumes from the last checkpoint instead of from the first batch. 0 disables checkpointing",
+    )
+    early_stopping_tolerance: float = Field(
+        default=0.0,
+        title="Early Stopping Tolerance",
+        description="Stop evaluating reconstruction or sparsity and variance batches once the half-width of the 95% confidence interval of every key metric (CE loss score, explained variance and L0) of every SAE is below this. n_eval_reconstruction_batches and n_eval_sparsity_variance_batches become the maximum number of batches. 0 disables early stopping",
+    )
+    early_stopping_min_batches: int = Field(
+        default=10,
+        title="Early Stopping Min Batches",
+        description="Evaluate at least this many batches before stopping early, so that the confidence intervals are estimated from enough batches",
+    )
@@ -117,6 +117,36 @@ class TokenStatsMetrics(BaseMetrics):
         title="Total Tokens (Sparsity/Variance)",
         description="Total number of tokens used in sparsity and variance evaluation",
     )
+    n_batches_eval_reconstruction: int | None = Field(
+        default=None,
+        title="Batches (Reconstruction)",
+        description="Number of batches evaluated for reconstruction metrics, fewer than n_eval_reconstruction_batches if evaluation stopped early",
+    )
+    n_batches_eval_sparsity_variance: int | None = Field(
+        default=None,
+        title="Batches (Sparsity/Variance)",
+        description="Number of batches evaluated for sparsity and variance metrics, fewer than n_eval_sparsity_variance_batches if evaluation stopped early",
+    )
+
+
+# Define metrics for the confidence intervals of the key metrics
+@dataclass
+class ConfidenceIntervalMetrics(BaseMetrics):
+    ce_loss_score_ci_half_width: float | None = Field(
+        default=None,
+        title="CE Loss Score CI Half-Width",
+        description="Half-width of the 95% confidence interval of the CE loss score, estimated from the per-batch scores",
+    )
+    explained_variance_ci_half_width: float | None = Field(
+        default=None,
+        title="Explained Variance CI Half-Width",
+        description="Half-width of the 95% confidence interval of the explained variance, estimated from the per-batch means",
+    )
+    l0_ci_half_width: float | None = Field(
+        default=None,
+        title="L0 CI Half-Width",
+        description="Half-width of the 95% confidence interval of the L0 sparsity, estimated from the per-batch means",
+    )
 
 
 # Define the categories themselves
@@ -146,6 +176,11 @@ class CoreMetricCategories(BaseMetricCategories):
         title="Token Statistics",
         description="Statistics about the number of tokens used in evaluation",
     )
+    confidence_intervals: ConfidenceIntervalMetrics = Field(
+        default_factory=ConfidenceIntervalMetrics,
+        title="Confidence Intervals",
+        description="Confidence intervals of the key metrics, which early stopping compares against its tolerance. Only set for metrics evaluated on at least two batches",
+    )
 
 
 # Define the feature-wise metrics
@@ -175,6 +210,16 @@ class CoreFeatureMetric(BaseResultDetail):
         title="Encoder-Decoder Cosine Similarity",
         description="Cosine similarity between encoder and decoder weights for each feature",
     )
+    max_decoder_cosine_sim: float | None = Field(
+        default=None,
+        title="Max Decoder Cosine Similarity",
+        description="Optional. Highest cosine similarity between the decoder weights of each feature and those of any other feature",
+    )
+    max_decoder_cosine_sim_index: int | None = Field(
+        default=None,
+        title="Max Decoder Cosine Similarity Index",
+        description="Optional. Index of the other feature with the highest decoder cosine similarity",
+    )
 
 
 # Define the eval output
@@ -193,7 +238,12 @@ class CoreEvalOutput(
     eval_result_details: list[CoreFeatureMetric] = Field(
         default_factory=list,
         title="Feature-wise Metrics",
-        description="Detailed metrics for each feature in the SAE",
+        description="Detailed metrics for each feature in the SAE. Empty when the metrics are saved to feature_metrics_file instead",
+    )
+    feature_metrics_file: str | None = Field(
+        default=None,
+        title="Feature-wise Metrics File",
+        description="Optional. Name of an .npz file in the same directory as this JSON file, holding one array per feature-wise metric, indexed by feature",
     )
     eval_type_id: str = Field(
         default=EVAL_TYPE_ID_CORE,
@@ -2,6 +2,9 @@
 # flake8: noqa: E501
 # fmt: on
 import argparse
+import hashlib
+import json
+import os
 import time
 import functools
 import random
@@ -12,12 +15,14 @@ import re
 import gc
 import subprocess
 from collections import defaultdict
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from functools import partial
 from importlib.metadata import PackageNotFoundError, version
 from pathlib import Path
 import einops
+import numpy as np
 import torch
+from pydantic import TypeAdapter
 from tqdm import tqdm
 from transformer_lens import HookedTransformer
 from transformer_lens.hook_points import HookedRootModule
@@ -34,6 +39,7 @@ from evals.core.eval_output import (
     ShrinkageMetrics,
     SparsityMetrics,
     TokenStatsMetrics,
+    ConfidenceIntervalMetrics,
     CoreFeatureMetric,
 )
 from sae_bench_utils import (
@@ -42,8 +48,12 @@ from sae_bench_utils import (
     get_sae_bench_version,
 )
 
+import sae_bench_utils.activation_cache as activation_cache
+import sae_bench_utils.activation_collection as activation_collection
 import sae_bench_utils.sae_selection_utils as sae_selection_utils
 import sae_bench_utils.general_utils as general_utils
+import sae_bench_utils.streaming_stats as streaming_stats
+import sae_bench_utils.token_cache as token_cache
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +62,25 @@ logger = logging.getLogger(__name__)
 # compromise.
 DEFAULT_FLOAT_PRECISION = 10
 
+FEATURE_METRICS_FILE_SUFFIX = "_feature_metrics.npz"
+
+# CoreEvalConfig fields that don't change the results, which get_eval_config_hash() leaves out
+RESULT_INDEPENDENT_CONFIG_FIELDS = {
+    "model_name",
+    "verbose",
+    "max_saes_per_group",
+    "checkpoint_every_n_batches",
+}
+
+# Number of vocabulary entries whose logits exist at a time when computing the CE loss and KL
+# divergence. Full [batch, pos, d_vocab] logits are the largest tensors in the core eval for models
+# with large vocabularies, e.g. 256k for Gemma.
+DEFAULT_VOCAB_CHUNK_SIZE = 8192
+
+# Number of latents whose weights are normalized at a time when computing the feature-wise weight
+# based metrics, which bounds their memory use for SAEs with millions of latents
+DEFAULT_WEIGHT_METRICS_BLOCK_SIZE = 16384
+
 
 def retry_with_exponential_backoff(
     retries: int = 5,
@@ -171,6 +200,101 @@ def get_multiple_evals_everything_config(
     )
 
 
+class MetricsCheckpoint:
+    """Saves the metric state that run_evals_multiple_saes() has accumulated every
+    every_n_batches batches, so that an interrupted run resumes mid-SAE from the last checkpoint.
+
+    The state of each stage (reconstruction and sparsity_variance) is stored separately. A
+    checkpoint is only restored if it was saved under the same key, which identifies the SAEs and
+    the eval config. Resuming reads and discards the token batches that were already evaluated,
+    so the remaining batches get the same tokens as in an uninterrupted run."""
+
+    def __init__(self, path: Path, key: str, every_n_batches: int):
+        assert every_n_batches > 0
+        self.path = path
+        self.key = key
+        self.every_n_batches = every_n_batches
+
+    def load(self, stage: str) -> Optional[dict[str, Any]]:
+        if not self.path.exists():
+            return None
+        checkpoint = torch.load(self.path, map_location="cpu")
+        if checkpoint["key"] != self.key:
+            return None
+        return checkpoint["stages"].get(stage)
+
+    def is_due(self, num_batches_done: int, n_batches: int) -> bool:
+        return num_batches_done % self.every_n_batches == 0 or num_batches_done == n_batches
+
+    def save(self, stage: str, state: dict[str, Any]):
+        stages = {}
+        if self.path.exists():
+            checkpoint = torch.load(self.path, map_location="cpu")
+            if checkpoint["key"] == self.key:
+                stages = checkpoint["stages"]
+        stages[stage] = state
+
+        # Write to a temporary file first, so that a run killed while saving keeps the last
+        # complete checkpoint
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        torch.save({"key": self.key, "stages": stages}, tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path.exists():
+            self.path.unlink()
+
+
+def moments_to_state(
+    metric_dict: dict[str, streaming_stats.RunningMoments],
+) -> dict[str, dict[str, Any]]:
+    return {metric_name: asdict(moments) for metric_name, moments in metric_dict.items()}
+
+
+def moments_from_state(
+    metric_state: dict[str, dict[str, Any]],
+) -> dict[str, streaming_stats.RunningMoments]:
+    return {
+        metric_name: streaming_stats.RunningMoments(**moments_state)
+        for metric_name, moments_state in metric_state.items()
+    }
+
+
+def skip_batches(activation_store: ActivationsStore, n_batches: int, eval_batch_size_prompts: int):
+    """Read and discard the tokens of n_batches batches, e.g. ones a checkpoint already covers."""
+    for _ in range(n_batches):
+        activation_store.get_batch_tokens(eval_batch_size_prompts)
+
+
+def have_metrics_converged(
+    all_ci_moments: list[dict[str, streaming_stats.RunningMoments]],
+    num_batches_done: int,
+    early_stopping_tolerance: float,
+    early_stopping_min_batches: int,
+) -> bool:
+    """Whether evaluation can stop early, because the confidence interval half-width of every
+    tracked per-batch metric of every SAE is below early_stopping_tolerance. Always False when
+    early stopping is disabled, before early_stopping_min_batches batches or if nothing is
+    tracked."""
+    if early_stopping_tolerance <= 0 or num_batches_done < early_stopping_min_batches:
+        return False
+    half_widths = [
+        moments.confidence_interval_half_width().item()
+        for ci_moments in all_ci_moments
+        for moments in ci_moments.values()
+    ]
+    return len(half_widths) > 0 and max(half_widths) < early_stopping_tolerance
+
+
+def get_ci_half_widths(ci_moments: dict[str, streaming_stats.RunningMoments]) -> dict[str, float]:
+    """The confidence interval half-width of each metric tracked over at least two batches."""
+    return {
+        f"{metric_name}_ci_half_width": moments.confidence_interval_half_width().item()
+        for metric_name, moments in ci_moments.items()
+        if moments.count >= 2
+    }
+
+
 @torch.no_grad()
 def run_evals(
     sae: SAE,
@@ -181,30 +305,84 @@ def run_evals(
     ignore_tokens: set[int | None] = set(),
     verbose: bool = False,
 ) -> tuple[dict[str, Any], dict[str, Any]]:
-    hook_name = sae.cfg.hook_name
+    return run_evals_multiple_saes(
+        [sae],
+        activation_store,
+        model,
+        eval_config=eval_config,
+        model_kwargs=model_kwargs,
+        ignore_tokens=ignore_tokens,
+        verbose=verbose,
+    )[0]
+
+
+def get_sae_group_key(sae: SAE) -> tuple[Any, ...]:
+    """SAEs with equal keys can be evaluated together by run_evals_multiple_saes(), as they read the
+    same hook of the same model and get the same tokens from ActivationsStore.from_sae()."""
+    return (
+        sae.cfg.model_name,
+        sae.cfg.hook_name,
+        sae.cfg.hook_head_index,
+        sae.cfg.prepend_bos,
+        sae.cfg.normalize_activations,
+    )
+
+
+@torch.no_grad()
+def run_evals_multiple_saes(
+    saes: list[SAE],
+    activation_store: ActivationsStore,
+    model: HookedRootModule,
+    eval_config: CoreEvalConfig = CoreEvalConfig(),
+    model_kwargs: Mapping[str, Any] = {},
+    ignore_tokens: set[int | None] = set(),
+    verbose: bool = False,
+    checkpoint: Optional[MetricsCheckpoint] = None,
+) -> list[tuple[dict[str, Any], dict[str, Any]]]:
+    """run_evals() for several SAEs with the same get_sae_group_key(), returning (metrics,
+    feature_metrics) for each SAE. Every SAE is evaluated on the same token batches, and the clean
+    and zero-ablated runs and the activations at the hook are computed once per batch for all SAEs,
+    so evaluating a sweep of SAEs at one layer only pays for the SAE-dependent parts per SAE.
+
+    With a checkpoint, the accumulated metrics are saved periodically and a run resumes from the
+    last saved batch.
+
+    With eval_config.early_stopping_tolerance > 0, the n_eval_*_batches are maximums: each stage
+    stops once the confidence intervals of its key metrics (CE loss score, or explained variance
+    and L0) are narrow enough for every SAE. The batches evaluated and the final confidence
+    interval half-widths are reported in token_stats and confidence_intervals."""
+    assert len(saes) > 0, "No SAEs to evaluate"
+    assert all(get_sae_group_key(sae) == get_sae_group_key(saes[0]) for sae in saes)
+    hook_name = saes[0].cfg.hook_name
     actual_batch_size = eval_config.batch_size_prompts or activation_store.store_batch_size_prompts
 
     # TODO: Come up with a cleaner long term strategy here for SAEs that do reshaping.
     # turn off hook_z reshaping mode if it's on, and restore it after evals
+    previous_hook_z_reshaping_modes = []
     if "hook_z" in hook_name:
-        previous_hook_z_reshaping_mode = sae.hook_z_reshaping_mode
-        sae.turn_off_forward_pass_hook_z_reshaping()
-    else:
-        previous_hook_z_reshaping_mode = None
-
-    all_metrics = {
-        "model_behavior_preservation": {},
-        "model_performance_preservation": {},
-        "reconstruction_quality": {},
-        "shrinkage": {},
-        "sparsity": {},
-        "token_stats": {},
-    }
+        for sae in saes:
+            previous_hook_z_reshaping_modes.append(sae.hook_z_reshaping_mode)
+            sae.turn_off_forward_pass_hook_z_reshaping()
+
+    all_saes_metrics = [
+        {
+            "model_behavior_preservation": {},
+            "model_performance_preservation": {},
+            "reconstruction_quality": {},
+            "shrinkage": {},
+            "sparsity": {},
+            "token_stats": {},
+            "confidence_intervals": {},
+        }
+        for _ in saes
+    ]
+    n_reconstruction_batches = eval_config.n_eval_reconstruction_batches
+    n_sparsity_variance_batches = eval_config.n_eval_sparsity_variance_batches
 
     if eval_config.compute_kl or eval_config.compute_ce_loss:
         assert eval_config.n_eval_reconstruction_batches > 0
-        reconstruction_metrics = get_downstream_reconstruction_metrics(
-            sae,
+        all_reconstruction_metrics = get_downstream_reconstruction_metrics_multiple_saes(
+            saes,
             model,
             activation_store,
             compute_kl=eval_config.compute_kl,
@@ -214,26 +392,37 @@ def run_evals(
             ignore_tokens=ignore_tokens,
             exclude_special_tokens_from_reconstruction=eval_config.exclude_special_tokens_from_reconstruction,
             verbose=verbose,
+            checkpoint=checkpoint,
+            early_stopping_tolerance=eval_config.early_stopping_tolerance,
+            early_stopping_min_batches=eval_config.early_stopping_min_batches,
         )
+        n_reconstruction_batches = all_reconstruction_metrics[0]["n_batches"]
+
+        for all_metrics, reconstruction_metrics in zip(
+            all_saes_metrics, all_reconstruction_metrics
+        ):
+            if eval_config.compute_kl:
+                all_metrics["model_behavior_preservation"].update(
+                    {
+                        "kl_div_score": reconstruction_metrics["kl_div_score"],
+                        "kl_div_with_ablation": reconstruction_metrics["kl_div_with_ablation"],
+                        "kl_div_with_sae": reconstruction_metrics["kl_div_with_sae"],
+                    }
+                )
 
-        if eval_config.compute_kl:
-            all_metrics["model_behavior_preservation"].update(
-                {
-                    "kl_div_score": reconstruction_metrics["kl_div_score"],
-                    "kl_div_with_ablation": reconstruction_metrics["kl_div_with_ablation"],
-                    "kl_div_with_sae": reconstruction_metrics["kl_div_with_sae"],
-                }
-            )
-
-        if eval_config.compute_ce_loss:
-            all_metrics["model_performance_preservation"].update(
-                {
-                    "ce_loss_score": reconstruction_metrics["ce_loss_score"],
-                    "ce_loss_with_ablation": reconstruction_metrics["ce_loss_with_ablation"],
-                    "ce_loss_with_sae": reconstruction_metrics["ce_loss_with_sae"],
-                    "ce_loss_without_sae": reconstruction_metrics["ce_loss_without_sae"],
-                }
-            )
+            if eval_config.compute_ce_loss:
+                all_metrics["model_performance_preservation"].update(
+                    {
+                        "ce_loss_score": reconstruction_metrics["ce_loss_score"],
+                        "ce_loss_with_ablation": reconstruction_metrics["ce_loss_with_ablation"],
+                        "ce_loss_with_sae": reconstruction_metrics["ce_loss_with_sae"],
+                        "ce_loss_without_sae": reconstruction_metrics["ce_loss_without_sae"],
+                    }
+                )
+                if "ce_loss_score_ci_half_width" in reconstruction_metrics:
+                    all_metrics["confidence_intervals"]["ce_loss_score_ci_half_width"] = (
+                        reconstruction_metrics["ce_loss_score_ci_half_width"]
+                    )
 
         activation_store.reset_input_dataset()
 
@@ -243,8 +432,8 @@ def run_evals(
         or eval_config.compute_variance_metrics
     ):
         assert eval_config.n_eval_sparsity_variance_batches > 0
-        sparsity_variance_metrics, feature_metrics = get_sparsity_and_variance_metrics(
-            sae,
+        all_sparsity_variance_metrics = get_sparsity_and_variance_metrics_multiple_saes(
+            saes,
             model,
             activation_store,
             compute_l2_norms=eval_config.compute_l2_norms,
@@ -256,103 +445,175 @@ def run_evals(
             model_kwargs=model_kwargs,
             ignore_tokens=ignore_tokens,
             verbose=verbose,
+            checkpoint=checkpoint,
+            early_stopping_tolerance=eval_config.early_stopping_tolerance,
+            early_stopping_min_batches=eval_config.early_stopping_min_batches,
         )
+        n_sparsity_variance_batches = all_sparsity_variance_metrics[0][0]["n_batches"]
+        all_feature_metrics = [
+            feature_metrics for _, feature_metrics in all_sparsity_variance_metrics
+        ]
+
+        for all_metrics, (sparsity_variance_metrics, _) in zip(
+            all_saes_metrics, all_sparsity_variance_metrics
+        ):
+            if eval_config.compute_l2_norms:
+                all_metrics["shrinkage"].update(
+                    {
+                        "l2_norm_in": sparsity_variance_metrics["l2_norm_in"],
+                        "l2_norm_out": sparsity_variance_metrics["l2_norm_out"],
+                        "l2_ratio": sparsity_variance_metrics["l2_ratio"],
+                        "relative_reconstruction_bias": sparsity_variance_metrics[
+                            "relative_reconstruction_bias"
+                        ],
+                    }
+                )
 
-        if eval_config.compute_l2_norms:
-            all_metrics["shrinkage"].update(
-                {
-                    "l2_norm_in": sparsity_variance_metrics["l2_norm_in"],
-                    "l2_norm_out": sparsity_variance_metrics["l2_norm_out"],
-                    "l2_ratio": sparsity_variance_metrics["l2_ratio"],
-                    "relative_reconstruction_bias": sparsity_variance_metrics[
-                        "relative_reconstruction_bias"
-                    ],
-                }
-            )
+            if eval_config.compute_sparsity_metrics:
+                all_metrics["sparsity"].update(
+                    {
+                        "l0": sparsity_variance_metrics["l0"],
+                        "l1": sparsity_variance_metrics["l1"],
+                    }
+                )
 
-        if eval_config.compute_sparsity_metrics:
-            all_metrics["sparsity"].update(
-                {
-                    "l0": sparsity_variance_metrics["l0"],
-                    "l1": sparsity_variance_metrics["l1"],
-                }
-            )
+            if eval_config.compute_variance_metrics:
+                all_metrics["reconstruction_quality"].update(
+                    {
+                        "explained_variance": sparsity_variance_metrics["explained_variance"],
+                        "mse": sparsity_variance_metrics["mse"],
+                        "cossim": sparsity_variance_metrics["cossim"],
+                    }
+                )
 
-        if eval_config.compute_variance_metrics:
-            all_metrics["reconstruction_quality"].update(
-                {
-                    "explained_variance": sparsity_variance_metrics["explained_variance"],
-                    "mse": sparsity_variance_metrics["mse"],
-                    "cossim": sparsity_variance_metrics["cossim"],
-                }
-            )
+            for metric_name in ["explained_variance", "l0"]:
+                if f"{metric_name}_ci_half_width" in sparsity_variance_metrics:
+                    all_metrics["confidence_intervals"][f"{metric_name}_ci_half_width"] = (
+                        sparsity_variance_metrics[f"{metric_name}_ci_half_width"]
+                    )
     else:
-        feature_metrics = {}
+        all_feature_metrics = [{} for _ in saes]
 
     if eval_config.compute_featurewise_weight_based_metrics:
-        feature_metrics |= get_featurewise_weight_based_metrics(sae)
+        for sae, feature_metrics in zip(saes, all_feature_metrics):
+            feature_metrics |= get_featurewise_weight_based_metrics(
+                sae,
+                block_size=eval_config.weight_metrics_block_size,
+                compute_max_decoder_cosine_sim=(
+                    eval_config.compute_featurewise_max_decoder_cosine_sim
+                ),
+            )
 
-    if len(all_metrics) == 0:
+    if len(all_saes_metrics[0]) == 0:
         raise ValueError("No metrics were computed, please set at least one metric to True.")
 
     # restore previous hook z reshaping mode if necessary
-    if "hook_z" in hook_name:
+    for sae, previous_hook_z_reshaping_mode in zip(saes, previous_hook_z_reshaping_modes):
         if previous_hook_z_reshaping_mode and not sae.hook_z_reshaping_mode:
             sae.turn_on_forward_pass_hook_z_reshaping()
         elif not previous_hook_z_reshaping_mode and sae.hook_z_reshaping_mode:
             sae.turn_off_forward_pass_hook_z_reshaping()
 
     total_tokens_evaluated_eval_reconstruction = (
-        activation_store.context_size
-        * eval_config.n_eval_reconstruction_batches
-        * actual_batch_size
+        activation_store.context_size * n_reconstruction_batches * actual_batch_size
     )
 
     total_tokens_evaluated_eval_sparsity_variance = (
-        activation_store.context_size
-        * eval_config.n_eval_sparsity_variance_batches
-        * actual_batch_size
+        activation_store.context_size * n_sparsity_variance_batches * actual_batch_size
     )
 
-    all_metrics["token_stats"] = {
-        "total_tokens_eval_reconstruction": total_tokens_evaluated_eval_reconstruction,
-        "total_tokens_eval_sparsity_variance": total_tokens_evaluated_eval_sparsity_variance,
-    }
+    results = []
+    for all_metrics, feature_metrics in zip(all_saes_metrics, all_feature_metrics):
+        all_metrics["token_stats"] = {
+            "total_tokens_eval_reconstruction": total_tokens_evaluated_eval_reconstruction,
+            "total_tokens_eval_sparsity_variance": total_tokens_evaluated_eval_sparsity_variance,
+            "n_batches_eval_reconstruction": n_reconstruction_batches,
+            "n_batches_eval_sparsity_variance": n_sparsity_variance_batches,
+        }
 
-    # Remove empty metric groups
-    all_metrics = {k: v for k, v in all_metrics.items() if v}
+        # Remove empty metric groups
+        all_metrics = {k: v for k, v in all_metrics.items() if v}
+        results.append((all_metrics, feature_metrics))
 
-    return all_metrics, feature_metrics
+    return results
 
 
-def get_featurewise_weight_based_metrics(sae: SAE) -> dict[str, Any]:
-    unit_norm_encoders = (sae.W_enc / sae.W_enc.norm(dim=0, keepdim=True)).cpu()
-    unit_norm_decoder = (sae.W_dec.T / sae.W_dec.T.norm(dim=0, keepdim=True)).cpu()
+@torch.no_grad()
+def get_featurewise_weight_based_metrics(
+    sae: SAE,
+    block_size: int = DEFAULT_WEIGHT_METRICS_BLOCK_SIZE,
+    compute_max_decoder_cosine_sim: bool = False,
+) -> dict[str, Any]:
+    """Encoder bias, encoder norm and encoder-decoder cosine similarity of each latent. With
+    compute_max_decoder_cosine_sim, also the highest cosine similarity of each latent's decoder
+    direction with that of any other latent, and the index of that latent.
 
-    encoder_norms = sae.W_enc.norm(dim=-2).cpu().tolist()
+    The latents are processed in blocks of block_size on the SAE's device, so no full
+    unit-normalized copy of W_enc or W_dec is made, and the decoder similarities are reduced to a
+    running maximum per latent one [block_size, block_size] tile at a time. Peak memory beyond the
+    weights is O(block_size * (d_in + block_size)), independent of d_sae."""
+    d_sae = sae.cfg.d_sae
 
     # gated models have a different bias (no b_enc)
     if not hasattr(sae, "b_enc") and not hasattr(sae, "b_mag"):
-        encoder_bias = torch.zeros(sae.cfg.d_sae).cpu().tolist()
+        encoder_bias = torch.zeros(d_sae)
     elif sae.cfg.architecture != "gated":
-        encoder_bias = sae.b_enc.cpu().tolist()
+        encoder_bias = sae.b_enc.detach().float().cpu()
     else:
-        encoder_bias = sae.b_mag.cpu().tolist()
-
-    encoder_decoder_cosine_sim = (
-        torch.nn.functional.cosine_similarity(
-            unit_norm_decoder.T,
-            unit_norm_encoders.T,
+        encoder_bias = sae.b_mag.detach().float().cpu()
+
+    def unit_norm_decoder_block(block_start: int) -> torch.Tensor:
+        decoder_block = sae.W_dec[block_start : block_start + block_size].float()
+        return decoder_block / decoder_block.norm(dim=-1, keepdim=True)
+
+    encoder_norms = []
+    encoder_decoder_cosine_sims = []
+    max_decoder_cosine_sims = []
+    max_decoder_cosine_sim_indices = []
+    for block_start in range(0, d_sae, block_size):
+        encoder_block = sae.W_enc[:, block_start : block_start + block_size].float()
+        encoder_block_norms = encoder_block.norm(dim=0)
+        unit_norm_decoder = unit_norm_decoder_block(block_start)
+
+        encoder_norms.append(encoder_block_norms.cpu())
+        encoder_decoder_cosine_sims.append(
+            torch.nn.functional.cosine_similarity(
+                unit_norm_decoder, (encoder_block / encoder_block_norms).T
+            ).cpu()
         )
-        .cpu()
-        .tolist()
-    )
 
-    return {
-        "encoder_bias": encoder_bias,
-        "encoder_norm": encoder_norms,
-        "encoder_decoder_cosine_sim": encoder_decoder_cosine_sim,
+        if compute_max_decoder_cosine_sim:
+            block_max = torch.full(
+                (unit_norm_decoder.shape[0],), -float("inf"), device=unit_norm_decoder.device
+            )
+            block_argmax = torch.zeros_like(block_max, dtype=torch.long)
+            for other_block_start in range(0, d_sae, block_size):
+                cosine_sims = unit_norm_decoder @ unit_norm_decoder_block(other_block_start).T
+                if other_block_start == block_start:
+                    # A latent's similarity with itself is always 1
+                    cosine_sims.fill_diagonal_(-float("inf"))
+                tile_max, tile_argmax = cosine_sims.max(dim=-1)
+                is_new_max = tile_max > block_max
+                block_max = torch.where(is_new_max, tile_max, block_max)
+                block_argmax = torch.where(
+                    is_new_max, tile_argmax + other_block_start, block_argmax
+                )
+            max_decoder_cosine_sims.append(block_max.cpu())
+            max_decoder_cosine_sim_indices.append(block_argmax.cpu())
+
+    feature_metrics = {
+        "encoder_bias": encoder_bias.float().cpu().numpy(),
+        "encoder_norm": torch.cat(encoder_norms).float().numpy(),
+        "encoder_decoder_cosine_sim": torch.cat(encoder_decoder_cosine_sims).float().numpy(),
     }
+    if compute_max_decoder_cosine_sim:
+        feature_metrics["max_decoder_cosine_sim"] = (
+            torch.cat(max_decoder_cosine_sims).float().numpy()
+        )
+        feature_metrics["max_decoder_cosine_sim_index"] = torch.cat(
+            max_decoder_cosine_sim_indices
+        ).numpy()
+    return feature_metrics
 
 
 def get_downstream_reconstruction_metrics(
@@ -367,23 +628,81 @@ def get_downstream_reconstruction_metrics(
     exclude_special_tokens_from_reconstruction: bool = False,
     verbose: bool = False,
 ):
-    metrics_dict = {}
-    if compute_kl:
-        metrics_dict["kl_div_with_sae"] = []
-        metrics_dict["kl_div_with_ablation"] = []
-    if compute_ce_loss:
-        metrics_dict["ce_loss_with_sae"] = []
-        metrics_dict["ce_loss_without_sae"] = []
-        metrics_dict["ce_loss_with_ablation"] = []
-
-    batch_iter = range(n_batches)
+    return get_downstream_reconstruction_metrics_multiple_saes(
+        [sae],
+        model,
+        activation_store,
+        compute_kl=compute_kl,
+        compute_ce_loss=compute_ce_loss,
+        n_batches=n_batches,
+        eval_batch_size_prompts=eval_batch_size_prompts,
+        ignore_tokens=ignore_tokens,
+        exclude_special_tokens_from_reconstruction=exclude_special_tokens_from_reconstruction,
+        verbose=verbose,
+    )[0]
+
+
+def get_downstream_reconstruction_metrics_multiple_saes(
+    saes: list[SAE],
+    model: HookedRootModule,
+    activation_store: ActivationsStore,
+    compute_kl: bool,
+    compute_ce_loss: bool,
+    n_batches: int,
+    eval_batch_size_prompts: int,
+    ignore_tokens: set[int | None] = set(),
+    exclude_special_tokens_from_reconstruction: bool = False,
+    verbose: bool = False,
+    checkpoint: Optional[MetricsCheckpoint] = None,
+    early_stopping_tolerance: float = 0.0,
+    early_stopping_min_batches: int = 10,
+) -> list[dict[str, float]]:
+    """The reconstruction metrics of each SAE, plus n_batches, the number of batches evaluated,
+    and the confidence interval half-width of the CE loss score, estimated from the per-batch
+    scores. Stops before n_batches once every SAE's CE loss score half-width is below a nonzero
+    early_stopping_tolerance."""
+    all_metrics_dicts = []
+    all_ci_moments = []
+    for _ in saes:
+        metrics_dict = {}
+        if compute_kl:
+            metrics_dict["kl_div_with_sae"] = streaming_stats.RunningMoments()
+            metrics_dict["kl_div_with_ablation"] = streaming_stats.RunningMoments()
+        if compute_ce_loss:
+            metrics_dict["ce_loss_with_sae"] = streaming_stats.RunningMoments()
+            metrics_dict["ce_loss_without_sae"] = streaming_stats.RunningMoments()
+            metrics_dict["ce_loss_with_ablation"] = streaming_stats.RunningMoments()
+        all_metrics_dicts.append(metrics_dict)
+        all_ci_moments.append(
+            {"ce_loss_score": streaming_stats.RunningMoments()} if compute_ce_loss else {}
+        )
+
+    first_batch = 0
+    checkpoint_state = checkpoint.load("reconstruction") if checkpoint is not None else None
+    if checkpoint_state is not None:
+        first_batch = checkpoint_state["num_batches_done"]
+        all_metrics_dicts = [
+            moments_from_state(metric_state) for metric_state in checkpoint_state["metrics"]
+        ]
+        all_ci_moments = [
+            moments_from_state(ci_state) for ci_state in checkpoint_state["ci_metrics"]
+        ]
+        skip_batches(activation_store, first_batch, eval_batch_size_prompts)
+
+    batch_iter = range(first_batch, n_batches)
     if verbose:
         batch_iter = tqdm(batch_iter, desc="Reconstruction Batches")
 
-    for _ in batch_iter:
+    num_batches_done = first_batch
+    for batch_idx in batch_iter:
+        if have_metrics_converged(
+            all_ci_moments, batch_idx, early_stopping_tolerance, early_stopping_min_batches
+        ):
+            break
+
         batch_tokens = activation_store.get_batch_tokens(eval_batch_size_prompts)
-        for metric_name, metric_value in get_recons_loss(
-            sae,
+        all_recons_metrics = get_recons_loss_multiple_saes(
+            saes,
             model,
             batch_tokens,
             activation_store,
@@ -391,36 +710,69 @@ def get_downstream_reconstruction_metrics(
             compute_ce_loss=compute_ce_loss,
             ignore_tokens=ignore_tokens,
             exclude_special_tokens_from_reconstruction=exclude_special_tokens_from_reconstruction,
-        ).items():
-            if len(ignore_tokens) > 0:
-                mask = torch.logical_not(
-                    torch.any(
-                        torch.stack([batch_tokens == token for token in ignore_tokens], dim=0),
-                        dim=0,
+        )
+        for metrics_dict, ci_moments, recons_metrics in zip(
+            all_metrics_dicts, all_ci_moments, all_recons_metrics
+        ):
+            batch_means = {}
+            for metric_name, metric_value in recons_metrics.items():
+                if len(ignore_tokens) > 0:
+                    mask = torch.logical_not(
+                        torch.any(
+                            torch.stack([batch_tokens == token for token in ignore_tokens], dim=0),
+                            dim=0,
+                        )
                     )
+                    if metric_value.shape[1] != mask.shape[1]:
+                        # ce loss will be missing the last value
+                        mask = mask[:, :-1]
+                    metric_value = metric_value[mask]
+
+                # Average over every token, not per position
+                metrics_dict[metric_name].update(metric_value.flatten())
+                batch_means[metric_name] = metric_value.float().mean()
+
+            if compute_ce_loss:
+                ci_moments["ce_loss_score"].update(
+                    (batch_means["ce_loss_with_ablation"] - batch_means["ce_loss_with_sae"])
+                    / (batch_means["ce_loss_with_ablation"] - batch_means["ce_loss_without_sae"])
                 )
-                if metric_value.shape[1] != mask.shape[1]:
-                    # ce loss will be missing the last value
-                    mask = mask[:, :-1]
-                metric_value = metric_value[mask]
 
-            metrics_dict[metric_name].append(metric_value)
+        num_batches_done = batch_idx + 1
+
+        if checkpoint is not None and checkpoint.is_due(batch_idx + 1, n_batches):
+            checkpoint.save(
+                "reconstruction",
+                {
+                    "num_batches_done": batch_idx + 1,
+                    "metrics": [
+                        moments_to_state(metrics_dict) for metrics_dict in all_metrics_dicts
+                    ],
+                    "ci_metrics": [moments_to_state(ci_moments) for ci_moments in all_ci_moments],
+                },
+            )
+
+    all_metrics = []
+    for metrics_dict, ci_moments in zip(all_metrics_dicts, all_ci_moments):
+        metrics: dict[str, float] = {}
+        for metric_name, metric_moments in metrics_dict.items():
+            metrics[f"{metric_name}"] = metric_moments.mean.item()
 
-    metrics: dict[str, float] = {}
-    for metric_name, metric_values in metrics_dict.items():
-        metrics[f"{metric_name}"] = torch.cat(metric_values).mean().item()
+        if compute_kl:
+            metrics["kl_div_score"] = (
+                metrics["kl_div_with_ablation"] - metrics["kl_div_with_sae"]
+            ) / metrics["kl_div_with_ablation"]
 
-    if compute_kl:
-        metrics["kl_div_score"] = (
-            metrics["kl_div_with_ablation"] - metrics["kl_div_with_sae"]
-        ) / metrics["kl_div_with_ablation"]
+        if compute_ce_loss:
+            metrics["ce_loss_score"] = (
+                metrics["ce_loss_with_ablation"] - metrics["ce_loss_with_sae"]
+            ) / (metrics["ce_loss_with_ablation"] - metrics["ce_loss_without_sae"])
 
-    if compute_ce_loss:
-        metrics["ce_loss_score"] = (
-            metrics["ce_loss_with_ablation"] - metrics["ce_loss_with_sae"]
-        ) / (metrics["ce_loss_with_ablation"] - metrics["ce_loss_without_sae"])
+        metrics["n_batches"] = num_batches_done
+        metrics |= get_ci_half_widths(ci_moments)
+        all_metrics.append(metrics)
 
-    return metrics
+    return all_metrics
 
 
 def get_sparsity_and_variance_metrics(
@@ -437,37 +789,107 @@ def get_sparsity_and_variance_metrics(
     ignore_tokens: set[int | None] = set(),
     verbose: bool = False,
 ) -> tuple[dict[str, Any], dict[str, Any]]:
-    hook_name = sae.cfg.hook_name
-    hook_head_index = sae.cfg.hook_head_index
-
-    metric_dict = {}
-    feature_metric_dict = {}
-
-    if compute_l2_norms:
-        metric_dict["l2_norm_in"] = []
-        metric_dict["l2_norm_out"] = []
-        metric_dict["l2_ratio"] = []
-        metric_dict["relative_reconstruction_bias"] = []
-    if compute_sparsity_metrics:
-        metric_dict["l0"] = []
-        metric_dict["l1"] = []
-    if compute_variance_metrics:
-        metric_dict["explained_variance"] = []
-        metric_dict["mse"] = []
-        metric_dict["cossim"] = []
-    if compute_featurewise_density_statistics:
-        feature_metric_dict["feature_density"] = []
-        feature_metric_dict["consistent_activation_heuristic"] = []
-
-    total_feature_acts = torch.zeros(sae.cfg.d_sae, device=sae.device)
-    total_feature_prompts = torch.zeros(sae.cfg.d_sae, device=sae.device)
+    return get_sparsity_and_variance_metrics_multiple_saes(
+        [sae],
+        model,
+        activation_store,
+        n_batches=n_batches,
+        compute_l2_norms=compute_l2_norms,
+        compute_sparsity_metrics=compute_sparsity_metrics,
+        compute_variance_metrics=compute_variance_metrics,
+        compute_featurewise_density_statistics=compute_featurewise_density_statistics,
+        eval_batch_size_prompts=eval_batch_size_prompts,
+        model_kwargs=model_kwargs,
+        ignore_tokens=ignore_tokens,
+        verbose=verbose,
+    )[0]
+
+
+def get_sparsity_and_variance_metrics_multiple_saes(
+    saes: list[SAE],
+    model: HookedRootModule,
+    activation_store: ActivationsStore,
+    n_batches: int,
+    compute_l2_norms: bool,
+    compute_sparsity_metrics: bool,
+    compute_variance_metrics: bool,
+    compute_featurewise_density_statistics: bool,
+    eval_batch_size_prompts: int,
+    model_kwargs: Mapping[str, Any],
+    ignore_tokens: set[int | None] = set(),
+    verbose: bool = False,
+    checkpoint: Optional[MetricsCheckpoint] = None,
+    early_stopping_tolerance: float = 0.0,
+    early_stopping_min_batches: int = 10,
+) -> list[tuple[dict[str, Any], dict[str, Any]]]:
+    """The (metrics, feature_metrics) of each SAE. The metrics include n_batches, the number of
+    batches evaluated, and the confidence interval half-widths of explained variance and L0,
+    estimated from the per-batch means. Stops before n_batches once every SAE's half-widths are
+    below a nonzero early_stopping_tolerance."""
+    hook_name = saes[0].cfg.hook_name
+    hook_head_index = saes[0].cfg.hook_head_index
+    hook_layer = saes[0].cfg.hook_layer
+
+    all_metric_dicts = []
+    all_ci_moments = []
+    for _ in saes:
+        metric_dict = {}
+        if compute_l2_norms:
+            metric_dict["l2_norm_in"] = streaming_stats.RunningMoments()
+            metric_dict["l2_norm_out"] = streaming_stats.RunningMoments()
+            metric_dict["l2_ratio"] = streaming_stats.RunningMoments()
+            metric_dict["relative_reconstruction_bias"] = streaming_stats.RunningMoments()
+        if compute_sparsity_metrics:
+            metric_dict["l0"] = streaming_stats.RunningMoments()
+            metric_dict["l1"] = streaming_stats.RunningMoments()
+        if compute_variance_metrics:
+            metric_dict["explained_variance"] = streaming_stats.RunningMoments()
+            metric_dict["mse"] = streaming_stats.RunningMoments()
+            metric_dict["cossim"] = streaming_stats.RunningMoments()
+        all_metric_dicts.append(metric_dict)
+        ci_moments = {}
+        if compute_variance_metrics:
+            ci_moments["explained_variance"] = streaming_stats.RunningMoments()
+        if compute_sparsity_metrics:
+            ci_moments["l0"] = streaming_stats.RunningMoments()
+        all_ci_moments.append(ci_moments)
+
+    all_total_feature_acts = [torch.zeros(sae.cfg.d_sae, device=sae.device) for sae in saes]
+    all_total_feature_prompts = [torch.zeros(sae.cfg.d_sae, device=sae.device) for sae in saes]
     total_tokens = 0
 
-    batch_iter = range(n_batches)
+    first_batch = 0
+    checkpoint_state = checkpoint.load("sparsity_variance") if checkpoint is not None else None
+    if checkpoint_state is not None:
+        first_batch = checkpoint_state["num_batches_done"]
+        all_metric_dicts = [
+            moments_from_state(metric_state) for metric_state in checkpoint_state["metrics"]
+        ]
+        all_ci_moments = [
+            moments_from_state(ci_state) for ci_state in checkpoint_state["ci_metrics"]
+        ]
+        all_total_feature_acts = [
+            total_feature_acts.to(sae.device)
+            for sae, total_feature_acts in zip(saes, checkpoint_state["total_feature_acts"])
+        ]
+        all_total_feature_prompts = [
+            total_feature_prompts.to(sae.device)
+            for sae, total_feature_prompts in zip(saes, checkpoint_state["total_feature_prompts"])
+        ]
+        total_tokens = checkpoint_state["total_tokens"]
+        skip_batches(activation_store, first_batch, eval_batch_size_prompts)
+
+    batch_iter = range(first_batch, n_batches)
     if verbose:
         batch_iter = tqdm(batch_iter, desc="Sparsity and Variance Batches")
 
-    for _ in batch_iter:
+    num_batches_done = first_batch
+    for batch_idx in batch_iter:
+        if have_metrics_converged(
+            all_ci_moments, batch_idx, early_stopping_tolerance, early_stopping_min_batches
+        ):
+            break
+
         batch_tokens = activation_store.get_batch_tokens(eval_batch_size_prompts)
 
         if len(ignore_tokens) > 0:
@@ -486,7 +908,7 @@ def get_sparsity_and_variance_metrics(
             batch_tokens,
             prepend_bos=False,
             names_filter=[hook_name],
-            stop_at_layer=sae.cfg.hook_layer + 1,
+            stop_at_layer=hook_layer + 1,
             **model_kwargs,
         )
 
@@ -499,126 +921,155 @@ def get_sparsity_and_variance_metrics(
             original_act = cache[hook_name].flatten(-2, -1)
         else:
             original_act = cache[hook_name]
+        del cache
 
         # normalise if necessary (necessary in training only, otherwise we should fold the scaling in)
         if activation_store.normalize_activations == "expected_average_only_in":
             original_act = activation_store.apply_norm_scaling_factor(original_act)
 
-        # send the (maybe normalised) activations into the SAE
-        sae_feature_activations = sae.encode(original_act.to(sae.device))
-        sae_out = sae.decode(sae_feature_activations).to(original_act.device)
-        del cache
-
-        if activation_store.normalize_activations == "expected_average_only_in":
-            sae_out = activation_store.unscale(sae_out)
-
         flattened_sae_input = einops.rearrange(original_act, "b ctx d -> (b ctx) d")
-        flattened_sae_feature_acts = einops.rearrange(
-            sae_feature_activations, "b ctx d -> (b ctx) d"
-        )
-        flattened_sae_out = einops.rearrange(sae_out, "b ctx d -> (b ctx) d")
-
-        # TODO: Clean this up.
-        # apply mask
-        masked_sae_feature_activations = sae_feature_activations * mask.unsqueeze(-1)
         flattened_sae_input = flattened_sae_input[flattened_mask]
-        flattened_sae_feature_acts = flattened_sae_feature_acts[flattened_mask]
-        flattened_sae_out = flattened_sae_out[flattened_mask]
+        if compute_featurewise_density_statistics:
+            total_tokens += mask.sum()
 
-        if compute_l2_norms:
-            l2_norm_in = torch.norm(flattened_sae_input, dim=-1)
-            l2_norm_out = torch.norm(flattened_sae_out, dim=-1)
-            l2_norm_in_for_div = l2_norm_in.clone()
-            l2_norm_in_for_div[torch.abs(l2_norm_in_for_div) < 0.0001] = 1
-            l2_norm_ratio = l2_norm_out / l2_norm_in_for_div
-
-            # Equation 10 from https://arxiv.org/abs/2404.16014
-            # https://github.com/saprmarks/dictionary_learning/blob/main/evaluation.py
-            x_hat_norm_squared = torch.norm(flattened_sae_out, dim=-1) ** 2
-            x_dot_x_hat = (flattened_sae_input * flattened_sae_out).sum(dim=-1)
-            relative_reconstruction_bias = (
-                x_hat_norm_squared.mean() / x_dot_x_hat.mean()
-            ).unsqueeze(0)
-
-            metric_dict["l2_norm_in"].append(l2_norm_in)
-            metric_dict["l2_norm_out"].append(l2_norm_out)
-            metric_dict["l2_ratio"].append(l2_norm_ratio)
-            metric_dict["relative_reconstruction_bias"].append(relative_reconstruction_bias)
+        for sae_idx, sae in enumerate(saes):
+            metric_dict = all_metric_dicts[sae_idx]
+            ci_moments = all_ci_moments[sae_idx]
 
-        if compute_sparsity_metrics:
-            l0 = (flattened_sae_feature_acts > 0).sum(dim=-1).float()
-            l1 = flattened_sae_feature_acts.sum(dim=-1)
-            metric_dict["l0"].append(l0)
-            metric_dict["l1"].append(l1)
+            # send the (maybe normalised) activations into the SAE
+            sae_feature_activations = sae.encode(original_act.to(sae.device))
+            sae_out = sae.decode(sae_feature_activations).to(original_act.device)
 
-        if compute_variance_metrics:
-            resid_sum_of_squares = (flattened_sae_input - flattened_sae_out).pow(2).sum(dim=-1)
-            total_sum_of_squares = (
-                (flattened_sae_input - flattened_sae_input.mean(dim=0)).pow(2).sum(-1)
+            if activation_store.normalize_activations == "expected_average_only_in":
+                sae_out = activation_store.unscale(sae_out)
+
+            flattened_sae_feature_acts = einops.rearrange(
+                sae_feature_activations, "b ctx d -> (b ctx) d"
             )
+            flattened_sae_out = einops.rearrange(sae_out, "b ctx d -> (b ctx) d")
+
+            # TODO: Clean this up.
+            # apply mask
+            masked_sae_feature_activations = sae_feature_activations * mask.unsqueeze(-1)
+            flattened_sae_feature_acts = flattened_sae_feature_acts[flattened_mask]
+            flattened_sae_out = flattened_sae_out[flattened_mask]
+
+            if compute_l2_norms:
+                l2_norm_in = torch.norm(flattened_sae_input, dim=-1)
+                l2_norm_out = torch.norm(flattened_sae_out, dim=-1)
+                l2_norm_in_for_div = l2_norm_in.clone()
+                l2_norm_in_for_div[torch.abs(l2_norm_in_for_div) < 0.0001] = 1
+                l2_norm_ratio = l2_norm_out / l2_norm_in_for_div
+
+                # Equation 10 from https://arxiv.org/abs/2404.16014
+                # https://github.com/saprmarks/dictionary_learning/blob/main/evaluation.py
+                x_hat_norm_squared = torch.norm(flattened_sae_out, dim=-1) ** 2
+                x_dot_x_hat = (flattened_sae_input * flattened_sae_out).sum(dim=-1)
+                relative_reconstruction_bias = (
+                    x_hat_norm_squared.mean() / x_dot_x_hat.mean()
+                ).unsqueeze(0)
+
+                metric_dict["l2_norm_in"].update(l2_norm_in)
+                metric_dict["l2_norm_out"].update(l2_norm_out)
+                metric_dict["l2_ratio"].update(l2_norm_ratio)
+                metric_dict["relative_reconstruction_bias"].update(relative_reconstruction_bias)
+
+            if compute_sparsity_metrics:
+                l0 = (flattened_sae_feature_acts > 0).sum(dim=-1).float()
+                l1 = flattened_sae_feature_acts.sum(dim=-1)
+                metric_dict["l0"].update(l0)
+                metric_dict["l1"].update(l1)
+                ci_moments["l0"].update(l0.mean())
+
+            if compute_variance_metrics:
+                resid_sum_of_squares = (
+                    (flattened_sae_input - flattened_sae_out).pow(2).sum(dim=-1)
+                )
+                total_sum_of_squares = (
+                    (flattened_sae_input - flattened_sae_input.mean(dim=0)).pow(2).sum(-1)
+                )
 
-            mse = resid_sum_of_squares / flattened_mask.sum()
-            explained_variance = 1 - resid_sum_of_squares / total_sum_of_squares
+                mse = resid_sum_of_squares / flattened_mask.sum()
+                explained_variance = 1 - resid_sum_of_squares / total_sum_of_squares
 
-            x_normed = flattened_sae_input / torch.norm(flattened_sae_input, dim=-1, keepdim=True)
-            x_hat_normed = flattened_sae_out / torch.norm(flattened_sae_out, dim=-1, keepdim=True)
-            cossim = (x_normed * x_hat_normed).sum(dim=-1)
+                x_normed = flattened_sae_input / torch.norm(
+                    flattened_sae_input, dim=-1, keepdim=True
+                )
+                x_hat_normed = flattened_sae_out / torch.norm(
+                    flattened_sae_out, dim=-1, keepdim=True
+                )
+                cossim = (x_normed * x_hat_normed).sum(dim=-1)
 
-            metric_dict["explained_variance"].append(explained_variance)
-            metric_dict["mse"].append(mse)
-            metric_dict["cossim"].append(cossim)
+                metric_dict["explained_variance"].update(explained_variance)
+                metric_dict["mse"].update(mse)
+                metric_dict["cossim"].update(cossim)
+                ci_moments["explained_variance"].update(explained_variance.mean())
 
-        if compute_featurewise_density_statistics:
-            sae_feature_activations_bool = (masked_sae_feature_activations > 0).float()
-            total_feature_acts += sae_feature_activations_bool.sum(dim=1).sum(dim=0)
-            total_feature_prompts += (sae_feature_activations_bool.sum(dim=1) > 0).sum(dim=0)
-            total_tokens += mask.sum()
+            if compute_featurewise_density_statistics:
+                sae_feature_activations_bool = (masked_sae_feature_activations > 0).float()
+                all_total_feature_acts[sae_idx] += sae_feature_activations_bool.sum(dim=1).sum(
+                    dim=0
+                )
+                all_total_feature_prompts[sae_idx] += (
+                    sae_feature_activations_bool.sum(dim=1) > 0
+                ).sum(dim=0)
+
+        num_batches_done = batch_idx + 1
+        if checkpoint is not None and checkpoint.is_due(batch_idx + 1, n_batches):
+            checkpoint.save(
+                "sparsity_variance",
+                {
+                    "num_batches_done": batch_idx + 1,
+                    "metrics": [moments_to_state(metric_dict) for metric_dict in all_metric_dicts],
+                    "ci_metrics": [moments_to_state(ci_moments) for ci_moments in all_ci_moments],
+                    "total_feature_acts": all_total_feature_acts,
+                    "total_feature_prompts": all_total_feature_prompts,
+                    "total_tokens": total_tokens,
+                },
+            )
 
-    # Aggregate scalar metrics
-    metrics: dict[str, float] = {}
-    for metric_name, metric_values in metric_dict.items():
-        metrics[f"{metric_name}"] = torch.cat(metric_values).mean().item()
+    results = []
+    for metric_dict, ci_moments, total_feature_acts, total_feature_prompts in zip(
+        all_metric_dicts, all_ci_moments, all_total_feature_acts, all_total_feature_prompts
+    ):
+        # Aggregate scalar metrics
+        metrics: dict[str, float] = {}
+        for metric_name, metric_moments in metric_dict.items():
+            metrics[f"{metric_name}"] = metric_moments.mean.item()
+        metrics["n_batches"] = num_batches_done
+        metrics |= get_ci_half_widths(ci_moments)
+
+        # Aggregate feature-wise metrics
+        feature_metrics: dict[str, np.ndarray] = {}
+        feature_metrics["feature_density"] = (total_feature_acts / total_tokens).cpu().numpy()
+        feature_metrics["consistent_activation_heuristic"] = (
+            (total_feature_acts / total_feature_prompts).cpu().numpy()
+        )
 
-    # Aggregate feature-wise metrics
-    feature_metrics: dict[str, list[float]] = {}
-    feature_metrics["feature_density"] = (total_feature_acts / total_tokens).tolist()
-    feature_metrics["consistent_activation_heuristic"] = (
-        total_feature_acts / total_feature_prompts
-    ).tolist()
+        results.append((metrics, feature_metrics))
 
-    return metrics, feature_metrics
+    return results
 
 
-@torch.no_grad()
-def get_recons_loss(
-    sae: SAE,
-    model: HookedRootModule,
-    batch_tokens: torch.Tensor,
-    activation_store: ActivationsStore,
-    compute_kl: bool,
-    compute_ce_loss: bool,
-    ignore_tokens: set[int | None] = set(),
-    exclude_special_tokens_from_reconstruction: bool = False,
-    model_kwargs: Mapping[str, Any] = {},
-) -> dict[str, Any]:
-    hook_name = sae.cfg.hook_name
-    head_index = sae.cfg.hook_head_index
-
-    original_logits, original_ce_loss = model(
-        batch_tokens, return_type="both", loss_per_token=True, **model_kwargs
-    )
+def get_shared_prefix_layer(
+    model: HookedRootModule, hook_name: str, model_kwargs: Mapping[str, Any]
+) -> Optional[int]:
+    """The block at which the clean and intervention runs of get_recons_loss can resume from a
+    shared residual stream, or None if each run must start from the tokens. The blocks below the
+    hook compute the same activations in every run, so they only need to run once."""
+    if not isinstance(model, HookedTransformer) or len(model_kwargs) > 0:
+        return None
+    # e.g. hook_embed runs before the first block
+    return activation_collection.get_layer_from_hook_name(hook_name)
 
-    if len(ignore_tokens) > 0 and exclude_special_tokens_from_reconstruction:
-        mask = torch.logical_not(
-            torch.any(
-                torch.stack([batch_tokens == token for token in ignore_tokens], dim=0),
-                dim=0,
-            )
-        )
-    else:
-        mask = torch.ones_like(batch_tokens, dtype=torch.bool)
 
-    metrics = {}
+def get_intervention_hooks(
+    sae: SAE, activation_store: ActivationsStore, mask: torch.Tensor
+) -> tuple[Callable, Callable]:
+    """The hooks that splice sae into the model at its hook, keeping the original activations at
+    positions where mask is False, and that zero-ablate the activations at its hook."""
+    hook_name = sae.cfg.hook_name
+    head_index = sae.cfg.hook_head_index
 
     # TODO(tomMcGrath): the rescaling below is a bit of a hack and could probably be tidied up
     def standard_replacement_hook(activations: torch.Tensor, hook: Any):
@@ -720,43 +1171,312 @@ def get_recons_loss(
         replacement_hook = standard_replacement_hook
         zero_ablate_hook = standard_zero_ablate_hook
 
-    recons_logits, recons_ce_loss = model.run_with_hooks(
-        batch_tokens,
-        return_type="both",
-        fwd_hooks=[(hook_name, partial(replacement_hook))],
-        loss_per_token=True,
-        **model_kwargs,
-    )
+    return replacement_hook, zero_ablate_hook
+
+
+def unembed_vocab_chunk(
+    model: HookedTransformer,
+    normalized_resid: torch.Tensor,
+    vocab_slice: slice,
+) -> torch.Tensor:
+    """The logits of the tokens in vocab_slice, computed like HookedTransformer.forward() computes
+    the logits of the full vocabulary from the residual stream after ln_final."""
+    logits = normalized_resid @ model.W_U[:, vocab_slice] + model.b_U[vocab_slice]
+    if model.cfg.output_logits_soft_cap > 0.0:
+        logits = model.cfg.output_logits_soft_cap * torch.tanh(
+            logits / model.cfg.output_logits_soft_cap
+        )
+    return logits
+
+
+def get_next_token_ce_loss(
+    model: HookedTransformer,
+    normalized_resid: torch.Tensor,
+    logsumexp: torch.Tensor,
+    tokens: torch.Tensor,
+    attention_mask: Optional[torch.Tensor],
+) -> torch.Tensor:
+    """The per token loss of HookedTransformer.forward(return_type="loss", loss_per_token=True),
+    from the logsumexp of the logits and the logits of the next tokens only."""
+    next_tokens = tokens[:, 1:]
+    next_token_logits = (normalized_resid[..., :-1, :] * model.W_U.T[next_tokens]).sum(dim=-1)
+    next_token_logits = next_token_logits + model.b_U[next_tokens]
+    if model.cfg.output_logits_soft_cap > 0.0:
+        next_token_logits = model.cfg.output_logits_soft_cap * torch.tanh(
+            next_token_logits / model.cfg.output_logits_soft_cap
+        )
+    ce_loss = logsumexp[..., :-1] - next_token_logits.float()
+    if attention_mask is not None:
+        # Like utils.lm_cross_entropy_loss(), ignore positions where either token is padding
+        ce_loss = ce_loss * torch.logical_and(attention_mask[:, :-1], attention_mask[:, 1:])
+    return ce_loss
+
+
+def get_vocab_chunked_log_softmax_stats(
+    get_logits_chunk: Callable[[slice], torch.Tensor],
+    d_vocab: int,
+    vocab_chunk_size: int = DEFAULT_VOCAB_CHUNK_SIZE,
+    get_reference_logits_chunk: Optional[Callable[[slice], torch.Tensor]] = None,
+) -> tuple[torch.Tensor, Optional[torch.Tensor], Optional[torch.Tensor]]:
+    """The logsumexp over the vocabulary of some logits, and optionally of reference logits and the
+    KL divergence KL(reference || logits), computed one chunk of vocab_chunk_size logits at a time
+    with an online logsumexp. Reference logits broadcast against the logits, e.g. one clean run
+    against several stacked intervention runs.
+
+    Returns (logsumexp, reference_logsumexp, kl_div), in float32. The last two are None without
+    get_reference_logits_chunk."""
+    max_logits = sum_exp = None
+    reference_max_logits = reference_sum_exp = weighted_log_ratio_sum = None
+
+    for vocab_start in range(0, d_vocab, vocab_chunk_size):
+        vocab_slice = slice(vocab_start, min(vocab_start + vocab_chunk_size, d_vocab))
+        logits = get_logits_chunk(vocab_slice).float()
+
+        # Rescale the running sums to the new running max before adding this chunk
+        chunk_max_logits = logits.amax(dim=-1)
+        if max_logits is None:
+            max_logits = chunk_max_logits
+            sum_exp = torch.zeros_like(chunk_max_logits)
+        else:
+            new_max_logits = torch.maximum(max_logits, chunk_max_logits)
+            sum_exp = sum_exp * torch.exp(max_logits - new_max_logits)
+            max_logits = new_max_logits
+        sum_exp = sum_exp + torch.exp(logits - max_logits[..., None]).sum(dim=-1)
+
+        if get_reference_logits_chunk is None:
+            continue
+
+        # KL(p || q) = sum_v p_v * (a_v - b_v) - logsumexp(a) + logsumexp(b), where p = softmax(a),
+        # so the reference side also tracks sum_v exp(a_v - max(a)) * (a_v - b_v)
+        reference_logits = get_reference_logits_chunk(vocab_slice).float()
+        chunk_reference_max_logits = reference_logits.amax(dim=-1)
+        if reference_max_logits is None:
+            reference_max_logits = chunk_reference_max_logits
+            reference_sum_exp = torch.zeros_like(chunk_reference_max_logits)
+            weighted_log_ratio_sum = torch.zeros_like(max_logits)
+        else:
+            new_reference_max_logits = torch.maximum(
+                reference_max_logits, chunk_reference_max_logits
+            )
+            rescale = torch.exp(reference_max_logits - new_reference_max_logits)
+            reference_sum_exp = reference_sum_exp * rescale
+            weighted_log_ratio_sum = weighted_log_ratio_sum * rescale
+            reference_max_logits = new_reference_max_logits
+        reference_exp = torch.exp(reference_logits - reference_max_logits[..., None])
+        reference_sum_exp = reference_sum_exp + reference_exp.sum(dim=-1)
+        weighted_log_ratio_sum = weighted_log_ratio_sum + (
+            reference_exp * (reference_logits - logits)
+        ).sum(dim=-1)
+
+    assert max_logits is not None and sum_exp is not None, "d_vocab must be positive"
+    logsumexp = max_logits + torch.log(sum_exp)
+    if get_reference_logits_chunk is None:
+        return logsumexp, None, None
+
+    assert reference_max_logits is not None and reference_sum_exp is not None
+    assert weighted_log_ratio_sum is not None
+    reference_logsumexp = reference_max_logits + torch.log(reference_sum_exp)
+    kl_div = weighted_log_ratio_sum / reference_sum_exp - reference_logsumexp + logsumexp
+    return logsumexp, reference_logsumexp, kl_div
+
 
-    zero_abl_logits, zero_abl_ce_loss = model.run_with_hooks(
+@torch.no_grad()
+def get_recons_loss(
+    sae: SAE,
+    model: HookedRootModule,
+    batch_tokens: torch.Tensor,
+    activation_store: ActivationsStore,
+    compute_kl: bool,
+    compute_ce_loss: bool,
+    ignore_tokens: set[int | None] = set(),
+    exclude_special_tokens_from_reconstruction: bool = False,
+    model_kwargs: Mapping[str, Any] = {},
+) -> dict[str, Any]:
+    return get_recons_loss_multiple_saes(
+        [sae],
+        model,
         batch_tokens,
-        return_type="both",
-        fwd_hooks=[(hook_name, zero_ablate_hook)],
-        loss_per_token=True,
-        **model_kwargs,
-    )
+        activation_store,
+        compute_kl=compute_kl,
+        compute_ce_loss=compute_ce_loss,
+        ignore_tokens=ignore_tokens,
+        exclude_special_tokens_from_reconstruction=exclude_special_tokens_from_reconstruction,
+        model_kwargs=model_kwargs,
+    )[0]
+
+
+@torch.no_grad()
+def get_recons_loss_multiple_saes(
+    saes: list[SAE],
+    model: HookedRootModule,
+    batch_tokens: torch.Tensor,
+    activation_store: ActivationsStore,
+    compute_kl: bool,
+    compute_ce_loss: bool,
+    ignore_tokens: set[int | None] = set(),
+    exclude_special_tokens_from_reconstruction: bool = False,
+    model_kwargs: Mapping[str, Any] = {},
+    max_stacked_runs: int = 2,
+    vocab_chunk_size: int = DEFAULT_VOCAB_CHUNK_SIZE,
+) -> list[dict[str, Any]]:
+    """get_recons_loss() for several SAEs at the same hook. The clean and zero-ablated runs don't
+    depend on the SAE, so they run once for all SAEs. The intervention runs are stacked along the
+    batch dimension, up to max_stacked_runs copies of the batch per forward pass.
+
+    The KL divergence is computed over chunks of vocab_chunk_size logits. For HookedTransformers
+    run without model_kwargs, the runs stop before the unembed, so full logits never exist and
+    each chunk of logits is computed from the final residual stream as it's needed."""
+    hook_name = saes[0].cfg.hook_name
+
+    prefix_layer = get_shared_prefix_layer(model, hook_name, model_kwargs)
+
+    def repeat_batch(tensor: Optional[torch.Tensor], num_runs: int) -> Optional[torch.Tensor]:
+        if tensor is None or num_runs == 1:
+            return tensor
+        return torch.cat([tensor] * num_runs, dim=0)
+
+    # num_runs stacks that many copies of the batch, so that per-row hooks can run several
+    # interventions in a single forward pass. Each run returns an output that chunks of logits
+    # can be computed from, and its per token CE loss if the model computed it.
+    if prefix_layer is None:
+
+        def run_with_hook(fwd_hooks: list[tuple[str, Callable]], num_runs: int = 1):
+            return model.run_with_hooks(
+                repeat_batch(batch_tokens, num_runs),
+                return_type="both",
+                fwd_hooks=fwd_hooks,
+                loss_per_token=True,
+                **model_kwargs,
+            )
 
-    def kl(original_logits: torch.Tensor, new_logits: torch.Tensor):
-        original_probs = torch.nn.functional.softmax(original_logits, dim=-1)
-        log_original_probs = torch.log(original_probs)
-        new_probs = torch.nn.functional.softmax(new_logits, dim=-1)
-        log_new_probs = torch.log(new_probs)
-        kl_div = original_probs * (log_original_probs - log_new_probs)
-        kl_div = kl_div.sum(dim=-1)
-        return kl_div
+        def get_logits_chunk(logits: torch.Tensor, vocab_slice: slice) -> torch.Tensor:
+            return logits[..., vocab_slice]
 
-    if compute_kl:
-        recons_kl_div = kl(original_logits, recons_logits)
-        zero_abl_kl_div = kl(original_logits, zero_abl_logits)
-        metrics["kl_div_with_sae"] = recons_kl_div
-        metrics["kl_div_with_ablation"] = zero_abl_kl_div
+        def get_ce_loss(logits: torch.Tensor, logsumexp: torch.Tensor) -> torch.Tensor:
+            raise AssertionError("The model already computed the CE loss")
 
-    if compute_ce_loss:
-        metrics["ce_loss_with_sae"] = recons_ce_loss
-        metrics["ce_loss_without_sae"] = original_ce_loss
-        metrics["ce_loss_with_ablation"] = zero_abl_ce_loss
+    else:
+        # Run the blocks below the SAE's hook once and resume every run from the residual stream
+        # before the hook's block. The embedding also gives the attention mask and positional
+        # embedding that a run starting from the residual stream can't compute itself.
+        assert isinstance(model, HookedTransformer)
+        embed, _, shortformer_pos_embed, attention_mask = model.input_to_embed(batch_tokens)
+        prefix_resid = model(
+            embed,
+            start_at_layer=0,
+            stop_at_layer=prefix_layer,
+            shortformer_pos_embed=shortformer_pos_embed,
+            attention_mask=attention_mask,
+        )
 
-    return metrics
+        def run_with_hook(fwd_hooks: list[tuple[str, Callable]], num_runs: int = 1):
+            final_resid = model.run_with_hooks(
+                repeat_batch(prefix_resid, num_runs),
+                start_at_layer=prefix_layer,
+                stop_at_layer=model.cfg.n_layers,
+                shortformer_pos_embed=repeat_batch(shortformer_pos_embed, num_runs),
+                attention_mask=repeat_batch(attention_mask, num_runs),
+                fwd_hooks=fwd_hooks,
+            )
+            if model.cfg.normalization_type is not None:
+                final_resid = model.ln_final(final_resid)
+            return final_resid, None
+
+        def get_logits_chunk(normalized_resid: torch.Tensor, vocab_slice: slice) -> torch.Tensor:
+            return unembed_vocab_chunk(model, normalized_resid, vocab_slice)
+
+        def get_ce_loss(normalized_resid: torch.Tensor, logsumexp: torch.Tensor) -> torch.Tensor:
+            return get_next_token_ce_loss(
+                model, normalized_resid, logsumexp, batch_tokens, attention_mask
+            )
+
+    original_output, original_ce_loss = run_with_hook([])
+    d_vocab = model.cfg.d_vocab_out if prefix_layer is not None else original_output.shape[-1]
+
+    if len(ignore_tokens) > 0 and exclude_special_tokens_from_reconstruction:
+        mask = torch.logical_not(
+            torch.any(
+                torch.stack([batch_tokens == token for token in ignore_tokens], dim=0),
+                dim=0,
+            )
+        )
+    else:
+        mask = torch.ones_like(batch_tokens, dtype=torch.bool)
+
+    hooks = [get_intervention_hooks(sae, activation_store, mask) for sae in saes]
+    _, zero_ablate_hook = hooks[0]
+    # The zero-ablated run first, then one spliced run per SAE
+    run_hooks = [zero_ablate_hook] + [replacement_hook for replacement_hook, _ in hooks]
+
+    batch_size = batch_tokens.shape[0]
+    all_metrics = [{} for _ in saes]
+    zero_abl_metrics = {}
+
+    for first_run_idx in range(0, len(run_hooks), max_stacked_runs):
+        stacked_run_hooks = run_hooks[first_run_idx : first_run_idx + max_stacked_runs]
+
+        # Several runs share one forward pass over a stacked batch, each intervening on its own
+        # batch_size rows
+        def stacked_intervention_hook(activations: torch.Tensor, hook: Any):
+            return torch.cat(
+                [
+                    run_hook(run_activations, hook)
+                    for run_hook, run_activations in zip(
+                        stacked_run_hooks, activations.split(batch_size, dim=0)
+                    )
+                ],
+                dim=0,
+            )
+
+        num_runs = len(stacked_run_hooks)
+        stacked_output, stacked_ce_loss = run_with_hook(
+            [(hook_name, stacked_intervention_hook)], num_runs=num_runs
+        )
+        # [num_runs, batch, ...], so that the clean run broadcasts against every run
+        stacked_output = stacked_output.unflatten(0, (num_runs, batch_size))
+
+        # The clean run's logsumexp is needed for its CE loss if the model didn't compute it
+        compute_original_ce_loss = compute_ce_loss and original_ce_loss is None
+        stacked_logsumexp, original_logsumexp, stacked_kl_div = get_vocab_chunked_log_softmax_stats(
+            partial(get_logits_chunk, stacked_output),
+            d_vocab,
+            vocab_chunk_size,
+            get_reference_logits_chunk=(
+                partial(get_logits_chunk, original_output)
+                if compute_kl or compute_original_ce_loss
+                else None
+            ),
+        )
+        if compute_original_ce_loss:
+            assert original_logsumexp is not None
+            original_ce_loss = get_ce_loss(original_output, original_logsumexp)
+        if stacked_ce_loss is None:
+            stacked_ce_loss = (
+                get_ce_loss(stacked_output, stacked_logsumexp) if compute_ce_loss else None
+            )
+        else:
+            stacked_ce_loss = stacked_ce_loss.unflatten(0, (num_runs, batch_size))
+
+        for stacked_idx, run_idx in enumerate(range(first_run_idx, first_run_idx + num_runs)):
+            kl_div = stacked_kl_div[stacked_idx] if stacked_kl_div is not None else None
+            ce_loss = stacked_ce_loss[stacked_idx] if stacked_ce_loss is not None else None
+            if run_idx == 0:
+                if compute_kl:
+                    zero_abl_metrics["kl_div_with_ablation"] = kl_div
+                zero_abl_metrics["ce_loss_with_ablation"] = ce_loss
+                continue
+
+            metrics = all_metrics[run_idx - 1]
+            if compute_kl:
+                metrics["kl_div_with_sae"] = kl_div
+                metrics["kl_div_with_ablation"] = zero_abl_metrics["kl_div_with_ablation"]
+
+            if compute_ce_loss:
+                metrics["ce_loss_with_sae"] = ce_loss
+                metrics["ce_loss_without_sae"] = original_ce_loss
+                metrics["ce_loss_with_ablation"] = zero_abl_metrics["ce_loss_with_ablation"]
+
+    return all_metrics
 
 
 def all_loadable_saes() -> list[tuple[str, str, float, float]]:
@@ -829,6 +1549,89 @@ def convert_feature_metrics(
     return feature_metrics_by_feature
 
 
+def save_feature_metrics(
+    flattened_feature_metrics: Dict[str, np.ndarray], npz_path: Path
+) -> None:
+    """Save feature metrics as one float32 array per metric to an uncompressed .npz file. Unlike
+    eval_result_details, this doesn't create an object per feature, and np.load() reads each
+    metric only when it's accessed. float32 keeps ~7 significant digits, so small feature
+    densities lose less precision than when rounding to DEFAULT_FLOAT_PRECISION decimals."""
+    np.savez(
+        npz_path,
+        **{
+            metric_name: np.asarray(values, dtype=np.float32)
+            for metric_name, values in flattened_feature_metrics.items()
+        },
+    )
+
+
+def get_unique_id(sae_release: str, sae_id: str) -> str:
+    return f"{sae_release}_{sae_id}".replace(".", "_")
+
+
+def get_eval_result_path(output_path: Path, unique_id: str, eval_config: CoreEvalConfig) -> Path:
+    json_filename = f"{unique_id}_{eval_config.context_size}_{eval_config.dataset}.json"
+    return output_path / json_filename.replace("/", "_")
+
+
+def get_eval_config_hash(eval_config: CoreEvalConfig) -> str:
+    """A hash of the settings of eval_config that change the results. Results are saved per SAE,
+    which determines the model, so model_name is left out."""
+    config_dict = {
+        field_name: value
+        for field_name, value in asdict(eval_config).items()
+        if field_name not in RESULT_INDEPENDENT_CONFIG_FIELDS
+    }
+    config_json = json.dumps(config_dict, sort_keys=True, default=str)
+    return hashlib.sha256(config_json.encode()).hexdigest()
+
+
+def load_completed_eval_result(
+    json_path: Path, unique_id: str, eval_config: CoreEvalConfig
+) -> Optional[Dict[str, Any]]:
+    """The result saved by save_single_eval_result() at json_path, in the format multiple_evals()
+    returns, or None if there is none or it was computed with an eval config whose
+    get_eval_config_hash() differs from that of eval_config."""
+    if not json_path.exists():
+        return None
+    with open(json_path) as f:
+        saved_output = json.load(f)
+
+    saved_eval_config = TypeAdapter(CoreEvalConfig).validate_python(saved_output["eval_config"])
+    if get_eval_config_hash(saved_eval_config) != get_eval_config_hash(eval_config):
+        return None
+
+    # Like run_evals_multiple_saes(), leave out metrics that weren't computed, e.g. confidence
+    # intervals of metrics evaluated on a single batch
+    metrics = {
+        group_name: {
+            metric_name: value for metric_name, value in group_metrics.items() if value is not None
+        }
+        for group_name, group_metrics in saved_output["eval_result_metrics"].items()
+    }
+    result = {
+        "unique_id": unique_id,
+        "sae_set": saved_output["sae_lens_release_id"],
+        "sae_id": saved_output["sae_lens_id"],
+        "eval_cfg": saved_eval_config,
+        "metrics": {
+            group_name: group_metrics
+            for group_name, group_metrics in metrics.items()
+            if group_metrics
+        },
+    }
+    feature_metrics_file = saved_output.get("feature_metrics_file")
+    if feature_metrics_file is not None:
+        feature_metrics_path = json_path.parent / feature_metrics_file
+        if not feature_metrics_path.exists():
+            return None
+        with np.load(feature_metrics_path) as feature_metrics:
+            result["feature_metrics"] = {
+                metric_name: feature_metrics[metric_name] for metric_name in feature_metrics.files
+            }
+    return result
+
+
 def save_single_eval_result(
     result: Dict[str, Any],
     eval_instance_id: str,
@@ -854,13 +1657,19 @@ def save_single_eval_result(
         shrinkage=ShrinkageMetrics(**result["metrics"].get("shrinkage", {})),
         sparsity=SparsityMetrics(**result["metrics"].get("sparsity", {})),
         token_stats=TokenStatsMetrics(**result["metrics"].get("token_stats", {})),
+        confidence_intervals=ConfidenceIntervalMetrics(
+            **result["metrics"].get("confidence_intervals", {})
+        ),
     )
 
-    # Create feature metrics
-    flattened_feature_metrics = result.get("feature_metrics", {})
+    json_path = get_eval_result_path(output_path, result["unique_id"], eval_config)
 
-    # Convert feature metrics from parallel lists to list of dicts
-    feature_metrics_by_feature = convert_feature_metrics(flattened_feature_metrics)
+    # Feature metrics go to a sidecar file next to the JSON file, which only points to it
+    flattened_feature_metrics = result.get("feature_metrics", {})
+    feature_metrics_file = None
+    if flattened_feature_metrics:
+        feature_metrics_file = json_path.stem + FEATURE_METRICS_FILE_SUFFIX
+        save_feature_metrics(flattened_feature_metrics, output_path / feature_metrics_file)
 
     # Create the full output object
     eval_output = CoreEvalOutput(
@@ -868,7 +1677,8 @@ def save_single_eval_result(
         eval_id=eval_instance_id,
         datetime_epoch_millis=int(time.time() * 1000),
         eval_result_metrics=metric_categories,
-        eval_result_details=feature_metrics_by_feature,
+        eval_result_details=[],
+        feature_metrics_file=feature_metrics_file,
         eval_result_unstructured={},  # Add empty dict for unstructured results
         sae_bench_commit_hash=sae_bench_commit_hash,
         sae_lens_id=result["sae_id"],
@@ -877,17 +1687,135 @@ def save_single_eval_result(
     )
 
     # Save individual JSON file
-    json_filename = (
-        f"{result['unique_id']}_{eval_config.context_size}_{eval_config.dataset}.json".replace(
-            "/", "_"
-        )
-    )
-    json_path = output_path / json_filename
     eval_output.to_json_file(json_path)
 
     return json_path
 
 
+def get_num_eval_batches(eval_config: CoreEvalConfig) -> tuple[int, int]:
+    """The maximum number of reconstruction and sparsity / variance batches that
+    run_evals_multiple_saes() reads with eval_config."""
+    num_reconstruction_batches = (
+        eval_config.n_eval_reconstruction_batches
+        if eval_config.compute_kl or eval_config.compute_ce_loss
+        else 0
+    )
+    num_sparsity_variance_batches = (
+        eval_config.n_eval_sparsity_variance_batches
+        if eval_config.compute_l2_norms
+        or eval_config.compute_sparsity_metrics
+        or eval_config.compute_variance_metrics
+        else 0
+    )
+    return num_reconstruction_batches, num_sparsity_variance_batches
+
+
+def get_num_norm_estimate_sequences(eval_config: CoreEvalConfig) -> int:
+    """The norm scaling factor is estimated on the first sequences of the token stream, the ones
+    the reconstruction metrics read."""
+    assert eval_config.batch_size_prompts is not None
+    num_reconstruction_batches, _ = get_num_eval_batches(eval_config)
+    return eval_config.batch_size_prompts * max(num_reconstruction_batches, 1)
+
+
+def estimate_sae_norm_scaling_factor(
+    model: HookedTransformer,
+    sae: SAE,
+    eval_config: CoreEvalConfig,
+    tokens_SL: np.ndarray,
+) -> float:
+    """The norm scaling factor at the hook of sae, estimated on the first
+    get_num_norm_estimate_sequences() sequences of tokens_SL."""
+    assert eval_config.batch_size_prompts is not None
+    return token_cache.estimate_norm_scaling_factor(
+        model,
+        tokens_SL[: get_num_norm_estimate_sequences(eval_config)],
+        sae.cfg.hook_name,
+        sae.cfg.hook_layer,
+        sae.cfg.hook_head_index,
+        sae.cfg.d_in,
+        batch_size=eval_config.batch_size_prompts,
+    )
+
+
+def get_activation_store(
+    model: HookedTransformer,
+    sae: SAE,
+    eval_config: CoreEvalConfig,
+    create_activation_store: Callable[[], ActivationsStore],
+) -> ActivationsStore:
+    """The ActivationsStore from create_activation_store(). sae_lens leaves its norm scaling factor
+    at 1.0, so for SAEs that expect normalized activations it is estimated like in
+    get_cached_tokens_store(), on the same tokens read from a second store."""
+    activation_store = create_activation_store()
+    if sae.cfg.normalize_activations == "expected_average_only_in":
+        assert eval_config.batch_size_prompts is not None
+        tokens_SL = token_cache.read_tokens(
+            create_activation_store(),
+            get_num_norm_estimate_sequences(eval_config),
+            batch_size=eval_config.batch_size_prompts,
+        )
+        activation_store.estimated_norm_scaling_factor = estimate_sae_norm_scaling_factor(
+            model, sae, eval_config, tokens_SL
+        )
+    return activation_store
+
+
+def get_cached_tokens_store(
+    cache: token_cache.TokenCache,
+    model: HookedTransformer,
+    sae: SAE,
+    eval_config: CoreEvalConfig,
+    create_activation_store: Callable[[], ActivationsStore],
+) -> token_cache.CachedTokensStore:
+    """A store serving the tokens that run_evals_multiple_saes() reads for the SAEs with
+    get_sae_group_key(sae), in the order the ActivationsStore from create_activation_store() would
+    serve them. If the SAE expects normalized activations, the norm scaling factor at its hook is
+    estimated once on the reconstruction tokens and cached, giving the same factor as
+    get_activation_store()."""
+    assert eval_config.batch_size_prompts is not None
+    num_reconstruction_batches, num_sparsity_variance_batches = get_num_eval_batches(eval_config)
+    num_sequences = eval_config.batch_size_prompts * max(
+        num_reconstruction_batches + num_sparsity_variance_batches, 1
+    )
+
+    tokens_key = token_cache.TokenCacheKey(
+        dataset_name=eval_config.dataset,
+        tokenizer_revision=activation_cache.get_tokenizer_revision(model.tokenizer),
+        context_size=eval_config.context_size,
+        prepend_bos=sae.cfg.prepend_bos,
+        shuffle_seed=42,
+    )
+    tokens_SL = token_cache.get_cached_tokens(
+        cache,
+        tokens_key,
+        num_sequences,
+        create_activation_store,
+        batch_size=eval_config.batch_size_prompts,
+    )
+
+    norm_scaling_factor = 1.0
+    if sae.cfg.normalize_activations == "expected_average_only_in":
+        norm_scaling_factor = token_cache.get_norm_scaling_factor(
+            cache,
+            token_cache.NormScalingFactorKey(
+                model_name=sae.cfg.model_name,
+                hook_name=sae.cfg.hook_name,
+                hook_head_index=sae.cfg.hook_head_index,
+                tokens_key=tokens_key,
+                num_sequences=get_num_norm_estimate_sequences(eval_config),
+            ),
+            lambda: estimate_sae_norm_scaling_factor(model, sae, eval_config, tokens_SL),
+        )
+
+    return token_cache.CachedTokensStore(
+        tokens_SL,
+        device=model.cfg.device,
+        normalize_activations=sae.cfg.normalize_activations,
+        estimated_norm_scaling_factor=norm_scaling_factor,
+    )
+
+
 def multiple_evals(
     filtered_saes: list[tuple[str, str]] | list[tuple[str, SAE]],
     n_eval_reconstruction_batches: int,
@@ -895,13 +1823,35 @@ def multiple_evals(
     eval_batch_size_prompts: int = 8,
     compute_featurewise_density_statistics: bool = False,
     compute_featurewise_weight_based_metrics: bool = False,
+    compute_featurewise_max_decoder_cosine_sim: bool = False,
+    weight_metrics_block_size: int = DEFAULT_WEIGHT_METRICS_BLOCK_SIZE,
     exclude_special_tokens_from_reconstruction: bool = False,
     dataset: str = "Skylion007/openwebtext",
     context_size: int = 128,
     output_folder: str = "eval_results",
     verbose: bool = False,
     dtype: str = "float32",
+    max_saes_per_group: int = 1,
+    token_cache_dir: Optional[str] = token_cache.DEFAULT_TOKEN_CACHE_DIR,
+    force_rerun: bool = False,
+    checkpoint_every_n_batches: int = 0,
+    early_stopping_tolerance: float = 0.0,
+    early_stopping_min_batches: int = 10,
 ) -> List[Dict[str, Any]]:
+    """Consecutive SAEs in filtered_saes with the same get_sae_group_key(), e.g. a sweep at one
+    layer, are evaluated together in groups of up to max_saes_per_group SAEs, sharing the clean and
+    zero-ablated runs. Every SAE of a group is held in memory at once.
+
+    The eval tokens are read from the token cache in token_cache_dir, so the dataset is only
+    streamed and tokenized for the first SAE that needs them. If token_cache_dir is None, every
+    group streams the dataset through its own ActivationsStore.
+
+    Unless force_rerun, SAEs whose results were already saved in output_folder with the same
+    get_eval_config_hash() are skipped, and their saved results are returned. If
+    checkpoint_every_n_batches > 0, each group's metrics are checkpointed next to its results
+    every that many batches, and an interrupted group resumes from its last checkpoint. If
+    early_stopping_tolerance > 0, the n_eval_*_batches are maximums and each stage stops once the
+    95% confidence intervals of its key metrics are narrower than that for every SAE of a group."""
     device = general_utils.setup_environment()
     assert len(filtered_saes) > 0, "No SAEs to evaluate"
 
@@ -920,43 +1870,40 @@ def multiple_evals(
         n_eval_sparsity_variance_batches=n_eval_sparsity_variance_batches,
     )
 
-    current_model = None
-    current_model_str = None
-
-    for sae_release_name, sae_id in tqdm(filtered_saes):
-        # Wrap SAE loading with retry
-        @retry_with_exponential_backoff(
-            retries=5,
-            exceptions=(
-                Exception,
-            ),  # You might want to be more specific about which exceptions to catch
-            initial_delay=1.0,
-            max_delay=60.0,
+    def make_core_eval_config(model_name: str) -> CoreEvalConfig:
+        return CoreEvalConfig(
+            model_name=model_name,
+            batch_size_prompts=multiple_evals_config.batch_size_prompts or 16,
+            n_eval_reconstruction_batches=multiple_evals_config.n_eval_reconstruction_batches,
+            n_eval_sparsity_variance_batches=multiple_evals_config.n_eval_sparsity_variance_batches,
+            exclude_special_tokens_from_reconstruction=exclude_special_tokens_from_reconstruction,
+            dataset=dataset,
+            context_size=context_size,
+            compute_kl=multiple_evals_config.compute_kl,
+            compute_ce_loss=multiple_evals_config.compute_ce_loss,
+            compute_l2_norms=multiple_evals_config.compute_l2_norms,
+            compute_sparsity_metrics=multiple_evals_config.compute_sparsity_metrics,
+            compute_variance_metrics=multiple_evals_config.compute_variance_metrics,
+            compute_featurewise_density_statistics=compute_featurewise_density_statistics,
+            compute_featurewise_weight_based_metrics=compute_featurewise_weight_based_metrics,
+            compute_featurewise_max_decoder_cosine_sim=compute_featurewise_max_decoder_cosine_sim,
+            weight_metrics_block_size=weight_metrics_block_size,
+            llm_dtype=dtype,
+            max_saes_per_group=max_saes_per_group,
+            checkpoint_every_n_batches=checkpoint_every_n_batches,
+            early_stopping_tolerance=early_stopping_tolerance,
+            early_stopping_min_batches=early_stopping_min_batches,
         )
-        def load_sae():
-            return SAE.from_pretrained(
-                release=sae_release_name,
-                sae_id=sae_id,
-                device=device,
-            )[0]
 
-        del_sae = False
-        # Handle both pretrained SAEs (identified by string) and custom SAEs (passed as objects)
-        if isinstance(sae_id, str):
-            try:
-                sae = load_sae()
-                del_sae = True
-            except Exception as e:
-                logger.error(f"Failed to load SAE {sae_id} from {sae_release_name}: {str(e)}")
-                continue  # Skip this SAE and continue with the next one
-        else:
-            sae = sae_id
-            sae_id = "custom_sae"
+    current_model = None
+    current_model_str = None
 
-        sae.to(device)
-        sae = sae.to(general_utils.str_to_dtype(dtype))
+    def evaluate_sae_group(sae_group: list[tuple[str, str, SAE]]) -> list[Dict[str, Any]]:
+        nonlocal current_model, current_model_str
 
-        # TODO: Check if results already exist and skip if so, add force_rerun flag
+        # The SAEs of a group share the model, hook and dataset settings
+        sae = sae_group[0][2]
+        sae_ids = [sae_id for _, sae_id, _ in sae_group]
 
         if current_model_str != sae.cfg.model_name:
             # Wrap model loading with retry
@@ -977,34 +1924,35 @@ def multiple_evals(
                 )
 
             try:
-                del current_model
-                current_model_str = sae.cfg.model_name
+                current_model = None
                 current_model = load_model()
+                current_model_str = sae.cfg.model_name
             except Exception as e:
                 logger.error(f"Failed to load model {sae.cfg.model_name}: {str(e)}")
-                continue  # Skip this SAE and continue with the next one
+                return []  # Skip these SAEs and continue with the next group
 
         assert current_model is not None
 
+        group_results = []
         try:
             # Create a CoreEvalConfig for this specific evaluation
-            core_eval_config = CoreEvalConfig(
-                model_name=sae.cfg.model_name,
-                batch_size_prompts=multiple_evals_config.batch_size_prompts or 16,
-                n_eval_reconstruction_batches=multiple_evals_config.n_eval_reconstruction_batches,
-                n_eval_sparsity_variance_batches=multiple_evals_config.n_eval_sparsity_variance_batches,
-                exclude_special_tokens_from_reconstruction=exclude_special_tokens_from_reconstruction,
-                dataset=dataset,
-                context_size=context_size,
-                compute_kl=multiple_evals_config.compute_kl,
-                compute_ce_loss=multiple_evals_config.compute_ce_loss,
-                compute_l2_norms=multiple_evals_config.compute_l2_norms,
-                compute_sparsity_metrics=multiple_evals_config.compute_sparsity_metrics,
-                compute_variance_metrics=multiple_evals_config.compute_variance_metrics,
-                compute_featurewise_density_statistics=compute_featurewise_density_statistics,
-                compute_featurewise_weight_based_metrics=compute_featurewise_weight_based_metrics,
-                llm_dtype=dtype,
-            )
+            core_eval_config = make_core_eval_config(sae.cfg.model_name)
+
+            checkpoint = None
+            if checkpoint_every_n_batches > 0:
+                unique_ids = [get_unique_id(release, sae_id) for release, sae_id, _ in sae_group]
+                checkpoint_key = json.dumps(
+                    [unique_ids, get_eval_config_hash(core_eval_config)], sort_keys=True
+                )
+                checkpoint = MetricsCheckpoint(
+                    get_eval_result_path(output_path, unique_ids[0], core_eval_config).with_suffix(
+                        ".checkpoint.pt"
+                    ),
+                    key=hashlib.sha256(checkpoint_key.encode()).hexdigest(),
+                    every_n_batches=checkpoint_every_n_batches,
+                )
+                if force_rerun:
+                    checkpoint.remove()
 
             # Wrap activation store creation with retry
             @retry_with_exponential_backoff(
@@ -1014,21 +1962,27 @@ def multiple_evals(
                 max_delay=30.0,
             )
             def create_activation_store():
-                return ActivationsStore.from_sae(
+                activation_store = ActivationsStore.from_sae(
                     current_model, sae, context_size=context_size, dataset=dataset
                 )
+                activation_store.shuffle_input_dataset(seed=42)
+                return activation_store
 
-            activation_store = create_activation_store()
-            activation_store.shuffle_input_dataset(seed=42)
-
-            eval_metrics = nested_dict()
-            eval_metrics["unique_id"] = f"{sae_release_name}_{sae_id}".replace(".", "_")
-            eval_metrics["sae_set"] = f"{sae_release_name}"
-            eval_metrics["sae_id"] = f"{sae_id}"
-            eval_metrics["eval_cfg"] = core_eval_config
+            if token_cache_dir is None:
+                activation_store = get_activation_store(
+                    current_model, sae, core_eval_config, create_activation_store
+                )
+            else:
+                activation_store = get_cached_tokens_store(
+                    token_cache.TokenCache(token_cache_dir),
+                    current_model,
+                    sae,
+                    core_eval_config,
+                    create_activation_store,
+                )
 
-            scalar_metrics, feature_metrics = run_evals(
-                sae=sae,
+            all_sae_metrics = run_evals_multiple_saes(
+                saes=[group_sae for _, _, group_sae in sae_group],
                 activation_store=activation_store,
                 model=current_model,  # type: ignore
                 eval_config=core_eval_config,
@@ -1038,39 +1992,117 @@ def multiple_evals(
                     current_model.tokenizer.bos_token_id,  # type: ignore
                 },
                 verbose=verbose,
+                checkpoint=checkpoint,
             )
-            eval_metrics["metrics"] = scalar_metrics
-
-            if compute_featurewise_density_statistics or compute_featurewise_weight_based_metrics:
-                eval_metrics["feature_metrics"] = feature_metrics
 
-            # Clean NaN values before saving
-            cleaned_metrics = replace_nans_with_negative_one(eval_metrics)
+            for (sae_release_name, sae_id, _), (scalar_metrics, feature_metrics) in zip(
+                sae_group, all_sae_metrics
+            ):
+                eval_metrics = nested_dict()
+                eval_metrics["unique_id"] = get_unique_id(sae_release_name, sae_id)
+                eval_metrics["sae_set"] = f"{sae_release_name}"
+                eval_metrics["sae_id"] = f"{sae_id}"
+                eval_metrics["eval_cfg"] = core_eval_config
+                eval_metrics["metrics"] = scalar_metrics
+
+                if (
+                    compute_featurewise_density_statistics
+                    or compute_featurewise_weight_based_metrics
+                ):
+                    eval_metrics["feature_metrics"] = feature_metrics
+
+                # Clean NaN values before saving
+                cleaned_metrics = replace_nans_with_negative_one(eval_metrics)
+
+                # Save results immediately after each evaluation
+                saved_path = save_single_eval_result(
+                    cleaned_metrics,
+                    eval_instance_id,
+                    sae_lens_version,
+                    sae_bench_commit_hash,
+                    output_path,
+                )
 
-            # Save results immediately after each evaluation
-            saved_path = save_single_eval_result(
-                cleaned_metrics,
-                eval_instance_id,
-                sae_lens_version,
-                sae_bench_commit_hash,
-                output_path,
-            )
+                if verbose:
+                    print(f"Saved evaluation results to: {saved_path}")
 
-            if verbose:
-                print(f"Saved evaluation results to: {saved_path}")
+                group_results.append(eval_metrics)
 
-            eval_results.append(eval_metrics)
+            # Every result of the group is saved, so the checkpoint is no longer needed
+            if checkpoint is not None:
+                checkpoint.remove()
         except Exception as e:
             logger.error(
-                f"Failed to evaluate SAE {sae_id} from {sae_release_name} "
+                f"Failed to evaluate SAEs {sae_ids} from {sae_group[0][0]} "
                 f"with context length {context_size} on dataset {dataset}: {str(e)}"
             )
-            continue  # Skip this combination and continue with the next one
 
-        if del_sae:
-            del sae
-        gc.collect()
-        torch.cuda.empty_cache()
+        return group_results  # Skip the rest of this group and continue with the next one
+
+    sae_group: list[tuple[str, str, SAE]] = []
+
+    for sae_release_name, sae_id in tqdm(filtered_saes):
+        if not force_rerun:
+            unique_id = get_unique_id(
+                sae_release_name, sae_id if isinstance(sae_id, str) else "custom_sae"
+            )
+            # The model name comes from the SAE, which isn't loaded yet, but results are saved
+            # per SAE and get_eval_config_hash() ignores the model name
+            core_eval_config = make_core_eval_config(model_name="")
+            json_path = get_eval_result_path(output_path, unique_id, core_eval_config)
+            completed_result = load_completed_eval_result(json_path, unique_id, core_eval_config)
+            if completed_result is not None:
+                print(f"Skipping {unique_id}, loading existing results from {json_path}")
+                eval_results.append(completed_result)
+                continue
+
+        # Wrap SAE loading with retry
+        @retry_with_exponential_backoff(
+            retries=5,
+            exceptions=(
+                Exception,
+            ),  # You might want to be more specific about which exceptions to catch
+            initial_delay=1.0,
+            max_delay=60.0,
+        )
+        def load_sae():
+            return SAE.from_pretrained(
+                release=sae_release_name,
+                sae_id=sae_id,
+                device=device,
+            )[0]
+
+        # Handle both pretrained SAEs (identified by string) and custom SAEs (passed as objects)
+        if isinstance(sae_id, str):
+            try:
+                sae = load_sae()
+            except Exception as e:
+                logger.error(f"Failed to load SAE {sae_id} from {sae_release_name}: {str(e)}")
+                continue  # Skip this SAE and continue with the next one
+        else:
+            sae = sae_id
+            sae_id = "custom_sae"
+
+        sae.to(device)
+        sae = sae.to(general_utils.str_to_dtype(dtype))
+
+        if len(sae_group) > 0 and get_sae_group_key(sae) != get_sae_group_key(sae_group[0][2]):
+            eval_results.extend(evaluate_sae_group(sae_group))
+            sae_group = []
+            gc.collect()
+            torch.cuda.empty_cache()
+
+        sae_group.append((sae_release_name, sae_id, sae))
+        del sae
+
+        if len(sae_group) >= max_saes_per_group:
+            eval_results.extend(evaluate_sae_group(sae_group))
+            sae_group = []
+            gc.collect()
+            torch.cuda.empty_cache()
+
+    if len(sae_group) > 0:
+        eval_results.extend(evaluate_sae_group(sae_group))
 
     return eval_results
 
@@ -1100,12 +2132,20 @@ def run_evaluations(args: argparse.Namespace) -> List[Dict[str, Any]]:
         eval_batch_size_prompts=args.batch_size_prompts,
         compute_featurewise_density_statistics=args.compute_featurewise_density_statistics,
         compute_featurewise_weight_based_metrics=args.compute_featurewise_weight_based_metrics,
+        compute_featurewise_max_decoder_cosine_sim=args.compute_featurewise_max_decoder_cosine_sim,
+        weight_metrics_block_size=args.weight_metrics_block_size,
         exclude_special_tokens_from_reconstruction=args.exclude_special_tokens_from_reconstruction,
         dataset=args.dataset,
         context_size=args.context_size,
         output_folder=args.output_folder,
         verbose=args.verbose,
         dtype=args.llm_dtype,
+        max_saes_per_group=args.max_saes_per_group,
+        token_cache_dir=None if args.no_token_cache else args.token_cache_dir,
+        force_rerun=args.force_rerun,
+        checkpoint_every_n_batches=args.checkpoint_every_n_batches,
+        early_stopping_tolerance=args.early_stopping_tolerance,
+        early_stopping_min_batches=args.early_stopping_min_batches,
     )
 
     return eval_results
@@ -1114,6 +2154,11 @@ def run_evaluations(args: argparse.Namespace) -> List[Dict[str, Any]]:
 def replace_nans_with_negative_one(obj: Any) -> Any:
     if isinstance(obj, dict):
         return {k: replace_nans_with_negative_one(v) for k, v in obj.items()}
+    elif isinstance(obj, np.ndarray):
+        # Feature metrics have one entry per latent, so replace them without a per-element walk
+        if np.issubdtype(obj.dtype, np.floating):
+            return np.nan_to_num(obj, nan=-1, posinf=np.inf, neginf=-np.inf)
+        return obj
     elif isinstance(obj, list):
         return [replace_nans_with_negative_one(item) for item in obj]
     elif isinstance(obj, float) and math.isnan(obj):
@@ -1193,6 +2238,19 @@ def arg_parser():
         action="store_true",
         help="Compute featurewise weight-based metrics.",
     )
+    parser.add_argument(
+        "--compute_featurewise_max_decoder_cosine_sim",
+        action="store_true",
+        help="With the featurewise weight-based metrics, also compute each latent's highest "
+        "decoder cosine similarity with any other latent. Takes O(d_sae^2 * d_in) compute.",
+    )
+    parser.add_argument(
+        "--weight_metrics_block_size",
+        type=int,
+        default=DEFAULT_WEIGHT_METRICS_BLOCK_SIZE,
+        help="Number of latents processed at a time by the featurewise weight-based metrics, "
+        "which bounds their peak memory.",
+    )
     parser.add_argument(
         "--exclude_special_tokens_from_reconstruction",
         action="store_true",
@@ -1221,6 +2279,18 @@ def arg_parser():
         help="Enable verbose output with tqdm loaders.",
     )
     parser.add_argument("--force_rerun", action="store_true", help="Force rerun of experiments")
+    parser.add_argument(
+        "--token_cache_dir",
+        type=str,
+        default=token_cache.DEFAULT_TOKEN_CACHE_DIR,
+        help="Directory of the on-disk cache of tokenized eval sequences, shared by every run on "
+        "the machine.",
+    )
+    parser.add_argument(
+        "--no_token_cache",
+        action="store_true",
+        help="Don't use the token cache, so every SAE group streams and tokenizes the dataset.",
+    )
     parser.add_argument(
         "--llm_dtype",
         type=str,
@@ -1228,6 +2298,34 @@ def arg_parser():
         choices=["float32", "float64", "float16", "bfloat16"],
         help="Data type for computation",
     )
+    parser.add_argument(
+        "--max_saes_per_group",
+        type=int,
+        default=1,
+        help="Evaluate up to this many consecutive SAEs at the same hook together, sharing the "
+        "clean and zero-ablated runs. Every SAE of a group is held in memory at once.",
+    )
+    parser.add_argument(
+        "--checkpoint_every_n_batches",
+        type=int,
+        default=0,
+        help="Save the accumulated metrics every this many batches, so that an interrupted run "
+        "resumes mid-SAE. 0 disables checkpointing.",
+    )
+    parser.add_argument(
+        "--early_stopping_tolerance",
+        type=float,
+        default=0.0,
+        help="Stop evaluating batches once the 95%% confidence interval half-width of the CE loss "
+        "score, explained variance and L0 is below this. The number of batches arguments become "
+        "maximums. 0 disables early stopping.",
+    )
+    parser.add_argument(
+        "--early_stopping_min_batches",
+        type=int,
+        default=10,
+        help="Evaluate at least this many batches before stopping early.",
+    )
 
     return parser
 
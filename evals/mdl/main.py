@@ -21,7 +21,7 @@ from datetime import datetime
 from tqdm import tqdm
 
 from evals.mdl.eval_config import MDLEvalConfig
-from sae_bench_utils import activation_collection, general_utils
+from sae_bench_utils import activation_collection, batch_size_planner, general_utils
 from sae_bench_utils import (
     get_eval_uuid,
     get_sae_lens_version,
@@ -504,16 +504,18 @@ def create_config_and_selected_saes(
         model_name=args.model_name,
     )
 
-    if args.llm_batch_size is not None:
-        config.llm_batch_size = args.llm_batch_size
-    else:
-        config.llm_batch_size = activation_collection.LLM_NAME_TO_BATCH_SIZE[config.model_name]
-
     if args.llm_dtype is not None:
         config.llm_dtype = args.llm_dtype
     else:
         config.llm_dtype = activation_collection.LLM_NAME_TO_DTYPE[config.model_name]
 
+    if args.llm_batch_size is not None:
+        config.llm_batch_size = args.llm_batch_size
+    else:
+        config.llm_batch_size = batch_size_planner.plan_llm_batch_size(
+            config.model_name, config.context_length, config.llm_dtype
+        )
+
     if args.random_seed is not None:
         config.random_seed = args.random_seed
 
@@ -562,7 +564,7 @@ def arg_parser():
         "--llm_batch_size",
         type=int,
         default=None,
-        help="Batch size for LLM. If None, will be populated using LLM_NAME_TO_BATCH_SIZE",
+        help="Batch size for LLM. If None, will be planned from the model dimensions and free memory",
     )
     parser.add_argument(
         "--llm_dtype",
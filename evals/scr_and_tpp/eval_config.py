@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic.dataclasses import dataclass
 from pydantic import Field, field_validator
 from evals.base_eval_output import BaseEvalConfig
@@ -76,16 +78,21 @@ class ScrAndTppEvalConfig(BaseEvalConfig):
         description="L1 sparsity penalty when training the linear probe.",
     )
 
-    sae_batch_size: int = Field(
-        default=125,
+    sae_batch_size: Optional[int] = Field(
+        default=None,
         title="SAE Batch Size",
-        description="SAE Batch size, inference only",
+        description="SAE Batch size, inference only. If None, it is planned for each SAE from its width and the free memory.",
     )
     llm_batch_size: int = Field(
         default=None,
         title="LLM Batch Size",
         description="LLM batch size. This is set by default in the main script, or it can be set with a command line argument.",
     )
+    probe_batch_sizes: bool = Field(
+        default=False,
+        title="Probe Batch Sizes",
+        description="Refine the LLM and SAE batch sizes with a short probing run before they are used: each is halved until a batch of random inputs fits in memory. This catches plans from the free memory that turn out too large, at the cost of one LLM forward pass per run and one SAE encoding per SAE.",
+    )
     llm_dtype: str = Field(
         default="",
         title="LLM Data Type",
@@ -97,6 +104,12 @@ class ScrAndTppEvalConfig(BaseEvalConfig):
         description="Lower GPU memory usage by moving model to CPU when not required. Will be slower and require more system memory.",
     )
 
+    quantize_activations: bool = Field(
+        default=False,
+        title="Quantize Activations",
+        description="Store the saved LLM activations as int8 with a per-channel scale and zero point, calibrated on the train activations. This makes the activation artifacts 2-4x smaller, depending on the LLM dtype. The activations stay int8 when loaded, also in the run that saves them, and each batch is dequantized just before it is encoded by the SAE.",
+    )
+
     model_name: str = Field(
         default="",
         title="Model Name",
@@ -3,7 +3,7 @@ import os
 import shutil
 import random
 import time
-from dataclasses import asdict
+from dataclasses import asdict, replace
 from typing import Optional
 
 import einops
@@ -31,10 +31,14 @@ from evals.scr_and_tpp.eval_output import (
     TppMetrics,
 )
 import evals.sparse_probing.probe_training as probe_training
+import sae_bench_utils.activation_cache as activation_cache
 import sae_bench_utils.activation_collection as activation_collection
+import sae_bench_utils.batch_size_planner as batch_size_planner
 import sae_bench_utils.dataset_info as dataset_info
 import sae_bench_utils.dataset_utils as dataset_utils
 import sae_bench_utils.general_utils as general_utils
+import sae_bench_utils.sae_pipeline as sae_pipeline
+from sae_bench_utils.ragged_activations import RaggedActivations, segment_mean
 from sae_bench_utils import (
     get_eval_uuid,
     get_sae_lens_version,
@@ -53,39 +57,33 @@ def get_effects_per_class_precomputed_acts(
     sae: SAE,
     probe: probe_training.Probe,
     class_idx: str,
-    precomputed_acts: dict[str, torch.Tensor],
+    precomputed_acts: dict[str, RaggedActivations],
     perform_scr: bool,
     sae_batch_size: int,
 ) -> torch.Tensor:
-    inputs_train_BLD, labels_train_B = probe_training.prepare_probe_data(
+    inputs_train, labels_train_B = probe_training.prepare_probe_data(
         precomputed_acts, class_idx, perform_scr
     )
 
-    assert inputs_train_BLD.shape[0] == len(labels_train_B)
+    assert len(inputs_train) == len(labels_train_B)
 
-    device = inputs_train_BLD.device
-    dtype = inputs_train_BLD.dtype
+    device = inputs_train.device
+    dtype = inputs_train.dtype
 
     running_sum_pos_F = torch.zeros(sae.W_dec.data.shape[0], dtype=torch.float32, device=device)
     running_sum_neg_F = torch.zeros(sae.W_dec.data.shape[0], dtype=torch.float32, device=device)
     count_pos = 0
     count_neg = 0
 
-    for i in range(0, inputs_train_BLD.shape[0], sae_batch_size):
-        activation_batch_BLD = inputs_train_BLD[i : i + sae_batch_size]
+    for i in range(0, len(inputs_train), sae_batch_size):
+        activation_batch = inputs_train[i : i + sae_batch_size]
         labels_batch_B = labels_train_B[i : i + sae_batch_size]
 
-        activations_BL = einops.reduce(activation_batch_BLD, "B L D -> B L", "sum")
-        nonzero_acts_BL = (activations_BL != 0.0).to(dtype=dtype)
-        nonzero_acts_B = einops.reduce(nonzero_acts_BL, "B L -> B", "sum").to(torch.float32)
+        # Only real tokens are stored, so there is nothing to mask
+        f_TF = sae.encode(activation_batch.dequantize().acts_TD)
 
-        f_BLF = sae.encode(activation_batch_BLD)
-        f_BLF = f_BLF * nonzero_acts_BL[:, :, None]  # zero out masked tokens
-
-        # Get the average activation per input. We divide by the number of nonzero activations for the attention mask
-        average_sae_acts_BF = (
-            einops.reduce(f_BLF, "B L F -> B F", "sum").to(torch.float32) / nonzero_acts_B[:, None]
-        )
+        # Get the average activation per input
+        average_sae_acts_BF = segment_mean(f_TF.to(torch.float32), activation_batch)
 
         # Separate positive and negative samples
         pos_mask = labels_batch_B == dataset_info.POSITIVE_CLASS_LABEL
@@ -127,7 +125,7 @@ def get_all_node_effects_for_one_sae(
     probes: dict[str, probe_training.Probe],
     chosen_class_indices: list[str],
     perform_scr: bool,
-    indirect_effect_acts: dict[str, torch.Tensor],
+    indirect_effect_acts: dict[str, RaggedActivations],
     sae_batch_size: int,
 ) -> dict[str, torch.Tensor]:
     node_effects = {}
@@ -181,36 +179,30 @@ def select_top_n_features(effects: torch.Tensor, n: int, class_name: str) -> tor
 
 
 def ablated_precomputed_activations(
-    ablation_acts_BLD: torch.Tensor,
+    ablation_acts: RaggedActivations,
     sae: SAE,
     to_ablate: torch.Tensor,
     sae_batch_size: int,
 ) -> torch.Tensor:
-    """NOTE: We don't pass in the attention mask. Thus, we must have already zeroed out all masked tokens in ablation_acts_BLD."""
+    """NOTE: We don't pass in the attention mask. ablation_acts only contains the activations of unmasked tokens."""
 
     all_acts_list_BD = []
 
-    for i in range(0, ablation_acts_BLD.shape[0], sae_batch_size):
-        activation_batch_BLD = ablation_acts_BLD[i : i + sae_batch_size]
-        dtype = activation_batch_BLD.dtype
-
-        activations_BL = einops.reduce(activation_batch_BLD, "B L D -> B L", "sum")
-        nonzero_acts_BL = (activations_BL != 0.0).to(dtype=dtype)
-        nonzero_acts_B = einops.reduce(nonzero_acts_BL, "B L -> B", "sum")
+    for i in range(0, len(ablation_acts), sae_batch_size):
+        activation_batch = ablation_acts[i : i + sae_batch_size]
+        activation_batch_TD = activation_batch.dequantize().acts_TD
 
-        f_BLF = sae.encode(activation_batch_BLD)
-        x_hat_BLD = sae.decode(f_BLF)
+        f_TF = sae.encode(activation_batch_TD)
+        x_hat_TD = sae.decode(f_TF)
 
-        error_BLD = activation_batch_BLD - x_hat_BLD
+        error_TD = activation_batch_TD - x_hat_TD
 
-        f_BLF[..., to_ablate] = 0.0  # zero ablation
+        f_TF[..., to_ablate] = 0.0  # zero ablation
 
-        modified_acts_BLD = sae.decode(f_BLF) + error_BLD
+        modified_acts_TD = sae.decode(f_TF) + error_TD
 
-        # Get the average activation per input. We divide by the number of nonzero activations for the attention mask
-        probe_acts_BD = (
-            einops.reduce(modified_acts_BLD, "B L D -> B D", "sum") / nonzero_acts_B[:, None]
-        )
+        # Get the average activation per input
+        probe_acts_BD = segment_mean(modified_acts_TD, activation_batch)
         all_acts_list_BD.append(probe_acts_BD)
 
     all_acts_BD = torch.cat(all_acts_list_BD, dim=0)
@@ -281,7 +273,7 @@ def perform_feature_ablations(
     probes: dict[str, probe_training.Probe],
     sae: SAE,
     sae_batch_size: int,
-    all_test_acts_BLD: dict[str, torch.Tensor],
+    all_test_acts: dict[str, RaggedActivations],
     node_effects: dict[str, torch.Tensor],
     top_n_values: list[int],
     chosen_classes: list[str],
@@ -296,9 +288,9 @@ def perform_feature_ablations(
                 node_effects[ablated_class_name], top_n, ablated_class_name
             )
             test_acts_ablated = {}
-            for evaluated_class_name in all_test_acts_BLD.keys():
+            for evaluated_class_name in all_test_acts.keys():
                 test_acts_ablated[evaluated_class_name] = ablated_precomputed_activations(
-                    all_test_acts_BLD[evaluated_class_name],
+                    all_test_acts[evaluated_class_name],
                     sae,
                     selected_features_F,
                     sae_batch_size,
@@ -446,7 +438,7 @@ def get_dataset_activations(
     chosen_classes: list[str],
     column1_vals: Optional[tuple[str, str]] = None,
     column2_vals: Optional[tuple[str, str]] = None,
-) -> tuple[dict[str, torch.Tensor], dict[str, torch.Tensor]]:
+) -> tuple[dict[str, RaggedActivations], dict[str, RaggedActivations]]:
     train_data, test_data = dataset_creation.get_train_test_data(
         dataset_name,
         config.perform_scr,
@@ -468,14 +460,59 @@ def get_dataset_activations(
         test_data, model.tokenizer, config.context_length, device
     )
 
-    all_train_acts_BLD = activation_collection.get_all_llm_activations(
+    all_train_acts = activation_collection.get_all_llm_activations_ragged(
         train_data, model, llm_batch_size, layer, hook_point, mask_bos_pad_eos_tokens=True
     )
-    all_test_acts_BLD = activation_collection.get_all_llm_activations(
+    all_test_acts = activation_collection.get_all_llm_activations_ragged(
         test_data, model, llm_batch_size, layer, hook_point, mask_bos_pad_eos_tokens=True
     )
 
-    return all_train_acts_BLD, all_test_acts_BLD
+    return all_train_acts, all_test_acts
+
+
+def get_activation_cache_keys(
+    dataset_name: str,
+    config: ScrAndTppEvalConfig,
+    model: HookedTransformer,
+    hook_point: str,
+    chosen_classes: list[str],
+    column1_vals: Optional[tuple[str, str]] = None,
+    column2_vals: Optional[tuple[str, str]] = None,
+) -> tuple[activation_cache.ActivationCacheKey, activation_cache.ActivationCacheKey]:
+    """The cache keys of the train and test activations from get_dataset_activations().
+    TPP selects its data like sparse_probing, so with equal settings the two evals share activations."""
+    if config.perform_scr:
+        dataset_kwargs = {
+            "sampling": "spurious_correlation",
+            "train_set_size": config.train_set_size,
+            "test_set_size": config.test_set_size,
+            "column1_vals": column1_vals,
+            "column2_vals": column2_vals,
+        }
+    else:
+        dataset_kwargs = {
+            "sampling": "multi_label",
+            "train_set_size": config.train_set_size,
+            "test_set_size": config.test_set_size,
+            "classes": chosen_classes,
+        }
+
+    tokenizer_revision = activation_cache.get_tokenizer_revision(model.tokenizer)
+    return tuple(
+        activation_cache.ActivationCacheKey(
+            model_name=config.model_name,
+            hook_name=hook_point,
+            dataset_name=dataset_name,
+            split=split,
+            random_seed=config.random_seed,
+            context_length=config.context_length,
+            tokenizer_revision=tokenizer_revision,
+            dtype=config.llm_dtype,
+            quantization="int8" if config.quantize_activations else None,
+            dataset_kwargs=dataset_kwargs,
+        )
+        for split in ["train", "test"]
+    )
 
 
 def run_eval_single_dataset(
@@ -500,24 +537,19 @@ def run_eval_single_dataset(
 
     if not config.perform_scr:
         chosen_classes = dataset_info.chosen_classes_per_dataset[dataset_name]
-        activations_filename = f"{dataset_name}_activations.pt".replace("/", "_")
-        probes_filename = f"{dataset_name}_probes.pkl".replace("/", "_")
+        probes_name = dataset_name
     else:
         chosen_classes = list(dataset_info.PAIRED_CLASS_KEYS.keys())
-        activations_filename = (
-            f"{dataset_name}_{column1_vals[0]}_{column1_vals[1]}_activations.pt".replace("/", "_")
-        )
-        probes_filename = f"{dataset_name}_{column1_vals[0]}_{column1_vals[1]}_probes.pkl".replace(
-            "/", "_"
-        )
+        probes_name = f"{dataset_name}_{column1_vals[0]}_{column1_vals[1]}"
 
-    activations_path = os.path.join(artifacts_folder, activations_filename)
-    probes_path = os.path.join(artifacts_folder, probes_filename)
+    train_key, test_key = get_activation_cache_keys(
+        dataset_name, config, model, hook_point, chosen_classes, column1_vals, column2_vals
+    )
 
-    if not os.path.exists(activations_path):
+    def compute_activations():
         if config.lower_vram_usage:
-            model = model.to(device)
-        all_train_acts_BLD, all_test_acts_BLD = get_dataset_activations(
+            model.to(device)
+        return get_dataset_activations(
             dataset_name,
             config,
             model,
@@ -529,14 +561,36 @@ def run_eval_single_dataset(
             column1_vals,
             column2_vals,
         )
-        if config.lower_vram_usage:
-            model = model.to("cpu")
 
+    all_train_acts, all_test_acts = activation_cache.get_train_test_activations(
+        activation_cache.ActivationCache(),
+        train_key,
+        test_key,
+        compute_activations,
+        save_activations,
+    )
+    if config.lower_vram_usage:
+        model = model.to("cpu")
+
+    probes_digest = activation_cache.get_artifact_digest(
+        train_key,
+        perform_scr=config.perform_scr,
+        probe_train_batch_size=config.probe_train_batch_size,
+        probe_test_batch_size=config.probe_test_batch_size,
+        probe_epochs=config.probe_epochs,
+        probe_lr=config.probe_lr,
+        probe_l1_penalty=config.probe_l1_penalty,
+        early_stopping_patience=config.early_stopping_patience,
+    )
+    probes_filename = f"{probes_name}_{probes_digest}_probes.pkl".replace("/", "_")
+    probes_path = os.path.join(artifacts_folder, probes_filename)
+
+    if not os.path.exists(probes_path):
         all_meaned_train_acts_BD = activation_collection.create_meaned_model_activations(
-            all_train_acts_BLD
+            all_train_acts
         )
         all_meaned_test_acts_BD = activation_collection.create_meaned_model_activations(
-            all_test_acts_BLD
+            all_test_acts
         )
 
         torch.set_grad_enabled(True)
@@ -564,28 +618,15 @@ def run_eval_single_dataset(
             config.perform_scr,
         )
 
-        acts = {
-            "train": all_train_acts_BLD,
-            "test": all_test_acts_BLD,
-        }
-
         llm_probes_dict = {
             "llm_probes": llm_probes,
             "llm_test_accuracies": llm_test_accuracies,
         }
 
         if save_activations:
-            torch.save(acts, activations_path)
             with open(probes_path, "wb") as f:
                 pickle.dump(llm_probes_dict, f)
     else:
-        if config.lower_vram_usage:
-            model = model.to("cpu")
-        print(f"Loading activations from {activations_path}")
-        acts = torch.load(activations_path)
-        all_train_acts_BLD = acts["train"]
-        all_test_acts_BLD = acts["test"]
-
         print(f"Loading probes from {probes_path}")
         with open(probes_path, "rb") as f:
             llm_probes_dict = pickle.load(f)
@@ -600,7 +641,7 @@ def run_eval_single_dataset(
         llm_probes,
         chosen_classes,
         config.perform_scr,
-        all_train_acts_BLD,
+        all_train_acts,
         config.sae_batch_size,
     )
 
@@ -608,7 +649,7 @@ def run_eval_single_dataset(
         llm_probes,
         sae,
         config.sae_batch_size,
-        all_test_acts_BLD,
+        all_test_acts,
         sae_node_effects,
         config.n_values,
         chosen_classes,
@@ -637,6 +678,23 @@ def run_eval_single_sae(
 
     os.makedirs(artifacts_folder, exist_ok=True)
 
+    if config.sae_batch_size is None:
+        # Plan on a copy, so the config saved with the results keeps None
+        config = replace(
+            config,
+            sae_batch_size=batch_size_planner.plan_sae_batch_size(
+                sae.cfg.d_in, sae.cfg.d_sae, config.context_length, sae.dtype, sae.device
+            ),
+        )
+
+    if config.probe_batch_sizes:
+        config = replace(
+            config,
+            sae_batch_size=batch_size_planner.probe_sae_batch_size(
+                sae, sae.cfg.d_in, config.context_length, config.sae_batch_size
+            ),
+        )
+
     dataset_results = {}
 
     averaging_names = []
@@ -707,6 +765,8 @@ def run_eval(
 
     If clean_up_activations is True, which means that the activations are deleted after the evaluation is done.
     You may want to use this because activations for all datasets can easily be 10s of GBs.
+    Activations are stored in the shared activation cache (see sae_bench_utils/activation_cache.py),
+    so other evals on the same model, hook and data reuse them.
     Return dict is a dict of SAE name: evaluation results for that SAE."""
     eval_instance_id = get_eval_uuid()
     sae_lens_version = get_sae_lens_version()
@@ -722,6 +782,7 @@ def run_eval(
     artifacts_base_folder = "artifacts"
 
     results_dict = {}
+    hook_names = set()
 
     llm_dtype = general_utils.str_to_dtype(config.llm_dtype)
 
@@ -729,24 +790,22 @@ def run_eval(
         config.model_name, device=device, dtype=llm_dtype
     )
 
-    for sae_release, sae_id in tqdm(
-        selected_saes, desc="Running SAE evaluation on all selected SAEs"
-    ):
-        del_sae = False
-        # Handle both pretrained SAEs (identified by string) and custom SAEs (passed as objects)
-        if isinstance(sae_id, str):
-            sae = SAE.from_pretrained(
-                release=sae_release,
-                sae_id=sae_id,
-                device=device,
-            )[0]
-            # If loading from pretrained, we delete the SAE object after use
-            del_sae = True
-        else:
-            sae = sae_id
-            sae_id = "custom_sae"
+    if config.probe_batch_sizes:
+        config = replace(
+            config,
+            llm_batch_size=batch_size_planner.probe_llm_batch_size(
+                model, config.context_length, config.llm_batch_size
+            ),
+        )
 
-        sae = sae.to(device=device, dtype=llm_dtype)
+    # The next SAE is loaded and results are written in the background, while an SAE is evaluated
+    result_writer = sae_pipeline.ResultWriter()
+    for sae_release, sae_id, sae, _ in tqdm(
+        sae_pipeline.iter_saes(selected_saes, device, llm_dtype),
+        total=len(selected_saes),
+        desc="Running SAE evaluation on all selected SAEs",
+    ):
+        hook_names.add(sae.cfg.hook_name)
 
         artifacts_folder = os.path.join(
             artifacts_base_folder, eval_type, config.model_name, sae.cfg.hook_name
@@ -835,17 +894,41 @@ def run_eval(
 
         results_dict[f"{sae_release}_{sae_id}"] = asdict(eval_output)
 
-        eval_output.to_json_file(sae_result_path, indent=2)
+        result_writer.submit(eval_output.to_json_file, sae_result_path, indent=2)
 
-        if del_sae:
-            del sae
+        del sae
         gc.collect()
         torch.cuda.empty_cache()
 
+    result_writer.close()
+
     if clean_up_activations:
         if os.path.exists(artifacts_folder):
             shutil.rmtree(artifacts_folder)
 
+        cache = activation_cache.ActivationCache()
+        for hook_name in hook_names:
+            for dataset_name in config.dataset_names:
+                if config.perform_scr:
+                    chosen_classes = list(dataset_info.PAIRED_CLASS_KEYS.keys())
+                    column1_vals_list = config.column1_vals_lookup[dataset_name]
+                else:
+                    chosen_classes = dataset_info.chosen_classes_per_dataset[dataset_name]
+                    column1_vals_list = [None]
+
+                for column1_vals in column1_vals_list:
+                    keys = get_activation_cache_keys(
+                        dataset_name,
+                        config,
+                        model,
+                        hook_name,
+                        chosen_classes,
+                        column1_vals,
+                        COLUMN2_VALS_LOOKUP[dataset_name],
+                    )
+                    for key in keys:
+                        cache.remove(key)
+
     return results_dict
 
 
@@ -857,22 +940,30 @@ def create_config_and_selected_saes(
         perform_scr=args.perform_scr,
     )
 
-    if args.llm_batch_size is not None:
-        config.llm_batch_size = args.llm_batch_size
-    else:
-        config.llm_batch_size = activation_collection.LLM_NAME_TO_BATCH_SIZE[config.model_name]
-
     if args.llm_dtype is not None:
         config.llm_dtype = args.llm_dtype
     else:
         config.llm_dtype = activation_collection.LLM_NAME_TO_DTYPE[config.model_name]
 
+    if args.llm_batch_size is not None:
+        config.llm_batch_size = args.llm_batch_size
+    else:
+        config.llm_batch_size = batch_size_planner.plan_llm_batch_size(
+            config.model_name, config.context_length, config.llm_dtype
+        )
+
     if args.random_seed is not None:
         config.random_seed = args.random_seed
 
     if args.lower_vram_usage:
         config.lower_vram_usage = True
 
+    if args.quantize_activations:
+        config.quantize_activations = True
+
+    if args.probe_batch_sizes:
+        config.probe_batch_sizes = True
+
     if args.sae_batch_size is not None:
         config.sae_batch_size = args.sae_batch_size
 
@@ -938,7 +1029,7 @@ def arg_parser():
         "--llm_batch_size",
         type=int,
         default=None,
-        help="Batch size for LLM. If None, will be populated using LLM_NAME_TO_BATCH_SIZE",
+        help="Batch size for LLM. If None, will be planned from the model dimensions and free memory",
     )
     parser.add_argument(
         "--llm_dtype",
@@ -951,13 +1042,23 @@ def arg_parser():
         "--sae_batch_size",
         type=int,
         default=None,
-        help="Batch size for SAE. If None, will be populated using default config value",
+        help="Batch size for SAE. If None, will be planned for each SAE from its width and free memory",
     )
     parser.add_argument(
         "--lower_vram_usage",
         action="store_true",
         help="Lower GPU memory usage by moving model to CPU when not required. Useful on 1M width SAEs. Will be slower and require more system memory.",
     )
+    parser.add_argument(
+        "--quantize_activations",
+        action="store_true",
+        help="Store the saved LLM activations as int8 with per-channel scales, making them 2-4x smaller.",
+    )
+    parser.add_argument(
+        "--probe_batch_sizes",
+        action="store_true",
+        help="Halve the LLM and SAE batch sizes until a short probing run with random inputs fits in memory.",
+    )
 
     return parser
 
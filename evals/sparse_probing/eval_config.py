@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic.dataclasses import dataclass
 from pydantic import Field
 from evals.base_eval_output import BaseEvalConfig
@@ -42,16 +44,21 @@ class SparseProbingEvalConfig(BaseEvalConfig):
         description="The maximum length of each input to the LLM. Any longer inputs will be truncated, keeping only the beginning.",
     )
 
-    sae_batch_size: int = Field(
-        default=125,
+    sae_batch_size: Optional[int] = Field(
+        default=None,
         title="SAE Batch Size",
-        description="SAE batch size, inference only",
+        description="SAE batch size, inference only. If None, it is planned for each SAE from its width and the free memory.",
     )
     llm_batch_size: int = Field(
         default=None,
         title="LLM Batch Size",
         description="LLM batch size. This is set by default in the main script, or it can be set with a command line argument.",
     )
+    probe_batch_sizes: bool = Field(
+        default=False,
+        title="Probe Batch Sizes",
+        description="Refine the LLM and SAE batch sizes with a short probing run before they are used: each is halved until a batch of random inputs fits in memory. This catches plans from the free memory that turn out too large, at the cost of one LLM forward pass per run and one SAE encoding per SAE.",
+    )
     llm_dtype: str = Field(
         default="",
         title="LLM Data Type",
@@ -75,3 +82,27 @@ class SparseProbingEvalConfig(BaseEvalConfig):
         title="Lower Memory Usage",
         description="Lower GPU memory usage by doing more computation on the CPU. Useful on 1M width SAEs. Will be slower and require more system memory.",
     )
+
+    quantize_activations: bool = Field(
+        default=False,
+        title="Quantize Activations",
+        description="Store the saved LLM activations as int8 with a per-channel scale and zero point, calibrated on the train activations. This makes the activation artifacts 2-4x smaller, depending on the LLM dtype. The activations stay int8 when loaded, also in the run that saves them, and each batch is dequantized just before it is encoded by the SAE.",
+    )
+
+    sparse_sae_activations: bool = Field(
+        default=False,
+        title="Sparse SAE Activations",
+        description="Keep the mean pooled SAE activations in CSR format and train the full-width SAE probe and compute the top-k mean differences on it directly, instead of on a dense [examples, d_sae] tensor. Memory and time scale with the number of nonzero activations, which makes the full-width probe feasible for 1M width SAEs, also on the CPU and with lower_vram_usage.",
+    )
+
+    probe_training_workers: int = Field(
+        default=0,
+        title="Probe Training Workers",
+        description="Number of worker processes for the CPU bound probe training. With more than 0 workers, the probes of a dataset are trained in a worker while the next dataset's activations are collected and encoded, with the activations passed through shared memory. The probe training of every dataset is then reseeded from random_seed, so the results are the same for any number of workers, but differ slightly from those with 0 workers, which keeps the random state of a single sequential run.",
+    )
+
+    use_sklearn_probes: bool = Field(
+        default=False,
+        title="Use Sklearn Probes",
+        description="Fit the top-k probes with one sklearn LogisticRegression per class and k instead of fitting all of them at once with batched Newton steps. Both minimize the same objective, so accuracies agree up to the solver tolerance.",
+    )
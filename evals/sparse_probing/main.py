@@ -1,9 +1,12 @@
 import gc
+import json
 import os
 import shutil
 import random
 import time
-from dataclasses import asdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from typing import Optional
 from pydantic import TypeAdapter
 import torch
 from sae_lens import SAE
@@ -21,10 +24,16 @@ from evals.sparse_probing.eval_output import (
     SparseProbingSaeMetrics,
 )
 import evals.sparse_probing.probe_training as probe_training
+import sae_bench_utils.activation_cache as activation_cache
 import sae_bench_utils.activation_collection as activation_collection
+import sae_bench_utils.activation_quantization as activation_quantization
+import sae_bench_utils.batch_size_planner as batch_size_planner
 import sae_bench_utils.dataset_info as dataset_info
 import sae_bench_utils.dataset_utils as dataset_utils
 import sae_bench_utils.general_utils as general_utils
+import sae_bench_utils.sae_pipeline as sae_pipeline
+from sae_bench_utils.ragged_activations import RaggedActivations, load_ragged_activations_dict
+from sae_bench_utils.sparse_activations import SparsePooledActivations
 from sae_bench_utils import (
     get_eval_uuid,
     get_sae_lens_version,
@@ -48,7 +57,7 @@ def get_dataset_activations(
     layer: int,
     hook_point: str,
     device: str,
-) -> tuple[dict[str, torch.Tensor], dict[str, torch.Tensor]]:
+) -> tuple[dict[str, RaggedActivations], dict[str, RaggedActivations]]:
     train_data, test_data = dataset_utils.get_multi_label_train_test_data(
         dataset_name,
         config.probe_train_set_size,
@@ -68,40 +77,197 @@ def get_dataset_activations(
         test_data, model.tokenizer, config.context_length, device
     )
 
-    all_train_acts_BLD = activation_collection.get_all_llm_activations(
+    all_train_acts = activation_collection.get_all_llm_activations_ragged(
         train_data, model, llm_batch_size, layer, hook_point, mask_bos_pad_eos_tokens=True
     )
-    all_test_acts_BLD = activation_collection.get_all_llm_activations(
+    all_test_acts = activation_collection.get_all_llm_activations_ragged(
         test_data, model, llm_batch_size, layer, hook_point, mask_bos_pad_eos_tokens=True
     )
 
-    return all_train_acts_BLD, all_test_acts_BLD
+    return all_train_acts, all_test_acts
 
 
-def run_eval_single_dataset(
+def get_activation_cache_keys(
     dataset_name: str,
     config: SparseProbingEvalConfig,
+    model: HookedTransformer,
+    hook_point: str,
+) -> tuple[activation_cache.ActivationCacheKey, activation_cache.ActivationCacheKey]:
+    """The cache keys of the train and test activations from get_dataset_activations()."""
+    tokenizer_revision = activation_cache.get_tokenizer_revision(model.tokenizer)
+    return tuple(
+        activation_cache.ActivationCacheKey(
+            model_name=config.model_name,
+            hook_name=hook_point,
+            dataset_name=dataset_name,
+            split=split,
+            random_seed=config.random_seed,
+            context_length=config.context_length,
+            tokenizer_revision=tokenizer_revision,
+            dtype=config.llm_dtype,
+            quantization="int8" if config.quantize_activations else None,
+            dataset_kwargs={
+                "sampling": "multi_label",
+                "train_set_size": config.probe_train_set_size,
+                "test_set_size": config.probe_test_set_size,
+                "classes": dataset_info.chosen_classes_per_dataset[dataset_name],
+            },
+        )
+        for split in ["train", "test"]
+    )
+
+
+def train_top_k_probes(
+    train_activations: dict[str, torch.Tensor],
+    test_activations: dict[str, torch.Tensor],
+    config: SparseProbingEvalConfig,
+) -> tuple[dict[int, dict[str, float]], dict[int, dict[str, int]]]:
+    """The test accuracy and solver iteration count of each class's top-k probe for each k in
+    config.k_values."""
+    if not config.use_sklearn_probes:
+        return probe_training.train_top_k_probes_on_activations(
+            train_activations, test_activations, config.k_values
+        )
+
+    test_accuracies = {}
+    num_iterations = {}
+    for k in config.k_values:
+        probes, test_accuracies[k] = probe_training.train_probe_on_activations(
+            train_activations,
+            test_activations,
+            select_top_k=k,
+        )
+        num_iterations[k] = {
+            class_name: int(probe.n_iter_[0]) for class_name, probe in probes.items()
+        }
+    return test_accuracies, num_iterations
+
+
+def train_timed_top_k_probes(
+    train_activations: dict[str, torch.Tensor | SparsePooledActivations],
+    test_activations: dict[str, torch.Tensor | SparsePooledActivations],
+    config: SparseProbingEvalConfig,
+) -> tuple[dict[int, dict[str, float]], dict[str, float | dict[int, dict[str, int]]]]:
+    """train_top_k_probes(), also returning the iteration counts and the training time, which
+    run_eval() saves in eval_result_unstructured."""
+    start = time.perf_counter()
+    test_accuracies, num_iterations = train_top_k_probes(
+        train_activations, test_activations, config
+    )
+    return test_accuracies, {
+        "num_iterations": num_iterations,
+        "training_time_s": time.perf_counter() - start,
+    }
+
+
+def get_quantization_accuracy_drift(
+    all_train_acts: dict[str, RaggedActivations],
+    all_test_acts: dict[str, RaggedActivations],
     sae: SAE,
+    config: SparseProbingEvalConfig,
+    sae_batch_size: int,
+) -> dict[str, float]:
+    """How much storing the LLM activations as int8 (config.quantize_activations) changes the
+    sparse probing metric. Trains the top-k SAE probes on the full precision activations and on
+    the same activations after an int8 round trip, with the same random state, and returns the
+    sae_top_{k}_test_accuracy of both along with their difference (quantized - full precision)."""
+    # Start from full precision, also if the activations were loaded from a quantized artifact
+    all_train_acts = {name: ragged.dequantize() for name, ragged in all_train_acts.items()}
+    all_test_acts = {name: ragged.dequantize() for name, ragged in all_test_acts.items()}
+    quantization_params = activation_quantization.calibrate(
+        [ragged.acts_TD for ragged in all_train_acts.values()]
+    )
+
+    def quantize_round_trip(all_acts: dict[str, RaggedActivations]) -> dict[str, RaggedActivations]:
+        return load_ragged_activations_dict(
+            {
+                class_name: ragged.to_dict(quantization_params)
+                for class_name, ragged in all_acts.items()
+            }
+        )
+
+    drift = {}
+    for suffix, train_acts, test_acts in [
+        ("", all_train_acts, all_test_acts),
+        ("_quantized", quantize_round_trip(all_train_acts), quantize_round_trip(all_test_acts)),
+    ]:
+        sae_train_acts_BF = activation_collection.get_sae_meaned_activations(
+            train_acts, sae, sae_batch_size
+        )
+        sae_test_acts_BF = activation_collection.get_sae_meaned_activations(
+            test_acts, sae, sae_batch_size
+        )
+        torch.manual_seed(config.random_seed)
+        sae_top_k_test_accuracies, _ = train_top_k_probes(
+            sae_train_acts_BF, sae_test_acts_BF, config
+        )
+        for k in config.k_values:
+            drift[f"sae_top_{k}_test_accuracy{suffix}"] = average_test_accuracy(
+                sae_top_k_test_accuracies[k]
+            )
+
+    for k in config.k_values:
+        drift[f"sae_top_{k}_test_accuracy_drift"] = (
+            drift[f"sae_top_{k}_test_accuracy_quantized"] - drift[f"sae_top_{k}_test_accuracy"]
+        )
+    return drift
+
+
+@dataclass
+class DatasetProbeInputs:
+    """The mean pooled activations of a dataset, which is everything the CPU bound probe training
+    of train_dataset_probes() needs. llm_train_acts_BD and llm_test_acts_BD are None if the LLM
+    probe results were loaded from llm_results_path instead."""
+
+    dataset_name: str
+    dataset_seed: int
+    llm_train_acts_BD: Optional[dict[str, torch.Tensor]]
+    llm_test_acts_BD: Optional[dict[str, torch.Tensor]]
+    llm_results: Optional[dict[str, float]]
+    llm_results_path: str
+    sae_train_acts_BF: dict[str, torch.Tensor | SparsePooledActivations]
+    sae_test_acts_BF: dict[str, torch.Tensor | SparsePooledActivations]
+    sae_test_accuracy: float
+
+    def to(self, device: str) -> "DatasetProbeInputs":
+        def to_device(all_acts: Optional[dict]) -> Optional[dict]:
+            if all_acts is None:
+                return None
+            return {class_name: acts.to(device) for class_name, acts in all_acts.items()}
+
+        return replace(
+            self,
+            llm_train_acts_BD=to_device(self.llm_train_acts_BD),
+            llm_test_acts_BD=to_device(self.llm_test_acts_BD),
+            sae_train_acts_BF=to_device(self.sae_train_acts_BF),
+            sae_test_acts_BF=to_device(self.sae_test_acts_BF),
+        )
+
+
+def get_dataset_seed(config: SparseProbingEvalConfig, dataset_name: str) -> int:
+    """With probe training workers, each dataset reseeds its probe training, so its results don't
+    depend on the datasets evaluated before it, or on which process trains its probes."""
+    return config.random_seed + config.dataset_names.index(dataset_name)
+
+
+def get_dataset_llm_activations(
+    dataset_name: str,
+    config: SparseProbingEvalConfig,
     model: HookedTransformer,
     layer: int,
     hook_point: str,
     device: str,
     artifacts_folder: str,
     save_activations: bool,
-) -> dict[str, float]:
-    """config: eval_config.EvalConfig contains all hyperparameters to reproduce the evaluation.
-    It is saved in the results_dict for reproducibility."""
-
-    results_dict = {}
-
-    activations_filename = f"{dataset_name}_activations.pt".replace("/", "_")
+) -> tuple[dict[str, RaggedActivations], dict[str, RaggedActivations], str]:
+    """The train and test LLM activations of a dataset, from the activation cache if they were
+    saved before, and the path of its LLM probe results."""
+    train_key, test_key = get_activation_cache_keys(dataset_name, config, model, hook_point)
 
-    activations_path = os.path.join(artifacts_folder, activations_filename)
-
-    if not os.path.exists(activations_path):
+    def compute_activations():
         if config.lower_vram_usage:
-            model = model.to(device)
-        all_train_acts_BLD, all_test_acts_BLD = get_dataset_activations(
+            model.to(device)
+        return get_dataset_activations(
             dataset_name,
             config,
             model,
@@ -110,100 +276,303 @@ def run_eval_single_dataset(
             hook_point,
             device,
         )
-        if config.lower_vram_usage:
-            model = model.to("cpu")
 
-        all_train_acts_BD = activation_collection.create_meaned_model_activations(
-            all_train_acts_BLD
-        )
+    all_train_acts, all_test_acts = activation_cache.get_train_test_activations(
+        activation_cache.ActivationCache(),
+        train_key,
+        test_key,
+        compute_activations,
+        save_activations,
+    )
+    if config.lower_vram_usage:
+        model = model.to("cpu")
 
-        all_test_acts_BD = activation_collection.create_meaned_model_activations(all_test_acts_BLD)
+    llm_results_digest = activation_cache.get_artifact_digest(train_key, k_values=config.k_values)
+    llm_results_filename = f"{dataset_name}_{llm_results_digest}_llm_results.json".replace("/", "_")
+    llm_results_path = os.path.join(artifacts_folder, llm_results_filename)
 
-        llm_probes, llm_test_accuracies = probe_training.train_probe_on_activations(
-            all_train_acts_BD,
-            all_test_acts_BD,
-            select_top_k=None,
-        )
+    return all_train_acts, all_test_acts, llm_results_path
 
-        llm_results = {"llm_test_accuracy": average_test_accuracy(llm_test_accuracies)}
 
-        llm_test_accuracy = average_test_accuracy(llm_test_accuracies)
+def load_llm_results(llm_results_path: str) -> Optional[dict[str, float]]:
+    if not os.path.exists(llm_results_path):
+        return None
+    print(f"Loading LLM probe results from {llm_results_path}")
+    with open(llm_results_path) as f:
+        return json.load(f)
 
-        for k in config.k_values:
-            llm_top_k_probes, llm_top_k_test_accuracies = probe_training.train_probe_on_activations(
-                all_train_acts_BD,
-                all_test_acts_BD,
-                select_top_k=k,
-            )
-            llm_results[f"llm_top_{k}_test_accuracy"] = average_test_accuracy(
-                llm_top_k_test_accuracies
-            )
 
-        acts = {
-            "train": all_train_acts_BLD,
-            "test": all_test_acts_BLD,
-            "llm_results": llm_results,
-        }
+def train_llm_probes(
+    llm_train_acts_BD: dict[str, torch.Tensor],
+    llm_test_acts_BD: dict[str, torch.Tensor],
+    config: SparseProbingEvalConfig,
+    llm_results_path: str,
+    save_activations: bool,
+) -> tuple[dict[str, float], dict]:
+    """The LLM probe results, which are saved to llm_results_path if save_activations, and the
+    probe training stats of the top-k LLM probes."""
+    llm_probes, llm_test_accuracies = probe_training.train_probe_on_activations(
+        llm_train_acts_BD,
+        llm_test_acts_BD,
+        select_top_k=None,
+    )
 
-        if save_activations:
-            torch.save(acts, activations_path)
-    else:
-        if config.lower_vram_usage:
-            model = model.to("cpu")
-        print(f"Loading activations from {activations_path}")
-        acts = torch.load(activations_path)
-        all_train_acts_BLD = acts["train"]
-        all_test_acts_BLD = acts["test"]
-        llm_results = acts["llm_results"]
+    llm_results = {"llm_test_accuracy": average_test_accuracy(llm_test_accuracies)}
+
+    llm_top_k_test_accuracies, llm_top_k_stats = train_timed_top_k_probes(
+        llm_train_acts_BD, llm_test_acts_BD, config
+    )
+    for k in config.k_values:
+        llm_results[f"llm_top_{k}_test_accuracy"] = average_test_accuracy(
+            llm_top_k_test_accuracies[k]
+        )
+
+    if save_activations:
+        with open(llm_results_path, "w") as f:
+            json.dump(llm_results, f)
 
+    return llm_results, llm_top_k_stats
+
+
+def get_sae_probe_activations(
+    all_train_acts: dict[str, RaggedActivations],
+    all_test_acts: dict[str, RaggedActivations],
+    sae: SAE,
+    config: SparseProbingEvalConfig,
+) -> tuple[
+    dict[str, torch.Tensor | SparsePooledActivations],
+    dict[str, torch.Tensor | SparsePooledActivations],
+]:
+    """The mean pooled SAE activations of the train and test LLM activations. The LLM activations
+    are deleted from all_train_acts and all_test_acts once they are encoded."""
     all_sae_train_acts_BF = activation_collection.get_sae_meaned_activations(
-        all_train_acts_BLD, sae, config.sae_batch_size
+        all_train_acts, sae, config.sae_batch_size, config.sparse_sae_activations
     )
     all_sae_test_acts_BF = activation_collection.get_sae_meaned_activations(
-        all_test_acts_BLD, sae, config.sae_batch_size
-    )
-
-    for key in list(all_train_acts_BLD.keys()):
-        del all_train_acts_BLD[key]
-        del all_test_acts_BLD[key]
-
-    if not config.lower_vram_usage:
-        # This is optional, checking the accuracy of a probe trained on the entire SAE activations
-        # We use GPU here as sklearn.fit is slow on large input dimensions, all other probe training is done with sklearn.fit
-        _, sae_test_accuracies = probe_training.train_probe_on_activations(
-            all_sae_train_acts_BF,
-            all_sae_test_acts_BF,
-            select_top_k=None,
-            use_sklearn=False,
-            batch_size=250,
-            epochs=100,
-            lr=1e-2,
-        )
-        results_dict["sae_test_accuracy"] = average_test_accuracy(sae_test_accuracies)
-    else:
-        results_dict["sae_test_accuracy"] = -1
+        all_test_acts, sae, config.sae_batch_size, config.sparse_sae_activations
+    )
 
+    for key in list(all_train_acts.keys()):
+        del all_train_acts[key]
+        del all_test_acts[key]
+
+    if config.lower_vram_usage:
         for key in all_sae_train_acts_BF.keys():
-            all_sae_train_acts_BF[key] = all_sae_train_acts_BF[key].cpu()
-            all_sae_test_acts_BF[key] = all_sae_test_acts_BF[key].cpu()
+            all_sae_train_acts_BF[key] = all_sae_train_acts_BF[key].to("cpu")
+            all_sae_test_acts_BF[key] = all_sae_test_acts_BF[key].to("cpu")
 
         torch.cuda.empty_cache()
         gc.collect()
 
+    return all_sae_train_acts_BF, all_sae_test_acts_BF
+
+
+def train_full_width_sae_probe(
+    all_sae_train_acts_BF: dict[str, torch.Tensor | SparsePooledActivations],
+    all_sae_test_acts_BF: dict[str, torch.Tensor | SparsePooledActivations],
+    config: SparseProbingEvalConfig,
+) -> float:
+    """The average test accuracy of the probes trained on all SAE latents, or -1 if they are skipped
+    to save GPU memory."""
+    # Sparse SAE activations are small enough to also train this probe on the CPU
+    if config.lower_vram_usage and not config.sparse_sae_activations:
+        return -1
+
+    # This is optional, checking the accuracy of a probe trained on the entire SAE activations
+    # We use GPU here as sklearn.fit is slow on large input dimensions, all other probe training is done with sklearn.fit
+    _, sae_test_accuracies = probe_training.train_probe_on_activations(
+        all_sae_train_acts_BF,
+        all_sae_test_acts_BF,
+        select_top_k=None,
+        use_sklearn=False,
+        batch_size=250,
+        epochs=100,
+        lr=1e-2,
+    )
+    return average_test_accuracy(sae_test_accuracies)
+
+
+def add_sae_top_k_results(
+    results_dict: dict[str, float],
+    all_sae_train_acts_BF: dict[str, torch.Tensor | SparsePooledActivations],
+    all_sae_test_acts_BF: dict[str, torch.Tensor | SparsePooledActivations],
+    config: SparseProbingEvalConfig,
+) -> dict:
+    """Trains the top-k SAE probes, adding their accuracies to results_dict, and returns their
+    probe training stats."""
+    sae_top_k_test_accuracies, sae_top_k_stats = train_timed_top_k_probes(
+        all_sae_train_acts_BF, all_sae_test_acts_BF, config
+    )
+    for k in config.k_values:
+        results_dict[f"sae_top_{k}_test_accuracy"] = average_test_accuracy(
+            sae_top_k_test_accuracies[k]
+        )
+    return sae_top_k_stats
+
+
+def get_dataset_probe_inputs(
+    dataset_name: str,
+    config: SparseProbingEvalConfig,
+    sae: SAE,
+    model: HookedTransformer,
+    layer: int,
+    hook_point: str,
+    device: str,
+    artifacts_folder: str,
+    save_activations: bool,
+) -> DatasetProbeInputs:
+    """The LLM and SAE part of the probe training worker pipeline: collects the LLM activations,
+    encodes them with the SAE and trains the probe on all SAE latents, which uses the GPU."""
+    dataset_seed = get_dataset_seed(config, dataset_name)
+
+    all_train_acts, all_test_acts, llm_results_path = get_dataset_llm_activations(
+        dataset_name,
+        config,
+        model,
+        layer,
+        hook_point,
+        device,
+        artifacts_folder,
+        save_activations,
+    )
+
+    llm_train_acts_BD, llm_test_acts_BD = None, None
+    llm_results = load_llm_results(llm_results_path)
+    if llm_results is None:
+        llm_train_acts_BD = activation_collection.create_meaned_model_activations(all_train_acts)
+        llm_test_acts_BD = activation_collection.create_meaned_model_activations(all_test_acts)
+
+    all_sae_train_acts_BF, all_sae_test_acts_BF = get_sae_probe_activations(
+        all_train_acts, all_test_acts, sae, config
+    )
+
+    torch.manual_seed(dataset_seed)
+    sae_test_accuracy = train_full_width_sae_probe(
+        all_sae_train_acts_BF, all_sae_test_acts_BF, config
+    )
+
+    return DatasetProbeInputs(
+        dataset_name=dataset_name,
+        dataset_seed=dataset_seed,
+        llm_train_acts_BD=llm_train_acts_BD,
+        llm_test_acts_BD=llm_test_acts_BD,
+        llm_results=llm_results,
+        llm_results_path=llm_results_path,
+        sae_train_acts_BF=all_sae_train_acts_BF,
+        sae_test_acts_BF=all_sae_test_acts_BF,
+        sae_test_accuracy=sae_test_accuracy,
+    )
+
+
+def train_dataset_probes(
+    probe_inputs: DatasetProbeInputs,
+    config: SparseProbingEvalConfig,
+    save_activations: bool,
+) -> tuple[dict[str, float], dict[str, dict]]:
+    """The CPU bound part of the probe training worker pipeline: trains the LLM probes, unless
+    their results were loaded, and the top-k SAE probes. This runs in a probe training worker
+    process if config.probe_training_workers > 0.
+
+    Returns the results and the iteration counts and training time of the top-k probes, keyed
+    by "llm_top_k_probes" (if they were trained) and "sae_top_k_probes"."""
+    torch.manual_seed(probe_inputs.dataset_seed)
+
+    results_dict = {"sae_test_accuracy": probe_inputs.sae_test_accuracy}
+    probe_training_stats = {}
+
+    llm_results = probe_inputs.llm_results
+    if llm_results is None:
+        llm_results, probe_training_stats["llm_top_k_probes"] = train_llm_probes(
+            probe_inputs.llm_train_acts_BD,
+            probe_inputs.llm_test_acts_BD,
+            config,
+            probe_inputs.llm_results_path,
+            save_activations,
+        )
+
     for llm_result_key, llm_result_value in llm_results.items():
         results_dict[llm_result_key] = llm_result_value
 
-    for k in config.k_values:
-        sae_top_k_probes, sae_top_k_test_accuracies = probe_training.train_probe_on_activations(
-            all_sae_train_acts_BF,
-            all_sae_test_acts_BF,
-            select_top_k=k,
+    probe_training_stats["sae_top_k_probes"] = add_sae_top_k_results(
+        results_dict, probe_inputs.sae_train_acts_BF, probe_inputs.sae_test_acts_BF, config
+    )
+
+    return results_dict, probe_training_stats
+
+
+def run_eval_single_dataset(
+    dataset_name: str,
+    config: SparseProbingEvalConfig,
+    sae: SAE,
+    model: HookedTransformer,
+    layer: int,
+    hook_point: str,
+    device: str,
+    artifacts_folder: str,
+    save_activations: bool,
+) -> tuple[dict[str, float], dict[str, dict]]:
+    """config: eval_config.EvalConfig contains all hyperparameters to reproduce the evaluation.
+    It is saved in the results_dict for reproducibility.
+    Returns the results and the probe training stats, like train_dataset_probes().
+
+    Unlike the probe training worker pipeline, this trains the probes in the main process without
+    reseeding, continuing from the random state of run_eval_single_sae()."""
+    all_train_acts, all_test_acts, llm_results_path = get_dataset_llm_activations(
+        dataset_name,
+        config,
+        model,
+        layer,
+        hook_point,
+        device,
+        artifacts_folder,
+        save_activations,
+    )
+
+    probe_training_stats = {}
+    llm_results = load_llm_results(llm_results_path)
+    if llm_results is None:
+        llm_results, probe_training_stats["llm_top_k_probes"] = train_llm_probes(
+            activation_collection.create_meaned_model_activations(all_train_acts),
+            activation_collection.create_meaned_model_activations(all_test_acts),
+            config,
+            llm_results_path,
+            save_activations,
         )
-        results_dict[f"sae_top_{k}_test_accuracy"] = average_test_accuracy(
-            sae_top_k_test_accuracies
+
+    all_sae_train_acts_BF, all_sae_test_acts_BF = get_sae_probe_activations(
+        all_train_acts, all_test_acts, sae, config
+    )
+
+    results_dict = {
+        "sae_test_accuracy": train_full_width_sae_probe(
+            all_sae_train_acts_BF, all_sae_test_acts_BF, config
         )
+    }
 
-    return results_dict
+    for llm_result_key, llm_result_value in llm_results.items():
+        results_dict[llm_result_key] = llm_result_value
+
+    probe_training_stats["sae_top_k_probes"] = add_sae_top_k_results(
+        results_dict, all_sae_train_acts_BF, all_sae_test_acts_BF, config
+    )
+
+    return results_dict, probe_training_stats
+
+
+def init_probe_training_worker(num_threads: int):
+    torch.set_num_threads(num_threads)
+
+
+def create_probe_training_executor(num_workers: int) -> ProcessPoolExecutor:
+    """A process pool for train_dataset_probes(). CPU tensors passed to the workers are moved to
+    shared memory by torch.multiprocessing instead of being copied through a pipe. The CPU cores
+    are split between the workers, so they don't oversubscribe them."""
+    return ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=torch.multiprocessing.get_context("spawn"),
+        initializer=init_probe_training_worker,
+        initargs=(max(1, (os.cpu_count() or 1) // num_workers),),
+    )
 
 
 def run_eval_single_sae(
@@ -213,32 +582,110 @@ def run_eval_single_sae(
     device: str,
     artifacts_folder: str,
     save_activations: bool = True,
-) -> dict[str, float | dict[str, float]]:
+    probe_training_executor: Optional[Executor] = None,
+) -> tuple[dict[str, float | dict[str, float]], dict[str, dict[str, dict]]]:
     """hook_point: str is transformer lens format. example: f'blocks.{layer}.hook_resid_post'
     By default, we save activations for all datasets, and then reuse them for each sae.
     This is important to avoid recomputing activations for each SAE, and to ensure that the same activations are used for all SAEs.
-    However, it can use 10s of GBs of disk space."""
+    However, it can use 10s of GBs of disk space.
+
+    With config.probe_training_workers > 0, the CPU bound probe training of each dataset runs in a
+    worker process while the next dataset's activations are collected and encoded. Pass
+    probe_training_executor to reuse a create_probe_training_executor() pool across SAEs.
+    In that case every dataset reseeds its probe training, so the results don't depend on the
+    number of workers, but they differ from the default of training in the main process without
+    reseeding.
+
+    Returns the results and the probe training stats of train_dataset_probes() per dataset."""
 
     random.seed(config.random_seed)
     torch.manual_seed(config.random_seed)
     os.makedirs(artifacts_folder, exist_ok=True)
 
-    results_dict = {}
+    if config.sae_batch_size is None:
+        # Plan on a copy, so the config saved with the results keeps None
+        config = replace(
+            config,
+            sae_batch_size=batch_size_planner.plan_sae_batch_size(
+                sae.cfg.d_in, sae.cfg.d_sae, config.context_length, sae.dtype, sae.device
+            ),
+        )
 
-    dataset_results = {}
-    for dataset_name in config.dataset_names:
-        dataset_results[f"{dataset_name}_results"] = run_eval_single_dataset(
-            dataset_name,
+    if config.probe_batch_sizes:
+        config = replace(
             config,
-            sae,
-            model,
-            sae.cfg.hook_layer,
-            sae.cfg.hook_name,
-            device,
-            artifacts_folder,
-            save_activations,
+            sae_batch_size=batch_size_planner.probe_sae_batch_size(
+                sae, sae.cfg.d_in, config.context_length, config.sae_batch_size
+            ),
         )
 
+    results_dict = {}
+
+    dataset_results = {}
+    probe_training_stats = {}
+    if config.probe_training_workers == 0:
+        for dataset_name in config.dataset_names:
+            (
+                dataset_results[f"{dataset_name}_results"],
+                probe_training_stats[dataset_name],
+            ) = run_eval_single_dataset(
+                dataset_name,
+                config,
+                sae,
+                model,
+                sae.cfg.hook_layer,
+                sae.cfg.hook_name,
+                device,
+                artifacts_folder,
+                save_activations,
+            )
+    else:
+        owns_executor = probe_training_executor is None
+        if owns_executor:
+            probe_training_executor = create_probe_training_executor(
+                config.probe_training_workers
+            )
+        try:
+            # Submitted datasets hold their pooled activations in shared memory until their
+            # probes are trained, so at most probe_training_workers datasets are in flight
+            dataset_futures = []
+
+            def collect_oldest_dataset():
+                dataset_name, dataset_future = dataset_futures.pop(0)
+                (
+                    dataset_results[f"{dataset_name}_results"],
+                    probe_training_stats[dataset_name],
+                ) = dataset_future.result()
+
+            for dataset_name in config.dataset_names:
+                probe_inputs = get_dataset_probe_inputs(
+                    dataset_name,
+                    config,
+                    sae,
+                    model,
+                    sae.cfg.hook_layer,
+                    sae.cfg.hook_name,
+                    device,
+                    artifacts_folder,
+                    save_activations,
+                )
+                while len(dataset_futures) >= config.probe_training_workers:
+                    collect_oldest_dataset()
+                dataset_futures.append(
+                    (
+                        dataset_name,
+                        probe_training_executor.submit(
+                            train_dataset_probes, probe_inputs.to("cpu"), config, save_activations
+                        ),
+                    )
+                )
+                del probe_inputs
+            while dataset_futures:
+                collect_oldest_dataset()
+        finally:
+            if owns_executor:
+                probe_training_executor.shutdown(wait=True, cancel_futures=True)
+
     results_dict = general_utils.average_results_dictionaries(dataset_results, config.dataset_names)
 
     for dataset_name, dataset_result in dataset_results.items():
@@ -247,7 +694,7 @@ def run_eval_single_sae(
     if config.lower_vram_usage:
         model = model.to(device)
 
-    return results_dict
+    return results_dict, probe_training_stats
 
 
 def run_eval(
@@ -264,6 +711,8 @@ def run_eval(
 
     If clean_up_activations is True, which means that the activations are deleted after the evaluation is done.
     You may want to use this because activations for all datasets can easily be 10s of GBs.
+    Activations are stored in the shared activation cache (see sae_bench_utils/activation_cache.py),
+    so other evals on the same model, hook and data reuse them.
     Return dict is a dict of SAE name: evaluation results for that SAE."""
     eval_instance_id = get_eval_uuid()
     sae_lens_version = get_sae_lens_version()
@@ -273,6 +722,7 @@ def run_eval(
     os.makedirs(output_path, exist_ok=True)
 
     results_dict = {}
+    hook_names = set()
 
     llm_dtype = general_utils.str_to_dtype(config.llm_dtype)
 
@@ -280,24 +730,26 @@ def run_eval(
         config.model_name, device=device, dtype=llm_dtype
     )
 
-    for sae_release, sae_id in tqdm(
-        selected_saes, desc="Running SAE evaluation on all selected SAEs"
-    ):
-        del_sae = False
-        # Handle both pretrained SAEs (identified by string) and custom SAEs (passed as objects)
-        if isinstance(sae_id, str):
-            sae = SAE.from_pretrained(
-                release=sae_release,
-                sae_id=sae_id,
-                device=device,
-            )[0]
-            # If loading from pretrained, we delete the SAE object after use
-            del_sae = True
-        else:
-            sae = sae_id
-            sae_id = "custom_sae"
+    if config.probe_batch_sizes:
+        config = replace(
+            config,
+            llm_batch_size=batch_size_planner.probe_llm_batch_size(
+                model, config.context_length, config.llm_batch_size
+            ),
+        )
 
-        sae = sae.to(device=device, dtype=llm_dtype)
+    probe_training_executor = None
+    if config.probe_training_workers > 0:
+        probe_training_executor = create_probe_training_executor(config.probe_training_workers)
+
+    # The next SAE is loaded and results are written in the background, while an SAE is evaluated
+    result_writer = sae_pipeline.ResultWriter()
+    for sae_release, sae_id, sae, _ in tqdm(
+        sae_pipeline.iter_saes(selected_saes, device, llm_dtype),
+        total=len(selected_saes),
+        desc="Running SAE evaluation on all selected SAEs",
+    ):
+        hook_names.add(sae.cfg.hook_name)
 
         artifacts_folder = os.path.join(
             artifacts_base_folder,
@@ -315,13 +767,14 @@ def run_eval(
             with open(sae_result_path, "r") as f:
                 eval_output = TypeAdapter(SparseProbingEvalOutput).validate_json(f.read())
         else:
-            sparse_probing_results = run_eval_single_sae(
+            sparse_probing_results, probe_training_stats = run_eval_single_sae(
                 config,
                 sae,
                 model,
                 device,
                 artifacts_folder,
                 save_activations=save_activations,
+                probe_training_executor=probe_training_executor,
             )
             eval_output = SparseProbingEvalOutput(
                 eval_config=config,
@@ -351,6 +804,7 @@ def run_eval(
                     for dataset_name, result in sparse_probing_results.items()
                     if isinstance(result, dict)
                 ],
+                eval_result_unstructured={"probe_training": probe_training_stats},
                 sae_bench_commit_hash=sae_bench_commit_hash,
                 sae_lens_id=sae_id,
                 sae_lens_release_id=sae_release,
@@ -359,17 +813,26 @@ def run_eval(
 
         results_dict[f"{sae_release}_{sae_id}"] = asdict(eval_output)
 
-        eval_output.to_json_file(sae_result_path, indent=2)
+        result_writer.submit(eval_output.to_json_file, sae_result_path, indent=2)
 
-        if del_sae:
-            del sae
+        del sae
         gc.collect()
         torch.cuda.empty_cache()
 
+    result_writer.close()
+    if probe_training_executor is not None:
+        probe_training_executor.shutdown(wait=True)
+
     if clean_up_activations:
         if os.path.exists(artifacts_folder):
             shutil.rmtree(artifacts_folder)
 
+        cache = activation_cache.ActivationCache()
+        for hook_name in hook_names:
+            for dataset_name in config.dataset_names:
+                for key in get_activation_cache_keys(dataset_name, config, model, hook_name):
+                    cache.remove(key)
+
     return results_dict
 
 
@@ -380,16 +843,18 @@ def create_config_and_selected_saes(
         model_name=args.model_name,
     )
 
-    if args.llm_batch_size is not None:
-        config.llm_batch_size = args.llm_batch_size
-    else:
-        config.llm_batch_size = activation_collection.LLM_NAME_TO_BATCH_SIZE[config.model_name]
-
     if args.llm_dtype is not None:
         config.llm_dtype = args.llm_dtype
     else:
         config.llm_dtype = activation_collection.LLM_NAME_TO_DTYPE[config.model_name]
 
+    if args.llm_batch_size is not None:
+        config.llm_batch_size = args.llm_batch_size
+    else:
+        config.llm_batch_size = batch_size_planner.plan_llm_batch_size(
+            config.model_name, config.context_length, config.llm_dtype
+        )
+
     if args.sae_batch_size is not None:
         config.sae_batch_size = args.sae_batch_size
 
@@ -399,6 +864,21 @@ def create_config_and_selected_saes(
     if args.lower_vram_usage:
         config.lower_vram_usage = True
 
+    if args.quantize_activations:
+        config.quantize_activations = True
+
+    if args.probe_batch_sizes:
+        config.probe_batch_sizes = True
+
+    if args.use_sklearn_probes:
+        config.use_sklearn_probes = True
+
+    if args.sparse_sae_activations:
+        config.sparse_sae_activations = True
+
+    if args.probe_training_workers is not None:
+        config.probe_training_workers = args.probe_training_workers
+
     selected_saes = get_saes_from_regex(args.sae_regex_pattern, args.sae_block_pattern)
     assert len(selected_saes) > 0, "No SAEs selected"
 
@@ -449,7 +929,7 @@ def arg_parser():
         "--llm_batch_size",
         type=int,
         default=None,
-        help="Batch size for LLM. If None, will be populated using LLM_NAME_TO_BATCH_SIZE",
+        help="Batch size for LLM. If None, will be planned from the model dimensions and free memory",
     )
     parser.add_argument(
         "--llm_dtype",
@@ -462,13 +942,39 @@ def arg_parser():
         "--sae_batch_size",
         type=int,
         default=None,
-        help="Batch size for SAE. If None, will be populated using default config value",
+        help="Batch size for SAE. If None, will be planned for each SAE from its width and free memory",
     )
     parser.add_argument(
         "--lower_vram_usage",
         action="store_true",
         help="Lower GPU memory usage by doing more computation on the CPU. Useful on 1M width SAEs. Will be slower and require more system memory.",
     )
+    parser.add_argument(
+        "--quantize_activations",
+        action="store_true",
+        help="Store the saved LLM activations as int8 with per-channel scales, making them 2-4x smaller.",
+    )
+    parser.add_argument(
+        "--probe_batch_sizes",
+        action="store_true",
+        help="Halve the LLM and SAE batch sizes until a short probing run with random inputs fits in memory.",
+    )
+    parser.add_argument(
+        "--use_sklearn_probes",
+        action="store_true",
+        help="Fit each top-k probe with sklearn instead of fitting all of them at once with the batched solver.",
+    )
+    parser.add_argument(
+        "--sparse_sae_activations",
+        action="store_true",
+        help="Keep the mean pooled SAE activations in CSR format instead of as a dense [examples, d_sae] tensor. Recommended for very wide SAEs.",
+    )
+    parser.add_argument(
+        "--probe_training_workers",
+        type=int,
+        default=None,
+        help="Number of worker processes that train the probes of a dataset while the next dataset's activations are collected. 0 trains them in the main process.",
+    )
 
     return parser
 
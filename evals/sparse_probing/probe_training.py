@@ -10,6 +10,8 @@ from sklearn.metrics import accuracy_score
 import math
 
 import sae_bench_utils.dataset_info as dataset_info
+from sae_bench_utils.ragged_activations import RaggedActivations
+from sae_bench_utils.sparse_activations import SparsePooledActivations
 
 
 class Probe(nn.Module):
@@ -18,21 +20,51 @@ class Probe(nn.Module):
         self.net = nn.Linear(activation_dim, 1, bias=True, dtype=dtype)
 
     def forward(self, x):
+        if isinstance(x, SparsePooledActivations):
+            return (x.matmul(self.net.weight.T) + self.net.bias).squeeze(-1)
         return self.net(x).squeeze(-1)
 
 
+def _cat_activations(
+    acts_list: list[torch.Tensor] | list[RaggedActivations] | list[SparsePooledActivations],
+) -> torch.Tensor | RaggedActivations | SparsePooledActivations:
+    if isinstance(acts_list[0], RaggedActivations):
+        return RaggedActivations.cat(acts_list)
+    if isinstance(acts_list[0], SparsePooledActivations):
+        return SparsePooledActivations.cat(acts_list)
+    return torch.cat(acts_list)
+
+
+def _mean_over_examples(
+    acts_BD: Float[torch.Tensor, "batch_size d_model"] | SparsePooledActivations,
+) -> Float[torch.Tensor, "d_model"]:
+    if isinstance(acts_BD, SparsePooledActivations):
+        return acts_BD.mean()
+    return acts_BD.mean(dim=0)
+
+
 @jaxtyped(typechecker=beartype)
 def prepare_probe_data(
-    all_activations: dict[str, Float[torch.Tensor, "num_datapoints_per_class ... d_model"]],
+    all_activations: dict[
+        str,
+        Float[torch.Tensor, "num_datapoints_per_class ... d_model"]
+        | RaggedActivations
+        | SparsePooledActivations,
+    ],
     class_name: str,
     perform_scr: bool = False,
 ) -> tuple[
-    Float[torch.Tensor, "num_datapoints_per_class_x_2 ... d_model"],
+    Float[torch.Tensor, "num_datapoints_per_class_x_2 ... d_model"]
+    | RaggedActivations
+    | SparsePooledActivations,
     Int[torch.Tensor, "num_datapoints_per_class_x_2"],
 ]:
     """perform_scr is for the SCR metric. In this case, all_activations has 3 pairs of keys, or 6 total.
     It's a bit unfortunate to introduce coupling between the metrics, but most of the code is reused between them.
     The ... means we can have an optional seq_len dimension between num_datapoints_per_class and d_model.
+    Activations can also be RaggedActivations or SparsePooledActivations. The random sampling only
+    depends on the number of datapoints per class, so ragged, sparse and dense activations of the
+    same data are sampled identically.
     """
     positive_acts_BD = all_activations[class_name]
     device = positive_acts_BD.device
@@ -60,16 +92,18 @@ def prepare_probe_data(
             ]
             selected_negative_acts_BD.append(all_activations[negative_class_name][sample_indices])
 
-        selected_negative_acts_BD = torch.cat(selected_negative_acts_BD)
+        selected_negative_acts_BD = _cat_activations(selected_negative_acts_BD)
 
     # Randomly select num_positive samples from negative class
     indices = torch.randperm(len(selected_negative_acts_BD))[:num_positive]
     selected_negative_acts_BD = selected_negative_acts_BD[indices]
 
-    assert selected_negative_acts_BD.shape == positive_acts_BD.shape
+    assert len(selected_negative_acts_BD) == num_positive
+    if isinstance(positive_acts_BD, torch.Tensor):
+        assert selected_negative_acts_BD.shape == positive_acts_BD.shape
 
     # Combine positive and negative samples
-    combined_acts = torch.cat([positive_acts_BD, selected_negative_acts_BD])
+    combined_acts = _cat_activations([positive_acts_BD, selected_negative_acts_BD])
 
     combined_labels = torch.empty(len(combined_acts), dtype=torch.int, device=device)
     combined_labels[:num_positive] = dataset_info.POSITIVE_CLASS_LABEL
@@ -85,15 +119,15 @@ def prepare_probe_data(
 
 @jaxtyped(typechecker=beartype)
 def get_top_k_mean_diff_mask(
-    acts_BD: Float[torch.Tensor, "batch_size d_model"],
+    acts_BD: Float[torch.Tensor, "batch_size d_model"] | SparsePooledActivations,
     labels_B: Int[torch.Tensor, "batch_size"],
     k: int,
 ) -> Bool[torch.Tensor, "k"]:
     positive_mask_B = labels_B == dataset_info.POSITIVE_CLASS_LABEL
     negative_mask_B = labels_B == dataset_info.NEGATIVE_CLASS_LABEL
 
-    positive_distribution_D = acts_BD[positive_mask_B].mean(dim=0)
-    negative_distribution_D = acts_BD[negative_mask_B].mean(dim=0)
+    positive_distribution_D = _mean_over_examples(acts_BD[positive_mask_B])
+    negative_distribution_D = _mean_over_examples(acts_BD[negative_mask_B])
     distribution_diff_D = (positive_distribution_D - negative_distribution_D).abs()
     top_k_indices_D = torch.argsort(distribution_diff_D, descending=True)[:k]
 
@@ -116,9 +150,12 @@ def apply_topk_mask_zero_dims(
 
 @jaxtyped(typechecker=beartype)
 def apply_topk_mask_reduce_dim(
-    acts_BD: Float[torch.Tensor, "batch_size d_model"],
+    acts_BD: Float[torch.Tensor, "batch_size d_model"] | SparsePooledActivations,
     mask_D: Bool[torch.Tensor, "d_model"],
 ) -> Float[torch.Tensor, "batch_size k"]:
+    if isinstance(acts_BD, SparsePooledActivations):
+        return acts_BD.select_columns(torch.nonzero(~mask_D).squeeze(-1))
+
     masked_acts_BD = acts_BD.clone()
 
     masked_acts_BD = masked_acts_BD[:, ~mask_D]
@@ -192,7 +229,7 @@ def test_sklearn_probe(
 @jaxtyped(typechecker=beartype)
 @torch.no_grad
 def test_probe_gpu(
-    inputs: Float[torch.Tensor, "test_dataset_size d_model"],
+    inputs: Float[torch.Tensor, "test_dataset_size d_model"] | SparsePooledActivations,
     labels: Int[torch.Tensor, "test_dataset_size"],
     batch_size: int,
     probe: Probe,
@@ -229,9 +266,9 @@ def test_probe_gpu(
 
 @jaxtyped(typechecker=beartype)
 def train_probe_gpu(
-    train_inputs: Float[torch.Tensor, "train_dataset_size d_model"],
+    train_inputs: Float[torch.Tensor, "train_dataset_size d_model"] | SparsePooledActivations,
     train_labels: Int[torch.Tensor, "train_dataset_size"],
-    test_inputs: Float[torch.Tensor, "test_dataset_size d_model"],
+    test_inputs: Float[torch.Tensor, "test_dataset_size d_model"] | SparsePooledActivations,
     test_labels: Int[torch.Tensor, "test_dataset_size"],
     dim: int,
     batch_size: int,
@@ -242,7 +279,9 @@ def train_probe_gpu(
     early_stopping_patience: int = 10,
 ) -> tuple[Probe, float]:
     """We have a GPU training function for training on all SAE features, which was very slow (1 minute+) on CPU.
-    This is also used for SCR / TPP, which require probe weights."""
+    This is also used for SCR / TPP, which require probe weights.
+    With SparsePooledActivations inputs, each minibatch is multiplied with the probe weights in CSR
+    format, so the cost scales with the number of nonzero activations instead of d_sae."""
     device = train_inputs.device
     model_dtype = train_inputs.dtype
 
@@ -299,8 +338,12 @@ def train_probe_gpu(
 
 @jaxtyped(typechecker=beartype)
 def train_probe_on_activations(
-    train_activations: dict[str, Float[torch.Tensor, "train_dataset_size d_model"]],
-    test_activations: dict[str, Float[torch.Tensor, "test_dataset_size d_model"]],
+    train_activations: dict[
+        str, Float[torch.Tensor, "train_dataset_size d_model"] | SparsePooledActivations
+    ],
+    test_activations: dict[
+        str, Float[torch.Tensor, "test_dataset_size d_model"] | SparsePooledActivations
+    ],
     select_top_k: Optional[int] = None,
     use_sklearn: bool = True,
     batch_size: int = 16,
@@ -361,3 +404,224 @@ def train_probe_on_activations(
         test_accuracies[profession] = test_accuracy
 
     return probes, test_accuracies
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def fit_logistic_regression_batched(
+    inputs_PND: Float[torch.Tensor, "num_probes num_datapoints dim"],
+    labels_PN: Int[torch.Tensor, "num_probes num_datapoints"],
+    sample_mask_PN: Bool[torch.Tensor, "num_probes num_datapoints"],
+    C: float = 1.0,  # default sklearn value
+    max_iter: int = 100,
+    tol: float = 1e-10,
+    init_weights_PD: Optional[Float[torch.Tensor, "num_probes dim"]] = None,
+    init_bias_P: Optional[Float[torch.Tensor, "num_probes"]] = None,
+) -> tuple[
+    Float[torch.Tensor, "num_probes dim"],
+    Float[torch.Tensor, "num_probes"],
+    Int[torch.Tensor, "num_probes"],
+]:
+    """Fits num_probes independent L2-regularized logistic regressions at once, returning their
+    weights, biases and Newton iteration counts. Each probe minimizes the objective of sklearn's
+    LogisticRegression(penalty="l2", C=C): the summed log-loss plus ||w||^2 / (2C), with an
+    unpenalized bias.
+
+    Datapoints where sample_mask_PN is False are ignored and all-zero features get zero weight,
+    so probes with fewer datapoints or features can be padded to a common shape. The probes are
+    solved in float64 with batched Newton steps and a backtracking line search. A probe stops once
+    half its squared Newton decrement is below tol, so a probe warm-started from init_weights_PD
+    and init_bias_P close to its solution takes few or no iterations."""
+    num_probes, _, dim = inputs_PND.shape
+    inputs_PND = inputs_PND.to(dtype=torch.float64)
+    # The bias is the weight of an extra all-ones feature
+    inputs_PND = torch.cat([inputs_PND, torch.ones_like(inputs_PND[..., :1])], dim=-1)
+    labels_PN = labels_PN.to(dtype=torch.float64)
+    sample_mask_PN = sample_mask_PN.to(dtype=torch.float64)
+
+    l2_penalty_D = torch.full((dim + 1,), 1.0 / C, dtype=torch.float64, device=inputs_PND.device)
+    l2_penalty_D[-1] = 0.0
+    # Keeps the Hessian invertible for probes whose logits saturate
+    jitter_DD = 1e-10 * torch.eye(dim + 1, dtype=torch.float64, device=inputs_PND.device)
+
+    def objective(weights_PD: torch.Tensor) -> torch.Tensor:
+        logits_PN = torch.einsum("pnd,pd->pn", inputs_PND, weights_PD)
+        log_losses_PN = torch.nn.functional.softplus(logits_PN) - labels_PN * logits_PN
+        return (sample_mask_PN * log_losses_PN).sum(dim=-1) + 0.5 * (
+            l2_penalty_D * weights_PD.pow(2)
+        ).sum(dim=-1)
+
+    weights_PD = torch.zeros(num_probes, dim + 1, dtype=torch.float64, device=inputs_PND.device)
+    if init_weights_PD is not None:
+        weights_PD[:, :-1] = init_weights_PD.to(device=inputs_PND.device)
+    if init_bias_P is not None:
+        weights_PD[:, -1] = init_bias_P.to(device=inputs_PND.device)
+    num_iterations_P = torch.zeros(num_probes, dtype=torch.long)
+    active_P = torch.ones(num_probes, dtype=torch.bool, device=inputs_PND.device)
+    objective_P = objective(weights_PD)
+
+    for _ in range(max_iter):
+        probs_PN = torch.sigmoid(torch.einsum("pnd,pd->pn", inputs_PND, weights_PD))
+        grad_PD = torch.einsum(
+            "pnd,pn->pd", inputs_PND, sample_mask_PN * (probs_PN - labels_PN)
+        ) + (l2_penalty_D * weights_PD)
+        curvature_PN = sample_mask_PN * probs_PN * (1 - probs_PN)
+        hessian_PDD = (
+            inputs_PND.transpose(1, 2) @ (curvature_PN.unsqueeze(-1) * inputs_PND)
+            + torch.diag(l2_penalty_D)
+            + jitter_DD
+        )
+        step_PD = torch.linalg.solve(hessian_PDD, grad_PD)
+        newton_decrement_P = (grad_PD * step_PD).sum(dim=-1)
+
+        active_P &= newton_decrement_P / 2 > tol
+        if not active_P.any():
+            break
+        num_iterations_P += active_P.cpu()
+
+        # Backtracking line search with the Armijo condition, halving the step of each probe
+        # whose objective doesn't decrease enough
+        step_size_P = active_P.to(dtype=torch.float64)
+        for _ in range(30):
+            candidate_PD = weights_PD - step_size_P.unsqueeze(-1) * step_PD
+            candidate_objective_P = objective(candidate_PD)
+            sufficient_P = candidate_objective_P <= (
+                objective_P - 1e-4 * step_size_P * newton_decrement_P
+            )
+            if sufficient_P.all():
+                break
+            step_size_P = torch.where(sufficient_P, step_size_P, step_size_P / 2)
+        # A probe whose objective still doesn't decrease enough keeps its weights and stops, since
+        # its Newton step can't make progress, e.g. due to rounding errors close to the optimum
+        weights_PD = torch.where(sufficient_P.unsqueeze(-1), candidate_PD, weights_PD)
+        objective_P = torch.where(sufficient_P, candidate_objective_P, objective_P)
+        active_P &= sufficient_P
+
+    return weights_PD[:, :-1], weights_PD[:, -1], num_iterations_P
+
+
+def _pad_probe_data(
+    acts_list: list[torch.Tensor], labels_list: list[torch.Tensor]
+) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Stacks the [num_datapoints, dim] activations and labels of several probes, zero-padding
+    datapoints and features, into the inputs of fit_logistic_regression_batched()."""
+    num_datapoints = max(len(acts) for acts in acts_list)
+    dim = max(acts.shape[1] for acts in acts_list)
+    acts_PND = torch.zeros(len(acts_list), num_datapoints, dim, dtype=torch.float64)
+    labels_PN = torch.zeros(len(acts_list), num_datapoints, dtype=torch.int)
+    sample_mask_PN = torch.zeros(len(acts_list), num_datapoints, dtype=torch.bool)
+    for probe_idx, (acts, labels) in enumerate(zip(acts_list, labels_list)):
+        acts_PND[probe_idx, : len(acts), : acts.shape[1]] = acts.cpu()
+        labels_PN[probe_idx, : len(labels)] = labels.cpu()
+        sample_mask_PN[probe_idx, : len(acts)] = True
+    return acts_PND, labels_PN, sample_mask_PN
+
+
+def _warm_start_weights(
+    previous_weights_PD: torch.Tensor,
+    previous_feature_indices: list[torch.Tensor],
+    feature_indices: list[torch.Tensor],
+    dim: int,
+) -> torch.Tensor:
+    """Maps each probe's weights onto its new features by feature index, so features kept from
+    the previous feature set keep their weight and new features start at zero."""
+    init_weights_PD = torch.zeros(len(feature_indices), dim, dtype=torch.float64)
+    for probe_idx, (previous_indices_K, indices_K) in enumerate(
+        zip(previous_feature_indices, feature_indices)
+    ):
+        previous_weights = dict(
+            zip(previous_indices_K.tolist(), previous_weights_PD[probe_idx].tolist())
+        )
+        for feature_idx, index in enumerate(indices_K.tolist()):
+            init_weights_PD[probe_idx, feature_idx] = previous_weights.get(index, 0.0)
+    return init_weights_PD
+
+
+@jaxtyped(typechecker=beartype)
+def train_top_k_probes_on_activations(
+    train_activations: dict[
+        str, Float[torch.Tensor, "train_dataset_size d_model"] | SparsePooledActivations
+    ],
+    test_activations: dict[
+        str, Float[torch.Tensor, "test_dataset_size d_model"] | SparsePooledActivations
+    ],
+    k_values: list[int],
+    perform_scr: bool = False,
+    C: float = 1.0,
+    warm_start: bool = True,
+) -> tuple[dict[int, dict[str, float]], dict[int, dict[str, int]]]:
+    """The test accuracy and Newton iteration count of each class's top-k probe for each k in
+    k_values. The accuracies match calling train_probe_on_activations(select_top_k=k) with sklearn
+    for each k, but the probes of all classes are fit at once by fit_logistic_regression_batched().
+    The probe data is prepared in the same order, so with the same random state each probe is
+    trained and tested on the same datapoints.
+
+    The top-k features of a larger k mostly contain those of a smaller k, so with warm_start the
+    probes are fit in increasing k, each starting from the previous k's solution."""
+    class_names = list(train_activations.keys())
+    probe_data = {}
+    for k in k_values:
+        for class_name in class_names:
+            train_acts, train_labels = prepare_probe_data(
+                train_activations, class_name, perform_scr
+            )
+            test_acts, test_labels = prepare_probe_data(test_activations, class_name, perform_scr)
+
+            activation_mask_D = get_top_k_mean_diff_mask(train_acts, train_labels, k)
+            probe_data[(k, class_name)] = (
+                # apply_topk_mask_reduce_dim() keeps the selected features in this order
+                torch.nonzero(~activation_mask_D).squeeze(-1).cpu(),
+                apply_topk_mask_reduce_dim(train_acts, activation_mask_D),
+                train_labels,
+                apply_topk_mask_reduce_dim(test_acts, activation_mask_D),
+                test_labels,
+            )
+
+    test_accuracies = {}
+    num_iterations = {}
+    previous_weights_PD = None
+    previous_bias_P = None
+    previous_feature_indices = None
+    for k in sorted(set(k_values)):
+        feature_indices, train_acts_list, train_labels_list, test_acts_list, test_labels_list = (
+            list(data) for data in zip(*(probe_data[(k, name)] for name in class_names))
+        )
+        train_acts_PND, train_labels_PN, train_mask_PN = _pad_probe_data(
+            train_acts_list, train_labels_list
+        )
+
+        init_weights_PD = None
+        if warm_start and previous_weights_PD is not None:
+            init_weights_PD = _warm_start_weights(
+                previous_weights_PD,
+                previous_feature_indices,
+                feature_indices,
+                train_acts_PND.shape[-1],
+            )
+        weights_PD, bias_P, num_iterations_P = fit_logistic_regression_batched(
+            train_acts_PND,
+            train_labels_PN,
+            train_mask_PN,
+            C=C,
+            init_weights_PD=init_weights_PD,
+            init_bias_P=previous_bias_P if warm_start else None,
+        )
+        print(
+            f"Fit {len(class_names)} top-{k} probes in at most "
+            f"{num_iterations_P.max().item()} Newton iterations"
+        )
+
+        test_acts_PND, test_labels_PN, test_mask_PN = _pad_probe_data(
+            test_acts_list, test_labels_list
+        )
+        logits_PN = torch.einsum("pnd,pd->pn", test_acts_PND, weights_PD) + bias_P.unsqueeze(-1)
+        # Like LogisticRegression.predict(), predict the positive class for positive logits
+        correct_PN = ((logits_PN > 0).int() == test_labels_PN) & test_mask_PN
+        test_accuracies_P = correct_PN.sum(dim=-1) / test_mask_PN.sum(dim=-1)
+
+        test_accuracies[k] = dict(zip(class_names, test_accuracies_P.tolist()))
+        num_iterations[k] = dict(zip(class_names, num_iterations_P.tolist()))
+        previous_weights_PD, previous_bias_P = weights_PD, bias_P
+        previous_feature_indices = feature_indices
+
+    return test_accuracies, num_iterations
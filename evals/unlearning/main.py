@@ -23,6 +23,7 @@ from evals.unlearning.eval_output import (
 )
 from evals.unlearning.utils.eval import run_eval_single_sae
 import sae_bench_utils.activation_collection as activation_collection
+import sae_bench_utils.batch_size_planner as batch_size_planner
 from evals.unlearning.eval_config import UnlearningEvalConfig
 from sae_bench_utils import (
     get_eval_uuid,
@@ -34,6 +35,7 @@ from sae_bench_utils.sae_selection_utils import (
     select_saes_multiple_patterns,
 )
 import sae_bench_utils.general_utils as general_utils
+import sae_bench_utils.sae_pipeline as sae_pipeline
 
 EVAL_TYPE = "unlearning"
 
@@ -145,25 +147,13 @@ def run_eval(
         config.model_name, device=device, dtype=config.llm_dtype
     )
 
-    for sae_release, sae_id in tqdm(
-        selected_saes, desc="Running SAE evaluation on all selected SAEs"
+    # The next SAE is loaded and results are written in the background, while an SAE is evaluated
+    result_writer = sae_pipeline.ResultWriter()
+    for sae_release, sae_id, sae, _ in tqdm(
+        sae_pipeline.iter_saes(selected_saes, device, llm_dtype),
+        total=len(selected_saes),
+        desc="Running SAE evaluation on all selected SAEs",
     ):
-        del_sae = False
-        # Handle both pretrained SAEs (identified by string) and custom SAEs (passed as objects)
-        if isinstance(sae_id, str):
-            sae = SAE.from_pretrained(
-                release=sae_release,
-                sae_id=sae_id,
-                device=device,
-            )[0]
-            # If loading from pretrained, we delete the SAE object after use
-            del_sae = True
-        else:
-            sae = sae_id
-            sae_id = "custom_sae"
-
-        sae = sae.to(device=device, dtype=llm_dtype)
-
         sae_release_and_id = f"{sae_release}_{sae_id}"
 
         sae_results_folder = os.path.join(artifacts_folder, sae_release_and_id, "results/metrics")
@@ -201,13 +191,14 @@ def run_eval(
 
         results_dict[f"{sae_release}_{sae_id}"] = asdict(eval_output)
 
-        eval_output.to_json_file(sae_result_path, indent=2)
+        result_writer.submit(eval_output.to_json_file, sae_result_path, indent=2)
 
-        if del_sae:
-            del sae
+        del sae
         gc.collect()
         torch.cuda.empty_cache()
 
+    result_writer.close()
+
     if clean_up_artifacts:
         for folder in os.listdir(artifacts_folder):
             folder_path = os.path.join(artifacts_folder, folder)
@@ -224,17 +215,19 @@ def create_config_and_selected_saes(
         model_name=args.model_name,
     )
 
-    if args.llm_batch_size is not None:
-        config.llm_batch_size = args.llm_batch_size
-    else:
-        # // 8 is because the LLM_NAME_TO_BATCH_SIZE is for ctx len 128, but we use 1024 in this eval
-        config.llm_batch_size = activation_collection.LLM_NAME_TO_BATCH_SIZE[config.model_name] // 8
-
     if args.llm_dtype is not None:
         config.llm_dtype = args.llm_dtype
     else:
         config.llm_dtype = activation_collection.LLM_NAME_TO_DTYPE[config.model_name]
 
+    if args.llm_batch_size is not None:
+        config.llm_batch_size = args.llm_batch_size
+    else:
+        # This eval uses a context length of 1024
+        config.llm_batch_size = batch_size_planner.plan_llm_batch_size(
+            config.model_name, 1024, config.llm_dtype
+        )
+
     selected_saes = get_saes_from_regex(args.sae_regex_pattern, args.sae_block_pattern)
     assert len(selected_saes) > 0, "No SAEs selected"
 
@@ -280,7 +273,7 @@ def arg_parser():
         "--llm_batch_size",
         type=int,
         default=None,
-        help="Batch size for LLM. If None, will be populated using LLM_NAME_TO_BATCH_SIZE",
+        help="Batch size for LLM. If None, will be planned from the model dimensions and free memory",
     )
     parser.add_argument(
         "--llm_dtype",
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Optional
+
+import torch
+from transformers import AutoTokenizer
+
+import sae_bench_utils.activation_quantization as activation_quantization
+from sae_bench_utils.ragged_activations import RaggedActivations, load_ragged_activations_dict
+
+# Bump when the layout of cached values changes, which invalidates every existing entry
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_ACTIVATION_CACHE_DIR = os.path.join("artifacts", "activation_cache")
+
+
+def get_tokenizer_revision(tokenizer: AutoTokenizer | Any) -> str:
+    """A hash of everything about the tokenizer that changes the tokens of a dataset."""
+    tokenizer_state = {
+        "class": type(tokenizer).__name__,
+        "vocab": tokenizer.get_vocab(),
+        "special_tokens": tokenizer.special_tokens_map,
+        "padding_side": tokenizer.padding_side,
+    }
+    state_json = json.dumps(tokenizer_state, sort_keys=True, default=str)
+    return hashlib.sha256(state_json.encode()).hexdigest()
+
+
+@dataclass
+class ActivationCacheKey:
+    """Identifies a set of cached LLM activations by everything they were computed from.
+
+    dataset_kwargs holds any other setting that changes which examples were selected, e.g. the
+    train and test set sizes or the classes. Two evals that build equal keys share cached activations."""
+
+    model_name: str
+    hook_name: str
+    dataset_name: str
+    split: str
+    random_seed: int
+    context_length: int
+    tokenizer_revision: str
+    dtype: str
+    quantization: Optional[str] = None
+    dataset_kwargs: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"format_version": CACHE_FORMAT_VERSION, **asdict(self)}
+
+    def digest(self) -> str:
+        key_json = json.dumps(self.to_dict(), sort_keys=True, default=str)
+        return hashlib.sha256(key_json.encode()).hexdigest()
+
+
+class ActivationCache:
+    """Content-addressed store of LLM activations, shared by every eval on the machine.
+
+    Each value is saved with torch.save() as <cache_dir>/<key digest>.pt, next to a JSON file holding
+    the key, so the cache can be inspected and pruned by hand. Changing any field of the key
+    gives a different file, so stale activations are never reused.
+
+    Usage:
+        cache = ActivationCache()
+        if key in cache:
+            acts = cache.load(key)
+        else:
+            acts = compute_acts()
+            cache.save(key, acts)"""
+
+    def __init__(self, cache_dir: str = DEFAULT_ACTIVATION_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def get_path(self, key: ActivationCacheKey) -> str:
+        return os.path.join(self.cache_dir, f"{key.digest()}.pt")
+
+    def get_key_path(self, key: ActivationCacheKey) -> str:
+        return os.path.join(self.cache_dir, f"{key.digest()}.json")
+
+    def __contains__(self, key: ActivationCacheKey) -> bool:
+        return os.path.exists(self.get_path(key))
+
+    def load(self, key: ActivationCacheKey) -> Any:
+        path = self.get_path(key)
+        print(f"Loading {key.dataset_name} {key.split} activations from {path}")
+        return torch.load(path)
+
+    def save(self, key: ActivationCacheKey, value: Any):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key)
+
+        with open(self.get_key_path(key), "w") as f:
+            json.dump(key.to_dict(), f, indent=2, default=str)
+
+        # Write to a temporary file first, so that concurrent evals never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(value, tmp_path)
+        os.replace(tmp_path, path)
+
+    def remove(self, key: ActivationCacheKey):
+        for path in [self.get_path(key), self.get_key_path(key)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def get_artifact_digest(key: ActivationCacheKey, **settings: Any) -> str:
+    """A short digest for an eval-specific artifact derived from the activations of key, e.g. trained
+    probes. settings are the eval settings the artifact also depends on."""
+    artifact_json = json.dumps(
+        {"activations": key.digest(), **settings}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(artifact_json.encode()).hexdigest()[:16]
+
+
+def get_train_test_activations(
+    cache: ActivationCache,
+    train_key: ActivationCacheKey,
+    test_key: ActivationCacheKey,
+    compute_activations: Callable[
+        [], tuple[dict[str, RaggedActivations], dict[str, RaggedActivations]]
+    ],
+    save_activations: bool = True,
+) -> tuple[dict[str, RaggedActivations], dict[str, RaggedActivations]]:
+    """Load class_name -> activations for the train and test split from the cache, or compute them
+    with compute_activations() and, if save_activations, add them to the cache.
+
+    If the keys have quantization "int8", activations are stored as int8 with per-channel scales
+    calibrated on the train activations. Freshly computed activations are then also returned as
+    int8 RaggedActivations, which are dequantized batch by batch when they are used, so the run
+    that computes them gets the same results as later runs that load them."""
+    if train_key in cache and test_key in cache:
+        return (
+            load_ragged_activations_dict(cache.load(train_key)),
+            load_ragged_activations_dict(cache.load(test_key)),
+        )
+
+    all_train_acts, all_test_acts = compute_activations()
+
+    quantization_params = None
+    if train_key.quantization == "int8":
+        quantization_params = activation_quantization.calibrate(
+            [ragged.acts_TD for ragged in all_train_acts.values()]
+        )
+    elif train_key.quantization is not None:
+        raise ValueError(f"Unsupported quantization: {train_key.quantization}")
+
+    train_state = {k: v.to_dict(quantization_params) for k, v in all_train_acts.items()}
+    test_state = {k: v.to_dict(quantization_params) for k, v in all_test_acts.items()}
+
+    if save_activations:
+        cache.save(train_key, train_state)
+        cache.save(test_key, test_state)
+
+    if quantization_params is not None:
+        return load_ragged_activations_dict(train_state), load_ragged_activations_dict(test_state)
+    return all_train_acts, all_test_acts
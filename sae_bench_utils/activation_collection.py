@@ -9,6 +9,13 @@ from transformer_lens import HookedTransformer
 from transformers import AutoTokenizer
 from sae_lens import SAE
 import os
+import re
+
+import sae_bench_utils.activation_quantization as activation_quantization
+import sae_bench_utils.activation_shards as activation_shards
+import sae_bench_utils.prefetch_utils as prefetch_utils
+from sae_bench_utils.ragged_activations import RaggedActivations, segment_mean
+from sae_bench_utils.sparse_activations import SparseActivations, SparsePooledActivations
 
 # Relevant at ctx len 128
 LLM_NAME_TO_BATCH_SIZE = {
@@ -42,6 +49,132 @@ def get_bos_pad_eos_mask(
     return ~mask
 
 
+def get_layer_from_hook_name(hook_name: str) -> Optional[int]:
+    """Returns the block index of a hook such as 'blocks.12.hook_resid_post', or None for hooks
+    outside the residual blocks (e.g. 'hook_embed', 'ln_final.hook_normalized')."""
+    match = re.match(r"^blocks\.(\d+)\.", hook_name)
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+def get_stop_at_layer(hook_names: list[str]) -> Optional[int]:
+    """The earliest stop_at_layer at which every hook in hook_names has run, or None if the full
+    model must be run."""
+    stop_at_layer = 0
+    for hook_name in hook_names:
+        layer = get_layer_from_hook_name(hook_name)
+        if layer is None:
+            if hook_name in ("hook_embed", "hook_pos_embed"):
+                continue
+            return None
+        stop_at_layer = max(stop_at_layer, layer + 1)
+    return stop_at_layer
+
+
+# A reducer maps a batch of activations at a hook and the tokens they came from to the part of the
+# activations an eval actually uses, e.g. [batch, d_model] mean-pooled activations. Reducers run
+# inside the forward hook, so the full [batch, seq_len, d_model] activations are never kept.
+ActivationReducer = Callable[
+    [Float[torch.Tensor, "batch seq_len d_model"], Int[torch.Tensor, "batch seq_len"]],
+    torch.Tensor,
+]
+
+
+def masked_mean_reducer(
+    tokenizer: AutoTokenizer | Any, mask_bos_pad_eos_tokens: bool = True
+) -> ActivationReducer:
+    """Mean over the sequence, ignoring BOS, PAD, and EOS tokens if mask_bos_pad_eos_tokens is True.
+    Equal to create_meaned_model_activations() of the full activations."""
+
+    def reduce(
+        resid_BLD: Float[torch.Tensor, "batch seq_len d_model"],
+        tokens_BL: Int[torch.Tensor, "batch seq_len"],
+    ) -> Float[torch.Tensor, "batch d_model"]:
+        if mask_bos_pad_eos_tokens:
+            attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, tokenizer)
+        else:
+            attn_mask_BL = torch.ones_like(tokens_BL, dtype=torch.bool)
+        attn_mask_BL = attn_mask_BL.to(device=resid_BLD.device, dtype=resid_BLD.dtype)
+
+        sums_BD = einops.einsum(resid_BLD, attn_mask_BL, "B L D, B L -> B D")
+        lengths_B = einops.reduce(attn_mask_BL, "B L -> B", "sum")
+        return sums_BD / lengths_B[:, None]
+
+    return reduce
+
+
+def position_reducer(position: int) -> ActivationReducer:
+    """The activations at a fixed position, e.g. -2 for the token before the final one."""
+
+    def reduce(
+        resid_BLD: Float[torch.Tensor, "batch seq_len d_model"],
+        tokens_BL: Int[torch.Tensor, "batch seq_len"],
+    ) -> Float[torch.Tensor, "batch d_model"]:
+        # A view would keep the storage of the full batch of activations alive
+        return resid_BLD[:, position, :].clone()
+
+    return reduce
+
+
+def positions_reducer(positions: list[int]) -> ActivationReducer:
+    """The activations at each of a fixed set of positions."""
+
+    def reduce(
+        resid_BLD: Float[torch.Tensor, "batch seq_len d_model"],
+        tokens_BL: Int[torch.Tensor, "batch seq_len"],
+    ) -> Float[torch.Tensor, "batch num_positions d_model"]:
+        return resid_BLD[:, positions, :]
+
+    return reduce
+
+
+def last_token_reducer(tokenizer: AutoTokenizer | Any) -> ActivationReducer:
+    """The activations at the last token of each sequence that isn't padding. Works with both left
+    and right padding."""
+
+    def reduce(
+        resid_BLD: Float[torch.Tensor, "batch seq_len d_model"],
+        tokens_BL: Int[torch.Tensor, "batch seq_len"],
+    ) -> Float[torch.Tensor, "batch d_model"]:
+        seq_len = tokens_BL.shape[1]
+        if tokenizer.pad_token_id is None:
+            last_positions_B = torch.full((tokens_BL.shape[0],), seq_len - 1)
+        else:
+            not_pad_BL = (tokens_BL != tokenizer.pad_token_id).to(dtype=torch.int)
+            # argmax returns the first maximum, so search the flipped mask for the last real token
+            last_positions_B = seq_len - 1 - not_pad_BL.flip(dims=[1]).argmax(dim=1)
+        last_positions_B = last_positions_B.to(device=resid_BLD.device)
+        return resid_BLD[torch.arange(resid_BLD.shape[0], device=resid_BLD.device), last_positions_B]
+
+    return reduce
+
+
+@torch.no_grad
+def _run_with_activation_hooks(
+    tokens_BL: Int[torch.Tensor, "batch seq_len"],
+    model: HookedTransformer,
+    hook_names: list[str],
+    stop_at_layer: Optional[int],
+    reducer: Optional[ActivationReducer] = None,
+) -> dict[str, Float[torch.Tensor, "batch seq_len d_model"] | torch.Tensor]:
+    """Returns hook_name -> activations, reduced with reducer inside the hook if given."""
+    acts_BLD = {}
+
+    def activation_hook(resid_BLD: torch.Tensor, hook):
+        if reducer is not None:
+            acts_BLD[hook.name] = reducer(resid_BLD, tokens_BL.to(device=resid_BLD.device))
+            return
+        acts_BLD[hook.name] = resid_BLD
+
+    model.run_with_hooks(
+        tokens_BL,
+        stop_at_layer=stop_at_layer,
+        fwd_hooks=[(hook_name, activation_hook) for hook_name in hook_names],
+    )
+    return acts_BLD
+
+
 @jaxtyped(typechecker=beartype)
 @torch.no_grad
 def get_llm_activations(
@@ -66,15 +199,7 @@ def get_llm_activations(
     ):
         tokens_BL = tokens[i : i + batch_size]
 
-        acts_BLD = None
-
-        def activation_hook(resid_BLD: torch.Tensor, hook):
-            nonlocal acts_BLD
-            acts_BLD = resid_BLD
-
-        model.run_with_hooks(
-            tokens_BL, stop_at_layer=layer + 1, fwd_hooks=[(hook_name, activation_hook)]
-        )
+        acts_BLD = _run_with_activation_hooks(tokens_BL, model, [hook_name], layer + 1)[hook_name]
 
         if mask_bos_pad_eos_tokens:
             attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, model.tokenizer)
@@ -85,6 +210,112 @@ def get_llm_activations(
     return torch.cat(all_acts_BLD, dim=0)
 
 
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def get_llm_activations_multiple_hooks(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    batch_size: int,
+    hook_names: list[str],
+    mask_bos_pad_eos_tokens: bool = False,
+    show_progress: bool = True,
+) -> dict[str, Float[torch.Tensor, "dataset_size seq_len d_model"]]:
+    """Like get_llm_activations(), but collects activations at every hook in hook_names from a single
+    forward pass that stops after the deepest requested layer. Returns a dict of hook_name -> activations.
+    Use this when evaluating SAEs at several layers of the same model, e.g. layers 5, 12 and 19 of gemma-2-2b."""
+
+    stop_at_layer = get_stop_at_layer(hook_names)
+    all_acts_BLD = {hook_name: [] for hook_name in hook_names}
+
+    for i in tqdm(
+        range(0, len(tokens), batch_size),
+        desc="Collecting activations",
+        disable=not show_progress,
+    ):
+        tokens_BL = tokens[i : i + batch_size]
+
+        acts_BLD = _run_with_activation_hooks(tokens_BL, model, hook_names, stop_at_layer)
+
+        if mask_bos_pad_eos_tokens:
+            attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, model.tokenizer)
+
+        for hook_name in hook_names:
+            hook_acts_BLD = acts_BLD[hook_name]
+            if mask_bos_pad_eos_tokens:
+                hook_acts_BLD = hook_acts_BLD * attn_mask_BL[:, :, None]
+            all_acts_BLD[hook_name].append(hook_acts_BLD)
+
+    return {hook_name: torch.cat(acts, dim=0) for hook_name, acts in all_acts_BLD.items()}
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def get_llm_activations_ragged(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    batch_size: int,
+    layer: int,
+    hook_name: str,
+    mask_bos_pad_eos_tokens: bool = False,
+    show_progress: bool = True,
+) -> RaggedActivations:
+    """Like get_llm_activations(), but only keeps activations for real tokens. If mask_bos_pad_eos_tokens
+    is True, BOS, PAD, and EOS tokens are dropped instead of zeroed out, so nothing downstream has to
+    store, encode or mask padding."""
+
+    all_acts = []
+
+    for i in tqdm(
+        range(0, len(tokens), batch_size),
+        desc="Collecting activations",
+        disable=not show_progress,
+    ):
+        tokens_BL = tokens[i : i + batch_size]
+
+        acts_BLD = _run_with_activation_hooks(tokens_BL, model, [hook_name], layer + 1)[hook_name]
+
+        if mask_bos_pad_eos_tokens:
+            attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, model.tokenizer)
+        else:
+            attn_mask_BL = torch.ones_like(tokens_BL, dtype=torch.bool)
+
+        all_acts.append(RaggedActivations.from_padded(acts_BLD, attn_mask_BL))
+
+    return RaggedActivations.cat(all_acts)
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def get_llm_activations_reduced(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    batch_size: int,
+    layer: Optional[int],
+    hook_name: str,
+    reducer: ActivationReducer,
+    show_progress: bool = True,
+) -> Float[torch.Tensor, "dataset_size ..."]:
+    """Like get_llm_activations(), but only keeps the output of reducer, which runs inside the
+    forward hook. E.g. with masked_mean_reducer() this returns [dataset_size, d_model] mean-pooled
+    activations, using a factor of seq_len less memory than reducing the full activations later.
+    layer is None for hooks outside the residual blocks, as returned by get_layer_from_hook_name()."""
+    stop_at_layer = layer + 1 if layer is not None else get_stop_at_layer([hook_name])
+
+    all_acts = []
+
+    for i in tqdm(
+        range(0, len(tokens), batch_size),
+        desc="Collecting activations",
+        disable=not show_progress,
+    ):
+        tokens_BL = tokens[i : i + batch_size]
+
+        acts = _run_with_activation_hooks(tokens_BL, model, [hook_name], stop_at_layer, reducer)
+        all_acts.append(acts[hook_name])
+
+    return torch.cat(all_acts, dim=0)
+
+
 @jaxtyped(typechecker=beartype)
 @torch.no_grad
 def get_all_llm_activations(
@@ -112,6 +343,114 @@ def get_all_llm_activations(
     return all_classes_acts_BLD
 
 
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def get_all_llm_activations_multiple_hooks(
+    tokenized_inputs_dict: dict[str, dict[str, Int[torch.Tensor, "dataset_size seq_len"]]],
+    model: HookedTransformer,
+    batch_size: int,
+    hook_names: list[str],
+    mask_bos_pad_eos_tokens: bool = False,
+) -> dict[str, dict[str, Float[torch.Tensor, "dataset_size seq_len d_model"]]]:
+    """get_all_llm_activations() for several hooks at once. Returns hook_name -> class_name -> activations."""
+    all_hooks_acts_BLD = {hook_name: {} for hook_name in hook_names}
+
+    for class_name in tokenized_inputs_dict:
+        tokens = tokenized_inputs_dict[class_name]["input_ids"]
+
+        acts_BLD = get_llm_activations_multiple_hooks(
+            tokens, model, batch_size, hook_names, mask_bos_pad_eos_tokens
+        )
+
+        for hook_name in hook_names:
+            all_hooks_acts_BLD[hook_name][class_name] = acts_BLD[hook_name]
+
+    return all_hooks_acts_BLD
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def get_all_llm_activations_ragged(
+    tokenized_inputs_dict: dict[str, dict[str, Int[torch.Tensor, "dataset_size seq_len"]]],
+    model: HookedTransformer,
+    batch_size: int,
+    layer: int,
+    hook_name: str,
+    mask_bos_pad_eos_tokens: bool = False,
+) -> dict[str, RaggedActivations]:
+    """get_all_llm_activations() with padding-free storage. See get_llm_activations_ragged()."""
+    all_classes_acts = {}
+
+    for class_name in tokenized_inputs_dict:
+        tokens = tokenized_inputs_dict[class_name]["input_ids"]
+
+        all_classes_acts[class_name] = get_llm_activations_ragged(
+            tokens, model, batch_size, layer, hook_name, mask_bos_pad_eos_tokens
+        )
+
+    return all_classes_acts
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def get_all_llm_activations_reduced(
+    tokenized_inputs_dict: dict[str, dict[str, Int[torch.Tensor, "dataset_size seq_len"]]],
+    model: HookedTransformer,
+    batch_size: int,
+    layer: Optional[int],
+    hook_name: str,
+    reducer: ActivationReducer,
+) -> dict[str, Float[torch.Tensor, "dataset_size ..."]]:
+    """get_all_llm_activations() with in-hook reduction. See get_llm_activations_reduced()."""
+    all_classes_acts = {}
+
+    for class_name in tokenized_inputs_dict:
+        tokens = tokenized_inputs_dict[class_name]["input_ids"]
+
+        all_classes_acts[class_name] = get_llm_activations_reduced(
+            tokens, model, batch_size, layer, hook_name, reducer
+        )
+
+    return all_classes_acts
+
+
+@torch.no_grad
+def _get_resid_on_sae_devices(
+    resid_BLD: Float[torch.Tensor, "batch seq_len d_model"], saes: list[SAE | Any]
+) -> list[Float[torch.Tensor, "batch seq_len d_model"]]:
+    """Moves a batch to the device of each SAE, copying it at most once per device."""
+    resid_by_device = {}
+    resids_BLD = []
+    for sae in saes:
+        device = torch.device(sae.device)
+        if device not in resid_by_device:
+            resid_by_device[device] = resid_BLD.to(device=device)
+        resids_BLD.append(resid_by_device[device])
+    return resids_BLD
+
+
+@torch.no_grad
+def _encode_masked(
+    sae: SAE | Any,
+    resid_BLD: Float[torch.Tensor, "batch seq_len d_model"],
+    attn_mask_BL: Bool[torch.Tensor, "batch seq_len"],
+    selected_latents: Optional[list[int]],
+    activation_dtype: Optional[torch.dtype],
+) -> Float[torch.Tensor, "batch seq_len indexed_d_sae"]:
+    sae_act_BLF = sae.encode(resid_BLD)
+
+    if selected_latents is not None:
+        sae_act_BLF = sae_act_BLF[:, :, selected_latents]
+
+    attn_mask_BL = attn_mask_BL.to(device=sae_act_BLF.device)
+    sae_act_BLF = sae_act_BLF * attn_mask_BL[:, :, None]
+
+    if activation_dtype is not None:
+        sae_act_BLF = sae_act_BLF.to(dtype=activation_dtype)
+
+    return sae_act_BLF
+
+
 @jaxtyped(typechecker=beartype)
 @torch.no_grad
 def collect_sae_activations(
@@ -127,34 +466,129 @@ def collect_sae_activations(
 ) -> Float[torch.Tensor, "dataset_size seq_len indexed_d_sae"]:
     """Collects SAE activations for a given set of tokens.
     Note: If evaluating many SAEs, it is more efficient to use save_activations() and encode_precomputed_activations()."""
-    sae_acts = []
+    return collect_sae_activations_multiple_saes(
+        tokens,
+        model,
+        [sae],
+        batch_size,
+        layer,
+        hook_name,
+        mask_bos_pad_eos_tokens,
+        None if selected_latents is None else [selected_latents],
+        activation_dtype,
+    )[0]
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def collect_sae_activations_multiple_saes(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    saes: list[SAE | Any],
+    batch_size: int,
+    layer: int,
+    hook_name: str,
+    mask_bos_pad_eos_tokens: bool = False,
+    selected_latents: Optional[list[Optional[list[int]]]] = None,
+    activation_dtype: Optional[torch.dtype] = None,
+) -> list[Float[torch.Tensor, "dataset_size seq_len indexed_d_sae"]]:
+    """collect_sae_activations() for several SAEs trained on the same hook. Each batch of LLM activations
+    is computed once and encoded by every SAE. selected_latents, if given, has one entry (or None) per SAE.
+    Returns one tensor per SAE, in the order of saes."""
+    if selected_latents is None:
+        selected_latents = [None] * len(saes)
+    assert len(selected_latents) == len(saes)
+
+    sae_acts = [[] for _ in saes]
 
     for i in tqdm(range(0, tokens.shape[0], batch_size)):
         tokens_BL = tokens[i : i + batch_size]
         _, cache = model.run_with_cache(tokens_BL, stop_at_layer=layer + 1, names_filter=hook_name)
         resid_BLD: Float[torch.Tensor, "batch seq_len d_model"] = cache[hook_name]
 
-        sae_act_BLF: Float[torch.Tensor, "batch seq_len d_sae"] = sae.encode(resid_BLD)
+        if mask_bos_pad_eos_tokens:
+            attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, model.tokenizer)
+        else:
+            attn_mask_BL = torch.ones_like(tokens_BL, dtype=torch.bool)
+
+        for sae_idx, (sae, sae_resid_BLD) in enumerate(
+            zip(saes, _get_resid_on_sae_devices(resid_BLD, saes))
+        ):
+            sae_acts[sae_idx].append(
+                _encode_masked(
+                    sae,
+                    sae_resid_BLD,
+                    attn_mask_BL,
+                    selected_latents[sae_idx],
+                    activation_dtype,
+                )
+            )
+
+    return [torch.cat(acts, dim=0) for acts in sae_acts]
 
-        if selected_latents is not None:
-            sae_act_BLF = sae_act_BLF[:, :, selected_latents]
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def collect_sae_activations_sparse(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    sae: SAE | Any,
+    batch_size: int,
+    layer: int,
+    hook_name: str,
+    mask_bos_pad_eos_tokens: bool = False,
+    selected_latents: Optional[list[int]] = None,
+    activation_dtype: Optional[torch.dtype] = None,
+    top_k_per_token: Optional[int] = None,
+) -> SparseActivations:
+    """collect_sae_activations(), but only the nonzero activations are kept. Each batch is converted to
+    COO format on the SAE device before the next one is collected, so the dense [batch, seq_len, d_sae]
+    tensor only ever exists for one batch. If top_k_per_token is given, only the k largest activations
+    of each token are kept (after selecting latents), which bounds memory even for SAEs with a high L0."""
+    rows, cols, latents, values = [], [], [], []
+    num_latents = None
+
+    for i in tqdm(range(0, tokens.shape[0], batch_size)):
+        tokens_BL = tokens[i : i + batch_size]
+        _, cache = model.run_with_cache(tokens_BL, stop_at_layer=layer + 1, names_filter=hook_name)
+        resid_BLD: Float[torch.Tensor, "batch seq_len d_model"] = cache[hook_name]
 
         if mask_bos_pad_eos_tokens:
             attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, model.tokenizer)
         else:
             attn_mask_BL = torch.ones_like(tokens_BL, dtype=torch.bool)
 
-        attn_mask_BL = attn_mask_BL.to(device=sae_act_BLF.device)
-
-        sae_act_BLF = sae_act_BLF * attn_mask_BL[:, :, None]
+        sae_act_BLF = _encode_masked(
+            sae, resid_BLD.to(device=sae.device), attn_mask_BL, selected_latents, activation_dtype
+        )
+        num_latents = sae_act_BLF.shape[-1]
 
-        if activation_dtype is not None:
-            sae_act_BLF = sae_act_BLF.to(dtype=activation_dtype)
+        if top_k_per_token is not None:
+            top_values_BLK, top_latents_BLK = sae_act_BLF.topk(
+                min(top_k_per_token, num_latents), dim=-1
+            )
+            # topk orders latents by value, sort them so entries stay in (row, col, latent) order
+            top_latents_BLK, order_BLK = top_latents_BLK.sort(dim=-1)
+            top_values_BLK = top_values_BLK.gather(-1, order_BLK)
+
+            b, l, k = (top_values_BLK != 0).nonzero(as_tuple=True)
+            rows.append(b + i)
+            cols.append(l)
+            latents.append(top_latents_BLK[b, l, k])
+            values.append(top_values_BLK[b, l, k])
+        else:
+            b, l, f = sae_act_BLF.nonzero(as_tuple=True)
+            rows.append(b + i)
+            cols.append(l)
+            latents.append(f)
+            values.append(sae_act_BLF[b, l, f])
 
-        sae_acts.append(sae_act_BLF)
+    if num_latents is None:
+        num_latents = len(selected_latents) if selected_latents is not None else sae.W_dec.shape[0]
 
-    all_sae_acts_BLF = torch.cat(sae_acts, dim=0)
-    return all_sae_acts_BLF
+    return SparseActivations.from_batches(
+        rows, cols, latents, values, (tokens.shape[0], tokens.shape[1], num_latents)
+    )
 
 
 @jaxtyped(typechecker=beartype)
@@ -170,8 +604,27 @@ def get_feature_activation_sparsity(
 ) -> Float[torch.Tensor, "d_sae"]:
     """Get the activation sparsity for each SAE feature.
     Note: If evaluating many SAEs, it is more efficient to use save_activations() and get the sparsity from the saved activations."""
-    device = sae.device
-    running_sum_F = torch.zeros(sae.W_dec.shape[0], dtype=torch.float32, device=device)
+    return get_feature_activation_sparsity_multiple_saes(
+        tokens, model, [sae], batch_size, layer, hook_name, mask_bos_pad_eos_tokens
+    )[0]
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def get_feature_activation_sparsity_multiple_saes(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    saes: list[SAE | Any],
+    batch_size: int,
+    layer: int,
+    hook_name: str,
+    mask_bos_pad_eos_tokens: bool = False,
+) -> list[Float[torch.Tensor, "d_sae"]]:
+    """get_feature_activation_sparsity() for several SAEs trained on the same hook, from a single pass
+    over the tokens. Returns one tensor per SAE, in the order of saes."""
+    running_sums_F = [
+        torch.zeros(sae.W_dec.shape[0], dtype=torch.float32, device=sae.device) for sae in saes
+    ]
     total_tokens = 0
 
     for i in tqdm(range(0, tokens.shape[0], batch_size)):
@@ -179,36 +632,54 @@ def get_feature_activation_sparsity(
         _, cache = model.run_with_cache(tokens_BL, stop_at_layer=layer + 1, names_filter=hook_name)
         resid_BLD: Float[torch.Tensor, "batch seq_len d_model"] = cache[hook_name]
 
-        sae_act_BLF: Float[torch.Tensor, "batch seq_len d_sae"] = sae.encode(resid_BLD)
-        # make act to zero or one
-        sae_act_BLF = (sae_act_BLF > 0).to(dtype=torch.float32)
-
         if mask_bos_pad_eos_tokens:
             attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, model.tokenizer)
         else:
             attn_mask_BL = torch.ones_like(tokens_BL, dtype=torch.bool)
 
-        attn_mask_BL = attn_mask_BL.to(device=sae_act_BLF.device)
-
-        sae_act_BLF = sae_act_BLF * attn_mask_BL[:, :, None]
         total_tokens += attn_mask_BL.sum().item()
 
-        running_sum_F += einops.reduce(sae_act_BLF, "B L F -> F", "sum")
+        for sae, running_sum_F, sae_resid_BLD in zip(
+            saes, running_sums_F, _get_resid_on_sae_devices(resid_BLD, saes)
+        ):
+            sae_act_BLF: Float[torch.Tensor, "batch seq_len d_sae"] = sae.encode(sae_resid_BLD)
+            # make act to zero or one
+            sae_act_BLF = (sae_act_BLF > 0).to(dtype=torch.float32)
+
+            sae_act_BLF = sae_act_BLF * attn_mask_BL.to(device=sae_act_BLF.device)[:, :, None]
+
+            running_sum_F += einops.reduce(sae_act_BLF, "B L F -> F", "sum")
 
-    return running_sum_F / total_tokens
+    return [running_sum_F / total_tokens for running_sum_F in running_sums_F]
 
 
 @jaxtyped(typechecker=beartype)
 @torch.no_grad
 def create_meaned_model_activations(
-    all_llm_activations_BLD: dict[str, Float[torch.Tensor, "batch_size seq_len d_model"]],
+    all_llm_activations_BLD: dict[
+        str, Float[torch.Tensor, "batch_size seq_len d_model"] | RaggedActivations
+    ],
+    batch_size: int = 1024,
 ) -> dict[str, Float[torch.Tensor, "batch_size d_model"]]:
     """Mean activations across the sequence length dimension for each class while ignoring padding tokens.
-    VERY IMPORTANT NOTE: We assume that the activations have been zeroed out for masked tokens."""
+    VERY IMPORTANT NOTE: For padded activations, we assume that the activations have been zeroed out for masked tokens.
+    Ragged activations only contain real tokens. Quantized ragged activations are dequantized
+    batch_size examples at a time."""
 
     all_llm_activations_BD = {}
     for class_name in all_llm_activations_BLD:
         acts_BLD = all_llm_activations_BLD[class_name]
+
+        if isinstance(acts_BLD, RaggedActivations):
+            all_llm_activations_BD[class_name] = torch.cat(
+                [
+                    acts_BLD[i : i + batch_size].mean_pool()
+                    for i in range(0, len(acts_BLD), batch_size)
+                ],
+                dim=0,
+            )
+            continue
+
         dtype = acts_BLD.dtype
 
         activations_BL = einops.reduce(acts_BLD, "B L D -> B L", "sum")
@@ -221,86 +692,331 @@ def create_meaned_model_activations(
     return all_llm_activations_BD
 
 
+@torch.no_grad
+def _get_sae_meaned_batch(
+    sae: SAE | Any,
+    acts_BLD: Float[torch.Tensor, "batch seq_len d_model"] | RaggedActivations,
+) -> Float[torch.Tensor, "batch d_sae"]:
+    dtype = sae.dtype
+
+    if isinstance(acts_BLD, RaggedActivations):
+        acts_TF = sae.encode(acts_BLD.acts_TD)
+        return segment_mean(acts_TF, acts_BLD).to(dtype=dtype)
+
+    acts_BLF = sae.encode(acts_BLD)
+
+    activations_BL = einops.reduce(acts_BLD, "B L D -> B L", "sum")
+    nonzero_acts_BL = (activations_BL != 0.0).to(dtype=dtype)
+    nonzero_acts_B = einops.reduce(nonzero_acts_BL, "B L -> B", "sum")
+
+    acts_BLF = acts_BLF * nonzero_acts_BL[:, :, None]
+    acts_BF = einops.reduce(acts_BLF, "B L F -> B F", "sum") / nonzero_acts_B[:, None]
+    return acts_BF.to(dtype=dtype)
+
+
 @jaxtyped(typechecker=beartype)
 @torch.no_grad
 def get_sae_meaned_activations(
-    all_llm_activations_BLD: dict[str, Float[torch.Tensor, "batch_size seq_len d_model"]],
+    all_llm_activations_BLD: dict[
+        str, Float[torch.Tensor, "batch_size seq_len d_model"] | RaggedActivations
+    ],
     sae: SAE | Any,
     sae_batch_size: int,
-) -> dict[str, Float[torch.Tensor, "batch_size d_sae"]]:
+    sparse_output: bool = False,
+) -> dict[str, Float[torch.Tensor, "batch_size d_sae"] | SparsePooledActivations]:
     """Encode LLM activations with an SAE and mean across the sequence length dimension for each class while ignoring padding tokens.
-    VERY IMPORTANT NOTE: We assume that the activations have been zeroed out for masked tokens."""
+    VERY IMPORTANT NOTE: For padded activations, we assume that the activations have been zeroed out for masked tokens.
+    Ragged activations only contain real tokens, so only real tokens are encoded.
+    sae_batch_size is the number of examples encoded at once in both cases.
+    With sparse_output, each batch of meaned activations is converted to CSR format on the SAE device,
+    so the dense [batch_size, d_sae] activations only ever exist for one batch."""
+    all_sae_activations_BF = get_sae_meaned_activations_multiple_saes(
+        all_llm_activations_BLD, [sae], sae_batch_size, sparse_output
+    )
+    return all_sae_activations_BF[0]
 
-    dtype = sae.dtype
 
-    all_sae_activations_BF = {}
+@jaxtyped(typechecker=beartype)
+@torch.no_grad
+def get_sae_meaned_activations_multiple_saes(
+    all_llm_activations_BLD: dict[
+        str, Float[torch.Tensor, "batch_size seq_len d_model"] | RaggedActivations
+    ],
+    saes: list[SAE | Any],
+    sae_batch_size: int,
+    sparse_output: bool = False,
+) -> list[dict[str, Float[torch.Tensor, "batch_size d_sae"] | SparsePooledActivations]]:
+    """get_sae_meaned_activations() for several SAEs trained on the same hook. Each batch of LLM activations
+    is read and moved to the SAE device once, then encoded by every SAE.
+    Returns one class_name -> activations dict per SAE, in the order of saes."""
+
+    all_sae_activations_BF = [{} for _ in saes]
     for class_name in all_llm_activations_BLD:
         all_acts_BLD = all_llm_activations_BLD[class_name]
 
-        all_acts_BF = []
+        all_acts_BF = [[] for _ in saes]
 
         for i in range(0, len(all_acts_BLD), sae_batch_size):
             acts_BLD = all_acts_BLD[i : i + sae_batch_size]
-            acts_BLF = sae.encode(acts_BLD)
-
-            activations_BL = einops.reduce(acts_BLD, "B L D -> B L", "sum")
-            nonzero_acts_BL = (activations_BL != 0.0).to(dtype=dtype)
-            nonzero_acts_B = einops.reduce(nonzero_acts_BL, "B L -> B", "sum")
 
-            acts_BLF = acts_BLF * nonzero_acts_BL[:, :, None]
-            acts_BF = einops.reduce(acts_BLF, "B L F -> B F", "sum") / nonzero_acts_B[:, None]
-            acts_BF = acts_BF.to(dtype=dtype)
+            acts_by_device = {}
+            for sae_idx, sae in enumerate(saes):
+                device = torch.device(sae.device)
+                if device not in acts_by_device:
+                    acts_by_device[device] = acts_BLD.to(device=device)
+                    if isinstance(acts_BLD, RaggedActivations):
+                        # Quantized activations are dequantized one batch at a time
+                        acts_by_device[device] = acts_by_device[device].dequantize()
+                acts_BF = _get_sae_meaned_batch(sae, acts_by_device[device])
+                if sparse_output:
+                    acts_BF = SparsePooledActivations.from_dense(acts_BF)
+                all_acts_BF[sae_idx].append(acts_BF)
+
+        for sae_idx in range(len(saes)):
+            if sparse_output:
+                all_sae_activations_BF[sae_idx][class_name] = SparsePooledActivations.cat(
+                    all_acts_BF[sae_idx]
+                )
+            else:
+                all_sae_activations_BF[sae_idx][class_name] = torch.cat(
+                    all_acts_BF[sae_idx], dim=0
+                )
 
-            all_acts_BF.append(acts_BF)
+    return all_sae_activations_BF
 
-        all_acts_BF = torch.cat(all_acts_BF, dim=0)
-        all_sae_activations_BF[class_name] = all_acts_BF
 
-    return all_sae_activations_BF
+def get_activation_shard_path(artifacts_dir: str, chunk_idx: int, num_chunks: int) -> str:
+    """chunk_idx is 0-based, the file name is 1-based."""
+    return os.path.join(artifacts_dir, f"activations_{chunk_idx + 1}_of_{num_chunks}.bin")
 
 
-@jaxtyped(typechecker=beartype)
 @torch.no_grad()
-def save_activations(
+def _save_activation_shards(
     tokens: Int[torch.Tensor, "dataset_size seq_len"],
     model: HookedTransformer,
     batch_size: int,
-    layer: int,
-    hook_name: str,
+    hook_dirs: dict[str, str],
+    stop_at_layer: Optional[int],
     num_chunks: int,
     save_size: int,
-    artifacts_dir: str,
+    quantization_params: Optional[dict[str, activation_quantization.QuantizationParams]] = None,
 ):
-    """Save transformer activations to disk in chunks for later processing.
-
-    Saves files named 'activations_XX_of_YY.pt' where XX is the chunk number (1-based)
-    and YY is num_chunks. Each file contains a dict with 'activations' and 'tokens' keys."""
     dataset_size = tokens.shape[0]
+    hook_names = list(hook_dirs.keys())
 
     for save_idx in range(num_chunks):
         start_idx = save_idx * save_size
         end_idx = min((save_idx + 1) * save_size, dataset_size)
         tokens_SL = tokens[start_idx:end_idx]
-        activations_list = []
+        writers = {
+            hook_name: activation_shards.ActivationShardWriter(
+                get_activation_shard_path(hook_dir, save_idx, num_chunks)
+            )
+            for hook_name, hook_dir in hook_dirs.items()
+        }
 
         for i in tqdm(
-            range(0, tokens_SL.shape[0], batch_size), desc=f"Saving chunk {save_idx+1}/{num_chunks}"
+            range(0, tokens_SL.shape[0], batch_size),
+            desc=f"Saving chunk {save_idx+1}/{num_chunks}",
         ):
             tokens_BL = tokens_SL[i : i + batch_size]
-            _, cache = model.run_with_cache(
-                tokens_BL, stop_at_layer=layer + 1, names_filter=hook_name
+            acts_BLD = _run_with_activation_hooks(tokens_BL, model, hook_names, stop_at_layer)
+
+            for hook_name, writer in writers.items():
+                if quantization_params is None:
+                    writer.append("activations", acts_BLD[hook_name])
+                else:
+                    writer.append(
+                        "activations",
+                        activation_quantization.quantize(
+                            acts_BLD[hook_name], quantization_params[hook_name]
+                        ),
+                    )
+
+        for hook_name, writer in writers.items():
+            writer.write("tokens", tokens_SL)
+            writer.metadata.update(
+                {"hook_name": hook_name, "layer": get_layer_from_hook_name(hook_name)}
             )
-            resid_BLD = cache[hook_name]
+            if quantization_params is not None:
+                params = quantization_params[hook_name].to_dict()
+                writer.write("scale", params["scale"])
+                writer.write("zero_point", params["zero_point"])
+                writer.metadata.update({"quantization": "int8", "dtype": params["dtype"]})
+            writer.close()
+            print(f"Saved activations and tokens to {writer.shard_path}")
+
+
+@torch.no_grad()
+def calibrate_activation_quantization(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    batch_size: int,
+    hook_names: list[str],
+    num_calibration_samples: int,
+) -> dict[str, activation_quantization.QuantizationParams]:
+    """Per-channel int8 quantization parameters for each hook, from the activations of the first
+    num_calibration_samples sequences of tokens."""
+    observers = {
+        hook_name: activation_quantization.ChannelRangeObserver() for hook_name in hook_names
+    }
+    stop_at_layer = get_stop_at_layer(hook_names)
+    calibration_tokens = tokens[:num_calibration_samples]
+
+    for i in tqdm(
+        range(0, calibration_tokens.shape[0], batch_size), desc="Calibrating quantization"
+    ):
+        tokens_BL = calibration_tokens[i : i + batch_size]
+        acts_BLD = _run_with_activation_hooks(tokens_BL, model, hook_names, stop_at_layer)
+        for hook_name, observer in observers.items():
+            observer.update(acts_BLD[hook_name])
+
+    return {hook_name: observer.get_params() for hook_name, observer in observers.items()}
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad()
+def save_activations(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    batch_size: int,
+    layer: int,
+    hook_name: str,
+    num_chunks: int,
+    save_size: int,
+    artifacts_dir: str,
+    quantize: bool = False,
+    num_calibration_samples: int = 256,
+):
+    """Save transformer activations to disk in chunks for later processing.
+
+    Saves memory-mapped shards named 'activations_XX_of_YY.bin' (plus a JSON header) where XX is the
+    chunk number (1-based) and YY is num_chunks. Each shard contains 'activations' and 'tokens' arrays.
+    Activations are streamed to disk batch by batch, so host memory never holds more than one batch.
+
+    If quantize is True, activations are stored as int8 with a per-channel scale and zero point,
+    calibrated on the first num_calibration_samples sequences. This makes shards 2-4x smaller.
+    encode_precomputed_activations() dequantizes them on the SAE device. Use
+    activation_quantization.get_quantization_drift() to check the effect on the SAE activations."""
+    quantization_params = None
+    if quantize:
+        quantization_params = calibrate_activation_quantization(
+            tokens, model, batch_size, [hook_name], num_calibration_samples
+        )
+
+    _save_activation_shards(
+        tokens,
+        model,
+        batch_size,
+        {hook_name: artifacts_dir},
+        layer + 1,
+        num_chunks,
+        save_size,
+        quantization_params,
+    )
+
+
+@jaxtyped(typechecker=beartype)
+@torch.no_grad()
+def save_activations_multiple_hooks(
+    tokens: Int[torch.Tensor, "dataset_size seq_len"],
+    model: HookedTransformer,
+    batch_size: int,
+    hook_names: list[str],
+    num_chunks: int,
+    save_size: int,
+    artifacts_dir: str,
+    quantize: bool = False,
+    num_calibration_samples: int = 256,
+) -> dict[str, str]:
+    """save_activations() for several hooks from a single forward pass per batch.
+
+    Shards for each hook are written to artifacts_dir/<hook_name>/. Returns hook_name -> activation_dir,
+    which can be passed to encode_precomputed_activations() for the SAEs at that hook.
+    With quantize, every hook gets its own quantization parameters."""
+    hook_dirs = {hook_name: os.path.join(artifacts_dir, hook_name) for hook_name in hook_names}
+    for hook_dir in hook_dirs.values():
+        os.makedirs(hook_dir, exist_ok=True)
+
+    quantization_params = None
+    if quantize:
+        quantization_params = calibrate_activation_quantization(
+            tokens, model, batch_size, hook_names, num_calibration_samples
+        )
 
-            activations_list.append(resid_BLD.cpu())
+    _save_activation_shards(
+        tokens,
+        model,
+        batch_size,
+        hook_dirs,
+        get_stop_at_layer(hook_names),
+        num_chunks,
+        save_size,
+        quantization_params,
+    )
+    return hook_dirs
+
+
+def load_precomputed_activations(
+    activation_dir: str, chunk_idx: int, num_chunks: int
+) -> dict[str, torch.Tensor]:
+    """Open a chunk written by save_activations(). Shards are memory-mapped, chunks written by
+    older versions (activations_XX_of_YY.pt) are loaded fully into memory."""
+    shard_path = get_activation_shard_path(activation_dir, chunk_idx, num_chunks)
+    if activation_shards.shard_exists(shard_path):
+        return activation_shards.load_shard(shard_path)
+
+    legacy_path = os.path.join(activation_dir, f"activations_{chunk_idx + 1}_of_{num_chunks}.pt")
+    return torch.load(legacy_path)
+
+
+def load_quantization_params(
+    activation_dir: str, chunk_idx: int, num_chunks: int
+) -> Optional[activation_quantization.QuantizationParams]:
+    """The quantization parameters of a chunk saved with quantize=True, else None."""
+    shard_path = get_activation_shard_path(activation_dir, chunk_idx, num_chunks)
+    if not activation_shards.shard_exists(shard_path):
+        return None
+
+    metadata = activation_shards.read_shard_header(shard_path)["metadata"]
+    if metadata.get("quantization") != "int8":
+        return None
+
+    data = activation_shards.load_shard(shard_path)
+    return activation_quantization.QuantizationParams.from_dict(
+        {"scale": data["scale"].clone(), "zero_point": data["zero_point"].clone(), **metadata}
+    )
+
+
+def _iter_precomputed_batches(
+    activation_dir: str,
+    num_chunks: int,
+    sae_batch_size: int,
+    devices: list[torch.device],
+):
+    """Yields (tokens_BL, {device: (resid_BLD, copy_event)}, {device: quantization_params} or None)
+    for every batch of the saved chunks. Reading from the memory-mapped shard and starting the device
+    copies happens here, so running this in a background thread takes disk I/O and transfers off the
+    critical path. Quantized activations are copied as int8, for the consumer to dequantize."""
+    for save_idx in range(num_chunks):
+        data = load_precomputed_activations(activation_dir, save_idx, num_chunks)
+        resid_SLD = data["activations"]
+        tokens_SL = data["tokens"]
 
-        activations_SLD = torch.cat(activations_list, dim=0)
-        save_path = os.path.join(artifacts_dir, f"activations_{save_idx + 1}_of_{num_chunks}.pt")
+        quantization_params = load_quantization_params(activation_dir, save_idx, num_chunks)
+        if quantization_params is not None:
+            quantization_params = {device: quantization_params.to(device) for device in devices}
 
-        file_contents = {"activations": activations_SLD, "tokens": tokens_SL.cpu()}
+        for batch_start in range(0, resid_SLD.shape[0], sae_batch_size):
+            batch_end = batch_start + sae_batch_size
+            # Slicing a memory-mapped shard is lazy, clone() performs the disk read here
+            resid_BLD = resid_SLD[batch_start:batch_end].clone()
+            tokens_BL = tokens_SL[batch_start:batch_end].clone()
 
-        torch.save(file_contents, save_path)
-        print(f"Saved activations and tokens to {save_path}")
+            resid_copies = {
+                device: prefetch_utils.copy_to_device_async(resid_BLD, device) for device in devices
+            }
+            yield tokens_BL, resid_copies, quantization_params
 
 
 @jaxtyped(typechecker=beartype)
@@ -313,63 +1029,98 @@ def encode_precomputed_activations(
     mask_bos_pad_eos_tokens: bool = False,
     selected_latents: Optional[list[int]] = None,
     activation_dtype: Optional[torch.dtype] = None,
+    tokenizer: Optional[AutoTokenizer | Any] = None,
+    prefetch_depth: int = 2,
 ) -> Float[torch.Tensor, "dataset_size seq_len d_sae"]:
     """Process saved activations through an SAE model, handling memory constraints through batching.
 
     This is the second stage of activation processing, meant to be run after save_activations().
-    It loads the saved activation chunks, processes them through the SAE, and optionally:
-    - Applies masking for special tokens
+    It opens the saved activation shards, processes them through the SAE, and optionally:
+    - Applies masking for special tokens (using tokenizer, or sae.model.tokenizer if not given)
     - Selects specific SAE features
     - Converts to a specified dtype
 
-    The batched processing allows handling large datasets that don't fit in memory.
+    Shards are memory-mapped, so only the current batch of LLM activations is read from disk
+    and moved to the SAE device. A background thread reads and transfers up to prefetch_depth batches
+    ahead while the current batch is being encoded (prefetch_depth=0 disables this).
+    Activations saved with quantize=True are moved as int8 and dequantized on the SAE device.
 
     Returns:
         Tensor of encoded activations [dataset_size, seq_len, d_sae]
         If selected_latents is provided, d_sae will be len(selected_latents)
         Otherwise, d_sae will be the full SAE feature dimension"""
+    if mask_bos_pad_eos_tokens and tokenizer is None:
+        tokenizer = sae.model.tokenizer
+
+    return encode_precomputed_activations_multiple_saes(
+        [sae],
+        sae_batch_size,
+        num_chunks,
+        activation_dir,
+        mask_bos_pad_eos_tokens,
+        None if selected_latents is None else [selected_latents],
+        activation_dtype,
+        tokenizer,
+        prefetch_depth,
+    )[0]
 
-    all_sae_acts = []
-
-    for save_idx in range(num_chunks):
-        activation_file = os.path.join(
-            activation_dir, f"activations_{save_idx + 1}_of_{num_chunks}.pt"
-        )
-        data = torch.load(activation_file)
-        resid_SLD = data["activations"].to(device=sae.device)
-        tokens_SL = data["tokens"]
-
-        sae_act_batches = []
-        num_samples = resid_SLD.shape[0]
-
-        for batch_start in tqdm(
-            range(0, num_samples, sae_batch_size),
-            desc=f"Encoding chunk {save_idx + 1}/{num_chunks}",
-        ):
-            batch_end = min(batch_start + sae_batch_size, num_samples)
-            resid_BLD = resid_SLD[batch_start:batch_end]
-            tokens_BL = tokens_SL[batch_start:batch_end]
 
-            sae_act_BLF = sae.encode(resid_BLD)
-
-            if selected_latents is not None:
-                sae_act_BLF = sae_act_BLF[:, :, selected_latents]
-
-            if mask_bos_pad_eos_tokens:
-                attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, sae.model.tokenizer)
-            else:
-                attn_mask_BL = torch.ones_like(tokens_BL, dtype=torch.bool)
-
-            attn_mask_BL = attn_mask_BL.to(device=sae_act_BLF.device)
-            sae_act_BLF = sae_act_BLF * attn_mask_BL[:, :, None]
-
-            if activation_dtype is not None:
-                sae_act_BLF = sae_act_BLF.to(dtype=activation_dtype)
-
-            sae_act_batches.append(sae_act_BLF)
+@jaxtyped(typechecker=beartype)
+@torch.no_grad()
+def encode_precomputed_activations_multiple_saes(
+    saes: list[SAE | Any],
+    sae_batch_size: int,
+    num_chunks: int,
+    activation_dir: str,
+    mask_bos_pad_eos_tokens: bool = False,
+    selected_latents: Optional[list[Optional[list[int]]]] = None,
+    activation_dtype: Optional[torch.dtype] = None,
+    tokenizer: Optional[AutoTokenizer | Any] = None,
+    prefetch_depth: int = 2,
+) -> list[Float[torch.Tensor, "dataset_size seq_len d_sae"]]:
+    """encode_precomputed_activations() for several SAEs trained on the hook the activations were saved from.
+    Every batch is read from disk and moved to each SAE device once, then encoded by all SAEs.
+    selected_latents, if given, has one entry (or None) per SAE. tokenizer is required if
+    mask_bos_pad_eos_tokens is True. Returns one tensor per SAE, in the order of saes."""
+    if selected_latents is None:
+        selected_latents = [None] * len(saes)
+    assert len(selected_latents) == len(saes)
+    if mask_bos_pad_eos_tokens:
+        assert tokenizer is not None, "A tokenizer is required to mask BOS, PAD and EOS tokens"
+
+    all_sae_acts = [[] for _ in saes]
+    devices = list(dict.fromkeys(torch.device(sae.device) for sae in saes))
+
+    batches = _iter_precomputed_batches(activation_dir, num_chunks, sae_batch_size, devices)
+
+    for tokens_BL, resid_copies, quantization_params in tqdm(
+        prefetch_utils.prefetch(batches, prefetch_depth),
+        desc="Encoding precomputed activations",
+    ):
+        if mask_bos_pad_eos_tokens:
+            attn_mask_BL = get_bos_pad_eos_mask(tokens_BL, tokenizer)
+        else:
+            attn_mask_BL = torch.ones_like(tokens_BL, dtype=torch.bool)
 
-        sae_act_SLF = torch.cat(sae_act_batches, dim=0)
-        all_sae_acts.append(sae_act_SLF)
+        resid_by_device = {
+            device: prefetch_utils.wait_for_copy(resid_BLD, event)
+            for device, (resid_BLD, event) in resid_copies.items()
+        }
+        if quantization_params is not None:
+            resid_by_device = {
+                device: activation_quantization.dequantize(resid_BLD, quantization_params[device])
+                for device, resid_BLD in resid_by_device.items()
+            }
+
+        for sae_idx, sae in enumerate(saes):
+            all_sae_acts[sae_idx].append(
+                _encode_masked(
+                    sae,
+                    resid_by_device[torch.device(sae.device)],
+                    attn_mask_BL,
+                    selected_latents[sae_idx],
+                    activation_dtype,
+                )
+            )
 
-    all_sae_acts = torch.cat(all_sae_acts, dim=0)
-    return all_sae_acts
+    return [torch.cat(sae_acts, dim=0) for sae_acts in all_sae_acts]
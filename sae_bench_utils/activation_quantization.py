@@ -0,0 +1,193 @@
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+import torch
+from jaxtyping import Float, Int
+from sae_lens import SAE
+
+QMIN = -128
+QMAX = 127
+
+# Rows processed at once by quantize() and dequantize(), bounding their temporary memory
+_CHUNK_ROWS = 65536
+
+
+@dataclass
+class QuantizationParams:
+    """Per-channel asymmetric int8 quantization of activations: x ~= (q - zero_point) * scale.
+
+    dtype is the dtype of the original activations, which dequantize() restores."""
+
+    scale_D: Float[torch.Tensor, "d_model"]
+    zero_point_D: Int[torch.Tensor, "d_model"]
+    dtype: torch.dtype
+
+    def to(self, device: torch.device | str) -> "QuantizationParams":
+        return QuantizationParams(
+            self.scale_D.to(device=device), self.zero_point_D.to(device=device), self.dtype
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """Plain tensors and strings only, so it can be loaded with torch.load(weights_only=True)."""
+        return {
+            "scale": self.scale_D,
+            "zero_point": self.zero_point_D,
+            "dtype": str(self.dtype).removeprefix("torch."),
+        }
+
+    @staticmethod
+    def from_dict(state: dict[str, Any]) -> "QuantizationParams":
+        return QuantizationParams(
+            state["scale"], state["zero_point"], getattr(torch, state["dtype"])
+        )
+
+
+class ChannelRangeObserver:
+    """Tracks the per-channel min and max of activations over a calibration pass.
+
+    Usage:
+        observer = ChannelRangeObserver()
+        for acts_BLD in calibration_batches:
+            observer.update(acts_BLD)
+        params = observer.get_params()"""
+
+    def __init__(self):
+        self.min_D: Optional[torch.Tensor] = None
+        self.max_D: Optional[torch.Tensor] = None
+        self.dtype: Optional[torch.dtype] = None
+
+    @torch.no_grad()
+    def update(self, acts: Float[torch.Tensor, "... d_model"]):
+        acts_ND = acts.reshape(-1, acts.shape[-1])
+        if acts_ND.shape[0] == 0:
+            return
+        batch_min_D = acts_ND.min(dim=0).values.float()
+        batch_max_D = acts_ND.max(dim=0).values.float()
+
+        if self.min_D is None:
+            self.min_D, self.max_D, self.dtype = batch_min_D, batch_max_D, acts.dtype
+        else:
+            self.min_D = torch.minimum(self.min_D, batch_min_D.to(self.min_D.device))
+            self.max_D = torch.maximum(self.max_D, batch_max_D.to(self.max_D.device))
+
+    def get_params(self) -> QuantizationParams:
+        assert self.min_D is not None, "No activations were observed"
+        # Zero must be exactly representable, so masked (zeroed out) positions stay zero
+        min_D = torch.clamp(self.min_D, max=0.0)
+        max_D = torch.clamp(self.max_D, min=0.0)
+
+        scale_D = (max_D - min_D) / (QMAX - QMIN)
+        scale_D = torch.where(scale_D > 0, scale_D, torch.ones_like(scale_D))
+        zero_point_D = (QMIN - torch.round(min_D / scale_D)).to(torch.int32)
+        return QuantizationParams(scale_D, zero_point_D, self.dtype)
+
+
+def calibrate(acts_list: Iterable[Float[torch.Tensor, "... d_model"]]) -> QuantizationParams:
+    """Quantization parameters covering the range of every channel in acts_list."""
+    observer = ChannelRangeObserver()
+    for acts in acts_list:
+        observer.update(acts)
+    return observer.get_params()
+
+
+@torch.no_grad()
+def quantize(
+    acts: Float[torch.Tensor, "... d_model"], params: QuantizationParams
+) -> Int[torch.Tensor, "... d_model"]:
+    """Values outside the calibrated range are clamped."""
+    params = params.to(acts.device)
+    acts_ND = acts.reshape(-1, acts.shape[-1])
+    quantized_ND = torch.empty(acts_ND.shape, dtype=torch.int8, device=acts.device)
+
+    for start in range(0, acts_ND.shape[0], _CHUNK_ROWS):
+        chunk_ND = acts_ND[start : start + _CHUNK_ROWS].float()
+        chunk_ND = torch.round(chunk_ND / params.scale_D) + params.zero_point_D
+        quantized_ND[start : start + _CHUNK_ROWS] = chunk_ND.clamp_(QMIN, QMAX).to(torch.int8)
+
+    return quantized_ND.view(acts.shape)
+
+
+@torch.no_grad()
+def dequantize(
+    quantized: Int[torch.Tensor, "... d_model"], params: QuantizationParams
+) -> Float[torch.Tensor, "... d_model"]:
+    """Runs on the device of quantized, so move the int8 tensor to the device first."""
+    params = params.to(quantized.device)
+    quantized_ND = quantized.reshape(-1, quantized.shape[-1])
+    acts_ND = torch.empty(quantized_ND.shape, dtype=params.dtype, device=quantized.device)
+
+    for start in range(0, quantized_ND.shape[0], _CHUNK_ROWS):
+        chunk_ND = quantized_ND[start : start + _CHUNK_ROWS].float() - params.zero_point_D
+        acts_ND[start : start + _CHUNK_ROWS] = chunk_ND * params.scale_D
+
+    return acts_ND.view(quantized.shape)
+
+
+@torch.no_grad()
+def get_quantization_drift(
+    sae: SAE | Any,
+    acts: Float[torch.Tensor, "... d_model"],
+    params: QuantizationParams,
+    batch_size: int = 4096,
+) -> dict[str, float]:
+    """Reports how much int8 quantization of acts changes them and their SAE encodings.
+
+    Use this on a sample of activations to check that quantized artifacts are accurate enough
+    before relying on them. Returns:
+        activation_relative_mse: ||x - x_q||^2 / ||x||^2 of the LLM activations
+        sae_acts_relative_mse: the same for the SAE activations
+        sae_acts_cosine_similarity: mean per-token cosine similarity of the SAE activations
+        active_latents_jaccard: mean per-token overlap of the sets of active latents
+        l0_original, l0_quantized: mean number of active latents per token"""
+    acts_ND = acts.reshape(-1, acts.shape[-1])
+
+    totals = {
+        "activation_error": 0.0,
+        "activation_norm": 0.0,
+        "sae_error": 0.0,
+        "sae_norm": 0.0,
+        "cosine_similarity": 0.0,
+        "jaccard": 0.0,
+        "l0_original": 0.0,
+        "l0_quantized": 0.0,
+    }
+
+    for start in range(0, acts_ND.shape[0], batch_size):
+        original_ND = acts_ND[start : start + batch_size].to(device=sae.device, dtype=sae.dtype)
+        quantized_ND = dequantize(quantize(original_ND, params), params).to(dtype=sae.dtype)
+
+        original_NF = sae.encode(original_ND).float()
+        quantized_NF = sae.encode(quantized_ND).float()
+        original_ND, quantized_ND = original_ND.float(), quantized_ND.float()
+
+        totals["activation_error"] += (original_ND - quantized_ND).pow(2).sum().item()
+        totals["activation_norm"] += original_ND.pow(2).sum().item()
+        totals["sae_error"] += (original_NF - quantized_NF).pow(2).sum().item()
+        totals["sae_norm"] += original_NF.pow(2).sum().item()
+
+        cosine_N = torch.nn.functional.cosine_similarity(original_NF, quantized_NF, dim=-1)
+        # Tokens where both encodings are all zero are identical
+        both_zero_N = (original_NF.norm(dim=-1) == 0) & (quantized_NF.norm(dim=-1) == 0)
+        totals["cosine_similarity"] += torch.where(both_zero_N, 1.0, cosine_N).sum().item()
+
+        active_original_NF = original_NF > 0
+        active_quantized_NF = quantized_NF > 0
+        intersection_N = (active_original_NF & active_quantized_NF).sum(dim=-1)
+        union_N = (active_original_NF | active_quantized_NF).sum(dim=-1)
+        jaccard_N = torch.where(union_N > 0, intersection_N / union_N.clamp(min=1), 1.0)
+        totals["jaccard"] += jaccard_N.sum().item()
+
+        totals["l0_original"] += active_original_NF.sum().item()
+        totals["l0_quantized"] += active_quantized_NF.sum().item()
+
+    num_tokens = max(acts_ND.shape[0], 1)
+    return {
+        "activation_relative_mse": (
+            totals["activation_error"] / max(totals["activation_norm"], 1e-12)
+        ),
+        "sae_acts_relative_mse": totals["sae_error"] / max(totals["sae_norm"], 1e-12),
+        "sae_acts_cosine_similarity": totals["cosine_similarity"] / num_tokens,
+        "active_latents_jaccard": totals["jaccard"] / num_tokens,
+        "l0_original": totals["l0_original"] / num_tokens,
+        "l0_quantized": totals["l0_quantized"] / num_tokens,
+    }
@@ -0,0 +1,163 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import torch
+
+SHARD_FORMAT_VERSION = 1
+
+# Arrays inside a shard start on this byte boundary so that every dtype can be viewed in place.
+_ALIGNMENT = 64
+
+_DTYPE_TO_STR = {
+    torch.float32: "float32",
+    torch.float64: "float64",
+    torch.float16: "float16",
+    torch.bfloat16: "bfloat16",
+    torch.int64: "int64",
+    torch.int32: "int32",
+    torch.int16: "int16",
+    torch.int8: "int8",
+    torch.uint8: "uint8",
+    torch.bool: "bool",
+}
+_STR_TO_DTYPE = {v: k for k, v in _DTYPE_TO_STR.items()}
+
+
+def get_shard_header_path(shard_path: str) -> str:
+    return f"{shard_path}.json"
+
+
+def shard_exists(shard_path: str) -> bool:
+    return os.path.exists(shard_path) and os.path.exists(get_shard_header_path(shard_path))
+
+
+def _tensor_to_bytes(tensor: torch.Tensor) -> memoryview:
+    # numpy has no bfloat16, so write every dtype through a byte view
+    tensor = tensor.detach().contiguous().cpu()
+    return memoryview(tensor.view(-1).view(torch.uint8).numpy())
+
+
+class ActivationShardWriter:
+    """Writes a shard incrementally: arrays are a flat binary file plus a JSON header holding
+    their dtype, shape and byte offset. The leading array can be appended to batch by batch
+    along dim 0, so the whole shard never needs to be resident in memory.
+
+    Usage:
+        with ActivationShardWriter(path) as writer:
+            for acts_BLD in ...:
+                writer.append("activations", acts_BLD)
+            writer.write("tokens", tokens_SL)"""
+
+    def __init__(self, shard_path: str):
+        self.shard_path = shard_path
+        self.arrays: dict[str, dict] = {}
+        self.metadata: dict = {}
+        self._appending: Optional[str] = None
+        self._file = open(shard_path, "wb")
+
+    def _align(self):
+        pad = -self._file.tell() % _ALIGNMENT
+        if pad:
+            self._file.write(b"\0" * pad)
+
+    def append(self, name: str, tensor: torch.Tensor):
+        """Append along dim 0. Only the most recently started array can be appended to."""
+        if name not in self.arrays:
+            if tensor.dtype not in _DTYPE_TO_STR:
+                raise ValueError(f"Unsupported shard dtype: {tensor.dtype}")
+            self._align()
+            self.arrays[name] = {
+                "dtype": _DTYPE_TO_STR[tensor.dtype],
+                "shape": [0] + list(tensor.shape[1:]),
+                "offset": self._file.tell(),
+            }
+            self._appending = name
+        elif self._appending != name:
+            raise ValueError(f"Cannot append to {name} after another array has been written")
+
+        entry = self.arrays[name]
+        if (
+            list(tensor.shape[1:]) != entry["shape"][1:]
+            or _DTYPE_TO_STR[tensor.dtype] != entry["dtype"]
+        ):
+            raise ValueError(
+                f"Expected {name} batches of shape [*, {entry['shape'][1:]}] and dtype {entry['dtype']}, "
+                f"got {list(tensor.shape)} and {tensor.dtype}"
+            )
+
+        self._file.write(_tensor_to_bytes(tensor))
+        entry["shape"][0] += tensor.shape[0]
+
+    def write(self, name: str, tensor: torch.Tensor):
+        """Write a complete array in one go."""
+        if name in self.arrays:
+            raise ValueError(f"Array {name} has already been written")
+        self.append(name, tensor)
+        self._appending = None
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        header = {
+            "format_version": SHARD_FORMAT_VERSION,
+            "arrays": self.arrays,
+            "metadata": self.metadata,
+        }
+        # The header is written last so a shard without one is known to be incomplete
+        with open(get_shard_header_path(self.shard_path), "w") as f:
+            json.dump(header, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def read_shard_header(shard_path: str) -> dict:
+    with open(get_shard_header_path(shard_path)) as f:
+        header = json.load(f)
+    if header["format_version"] > SHARD_FORMAT_VERSION:
+        raise ValueError(
+            f"Shard {shard_path} has format version {header['format_version']}, "
+            f"this version of sae_bench supports up to {SHARD_FORMAT_VERSION}"
+        )
+    return header
+
+
+def load_shard(shard_path: str) -> dict[str, torch.Tensor]:
+    """Open every array in a shard as a memory-mapped CPU tensor. Nothing is read from disk
+    until it is accessed, so slicing out a batch and moving it to a device only pages in that batch.
+    The mapping is copy-on-write: modifying a returned tensor never modifies the file."""
+    header = read_shard_header(shard_path)
+
+    tensors = {}
+    for name, entry in header["arrays"].items():
+        dtype = _STR_TO_DTYPE[entry["dtype"]]
+        shape = entry["shape"]
+        num_bytes = int(np.prod(shape)) * torch.empty((), dtype=dtype).element_size()
+
+        if num_bytes == 0:
+            tensors[name] = torch.empty(shape, dtype=dtype)
+            continue
+
+        bytes_mmap = np.memmap(
+            shard_path, dtype=np.uint8, mode="c", offset=entry["offset"], shape=(num_bytes,)
+        )
+        tensors[name] = torch.from_numpy(bytes_mmap).view(dtype).view(shape)
+
+    return tensors
+
+
+def save_shard(shard_path: str, tensors: dict[str, torch.Tensor], metadata: Optional[dict] = None):
+    with ActivationShardWriter(shard_path) as writer:
+        for name, tensor in tensors.items():
+            writer.write(name, tensor)
+        if metadata is not None:
+            writer.metadata.update(metadata)
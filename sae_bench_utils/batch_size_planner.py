@@ -0,0 +1,209 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import psutil
+import torch
+from transformer_lens import HookedTransformer
+from transformer_lens.loading_from_pretrained import get_pretrained_model_config
+
+import sae_bench_utils.activation_collection as activation_collection
+import sae_bench_utils.general_utils as general_utils
+
+# Fraction of the free device memory the planned batches may use. The rest covers allocator
+# fragmentation and tensors the estimates below leave out.
+DEFAULT_MEMORY_FRACTION = 0.7
+
+MAX_LLM_BATCH_SIZE = 512
+MAX_SAE_BATCH_SIZE = 1024
+
+# The context length LLM_NAME_TO_BATCH_SIZE was tuned for
+_TABLE_CONTEXT_LENGTH = 128
+
+
+@dataclass
+class ModelDims:
+    """The dimensions of an LLM that determine its memory use."""
+
+    d_model: int
+    d_mlp: int
+    n_layers: int
+    n_heads: int
+    d_vocab: int
+
+    @staticmethod
+    def from_cfg(cfg: Any) -> "ModelDims":
+        """From a TransformerLens HookedTransformerConfig."""
+        d_mlp = cfg.d_mlp if cfg.d_mlp is not None else 4 * cfg.d_model
+        return ModelDims(cfg.d_model, d_mlp, cfg.n_layers, cfg.n_heads, cfg.d_vocab)
+
+    @property
+    def num_params(self) -> int:
+        block_params = 4 * self.d_model**2 + 2 * self.d_model * self.d_mlp
+        return self.n_layers * block_params + 2 * self.d_vocab * self.d_model
+
+
+def get_model_dims(model_name: str) -> Optional[ModelDims]:
+    """None if the TransformerLens config can't be loaded, e.g. offline or for an unknown model."""
+    try:
+        return ModelDims.from_cfg(get_pretrained_model_config(model_name))
+    except Exception as e:
+        print(f"Could not load the config of {model_name} for batch size planning: {e}")
+        return None
+
+
+def get_default_device() -> str:
+    """The device general_utils.setup_environment() selects."""
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_free_memory(device: str | torch.device) -> int:
+    """Bytes that can still be allocated on device, including memory cached by PyTorch."""
+    device = torch.device(device)
+    if device.type == "cuda":
+        free_bytes, _ = torch.cuda.mem_get_info(device)
+        cached_bytes = torch.cuda.memory_reserved(device) - torch.cuda.memory_allocated(device)
+        return free_bytes + cached_bytes
+    if device.type == "mps" and hasattr(torch.mps, "recommended_max_memory"):
+        return torch.mps.recommended_max_memory() - torch.mps.driver_allocated_memory()
+    return psutil.virtual_memory().available
+
+
+def estimate_llm_bytes_per_sequence(
+    dims: ModelDims,
+    context_length: int,
+    dtype: torch.dtype,
+    include_logits: bool = True,
+) -> int:
+    """Peak memory of one sequence in a no-grad forward pass. Only one block's intermediates are
+    alive at a time, so this is the residual stream plus the larger of the attention pattern and
+    the MLP hidden layer, plus the logits, which are upcast to float32 in loss computations."""
+    dtype_bytes = torch.empty((), dtype=dtype).element_size()
+    # The residual stream, its normalized copies and attention inputs / outputs
+    resid_bytes = 8 * context_length * dims.d_model * dtype_bytes
+    attn_bytes = 2 * dims.n_heads * context_length**2 * dtype_bytes
+    mlp_bytes = 2 * context_length * dims.d_mlp * dtype_bytes
+    logits_bytes = context_length * dims.d_vocab * 4 if include_logits else 0
+    return resid_bytes + max(attn_bytes, mlp_bytes) + logits_bytes
+
+
+def estimate_sae_bytes_per_sequence(
+    d_in: int, d_sae: int, context_length: int, dtype: torch.dtype
+) -> int:
+    """Memory of encoding one sequence: the input, the pre-activations and activations, and a
+    float32 copy of the activations made by most callers."""
+    dtype_bytes = torch.empty((), dtype=dtype).element_size()
+    return context_length * (d_in * dtype_bytes + d_sae * (2 * dtype_bytes + 4))
+
+
+def _fit_batch_size(memory_budget: int, bytes_per_sequence: int, max_batch_size: int) -> int:
+    """The largest power of 2 batch size within memory_budget, at least 1."""
+    batch_size = max(memory_budget // max(bytes_per_sequence, 1), 1)
+    batch_size = 2 ** (int(batch_size).bit_length() - 1)
+    return min(batch_size, max_batch_size)
+
+
+def plan_llm_batch_size(
+    model_name: str,
+    context_length: int,
+    llm_dtype: str,
+    device: Optional[str] = None,
+    memory_budget: Optional[int] = None,
+    include_logits: bool = True,
+    max_batch_size: int = MAX_LLM_BATCH_SIZE,
+) -> int:
+    """The largest llm_batch_size that should fit on device, estimated from the model dimensions.
+    Planned before the model is loaded, so the model weights are subtracted from the budget.
+
+    memory_budget defaults to DEFAULT_MEMORY_FRACTION of the free memory on device. If the model
+    config can't be loaded, falls back to LLM_NAME_TO_BATCH_SIZE, scaled to context_length."""
+    dims = get_model_dims(model_name)
+    if dims is None:
+        if model_name not in activation_collection.LLM_NAME_TO_BATCH_SIZE:
+            raise ValueError(f"Can't plan a batch size for {model_name}, set llm_batch_size")
+        table_batch_size = activation_collection.LLM_NAME_TO_BATCH_SIZE[model_name]
+        return max(table_batch_size * _TABLE_CONTEXT_LENGTH // context_length, 1)
+
+    dtype = general_utils.str_to_dtype(llm_dtype)
+    if memory_budget is None:
+        free_memory = get_free_memory(device or get_default_device())
+        weights_bytes = dims.num_params * torch.empty((), dtype=dtype).element_size()
+        memory_budget = int(DEFAULT_MEMORY_FRACTION * free_memory) - weights_bytes
+
+    bytes_per_sequence = estimate_llm_bytes_per_sequence(
+        dims, context_length, dtype, include_logits
+    )
+    batch_size = _fit_batch_size(memory_budget, bytes_per_sequence, max_batch_size)
+    print(
+        f"Planned llm_batch_size={batch_size} for {model_name} at context length {context_length}"
+    )
+    return batch_size
+
+
+def plan_sae_batch_size(
+    d_in: int,
+    d_sae: int,
+    context_length: int,
+    dtype: torch.dtype,
+    device: str | torch.device,
+    memory_budget: Optional[int] = None,
+    max_batch_size: int = MAX_SAE_BATCH_SIZE,
+) -> int:
+    """The largest sae_batch_size, in sequences, that should fit on device. Planned once the
+    model and SAE are loaded, so their weights are already excluded from the free memory."""
+    if memory_budget is None:
+        memory_budget = int(DEFAULT_MEMORY_FRACTION * get_free_memory(device))
+
+    bytes_per_sequence = estimate_sae_bytes_per_sequence(d_in, d_sae, context_length, dtype)
+    batch_size = _fit_batch_size(memory_budget, bytes_per_sequence, max_batch_size)
+    print(
+        f"Planned sae_batch_size={batch_size} for d_sae={d_sae} at context length {context_length}"
+    )
+    return batch_size
+
+
+def probe_batch_size(
+    run_batch: Callable[[int], Any], batch_size: int, min_batch_size: int = 1
+) -> int:
+    """Refine a planned batch size with a short probing run: halves batch_size until
+    run_batch(batch_size) doesn't run out of memory. Returns the first batch size that fit."""
+    while True:
+        try:
+            run_batch(batch_size)
+            return batch_size
+        except torch.OutOfMemoryError:
+            if batch_size <= min_batch_size:
+                raise
+            batch_size = max(batch_size // 2, min_batch_size)
+            print(f"Out of memory, retrying with batch size {batch_size}")
+        finally:
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+
+@torch.no_grad()
+def probe_llm_batch_size(model: HookedTransformer, context_length: int, batch_size: int) -> int:
+    """probe_batch_size() with a forward pass of random tokens through model."""
+
+    def run_batch(num_sequences: int):
+        tokens_BL = torch.randint(
+            0, model.cfg.d_vocab, (num_sequences, context_length), device=model.cfg.device
+        )
+        model(tokens_BL)
+
+    return probe_batch_size(run_batch, batch_size)
+
+
+@torch.no_grad()
+def probe_sae_batch_size(sae: Any, d_in: int, context_length: int, batch_size: int) -> int:
+    """probe_batch_size() with encoding random activations with sae, followed by the float32 copy
+    of the SAE activations that estimate_sae_bytes_per_sequence() accounts for."""
+
+    def run_batch(num_sequences: int):
+        acts_BLD = torch.randn(
+            num_sequences, context_length, d_in, device=sae.device, dtype=sae.dtype
+        )
+        sae.encode(acts_BLD).float()
+
+    return probe_batch_size(run_batch, batch_size)
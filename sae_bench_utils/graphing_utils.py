@@ -1,3 +1,5 @@
+import json
+import os
 import re
 import numpy as np
 import pandas as pd
@@ -9,8 +11,9 @@ import matplotlib.pyplot as plt
 from scipy import stats
 from matplotlib.colors import Normalize
 from matplotlib.lines import Line2D
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, Mapping
 from collections import defaultdict
+from contextlib import contextmanager
 
 # create a dictionary mapping trainer types to marker shapes
 
@@ -106,6 +109,38 @@ def sae_name_to_info(sae_name: str) -> dict:
     return sae_config
 
 
+@contextmanager
+def load_core_feature_metrics(json_path: str) -> Iterator[Mapping[str, np.ndarray]]:
+    """Load the feature-wise metrics of a core eval result, as one array per metric indexed by
+    feature. Newer results store them in a sidecar .npz file named by feature_metrics_file, which
+    is read lazily: each metric is only loaded from disk when it's accessed. Older results store
+    them in eval_result_details, which are converted to arrays.
+
+    The .npz file stays open until the with block exits, so read the metrics inside it:
+
+        with load_core_feature_metrics(json_path) as feature_metrics:
+            feature_density = feature_metrics["feature_density"]
+    """
+    with open(json_path) as f:
+        eval_results = json.load(f)
+
+    feature_metrics_file = eval_results.get("feature_metrics_file")
+    if feature_metrics_file is not None:
+        with np.load(os.path.join(os.path.dirname(json_path), feature_metrics_file)) as npz:
+            yield npz
+        return
+
+    feature_metrics = defaultdict(list)
+    for feature_result in eval_results.get("eval_result_details", []):
+        for metric_name, value in feature_result.items():
+            if metric_name != "index":
+                feature_metrics[metric_name].append(value)
+    yield {
+        metric_name: np.asarray(values, dtype=np.float32)
+        for metric_name, values in feature_metrics.items()
+    }
+
+
 def plot_3var_graph(
     results: dict[str, dict[str, float]],
     title: str,
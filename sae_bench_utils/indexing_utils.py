@@ -3,16 +3,18 @@ import torch
 from jaxtyping import Float, Int
 from torch import Tensor
 
+from sae_bench_utils.sparse_activations import SparseLatentActivations
+
 
 def get_k_largest_indices(
-    x: Float[Tensor, "batch seq"],
+    x: Float[Tensor, "batch seq"] | SparseLatentActivations,
     k: int,
     buffer: int = 0,
     no_overlap: bool = False,
 ) -> Int[Tensor, "k 2"]:
     """
     Args:
-        x:          The 2D tensor to get the top k largest elements from.
+        x:          The 2D tensor to get the top k largest elements from, or its sparse equivalent.
         k:          The number of top elements to get.
         buffer:     We won't choose any elements within `buffer` from the start or end of their seq (this helps if we
                     want more context around the chosen tokens).
@@ -20,12 +22,18 @@ def get_k_largest_indices(
                     each other.
 
     Returns:
-        indices: The index positions of the top k largest elements.
+        indices: The index positions of the top k largest elements. If x is sparse, only stored (nonzero)
+                 elements are returned, so there can be fewer than k.
     """
-    x = x[:, buffer:-buffer]
-    indices = x.flatten().argsort(-1, descending=True)
-    rows = indices // x.size(1)
-    cols = indices % x.size(1) + buffer
+    if isinstance(x, SparseLatentActivations):
+        x = x.crop(buffer)
+        order = x.values.argsort(descending=True)
+        rows, cols = x.positions[order].unbind(dim=-1)
+    else:
+        x = x[:, buffer:-buffer]
+        indices = x.flatten().argsort(-1, descending=True)
+        rows = indices // x.size(1)
+        cols = indices % x.size(1) + buffer
 
     if no_overlap:
         unique_indices = []
@@ -37,13 +45,17 @@ def get_k_largest_indices(
                     seen_positions.add((row, col + offset))
             if len(unique_indices) == k:
                 break
-        rows, cols = torch.tensor(unique_indices, dtype=torch.int64, device=x.device).unbind(dim=-1)
+        rows, cols = (
+            torch.tensor(unique_indices, dtype=torch.int64, device=rows.device)
+            .reshape(-1, 2)
+            .unbind(dim=-1)
+        )
 
     return torch.stack((rows, cols), dim=1)[:k]
 
 
 def get_iw_sample_indices(
-    x: Float[Tensor, "batch seq"],
+    x: Float[Tensor, "batch seq"] | SparseLatentActivations,
     k: int,
     buffer: int = 0,
     use_squared_values: bool = True,
@@ -54,6 +66,13 @@ def get_iw_sample_indices(
 
     Also includes an optional threshold above which we won't sample.
     """
+    if isinstance(x, SparseLatentActivations):
+        x = x.crop(buffer)
+        values = x.values.pow(2) if use_squared_values else x.values
+        probabilities = values.float() / values.float().sum()
+        indices = torch.multinomial(probabilities, k, replacement=False)
+        return x.positions[indices]
+
     x = x[:, buffer:-buffer]
     if use_squared_values:
         x = x.pow(2)
@@ -67,14 +86,14 @@ def get_iw_sample_indices(
 
 
 def index_with_buffer(
-    x: Float[Tensor, "batch seq"],
+    x: Float[Tensor, "batch seq"] | SparseLatentActivations,
     indices: Int[Tensor, "k 2"],
     buffer: int = 0,
 ) -> Float[Tensor, "k buffer_x2_plus1"]:
     """
     This function returns the tensor you get when indexing into `x` with indices, and taking a +-buffer range around
     each index. For example, if `indices` is a list of the top activating tokens (returned by `get_k_largest_indices`),
-    then this function can get you the sequence context.
+    then this function can get you the sequence context. If x is sparse, the result is dense.
     """
     assert indices.ndim == 2, "indices must have 2 dimensions"
     assert indices.shape[1] == 2, "indices must have 2 columns"
@@ -83,4 +102,6 @@ def index_with_buffer(
     cols = einops.repeat(cols, "k -> k buffer", buffer=buffer * 2 + 1) + torch.arange(
         -buffer, buffer + 1, device=cols.device
     )
+    if isinstance(x, SparseLatentActivations):
+        return x.lookup(rows, cols)
     return x[rows, cols]
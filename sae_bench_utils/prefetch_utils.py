@@ -0,0 +1,95 @@
+import queue
+import threading
+from typing import Iterable, Iterator, Optional, TypeVar
+
+import torch
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class _WorkerError:
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+def prefetch(iterable: Iterable[T], prefetch_depth: int = 2) -> Iterator[T]:
+    """Yields the items of iterable, which are produced in a background thread up to prefetch_depth
+    items ahead of the consumer. Use this to overlap loading (disk reads, host to device copies) with
+    compute. Exceptions raised while producing an item are re-raised in the consumer.
+    With prefetch_depth <= 0, iterable is consumed synchronously."""
+    if prefetch_depth <= 0:
+        yield from iterable
+        return
+
+    buffer = queue.Queue(maxsize=prefetch_depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(_WorkerError(e))
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, _WorkerError):
+                raise item.exception
+            yield item
+    finally:
+        # Also reached if the consumer stops early, which unblocks and ends the worker
+        stop.set()
+        thread.join()
+
+
+_copy_streams: dict[torch.device, "torch.cuda.Stream"] = {}
+
+
+def copy_to_device_async(
+    tensor: torch.Tensor, device: torch.device | str
+) -> tuple[torch.Tensor, Optional["torch.cuda.Event"]]:
+    """Starts copying a CPU tensor to device. For CUDA devices the copy runs on a side stream, so it
+    can overlap with kernels on the default stream. Pass the result to wait_for_copy() before use."""
+    device = torch.device(device)
+    if device.type != "cuda" or tensor.device.type != "cpu":
+        return tensor.to(device=device), None
+
+    if device not in _copy_streams:
+        _copy_streams[device] = torch.cuda.Stream(device=device)
+    stream = _copy_streams[device]
+
+    tensor = tensor.pin_memory()
+    with torch.cuda.stream(stream):
+        device_tensor = tensor.to(device=device, non_blocking=True)
+        event = torch.cuda.Event()
+        event.record(stream)
+    return device_tensor, event
+
+
+def wait_for_copy(tensor: torch.Tensor, event: Optional["torch.cuda.Event"]) -> torch.Tensor:
+    """Makes the current stream wait for a copy started by copy_to_device_async()."""
+    if event is not None:
+        current_stream = torch.cuda.current_stream(tensor.device)
+        event.wait(current_stream)
+        # The tensor was allocated on the copy stream, tell the caching allocator it is used here
+        tensor.record_stream(current_stream)
+    return tensor
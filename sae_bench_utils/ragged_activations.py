@@ -0,0 +1,202 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import torch
+from beartype import beartype
+from jaxtyping import Bool, Float, Int, jaxtyped
+
+import sae_bench_utils.activation_quantization as activation_quantization
+
+
+@dataclass
+class RaggedActivations:
+    """Activations for a batch of variable length examples with the padding removed.
+
+    acts_TD holds the activations of every real token of every example, packed along dim 0.
+    Example i owns rows offsets[i]:offsets[i + 1]. offsets always lives on the CPU.
+
+    len() and indexing work on examples, so this can be used in place of a [B, L, D] tensor
+    in e.g. probe_training.prepare_probe_data().
+
+    If quantization_params is set, acts_TD holds int8 activations, as loaded from a quantized
+    artifact, and dtype is the dtype they dequantize to. Call dequantize() on a batch before
+    using its activations, so the full precision activations never exist for the whole dataset."""
+
+    acts_TD: Float[torch.Tensor, "num_tokens d_model"] | Int[torch.Tensor, "num_tokens d_model"]
+    offsets: Int[torch.Tensor, "num_examples_plus_1"]
+    quantization_params: Optional[activation_quantization.QuantizationParams] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> Int[torch.Tensor, "num_examples"]:
+        return self.offsets[1:] - self.offsets[:-1]
+
+    @property
+    def device(self) -> torch.device:
+        return self.acts_TD.device
+
+    @property
+    def dtype(self) -> torch.dtype:
+        if self.quantization_params is not None:
+            return self.quantization_params.dtype
+        return self.acts_TD.dtype
+
+    @property
+    def d_model(self) -> int:
+        return self.acts_TD.shape[-1]
+
+    def to(self, *args, **kwargs) -> "RaggedActivations":
+        if self.quantization_params is None:
+            return RaggedActivations(self.acts_TD.to(*args, **kwargs), self.offsets)
+        # Resolve the target like Tensor.to() would, keeping the int8 activations unless the
+        # dtype changes
+        target = torch.empty(0, dtype=self.dtype, device=self.device).to(*args, **kwargs)
+        if target.dtype != self.dtype:
+            return self.dequantize().to(*args, **kwargs)
+        return RaggedActivations(
+            self.acts_TD.to(device=target.device),
+            self.offsets,
+            self.quantization_params.to(target.device),
+        )
+
+    def dequantize(self) -> "RaggedActivations":
+        """The full precision activations, on the device of acts_TD. A no-op if not quantized."""
+        if self.quantization_params is None:
+            return self
+        acts_TD = activation_quantization.dequantize(self.acts_TD, self.quantization_params)
+        return RaggedActivations(acts_TD, self.offsets)
+
+    def segment_ids(self) -> Int[torch.Tensor, "num_tokens"]:
+        """The example index of every token in acts_TD, on the same device as acts_TD."""
+        return torch.repeat_interleave(torch.arange(len(self)), self.lengths).to(self.device)
+
+    def __getitem__(self, idx: slice | torch.Tensor) -> "RaggedActivations":
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step == 1:
+                stop = max(start, stop)
+                acts_TD = self.acts_TD[self.offsets[start] : self.offsets[stop]]
+                offsets = self.offsets[start : stop + 1] - self.offsets[start]
+                return RaggedActivations(acts_TD, offsets, self.quantization_params)
+            idx = torch.arange(start, stop, step)
+        return self.index_select(idx)
+
+    def index_select(self, indices: Int[torch.Tensor, "num_selected"]) -> "RaggedActivations":
+        indices = indices.cpu()
+        lengths = self.lengths[indices]
+        starts = self.offsets[:-1][indices]
+
+        offsets = torch.zeros(len(indices) + 1, dtype=torch.long)
+        torch.cumsum(lengths, dim=0, out=offsets[1:])
+
+        segment_ids = torch.repeat_interleave(torch.arange(len(indices)), lengths)
+        token_indices = (
+            starts[segment_ids] + torch.arange(int(offsets[-1])) - offsets[:-1][segment_ids]
+        )
+
+        return RaggedActivations(
+            self.acts_TD[token_indices.to(self.device)], offsets, self.quantization_params
+        )
+
+    @staticmethod
+    def cat(ragged_list: list["RaggedActivations"]) -> "RaggedActivations":
+        """Quantized activations can only be concatenated if they share quantization parameters,
+        like the classes of one artifact."""
+        quantization_params = ragged_list[0].quantization_params
+        for ragged in ragged_list[1:]:
+            if quantization_params is None:
+                assert ragged.quantization_params is None
+            else:
+                assert ragged.quantization_params is not None
+                assert torch.equal(ragged.quantization_params.scale_D, quantization_params.scale_D)
+                assert torch.equal(
+                    ragged.quantization_params.zero_point_D, quantization_params.zero_point_D
+                )
+
+        acts_TD = torch.cat([ragged.acts_TD for ragged in ragged_list], dim=0)
+        lengths = torch.cat([ragged.lengths for ragged in ragged_list])
+        offsets = torch.zeros(len(lengths) + 1, dtype=torch.long)
+        torch.cumsum(lengths, dim=0, out=offsets[1:])
+        return RaggedActivations(acts_TD, offsets, quantization_params)
+
+    @staticmethod
+    @jaxtyped(typechecker=beartype)
+    def from_padded(
+        acts_BLD: Float[torch.Tensor, "batch seq_len d_model"],
+        mask_BL: Bool[torch.Tensor, "batch seq_len"],
+    ) -> "RaggedActivations":
+        mask_BL = mask_BL.to(device=acts_BLD.device)
+        lengths = mask_BL.sum(dim=1).cpu()
+        offsets = torch.zeros(len(lengths) + 1, dtype=torch.long)
+        torch.cumsum(lengths, dim=0, out=offsets[1:])
+        return RaggedActivations(acts_BLD[mask_BL], offsets)
+
+    def mean_pool(self) -> Float[torch.Tensor, "num_examples d_model"]:
+        """Mean over the tokens of each example. Quantized activations are dequantized at once, so
+        pool them in batches, as create_meaned_model_activations() does."""
+        return segment_mean(self.dequantize().acts_TD, self)
+
+    def to_dict(
+        self, quantization_params: Optional[activation_quantization.QuantizationParams] = None
+    ) -> dict:
+        """Plain tensors only, so it can be loaded with torch.load(weights_only=True).
+        If quantization_params is given, acts_TD is stored as int8 along with the parameters.
+        Activations that are already quantized are stored as they are."""
+        if self.quantization_params is not None:
+            assert quantization_params is None or quantization_params is self.quantization_params
+            return {
+                "acts_TD": self.acts_TD,
+                "offsets": self.offsets,
+                **self.quantization_params.to_dict(),
+            }
+        if quantization_params is None:
+            return {"acts_TD": self.acts_TD, "offsets": self.offsets}
+        return {
+            "acts_TD": activation_quantization.quantize(self.acts_TD, quantization_params),
+            "offsets": self.offsets,
+            **quantization_params.to_dict(),
+        }
+
+    @staticmethod
+    def from_dict(state: dict) -> "RaggedActivations":
+        """Quantized activations stay int8, see dequantize()."""
+        quantization_params = None
+        if "scale" in state:
+            quantization_params = activation_quantization.QuantizationParams.from_dict(state)
+        return RaggedActivations(state["acts_TD"], state["offsets"], quantization_params)
+
+
+def segment_mean(
+    values_TF: Float[torch.Tensor, "num_tokens d"], ragged: RaggedActivations
+) -> Float[torch.Tensor, "num_examples d"]:
+    """Mean of values_TF (one row per token of ragged, e.g. SAE activations of ragged.acts_TD) per example."""
+    sums_BF = torch.zeros(
+        (len(ragged), values_TF.shape[-1]), dtype=values_TF.dtype, device=values_TF.device
+    )
+    sums_BF.index_add_(0, ragged.segment_ids().to(values_TF.device), values_TF)
+    lengths_B = ragged.lengths.to(device=values_TF.device, dtype=values_TF.dtype)
+    return sums_BF / lengths_B[:, None]
+
+
+def nonzero_padded_to_ragged(
+    acts_BLD: Float[torch.Tensor, "batch seq_len d_model"],
+) -> RaggedActivations:
+    """Convert padded activations where masked tokens were zeroed out (the format written by older
+    versions of the sparse_probing and scr_and_tpp evals) to ragged activations."""
+    return RaggedActivations.from_padded(acts_BLD, acts_BLD.sum(dim=-1) != 0.0)
+
+
+def load_ragged_activations_dict(
+    all_acts: dict[str, dict[str, torch.Tensor] | torch.Tensor],
+) -> dict[str, RaggedActivations]:
+    """Load class_name -> activations saved with RaggedActivations.to_dict(), or padded activations
+    saved by older versions."""
+    loaded = {}
+    for class_name, acts in all_acts.items():
+        if isinstance(acts, torch.Tensor):
+            loaded[class_name] = nonzero_padded_to_ragged(acts)
+        else:
+            loaded[class_name] = RaggedActivations.from_dict(acts)
+    return loaded
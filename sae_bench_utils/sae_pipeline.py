@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+
+import torch
+from sae_lens import SAE
+
+import sae_bench_utils.prefetch_utils as prefetch_utils
+
+
+def load_sae(
+    sae_release: str,
+    sae_id: str | SAE,
+    device: str,
+    dtype: torch.dtype,
+) -> tuple[str, SAE, Optional[torch.Tensor]]:
+    """The (sae_id, sae, sparsity) of an entry of selected_saes, which is either a (sae_lens
+    release, sae_lens id) or a (sae_name, SAE object) tuple. Custom SAEs get the sae_id
+    "custom_sae" and no sparsity."""
+    # Handle both pretrained SAEs (identified by string) and custom SAEs (passed as objects)
+    if isinstance(sae_id, str):
+        sae, _, sparsity = SAE.from_pretrained(
+            release=sae_release,
+            sae_id=sae_id,
+            device=device,
+        )
+    else:
+        sae = sae_id
+        sae_id = "custom_sae"
+        sparsity = None
+
+    return sae_id, sae.to(device=device, dtype=dtype), sparsity
+
+
+def iter_saes(
+    selected_saes: list[tuple[str, SAE]] | list[tuple[str, str]],
+    device: str,
+    dtype: torch.dtype,
+    prefetch: bool = True,
+) -> Iterator[tuple[str, str, SAE, Optional[torch.Tensor]]]:
+    """Yields (sae_release, sae_id, sae, sparsity) for each entry of selected_saes, see load_sae().
+
+    With prefetch, the next SAE is loaded on a background thread while the caller evaluates the
+    current one, which takes loading off the critical path of a sweep. At most two loaded SAEs
+    are resident: the SAE after the next one is only loaded once the caller asks for the next one,
+    so callers must not keep references to SAEs they are done with."""
+    if not prefetch:
+        for sae_release, sae_id in selected_saes:
+            yield sae_release, *load_sae(sae_release, sae_id, device, dtype)
+        return
+
+    # One slot for the SAE being evaluated and one for the SAE being loaded
+    resident_slots = threading.Semaphore(2)
+    closed = threading.Event()
+
+    def load_saes():
+        for sae_release, sae_id in selected_saes:
+            resident_slots.acquire()
+            if closed.is_set():
+                return
+            yield sae_release, *load_sae(sae_release, sae_id, device, dtype)
+
+    loaded_saes = prefetch_utils.prefetch(load_saes(), prefetch_depth=1)
+    try:
+        for loaded_sae in loaded_saes:
+            yield loaded_sae
+            # The caller asked for the next SAE, so it is done with this one
+            resident_slots.release()
+    finally:
+        # Also reached if the caller stops early, which unblocks a loader waiting for a slot
+        closed.set()
+        resident_slots.release()
+        loaded_saes.close()
+
+
+class ResultWriter:
+    """Runs the serialization of eval results, e.g. eval_output.to_json_file(), on a background
+    thread in submission order, so that writing one SAE's results overlaps with evaluating the
+    next. A failed write is re-raised by a later submit() or by close(), which waits for every
+    pending write.
+
+    Usage:
+        with ResultWriter() as writer:
+            for sae_release, sae_id, sae, _ in iter_saes(selected_saes, device, dtype):
+                eval_output = ...
+                writer.submit(eval_output.to_json_file, sae_result_path, indent=2)"""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending: list[Future] = []
+
+    def submit(self, write: Callable[..., Any], *args: Any, **kwargs: Any):
+        self.raise_errors(wait=False)
+        self.pending.append(self.executor.submit(write, *args, **kwargs))
+
+    def raise_errors(self, wait: bool):
+        still_pending = []
+        for future in self.pending:
+            if wait or future.done():
+                future.result()
+            else:
+                still_pending.append(future)
+        self.pending = still_pending
+
+    def close(self):
+        try:
+            self.raise_errors(wait=True)
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Finish the pending writes, without masking the exception being raised
+            self.executor.shutdown(wait=True)
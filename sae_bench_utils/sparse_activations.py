@@ -0,0 +1,245 @@
+from dataclasses import dataclass
+
+import torch
+from beartype import beartype
+from jaxtyping import Float, Int, jaxtyped
+from torch import Tensor
+
+
+@dataclass
+class SparseLatentActivations:
+    """The [dataset_size, seq_len] activations of a single latent, storing only nonzero entries.
+    positions holds (row, col) pairs sorted in row-major order, values the matching activations."""
+
+    positions: Int[Tensor, "nnz 2"]
+    values: Float[Tensor, "nnz"]
+    shape: tuple[int, int]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def filter(self, keep: torch.Tensor) -> "SparseLatentActivations":
+        """Keep the entries where keep is True, e.g. acts.filter(acts.values < threshold)."""
+        return SparseLatentActivations(self.positions[keep], self.values[keep], self.shape)
+
+    def crop(self, buffer: int) -> "SparseLatentActivations":
+        """Drop entries within buffer of the start or end of their sequence."""
+        cols = self.positions[:, 1]
+        return self.filter((cols >= buffer) & (cols < self.shape[1] - buffer))
+
+    def lookup(self, rows: Int[Tensor, "..."], cols: Int[Tensor, "..."]) -> Float[Tensor, "..."]:
+        """The activations at (rows, cols), which are zero where no entry is stored."""
+        seq_len = self.shape[1]
+        keys = self.positions[:, 0] * seq_len + self.positions[:, 1]
+        query = (rows * seq_len + cols).to(keys.device)
+
+        idx = torch.searchsorted(keys, query.flatten()).clamp(max=max(len(keys) - 1, 0))
+        result = torch.zeros(query.numel(), dtype=self.values.dtype, device=self.values.device)
+        if len(keys) > 0:
+            found = keys[idx] == query.flatten()
+            result[found] = self.values[idx[found]]
+        return result.view(query.shape)
+
+    def to_dense(self) -> Float[Tensor, "dataset_size seq_len"]:
+        dense = torch.zeros(self.shape, dtype=self.values.dtype, device=self.values.device)
+        dense[self.positions[:, 0], self.positions[:, 1]] = self.values
+        return dense
+
+
+@dataclass
+class SparseActivations:
+    """[dataset_size, seq_len, num_latents] SAE activations in COO format, storing only nonzero entries,
+    so memory scales with L0 instead of the number of latents.
+
+    Entries are grouped by latent: latent i owns entries latent_offsets[i]:latent_offsets[i + 1],
+    sorted in row-major (row, col) order. latent_offsets lives on the CPU."""
+
+    positions: Int[Tensor, "nnz 2"]
+    values: Float[Tensor, "nnz"]
+    latent_offsets: Int[Tensor, "num_latents_plus_1"]
+    shape: tuple[int, int, int]
+
+    @property
+    def nnz(self) -> int:
+        return len(self.values)
+
+    def latent(self, latent_idx: int) -> SparseLatentActivations:
+        """The activations of latent_idx (an index into the stored latents, not the SAE)."""
+        start, end = self.latent_offsets[latent_idx], self.latent_offsets[latent_idx + 1]
+        return SparseLatentActivations(
+            self.positions[start:end], self.values[start:end], self.shape[:2]
+        )
+
+    def to_dense(self) -> Float[Tensor, "dataset_size seq_len num_latents"]:
+        dense = torch.zeros(self.shape, dtype=self.values.dtype, device=self.values.device)
+        latents = torch.repeat_interleave(
+            torch.arange(self.shape[2]), self.latent_offsets[1:] - self.latent_offsets[:-1]
+        ).to(self.values.device)
+        dense[self.positions[:, 0], self.positions[:, 1], latents] = self.values
+        return dense
+
+    @staticmethod
+    def from_batches(
+        rows: list[Int[Tensor, "batch_nnz"]],
+        cols: list[Int[Tensor, "batch_nnz"]],
+        latents: list[Int[Tensor, "batch_nnz"]],
+        values: list[Float[Tensor, "batch_nnz"]],
+        shape: tuple[int, int, int],
+    ) -> "SparseActivations":
+        """Assemble the entries of consecutive row batches, each in row-major (row, col) order."""
+        rows_N = torch.cat(rows)
+        cols_N = torch.cat(cols)
+        latents_N = torch.cat(latents)
+        values_N = torch.cat(values)
+
+        # A stable sort by latent keeps the row-major order within each latent
+        latents_N, order = torch.sort(latents_N, stable=True)
+        positions = torch.stack([rows_N[order], cols_N[order]], dim=1)
+
+        latent_offsets = torch.zeros(shape[2] + 1, dtype=torch.long)
+        latent_offsets[1:] = torch.cumsum(torch.bincount(latents_N, minlength=shape[2]).cpu(), 0)
+
+        return SparseActivations(positions, values_N[order], latent_offsets, shape)
+
+
+@dataclass
+class SparsePooledActivations:
+    """[num_examples, d_sae] mostly zero activations, e.g. mean pooled SAE activations, in CSR format.
+
+    Example i has the nonzero values values_N[crow_indices[i]:crow_indices[i + 1]] in the columns
+    col_indices_N[crow_indices[i]:crow_indices[i + 1]]. crow_indices always lives on the CPU.
+
+    len() and indexing work on examples, so this can be used in place of a [B, F] tensor in e.g.
+    probe_training.prepare_probe_data(). Memory and compute scale with the number of nonzero
+    values instead of B * F."""
+
+    values_N: Float[Tensor, "num_nonzero"]
+    col_indices_N: Int[Tensor, "num_nonzero"]
+    crow_indices: Int[Tensor, "num_examples_plus_1"]
+    d_sae: int
+
+    def __len__(self) -> int:
+        return len(self.crow_indices) - 1
+
+    @property
+    def shape(self) -> torch.Size:
+        return torch.Size([len(self), self.d_sae])
+
+    @property
+    def lengths(self) -> Int[Tensor, "num_examples"]:
+        return self.crow_indices[1:] - self.crow_indices[:-1]
+
+    @property
+    def device(self) -> torch.device:
+        return self.values_N.device
+
+    @property
+    def dtype(self) -> torch.dtype:
+        return self.values_N.dtype
+
+    def to(self, *args, **kwargs) -> "SparsePooledActivations":
+        values_N = self.values_N.to(*args, **kwargs)
+        return SparsePooledActivations(
+            values_N,
+            self.col_indices_N.to(device=values_N.device),
+            self.crow_indices,
+            self.d_sae,
+        )
+
+    def row_ids(self) -> Int[Tensor, "num_nonzero"]:
+        """The example index of every nonzero value, on the same device as values_N."""
+        return torch.repeat_interleave(torch.arange(len(self)), self.lengths).to(self.device)
+
+    def __getitem__(self, idx: slice | Tensor) -> "SparsePooledActivations":
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step == 1:
+                stop = max(start, stop)
+                begin, end = self.crow_indices[start], self.crow_indices[stop]
+                return SparsePooledActivations(
+                    self.values_N[begin:end],
+                    self.col_indices_N[begin:end],
+                    self.crow_indices[start : stop + 1] - begin,
+                    self.d_sae,
+                )
+            idx = torch.arange(start, stop, step)
+        if idx.dtype == torch.bool:
+            idx = torch.nonzero(idx).squeeze(-1)
+        return self.index_select(idx)
+
+    def index_select(self, indices: Int[Tensor, "num_selected"]) -> "SparsePooledActivations":
+        indices = indices.cpu()
+        lengths = self.lengths[indices]
+        starts = self.crow_indices[:-1][indices]
+
+        crow_indices = torch.zeros(len(indices) + 1, dtype=torch.long)
+        torch.cumsum(lengths, dim=0, out=crow_indices[1:])
+
+        row_ids = torch.repeat_interleave(torch.arange(len(indices)), lengths)
+        value_indices = (
+            starts[row_ids] + torch.arange(int(crow_indices[-1])) - crow_indices[:-1][row_ids]
+        ).to(self.device)
+
+        return SparsePooledActivations(
+            self.values_N[value_indices],
+            self.col_indices_N[value_indices],
+            crow_indices,
+            self.d_sae,
+        )
+
+    @staticmethod
+    def cat(sparse_list: list["SparsePooledActivations"]) -> "SparsePooledActivations":
+        assert len({sparse.d_sae for sparse in sparse_list}) == 1
+        lengths = torch.cat([sparse.lengths for sparse in sparse_list])
+        crow_indices = torch.zeros(len(lengths) + 1, dtype=torch.long)
+        torch.cumsum(lengths, dim=0, out=crow_indices[1:])
+        return SparsePooledActivations(
+            torch.cat([sparse.values_N for sparse in sparse_list]),
+            torch.cat([sparse.col_indices_N for sparse in sparse_list]),
+            crow_indices,
+            sparse_list[0].d_sae,
+        )
+
+    @staticmethod
+    @jaxtyped(typechecker=beartype)
+    def from_dense(acts_BF: Float[Tensor, "batch d_sae"]) -> "SparsePooledActivations":
+        row_ids, col_indices_N = torch.nonzero(acts_BF, as_tuple=True)
+        lengths = torch.bincount(row_ids, minlength=len(acts_BF)).cpu()
+        crow_indices = torch.zeros(len(acts_BF) + 1, dtype=torch.long)
+        torch.cumsum(lengths, dim=0, out=crow_indices[1:])
+        return SparsePooledActivations(
+            acts_BF[row_ids, col_indices_N], col_indices_N, crow_indices, acts_BF.shape[-1]
+        )
+
+    def to_dense(self) -> Float[Tensor, "num_examples d_sae"]:
+        acts_BF = torch.zeros(len(self), self.d_sae, dtype=self.dtype, device=self.device)
+        acts_BF[self.row_ids(), self.col_indices_N] = self.values_N
+        return acts_BF
+
+    def mean(self) -> Float[Tensor, "d_sae"]:
+        """Mean over the examples, like acts_BF.mean(dim=0)."""
+        sums_F = torch.zeros(self.d_sae, dtype=self.dtype, device=self.device)
+        sums_F.index_add_(0, self.col_indices_N, self.values_N)
+        return sums_F / len(self)
+
+    def select_columns(self, col_indices_K: Int[Tensor, "k"]) -> Float[Tensor, "num_examples k"]:
+        """The dense activations of the given columns, like acts_BF[:, col_indices_K]."""
+        col_indices_K = col_indices_K.to(self.device)
+        positions_F = torch.full((self.d_sae,), -1, dtype=torch.long, device=self.device)
+        positions_F[col_indices_K] = torch.arange(len(col_indices_K), device=self.device)
+        positions_N = positions_F[self.col_indices_N]
+        selected_N = positions_N >= 0
+
+        acts_BK = torch.zeros(len(self), len(col_indices_K), dtype=self.dtype, device=self.device)
+        acts_BK[self.row_ids()[selected_N], positions_N[selected_N]] = self.values_N[selected_N]
+        return acts_BK
+
+    def matmul(
+        self, weight_FO: Float[Tensor, "d_sae out"]
+    ) -> Float[Tensor, "num_examples out"]:
+        """self.to_dense() @ weight_FO without densifying, differentiable with respect to weight_FO."""
+        products_NO = self.values_N.unsqueeze(-1) * weight_FO[self.col_indices_N]
+        out_BO = torch.zeros(
+            len(self), weight_FO.shape[-1], dtype=products_NO.dtype, device=products_NO.device
+        )
+        return out_BO.index_add(0, self.row_ids(), products_NO)
@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import torch
+from jaxtyping import Float
+
+# z-score of a two-sided 95% normal confidence interval
+Z_95 = 1.959963984540054
+
+
+@dataclass
+class RunningMoments:
+    """Count, mean and variance of a stream of values, updated one batch at a time. Memory is
+    independent of the number of values, and accumulators of disjoint parts of a stream, e.g. from
+    different batches or processes, can be combined with merge().
+
+    The mean is a float64 sum divided by the count, so it matches the mean of all values, including
+    infinite ones. The variance uses the parallel form of Welford's algorithm.
+
+    Usage:
+        l0_moments = RunningMoments()
+        for batch in batches:
+            l0_moments.update(l0_N)
+        l0 = l0_moments.mean.item()"""
+
+    count: int = 0
+    total: Optional[torch.Tensor] = None
+    welford_mean: Optional[torch.Tensor] = None
+    m2: Optional[torch.Tensor] = None
+
+    def update(self, values: Float[torch.Tensor, "num_values ..."]):
+        """Add values, reducing over the first dimension. Later dimensions are tracked separately,
+        e.g. values of shape [num_tokens, d_sae] give per-latent statistics."""
+        if values.ndim == 0:
+            values = values.unsqueeze(0)
+        if values.shape[0] == 0:
+            return
+
+        values = values.detach().to(dtype=torch.float64)
+        batch_mean = values.mean(dim=0)
+        batch_moments = RunningMoments(
+            count=values.shape[0],
+            total=values.sum(dim=0),
+            welford_mean=batch_mean,
+            m2=(values - batch_mean).pow(2).sum(dim=0),
+        )
+        merged = self.merge(batch_moments)
+        self.count, self.total, self.welford_mean, self.m2 = (
+            merged.count,
+            merged.total,
+            merged.welford_mean,
+            merged.m2,
+        )
+
+    def merge(self, other: "RunningMoments") -> "RunningMoments":
+        """The moments of both streams combined. Neither accumulator is modified."""
+        if other.count == 0:
+            return RunningMoments(self.count, self.total, self.welford_mean, self.m2)
+        if self.count == 0:
+            return RunningMoments(other.count, other.total, other.welford_mean, other.m2)
+
+        assert self.total is not None and self.welford_mean is not None and self.m2 is not None
+        assert other.total is not None and other.welford_mean is not None and other.m2 is not None
+        device = self.total.device
+        count = self.count + other.count
+        delta = other.welford_mean.to(device) - self.welford_mean
+        return RunningMoments(
+            count=count,
+            total=self.total + other.total.to(device),
+            welford_mean=self.welford_mean + delta * (other.count / count),
+            m2=self.m2 + other.m2.to(device) + delta.pow(2) * (self.count * other.count / count),
+        )
+
+    @property
+    def mean(self) -> torch.Tensor:
+        if self.count == 0:
+            raise ValueError("No values have been added")
+        assert self.total is not None
+        return self.total / self.count
+
+    @property
+    def variance(self) -> torch.Tensor:
+        """The population variance of the values seen so far."""
+        if self.count == 0:
+            raise ValueError("No values have been added")
+        assert self.m2 is not None
+        return self.m2 / self.count
+
+    def confidence_interval_half_width(self, z: float = Z_95) -> torch.Tensor:
+        """Half-width of the normal-approximation confidence interval of the mean, from the sample
+        variance, treating the values as independent. Infinite for fewer than two values."""
+        if self.count < 2:
+            return torch.tensor(float("inf"), dtype=torch.float64)
+        assert self.m2 is not None
+        sample_variance = self.m2 / (self.count - 1)
+        return z * (sample_variance / self.count).sqrt()
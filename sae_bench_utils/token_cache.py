@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional
+
+import numpy as np
+import torch
+from transformer_lens import HookedTransformer
+
+# Bump when the layout of cached values changes, which invalidates every existing entry
+TOKEN_CACHE_FORMAT_VERSION = 1
+
+DEFAULT_TOKEN_CACHE_DIR = os.path.join("artifacts", "token_cache")
+
+
+@dataclass
+class TokenCacheKey:
+    """Identifies a stream of fixed-length token sequences by everything that changes its tokens.
+    The stream is deterministic, so a cached prefix of it can serve any shorter request."""
+
+    dataset_name: str
+    tokenizer_revision: str
+    context_size: int
+    prepend_bos: bool
+    shuffle_seed: int
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"format_version": TOKEN_CACHE_FORMAT_VERSION, **asdict(self)}
+
+    def digest(self) -> str:
+        key_json = json.dumps(self.to_dict(), sort_keys=True, default=str)
+        return hashlib.sha256(key_json.encode()).hexdigest()
+
+
+@dataclass
+class NormScalingFactorKey:
+    """Identifies the norm scaling factor of the activations at a hook, estimated on the first
+    num_sequences cached sequences of tokens_key."""
+
+    model_name: str
+    hook_name: str
+    hook_head_index: Optional[int]
+    tokens_key: TokenCacheKey
+    num_sequences: int
+
+    def digest(self) -> str:
+        key_json = json.dumps(
+            {**asdict(self), "tokens_key": self.tokens_key.digest()}, sort_keys=True, default=str
+        )
+        return hashlib.sha256(key_json.encode()).hexdigest()
+
+
+class TokenCache:
+    """On-disk store of pre-tokenized sequences, shared by every eval on the machine.
+
+    Each token stream is saved with np.save() as <cache_dir>/<key digest>.npy, a [num_sequences,
+    context_size] int32 array, next to a JSON file holding the key. Loading memory-maps the array,
+    so only the sequences an eval reads are paged in. Norm scaling factors estimated on the cached
+    tokens are saved as small JSON files in the same directory.
+
+    Usage:
+        cache = TokenCache()
+        tokens_SL = get_cached_tokens(cache, key, num_sequences, create_activation_store)"""
+
+    def __init__(self, cache_dir: str = DEFAULT_TOKEN_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def get_path(self, key: TokenCacheKey) -> str:
+        return os.path.join(self.cache_dir, f"{key.digest()}.npy")
+
+    def get_key_path(self, key: TokenCacheKey) -> str:
+        return os.path.join(self.cache_dir, f"{key.digest()}.json")
+
+    def get_norm_scaling_factor_path(self, key: NormScalingFactorKey) -> str:
+        return os.path.join(self.cache_dir, f"{key.digest()}.norm_scaling_factor.json")
+
+    def load(self, key: TokenCacheKey, num_sequences: int) -> Optional[np.ndarray]:
+        """The first num_sequences cached sequences, memory-mapped, or None if fewer are cached."""
+        path = self.get_path(key)
+        if not os.path.exists(path):
+            return None
+        tokens_SL = np.load(path, mmap_mode="r")
+        if tokens_SL.shape[0] < num_sequences:
+            return None
+        return tokens_SL[:num_sequences]
+
+    def save(self, key: TokenCacheKey, tokens_SL: np.ndarray):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key)
+
+        with open(self.get_key_path(key), "w") as f:
+            json.dump(key.to_dict(), f, indent=2, default=str)
+
+        # Write to a temporary file first, so that concurrent evals never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, tokens_SL)
+        os.replace(tmp_path, path)
+
+    def load_norm_scaling_factor(self, key: NormScalingFactorKey) -> Optional[float]:
+        path = self.get_norm_scaling_factor_path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)["norm_scaling_factor"]
+
+    def save_norm_scaling_factor(self, key: NormScalingFactorKey, norm_scaling_factor: float):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_norm_scaling_factor_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {**asdict(key), "norm_scaling_factor": norm_scaling_factor},
+                f,
+                indent=2,
+                default=str,
+            )
+        os.replace(tmp_path, path)
+
+
+def read_tokens(activation_store: Any, num_sequences: int, batch_size: int = 64) -> np.ndarray:
+    """The next num_sequences sequences of activation_store, read with get_batch_tokens() in
+    batches of batch_size, as a [num_sequences, context_size] int32 array."""
+    all_tokens_BL = []
+    for batch_start in range(0, num_sequences, batch_size):
+        num_batch_sequences = min(batch_size, num_sequences - batch_start)
+        all_tokens_BL.append(activation_store.get_batch_tokens(num_batch_sequences).cpu())
+    return torch.cat(all_tokens_BL, dim=0).to(dtype=torch.int32).numpy()
+
+
+def get_cached_tokens(
+    cache: TokenCache,
+    key: TokenCacheKey,
+    num_sequences: int,
+    create_activation_store: Callable[[], Any],
+    batch_size: int = 64,
+) -> np.ndarray:
+    """The first num_sequences sequences of the token stream of key, from the cache or, if fewer
+    are cached, read with get_batch_tokens() from the ActivationsStore that
+    create_activation_store() returns and added to the cache. The store is only created, and the
+    dataset only streamed and tokenized, when the cache can't serve the request."""
+    tokens_SL = cache.load(key, num_sequences)
+    if tokens_SL is not None:
+        return tokens_SL
+
+    print(f"Tokenizing {num_sequences} sequences of {key.dataset_name} for the token cache")
+    cache.save(key, read_tokens(create_activation_store(), num_sequences, batch_size))
+
+    tokens_SL = cache.load(key, num_sequences)
+    assert tokens_SL is not None
+    return tokens_SL
+
+
+class CachedTokensStore:
+    """Serves token batches from cached sequences, implementing the parts of ActivationsStore
+    that the core eval uses.
+
+    Like ActivationsStore.reset_input_dataset(), which doesn't rewind the token sequences that
+    ActivationsStore.get_batch_tokens() reads, reset_input_dataset() continues from the current
+    sequence. The sequences wrap around once all of them have been read."""
+
+    def __init__(
+        self,
+        tokens_SL: np.ndarray,
+        device: str | torch.device,
+        store_batch_size_prompts: int = 8,
+        normalize_activations: str = "none",
+        estimated_norm_scaling_factor: float = 1.0,
+    ):
+        self.tokens_SL = tokens_SL
+        self.device = device
+        self.context_size = tokens_SL.shape[1]
+        self.store_batch_size_prompts = store_batch_size_prompts
+        self.normalize_activations = normalize_activations
+        self.estimated_norm_scaling_factor = estimated_norm_scaling_factor
+        self.position = 0
+
+    def get_batch_tokens(self, batch_size: Optional[int] = None) -> torch.Tensor:
+        if not batch_size:
+            batch_size = self.store_batch_size_prompts
+        indices = np.arange(self.position, self.position + batch_size) % self.tokens_SL.shape[0]
+        self.position = (self.position + batch_size) % self.tokens_SL.shape[0]
+        tokens_BL = torch.from_numpy(np.asarray(self.tokens_SL[indices], dtype=np.int64))
+        return tokens_BL.to(self.device)
+
+    def reset_input_dataset(self):
+        pass
+
+    def apply_norm_scaling_factor(self, activations: torch.Tensor) -> torch.Tensor:
+        return activations * self.estimated_norm_scaling_factor
+
+    def unscale(self, activations: torch.Tensor) -> torch.Tensor:
+        return activations / self.estimated_norm_scaling_factor
+
+
+@torch.no_grad()
+def estimate_norm_scaling_factor(
+    model: HookedTransformer,
+    tokens_SL: np.ndarray,
+    hook_name: str,
+    hook_layer: int,
+    hook_head_index: Optional[int],
+    d_in: int,
+    batch_size: int,
+) -> float:
+    """The factor that scales the activations at hook_name on tokens_SL to an average norm of
+    sqrt(d_in), as ActivationsStore.estimate_norm_scaling_factor() computes it, but averaged over
+    every token of tokens_SL rather than over shuffled activation batches."""
+    norm_sum = 0.0
+    num_tokens = 0
+    for batch_start in range(0, tokens_SL.shape[0], batch_size):
+        tokens_BL = torch.from_numpy(
+            np.asarray(tokens_SL[batch_start : batch_start + batch_size], dtype=np.int64)
+        ).to(model.cfg.device)
+        _, cache = model.run_with_cache(
+            tokens_BL, names_filter=[hook_name], stop_at_layer=hook_layer + 1, prepend_bos=False
+        )
+        acts = cache[hook_name]
+        # Like ActivationsStore.get_activations(), select a head or concatenate the heads
+        if hook_head_index is not None:
+            acts = acts[:, :, hook_head_index]
+        elif acts.ndim > 3:
+            acts = acts.flatten(2)
+        norms = acts.float().norm(dim=-1)
+        norm_sum += norms.sum().item()
+        num_tokens += norms.numel()
+    return float(np.sqrt(d_in) / (norm_sum / num_tokens))
+
+
+def get_norm_scaling_factor(
+    cache: TokenCache,
+    key: NormScalingFactorKey,
+    estimate: Callable[[], float],
+) -> float:
+    """The cached norm scaling factor of key, or estimate() added to the cache."""
+    norm_scaling_factor = cache.load_norm_scaling_factor(key)
+    if norm_scaling_factor is None:
+        norm_scaling_factor = estimate()
+        cache.save_norm_scaling_factor(key, norm_scaling_factor)
+    return norm_scaling_factor
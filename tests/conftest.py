@@ -1,8 +1,11 @@
 import pytest
+import torch
 from sae_lens import SAE
-from transformer_lens import HookedTransformer
+from transformer_lens import HookedTransformer, HookedTransformerConfig
 from transformers import GPT2LMHeadModel
 
+from custom_saes.vanilla_sae import VanillaSAE
+
 
 @pytest.fixture
 def gpt2_model():
@@ -32,3 +35,32 @@ def gpt2_l5_sae() -> SAE:
 def gpt2_hf_model(gpt2_model: HookedTransformer):
     model = GPT2LMHeadModel.from_pretrained("gpt2", device_map="cpu")
     return model, gpt2_model.tokenizer
+
+
+# Small randomly initialized model and SAE for tests that must run without downloading weights
+@pytest.fixture
+def tiny_model() -> HookedTransformer:
+    cfg = HookedTransformerConfig(
+        n_layers=2,
+        d_model=16,
+        d_head=4,
+        n_heads=4,
+        d_mlp=32,
+        n_ctx=16,
+        d_vocab=50,
+        act_fn="relu",
+        device="cpu",
+        seed=0,
+    )
+    return HookedTransformer(cfg)
+
+
+@pytest.fixture
+def tiny_sae() -> VanillaSAE:
+    torch.manual_seed(0)
+    sae = VanillaSAE(d_in=16, d_sae=64)
+    with torch.no_grad():
+        sae.W_enc.normal_()
+        sae.W_dec.normal_()
+        sae.b_enc.normal_()
+    return sae.to(device="cpu")
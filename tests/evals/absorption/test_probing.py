@@ -326,9 +326,12 @@ def test_create_dataset_probe_training():
         assert 0 <= answer_class <= 25
 
 
+@patch("evals.absorption.probing.activation_collection.get_llm_activations_reduced")
 @patch("evals.absorption.probing.HookedTransformer")
 @patch("evals.absorption.probing.pd.DataFrame.to_csv")
-def test_gen_and_save_df_acts_probing(mock_to_csv, mock_model, tmp_path):
+def test_gen_and_save_df_acts_probing(
+    mock_to_csv, mock_model, mock_get_llm_activations_reduced, tmp_path
+):
     dataset = [
         (
             SpellingPrompt(base="The word 'cat' is spelled:", answer=" c-a-t", word="cat"),
@@ -340,17 +343,15 @@ def test_gen_and_save_df_acts_probing(mock_to_csv, mock_model, tmp_path):
         ),
     ]
     mock_model.cfg.d_model = 768
-    mock_cache = {
-        "test_hook": torch.rand(2, 10, 768)  # 2 samples, 10 tokens, 768 dimensions
-    }
-    mock_model.run_with_cache.return_value = (None, mock_cache)
+    # 2 samples, 768 dimensions, already gathered at position_idx
+    mock_get_llm_activations_reduced.return_value = torch.rand(2, 768)
 
     train_df, test_df, train_memmap, test_memmap = gen_and_save_df_acts_probing(
         mock_model,
         test_dataset=dataset,
         train_dataset=dataset,
         path=tmp_path,
-        hook_point="test_hook",
+        hook_point="blocks.0.hook_resid_post",
         batch_size=2,
         position_idx=-2,
     )
@@ -368,6 +369,7 @@ def test_gen_and_save_df_acts_probing(mock_to_csv, mock_model, tmp_path):
     assert os.path.exists(train_memmap_path)
     assert train_memmap.shape == (2, 768)  # 2 samples, 768 dimensions
     assert test_memmap.shape == (2, 768)  # 2 samples, 768 dimensions
+    assert mock_get_llm_activations_reduced.call_args.kwargs["layer"] == 0
 
 
 def test_train_linear_probe_for_task():
@@ -0,0 +1,197 @@
+import pytest
+import torch
+from sklearn.linear_model import LogisticRegression
+
+import evals.sparse_probing.probe_training as probe_training
+from sae_bench_utils.sparse_activations import SparsePooledActivations
+
+
+def make_class_activations(num_datapoints: int, dim: int) -> dict[str, torch.Tensor]:
+    """Activations of three classes, each shifted along its own direction."""
+    return {
+        class_name: torch.randn(num_datapoints + class_idx * 7, dim)
+        + 1.5 * torch.eye(dim)[class_idx]
+        for class_idx, class_name in enumerate(["a", "b", "c"])
+    }
+
+
+def test_fit_logistic_regression_batched_matches_sklearn():
+    torch.manual_seed(0)
+    inputs_PND = torch.randn(3, 200, 6)
+    labels_PN = (inputs_PND[..., 0] + torch.randn(3, 200) > 0).int()
+    sample_mask_PN = torch.ones(3, 200, dtype=torch.bool)
+    # Padded datapoints and features
+    sample_mask_PN[1, 150:] = False
+    inputs_PND[2, :, 4:] = 0.0
+
+    weights_PD, bias_P, num_iterations_P = probe_training.fit_logistic_regression_batched(
+        inputs_PND, labels_PN, sample_mask_PN, C=0.5
+    )
+
+    assert (num_iterations_P > 0).all()
+    for probe_idx, (num_datapoints, dim) in enumerate([(200, 6), (150, 6), (200, 4)]):
+        sklearn_probe = LogisticRegression(C=0.5, tol=1e-10, max_iter=10000).fit(
+            inputs_PND[probe_idx, :num_datapoints, :dim].double().numpy(),
+            labels_PN[probe_idx, :num_datapoints].numpy(),
+        )
+        assert weights_PD[probe_idx, :dim].tolist() == pytest.approx(
+            sklearn_probe.coef_[0].tolist(), abs=1e-4
+        )
+        assert bias_P[probe_idx].item() == pytest.approx(sklearn_probe.intercept_[0], abs=1e-4)
+        assert (weights_PD[probe_idx, dim:] == 0).all()
+
+
+def test_fit_logistic_regression_batched_warm_started_at_solution_stops_immediately():
+    torch.manual_seed(0)
+    inputs_PND = torch.randn(2, 100, 3)
+    labels_PN = (inputs_PND[..., 0] + torch.randn(2, 100) > 0).int()
+    sample_mask_PN = torch.ones(2, 100, dtype=torch.bool)
+
+    weights_PD, bias_P, _ = probe_training.fit_logistic_regression_batched(
+        inputs_PND, labels_PN, sample_mask_PN
+    )
+    warm_weights_PD, warm_bias_P, num_iterations_P = (
+        probe_training.fit_logistic_regression_batched(
+            inputs_PND, labels_PN, sample_mask_PN, init_weights_PD=weights_PD, init_bias_P=bias_P
+        )
+    )
+
+    assert num_iterations_P.tolist() == [0, 0]
+    assert torch.equal(warm_weights_PD, weights_PD)
+    assert torch.equal(warm_bias_P, bias_P)
+
+
+def test_fit_logistic_regression_batched_keeps_probes_whose_line_search_fails(monkeypatch):
+    torch.manual_seed(0)
+    inputs_PND = torch.randn(2, 100, 3)
+    labels_PN = (inputs_PND[..., 0] + torch.randn(2, 100) > 0).int()
+    sample_mask_PN = torch.ones(2, 100, dtype=torch.bool)
+    init_weights_PD = torch.ones(2, 3)
+
+    expected_weights_PD, expected_bias_P, expected_num_iterations_P = (
+        probe_training.fit_logistic_regression_batched(
+            inputs_PND, labels_PN, sample_mask_PN, init_weights_PD=init_weights_PD
+        )
+    )
+
+    # Make the second probe's Newton steps so large that even 30 halvings don't make them acceptable
+    solve = torch.linalg.solve
+
+    def solve_with_huge_step(hessian_PDD, grad_PD):
+        step_PD = solve(hessian_PDD, grad_PD)
+        step_PD[1] *= 1e12
+        return step_PD
+
+    monkeypatch.setattr(torch.linalg, "solve", solve_with_huge_step)
+    weights_PD, bias_P, num_iterations_P = probe_training.fit_logistic_regression_batched(
+        inputs_PND, labels_PN, sample_mask_PN, init_weights_PD=init_weights_PD
+    )
+
+    assert torch.equal(weights_PD[0], expected_weights_PD[0])
+    assert bias_P[0] == expected_bias_P[0]
+    assert num_iterations_P[0] == expected_num_iterations_P[0]
+    # The second probe keeps its initial weights and stops after its failed iteration
+    assert torch.equal(weights_PD[1], init_weights_PD[1].double())
+    assert bias_P[1] == 0
+    assert num_iterations_P[1] == 1
+
+
+def test_batched_top_k_probes_match_sklearn_probes():
+    torch.manual_seed(0)
+    train_activations = make_class_activations(60, 8)
+    test_activations = make_class_activations(30, 8)
+    k_values = [1, 2, 5]
+
+    torch.manual_seed(1)
+    batched_test_accuracies, _ = probe_training.train_top_k_probes_on_activations(
+        train_activations, test_activations, k_values
+    )
+
+    # The same random state gives the sklearn probes the same datapoints and features
+    torch.manual_seed(1)
+    for k in k_values:
+        for class_name in train_activations:
+            train_acts, train_labels = probe_training.prepare_probe_data(
+                train_activations, class_name
+            )
+            test_acts, test_labels = probe_training.prepare_probe_data(test_activations, class_name)
+            mask_D = probe_training.get_top_k_mean_diff_mask(train_acts, train_labels, k)
+            sklearn_probe = LogisticRegression().fit(
+                train_acts[:, ~mask_D].numpy(), train_labels.numpy()
+            )
+            test_accuracy = sklearn_probe.score(test_acts[:, ~mask_D].numpy(), test_labels.numpy())
+            assert batched_test_accuracies[k][class_name] == pytest.approx(test_accuracy, abs=0.02)
+
+
+def test_warm_started_top_k_probes_match_cold_started_probes_in_fewer_iterations():
+    torch.manual_seed(0)
+    train_activations = make_class_activations(60, 16)
+    test_activations = make_class_activations(30, 16)
+    k_values = [1, 2, 5, 10]
+
+    torch.manual_seed(1)
+    cold_test_accuracies, cold_num_iterations = (
+        probe_training.train_top_k_probes_on_activations(
+            train_activations, test_activations, k_values, warm_start=False
+        )
+    )
+    torch.manual_seed(1)
+    warm_test_accuracies, warm_num_iterations = (
+        probe_training.train_top_k_probes_on_activations(
+            train_activations, test_activations, k_values
+        )
+    )
+
+    assert warm_test_accuracies == cold_test_accuracies
+    assert warm_num_iterations[1] == cold_num_iterations[1]
+    total_warm_iterations = sum(sum(iters.values()) for iters in warm_num_iterations.values())
+    total_cold_iterations = sum(sum(iters.values()) for iters in cold_num_iterations.values())
+    assert total_warm_iterations < total_cold_iterations
+
+
+def make_sparse_class_activations(num_datapoints: int, d_sae: int) -> dict[str, torch.Tensor]:
+    """Non-negative activations where each latent is active on about a tenth of the examples."""
+    return {
+        class_name: torch.rand(num_datapoints, d_sae)
+        * (torch.rand(num_datapoints, d_sae) < 0.1)
+        * (1 + 2 * torch.eye(d_sae)[class_idx])
+        for class_idx, class_name in enumerate(["a", "b", "c"])
+    }
+
+
+def test_sparse_activations_give_the_same_probes_as_dense_activations():
+    torch.manual_seed(0)
+    train_activations = make_sparse_class_activations(60, 64)
+    test_activations = make_sparse_class_activations(30, 64)
+    sparse_train_activations = {
+        class_name: SparsePooledActivations.from_dense(acts_BF)
+        for class_name, acts_BF in train_activations.items()
+    }
+    sparse_test_activations = {
+        class_name: SparsePooledActivations.from_dense(acts_BF)
+        for class_name, acts_BF in test_activations.items()
+    }
+
+    results = []
+    for train_acts, test_acts in [
+        (train_activations, test_activations),
+        (sparse_train_activations, sparse_test_activations),
+    ]:
+        torch.manual_seed(1)
+        top_k_test_accuracies, _ = probe_training.train_top_k_probes_on_activations(
+            train_acts, test_acts, [1, 2, 5]
+        )
+        torch.manual_seed(1)
+        probes, test_accuracies = probe_training.train_probe_on_activations(
+            train_acts, test_acts, use_sklearn=False, batch_size=16, epochs=3, lr=1e-2
+        )
+        results.append((top_k_test_accuracies, probes, test_accuracies))
+
+    dense_top_k, dense_probes, dense_accuracies = results[0]
+    sparse_top_k, sparse_probes, sparse_accuracies = results[1]
+    assert sparse_top_k == dense_top_k
+    assert sparse_accuracies == pytest.approx(dense_accuracies)
+    for class_name in dense_probes:
+        assert torch.allclose(
+            sparse_probes[class_name].net.weight, dense_probes[class_name].net.weight, atol=1e-5
+        )
@@ -0,0 +1,125 @@
+from dataclasses import replace
+from types import SimpleNamespace
+
+import torch
+
+import evals.scr_and_tpp.main as scr_and_tpp_main
+import evals.sparse_probing.main as sparse_probing_main
+import sae_bench_utils.activation_cache as activation_cache
+from evals.scr_and_tpp.eval_config import ScrAndTppEvalConfig
+from evals.sparse_probing.eval_config import SparseProbingEvalConfig
+from sae_bench_utils.ragged_activations import RaggedActivations
+
+
+class FakeTokenizer:
+    padding_side = "right"
+    special_tokens_map = {"bos_token": "<bos>"}
+
+    def get_vocab(self):
+        return {"<bos>": 0, "a": 1, "b": 2}
+
+
+def make_key(**kwargs) -> activation_cache.ActivationCacheKey:
+    key_kwargs = dict(
+        model_name="pythia-70m-deduped",
+        hook_name="blocks.3.hook_resid_post",
+        dataset_name="LabHC/bias_in_bios_class_set1",
+        split="train",
+        random_seed=42,
+        context_length=128,
+        tokenizer_revision="abc",
+        dtype="float32",
+    )
+    key_kwargs.update(kwargs)
+    return activation_cache.ActivationCacheKey(**key_kwargs)
+
+
+def make_acts(num_examples: int) -> dict[str, RaggedActivations]:
+    lengths = torch.randint(1, 5, (num_examples,))
+    offsets = torch.zeros(num_examples + 1, dtype=torch.long)
+    offsets[1:] = torch.cumsum(lengths, 0)
+    return {"0": RaggedActivations(torch.randn(int(offsets[-1]), 8), offsets)}
+
+
+def test_activation_cache_key_digest_depends_on_every_field():
+    key = make_key(dataset_kwargs={"train_set_size": 4000})
+    assert key.digest() == make_key(dataset_kwargs={"train_set_size": 4000}).digest()
+
+    changed_keys = [
+        replace(key, split="test"),
+        replace(key, random_seed=43),
+        replace(key, context_length=256),
+        replace(key, tokenizer_revision="def"),
+        replace(key, dtype="bfloat16"),
+        replace(key, quantization="int8"),
+        replace(key, dataset_kwargs={"train_set_size": 2000}),
+    ]
+    digests = {key.digest()} | {changed_key.digest() for changed_key in changed_keys}
+    assert len(digests) == len(changed_keys) + 1
+
+
+def test_sparse_probing_and_tpp_share_activation_cache_keys():
+    model = SimpleNamespace(tokenizer=FakeTokenizer())
+    dataset_name = "LabHC/bias_in_bios_class_set1"
+    hook_name = "blocks.3.hook_resid_post"
+
+    sparse_probing_config = SparseProbingEvalConfig(model_name="pythia-70m-deduped")
+    tpp_config = ScrAndTppEvalConfig(model_name="pythia-70m-deduped", perform_scr=False)
+    chosen_classes = scr_and_tpp_main.dataset_info.chosen_classes_per_dataset[dataset_name]
+
+    sparse_probing_keys = sparse_probing_main.get_activation_cache_keys(
+        dataset_name, sparse_probing_config, model, hook_name
+    )
+    tpp_keys = scr_and_tpp_main.get_activation_cache_keys(
+        dataset_name, tpp_config, model, hook_name, chosen_classes
+    )
+    assert [key.digest() for key in sparse_probing_keys] == [key.digest() for key in tpp_keys]
+
+    sparse_probing_config.random_seed = 0
+    reseeded_keys = sparse_probing_main.get_activation_cache_keys(
+        dataset_name, sparse_probing_config, model, hook_name
+    )
+    assert reseeded_keys[0].digest() != tpp_keys[0].digest()
+
+
+def test_get_train_test_activations_computes_once(tmp_path):
+    cache = activation_cache.ActivationCache(str(tmp_path))
+    train_key = make_key(split="train")
+    test_key = make_key(split="test")
+    num_calls = 0
+
+    def compute_activations():
+        nonlocal num_calls
+        num_calls += 1
+        return make_acts(3), make_acts(2)
+
+    train_acts, test_acts = activation_cache.get_train_test_activations(
+        cache, train_key, test_key, compute_activations
+    )
+    cached_train_acts, cached_test_acts = activation_cache.get_train_test_activations(
+        cache, train_key, test_key, compute_activations
+    )
+
+    assert num_calls == 1
+    assert torch.equal(cached_train_acts["0"].acts_TD, train_acts["0"].acts_TD)
+    assert torch.equal(cached_test_acts["0"].offsets, test_acts["0"].offsets)
+    assert train_key in cache
+    assert make_key(split="train", random_seed=0) not in cache
+
+    # Freshly computed quantized activations equal the ones loaded later
+    quantized_keys = [
+        replace(train_key, quantization="int8"),
+        replace(test_key, quantization="int8"),
+    ]
+    quantized_train_acts, _ = activation_cache.get_train_test_activations(
+        cache, *quantized_keys, compute_activations
+    )
+    loaded_train_acts, _ = activation_cache.get_train_test_activations(
+        cache, *quantized_keys, compute_activations
+    )
+    assert num_calls == 2
+    assert torch.equal(quantized_train_acts["0"].acts_TD, loaded_train_acts["0"].acts_TD)
+    assert loaded_train_acts["0"].acts_TD.dtype == torch.int8
+
+    cache.remove(train_key)
+    assert train_key not in cache
@@ -0,0 +1,311 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+import sae_bench_utils.activation_collection as activation_collection
+import sae_bench_utils.activation_shards as activation_shards
+from sae_bench_utils.sparse_activations import SparsePooledActivations
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.bfloat16])
+def test_shard_round_trip(tmp_path, dtype):
+    shard_path = os.path.join(tmp_path, "shard.bin")
+    acts_SLD = torch.randn(10, 7, 3).to(dtype=dtype)
+    tokens_SL = torch.randint(0, 100, (10, 7))
+
+    with activation_shards.ActivationShardWriter(shard_path) as writer:
+        for i in range(0, 10, 4):
+            writer.append("activations", acts_SLD[i : i + 4])
+        writer.write("tokens", tokens_SL)
+
+    loaded = activation_shards.load_shard(shard_path)
+    assert loaded["activations"].dtype == dtype
+    assert torch.equal(loaded["activations"], acts_SLD)
+    assert torch.equal(loaded["tokens"], tokens_SL)
+
+    # the mapping is copy-on-write, writes never reach the file
+    loaded["activations"][0] = 0
+    assert torch.equal(activation_shards.load_shard(shard_path)["activations"], acts_SLD)
+
+
+def test_shard_writer_rejects_mismatched_batches(tmp_path):
+    shard_path = os.path.join(tmp_path, "shard.bin")
+    with pytest.raises(ValueError):
+        with activation_shards.ActivationShardWriter(shard_path) as writer:
+            writer.append("activations", torch.randn(2, 3))
+            writer.append("activations", torch.randn(2, 4))
+    assert not activation_shards.shard_exists(shard_path)
+
+
+def test_encode_precomputed_activations_matches_collect_sae_activations(
+    tmp_path, tiny_model, tiny_sae
+):
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (13, 8))
+    layer = 1
+    hook_name = f"blocks.{layer}.hook_resid_post"
+
+    expected_BLF = activation_collection.collect_sae_activations(
+        tokens, tiny_model, tiny_sae, batch_size=4, layer=layer, hook_name=hook_name
+    )
+
+    activation_collection.save_activations(
+        tokens,
+        tiny_model,
+        batch_size=4,
+        layer=layer,
+        hook_name=hook_name,
+        num_chunks=2,
+        save_size=7,
+        artifacts_dir=str(tmp_path),
+    )
+    encoded_BLF = activation_collection.encode_precomputed_activations(
+        tiny_sae, sae_batch_size=3, num_chunks=2, activation_dir=str(tmp_path)
+    )
+
+    assert torch.allclose(encoded_BLF, expected_BLF, atol=1e-5)
+
+
+def test_get_stop_at_layer():
+    assert activation_collection.get_layer_from_hook_name("blocks.12.hook_resid_post") == 12
+    assert activation_collection.get_layer_from_hook_name("ln_final.hook_normalized") is None
+    assert (
+        activation_collection.get_stop_at_layer(
+            ["blocks.5.hook_resid_post", "blocks.19.hook_resid_post", "blocks.12.attn.hook_z"]
+        )
+        == 20
+    )
+    assert activation_collection.get_stop_at_layer(["hook_embed"]) == 0
+    assert activation_collection.get_stop_at_layer(["ln_final.hook_normalized"]) is None
+
+
+def test_get_llm_activations_multiple_hooks_matches_single_hook(tiny_model):
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (9, 8))
+    hook_names = ["blocks.0.hook_resid_post", "blocks.1.hook_resid_post"]
+
+    all_acts_BLD = activation_collection.get_llm_activations_multiple_hooks(
+        tokens, tiny_model, batch_size=4, hook_names=hook_names
+    )
+
+    for layer, hook_name in enumerate(hook_names):
+        expected_BLD = activation_collection.get_llm_activations(
+            tokens, tiny_model, batch_size=4, layer=layer, hook_name=hook_name
+        )
+        assert torch.allclose(all_acts_BLD[hook_name], expected_BLD)
+
+
+def test_reduced_activations_match_reducing_full_activations(tiny_model):
+    tokenizer = SimpleNamespace(pad_token_id=0, bos_token_id=1, eos_token_id=2)
+    tokens = torch.randint(3, tiny_model.cfg.d_vocab, (9, 8))
+    tokens[:, 0] = tokenizer.bos_token_id
+    tokens[:4, 5:] = tokenizer.pad_token_id
+    layer = 1
+    hook_name = f"blocks.{layer}.hook_resid_post"
+
+    def get_reduced(reducer):
+        return activation_collection.get_llm_activations_reduced(
+            tokens, tiny_model, batch_size=4, layer=layer, hook_name=hook_name, reducer=reducer
+        )
+
+    acts_BLD = activation_collection.get_llm_activations(
+        tokens, tiny_model, batch_size=4, layer=layer, hook_name=hook_name
+    )
+    masked_acts_BLD = acts_BLD * activation_collection.get_bos_pad_eos_mask(tokens, tokenizer)[
+        :, :, None
+    ]
+    expected_mean_BD = activation_collection.create_meaned_model_activations(
+        {"class": masked_acts_BLD}
+    )["class"]
+
+    mean_BD = get_reduced(activation_collection.masked_mean_reducer(tokenizer))
+    assert mean_BD.shape == (9, 16)
+    assert torch.allclose(mean_BD, expected_mean_BD, atol=1e-6)
+
+    assert torch.equal(get_reduced(activation_collection.position_reducer(-2)), acts_BLD[:, -2])
+    assert torch.equal(
+        get_reduced(activation_collection.positions_reducer([0, 3])), acts_BLD[:, [0, 3]]
+    )
+
+    last_token_BD = get_reduced(activation_collection.last_token_reducer(tokenizer))
+    assert torch.equal(last_token_BD[:4], acts_BLD[:4, 4])
+    assert torch.equal(last_token_BD[4:], acts_BLD[4:, -1])
+
+
+@pytest.mark.parametrize("hook_name", ["hook_embed", "ln_final.hook_normalized"])
+def test_reduced_activations_at_hooks_outside_the_residual_blocks(tiny_model, hook_name):
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (5, 8))
+    layer = activation_collection.get_layer_from_hook_name(hook_name)
+    assert layer is None
+
+    acts_BD = activation_collection.get_llm_activations_reduced(
+        tokens,
+        tiny_model,
+        batch_size=2,
+        layer=layer,
+        hook_name=hook_name,
+        reducer=activation_collection.position_reducer(-2),
+    )
+
+    _, cache = tiny_model.run_with_cache(tokens, names_filter=hook_name)
+    assert torch.allclose(acts_BD, cache[hook_name][:, -2], atol=1e-6)
+
+
+def test_reduced_activations_dont_keep_the_full_activations_alive():
+    tokenizer = SimpleNamespace(pad_token_id=0, bos_token_id=1, eos_token_id=2)
+    resid_BLD = torch.randn(4, 8, 16)
+    tokens_BL = torch.randint(3, 50, (4, 8))
+
+    for reducer in [
+        activation_collection.masked_mean_reducer(tokenizer),
+        activation_collection.position_reducer(-2),
+        activation_collection.positions_reducer([0, 3]),
+        activation_collection.last_token_reducer(tokenizer),
+    ]:
+        acts = reducer(resid_BLD, tokens_BL)
+        assert acts.untyped_storage().nbytes() == acts.numel() * acts.element_size()
+
+
+def test_save_activations_multiple_hooks(tmp_path, tiny_model, tiny_sae):
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (9, 8))
+    hook_names = ["blocks.0.hook_resid_post", "blocks.1.hook_resid_post"]
+
+    hook_dirs = activation_collection.save_activations_multiple_hooks(
+        tokens,
+        tiny_model,
+        batch_size=4,
+        hook_names=hook_names,
+        num_chunks=1,
+        save_size=9,
+        artifacts_dir=str(tmp_path),
+    )
+
+    for layer, hook_name in enumerate(hook_names):
+        expected_BLF = activation_collection.collect_sae_activations(
+            tokens, tiny_model, tiny_sae, batch_size=4, layer=layer, hook_name=hook_name
+        )
+        encoded_BLF = activation_collection.encode_precomputed_activations(
+            tiny_sae, sae_batch_size=4, num_chunks=1, activation_dir=hook_dirs[hook_name]
+        )
+        assert torch.allclose(encoded_BLF, expected_BLF, atol=1e-5)
+
+
+def test_multiple_saes_match_single_sae(tmp_path, tiny_model, tiny_sae):
+    torch.manual_seed(1)
+    other_sae = type(tiny_sae)(d_in=16, d_sae=32)
+    with torch.no_grad():
+        other_sae.W_enc.normal_()
+        other_sae.b_enc.normal_()
+    other_sae = other_sae.to(device="cpu")
+    saes = [tiny_sae, other_sae]
+
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (9, 8))
+    layer = 1
+    hook_name = f"blocks.{layer}.hook_resid_post"
+
+    collected = activation_collection.collect_sae_activations_multiple_saes(
+        tokens, tiny_model, saes, 4, layer, hook_name, selected_latents=[None, [3, 1]]
+    )
+    sparsities = activation_collection.get_feature_activation_sparsity_multiple_saes(
+        tokens, tiny_model, saes, 4, layer, hook_name
+    )
+
+    activation_collection.save_activations(
+        tokens,
+        tiny_model,
+        4,
+        layer,
+        hook_name,
+        num_chunks=1,
+        save_size=9,
+        artifacts_dir=str(tmp_path),
+    )
+    encoded = activation_collection.encode_precomputed_activations_multiple_saes(
+        saes, 4, num_chunks=1, activation_dir=str(tmp_path)
+    )
+
+    llm_acts = {
+        "a": activation_collection.get_llm_activations(tokens, tiny_model, 4, layer, hook_name)
+    }
+    meaned = activation_collection.get_sae_meaned_activations_multiple_saes(llm_acts, saes, 4)
+
+    for sae_idx, (sae, selected_latents) in enumerate(zip(saes, [None, [3, 1]])):
+        expected_BLF = activation_collection.collect_sae_activations(
+            tokens, tiny_model, sae, 4, layer, hook_name
+        )
+        expected_selected_BLF = (
+            expected_BLF if selected_latents is None else expected_BLF[:, :, selected_latents]
+        )
+        assert torch.allclose(collected[sae_idx], expected_selected_BLF, atol=1e-5)
+        assert torch.allclose(encoded[sae_idx], expected_BLF, atol=1e-5)
+        assert torch.allclose(
+            sparsities[sae_idx],
+            activation_collection.get_feature_activation_sparsity(
+                tokens, tiny_model, sae, 4, layer, hook_name
+            ),
+        )
+        assert torch.allclose(
+            meaned[sae_idx]["a"],
+            activation_collection.get_sae_meaned_activations(llm_acts, sae, 4)["a"],
+        )
+
+
+def test_collect_sae_activations_sparse_matches_dense(tiny_model, tiny_sae):
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (9, 8))
+    layer = 1
+    hook_name = f"blocks.{layer}.hook_resid_post"
+    selected_latents = [5, 0, 17, 3]
+
+    dense_BLF = activation_collection.collect_sae_activations(
+        tokens, tiny_model, tiny_sae, 4, layer, hook_name, selected_latents=selected_latents
+    )
+    sparse = activation_collection.collect_sae_activations_sparse(
+        tokens, tiny_model, tiny_sae, 4, layer, hook_name, selected_latents=selected_latents
+    )
+
+    assert sparse.nnz == (dense_BLF != 0).sum().item()
+    assert torch.equal(sparse.to_dense(), dense_BLF)
+    for i in range(len(selected_latents)):
+        assert torch.equal(sparse.latent(i).to_dense(), dense_BLF[:, :, i])
+
+    top_k = activation_collection.collect_sae_activations_sparse(
+        tokens, tiny_model, tiny_sae, 4, layer, hook_name, top_k_per_token=2
+    )
+    top_k_dense_BLF = top_k.to_dense()
+    assert ((top_k_dense_BLF != 0).sum(dim=-1) <= 2).all()
+    full_BLF = activation_collection.collect_sae_activations(
+        tokens, tiny_model, tiny_sae, 4, layer, hook_name
+    )
+    assert torch.equal(top_k_dense_BLF.max(dim=-1).values, full_BLF.max(dim=-1).values)
+
+
+def test_sae_meaned_activations_sparse_output_matches_dense(tiny_model, tiny_sae):
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (9, 8))
+    layer = 1
+    hook_name = f"blocks.{layer}.hook_resid_post"
+    llm_acts = {
+        "a": activation_collection.get_llm_activations(tokens, tiny_model, 4, layer, hook_name)
+    }
+
+    dense_BF = activation_collection.get_sae_meaned_activations(llm_acts, tiny_sae, 4)["a"]
+    sparse_BF = activation_collection.get_sae_meaned_activations(
+        llm_acts, tiny_sae, 4, sparse_output=True
+    )["a"]
+
+    assert isinstance(sparse_BF, SparsePooledActivations)
+    assert sparse_BF.shape == dense_BF.shape
+    assert len(sparse_BF.values_N) == (dense_BF != 0).sum()
+    assert torch.equal(sparse_BF.to_dense(), dense_BF)
+
+    indices = torch.tensor([7, 0, 3, 3])
+    assert torch.equal(sparse_BF[indices].to_dense(), dense_BF[indices])
+    assert torch.equal(sparse_BF[2:6].to_dense(), dense_BF[2:6])
+    assert torch.equal(
+        SparsePooledActivations.cat([sparse_BF[:4], sparse_BF[4:]]).to_dense(), dense_BF
+    )
+    assert torch.allclose(sparse_BF.mean(), dense_BF.mean(dim=0), atol=1e-6)
+
+    columns = torch.tensor([5, 0, 17])
+    assert torch.equal(sparse_BF.select_columns(columns), dense_BF[:, columns])
+    weight_FO = torch.randn(dense_BF.shape[1], 2)
+    assert torch.allclose(sparse_BF.matmul(weight_FO), dense_BF @ weight_FO, atol=1e-5)
@@ -0,0 +1,106 @@
+import os
+
+import torch
+
+import sae_bench_utils.activation_collection as activation_collection
+import sae_bench_utils.activation_quantization as activation_quantization
+from sae_bench_utils.ragged_activations import RaggedActivations, load_ragged_activations_dict
+
+
+def test_quantize_round_trip_error_is_within_half_a_step():
+    acts_BLD = torch.randn(4, 8, 16) * torch.linspace(0.1, 10, 16)
+    acts_BLD[:, 0] = 0.0
+    params = activation_quantization.calibrate([acts_BLD[:2], acts_BLD[2:]])
+
+    quantized_BLD = activation_quantization.quantize(acts_BLD, params)
+    dequantized_BLD = activation_quantization.dequantize(quantized_BLD, params)
+
+    assert quantized_BLD.dtype == torch.int8
+    assert dequantized_BLD.dtype == acts_BLD.dtype
+    assert ((dequantized_BLD - acts_BLD).abs() <= params.scale_D / 2 + 1e-6).all()
+    # Zero is exactly representable, so zeroed out positions stay zero
+    assert (dequantized_BLD[:, 0] == 0).all()
+
+
+def test_encode_quantized_precomputed_activations(tmp_path, tiny_model, tiny_sae):
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (13, 8))
+    layer = 1
+    hook_name = f"blocks.{layer}.hook_resid_post"
+    save_kwargs = dict(batch_size=4, layer=layer, hook_name=hook_name, num_chunks=2, save_size=7)
+
+    full_dir = tmp_path / "full"
+    quantized_dir = tmp_path / "quantized"
+    full_dir.mkdir()
+    quantized_dir.mkdir()
+    activation_collection.save_activations(
+        tokens, tiny_model, artifacts_dir=str(full_dir), **save_kwargs
+    )
+    activation_collection.save_activations(
+        tokens,
+        tiny_model,
+        artifacts_dir=str(quantized_dir),
+        quantize=True,
+        num_calibration_samples=13,
+        **save_kwargs,
+    )
+
+    shard_name = "activations_1_of_2.bin"
+    assert os.path.getsize(quantized_dir / shard_name) < os.path.getsize(full_dir / shard_name) / 2
+
+    expected_BLF = activation_collection.encode_precomputed_activations(
+        tiny_sae, sae_batch_size=3, num_chunks=2, activation_dir=str(full_dir)
+    )
+    encoded_BLF = activation_collection.encode_precomputed_activations(
+        tiny_sae, sae_batch_size=3, num_chunks=2, activation_dir=str(quantized_dir)
+    )
+
+    assert encoded_BLF.dtype == expected_BLF.dtype
+    relative_error = (encoded_BLF - expected_BLF).norm() / expected_BLF.norm()
+    assert relative_error < 0.05
+
+
+def test_quantized_ragged_activations_and_drift_report(tiny_sae):
+    acts_TD = torch.randn(50, 16)
+    ragged = RaggedActivations(acts_TD, torch.tensor([0, 20, 50]))
+    params = activation_quantization.calibrate([acts_TD])
+
+    state = {"class": ragged.to_dict(params)}
+    assert state["class"]["acts_TD"].dtype == torch.int8
+
+    # Loaded activations stay int8 until they are dequantized
+    loaded = load_ragged_activations_dict(state)["class"]
+    assert torch.equal(loaded.offsets, ragged.offsets)
+    assert loaded.acts_TD.dtype == torch.int8
+    assert loaded.dtype == acts_TD.dtype
+    dequantized = loaded.dequantize()
+    assert torch.allclose(dequantized.acts_TD, acts_TD, atol=params.scale_D.max().item())
+
+    # Slices and selections keep the parameters and are dequantized batch by batch
+    assert torch.equal(loaded[1:].dequantize().acts_TD, dequantized[1:].acts_TD)
+    indices = torch.tensor([1, 0])
+    assert torch.equal(
+        loaded.index_select(indices).dequantize().acts_TD,
+        dequantized.index_select(indices).acts_TD,
+    )
+    assert torch.allclose(
+        activation_collection.create_meaned_model_activations({"class": loaded}, batch_size=1)[
+            "class"
+        ],
+        dequantized.mean_pool(),
+    )
+    assert torch.allclose(
+        activation_collection.get_sae_meaned_activations({"class": loaded}, tiny_sae, 1)["class"],
+        activation_collection.get_sae_meaned_activations({"class": dequantized}, tiny_sae, 2)[
+            "class"
+        ],
+        atol=1e-5,
+    )
+    assert load_ragged_activations_dict({"class": loaded.to_dict()})["class"].acts_TD.dtype == (
+        torch.int8
+    )
+
+    drift = activation_quantization.get_quantization_drift(tiny_sae, acts_TD, params, batch_size=16)
+    assert drift["activation_relative_mse"] < 1e-3
+    assert drift["sae_acts_cosine_similarity"] > 0.99
+    assert 0.9 < drift["active_latents_jaccard"] <= 1.0
+    assert abs(drift["l0_original"] - drift["l0_quantized"]) < 2
@@ -0,0 +1,102 @@
+import pytest
+import torch
+
+import sae_bench_utils.batch_size_planner as batch_size_planner
+
+PYTHIA_70M_DIMS = batch_size_planner.ModelDims(
+    d_model=512, d_mlp=2048, n_layers=6, n_heads=8, d_vocab=50304
+)
+
+
+def test_plan_llm_batch_size_fits_the_memory_budget(monkeypatch):
+    monkeypatch.setattr(batch_size_planner, "get_model_dims", lambda model_name: PYTHIA_70M_DIMS)
+    memory_budget = 4 * 1024**3
+
+    batch_size = batch_size_planner.plan_llm_batch_size(
+        "pythia-70m-deduped", 128, "float32", memory_budget=memory_budget
+    )
+    bytes_per_sequence = batch_size_planner.estimate_llm_bytes_per_sequence(
+        PYTHIA_70M_DIMS, 128, torch.float32
+    )
+
+    assert batch_size & (batch_size - 1) == 0
+    assert batch_size * bytes_per_sequence <= memory_budget < 2 * batch_size * bytes_per_sequence
+
+    long_context_batch_size = batch_size_planner.plan_llm_batch_size(
+        "pythia-70m-deduped", 1024, "float32", memory_budget=memory_budget
+    )
+    assert long_context_batch_size < batch_size
+
+    assert (
+        batch_size_planner.plan_llm_batch_size(
+            "pythia-70m-deduped", 128, "float32", memory_budget=1024**4
+        )
+        == batch_size_planner.MAX_LLM_BATCH_SIZE
+    )
+    assert (
+        batch_size_planner.plan_llm_batch_size(
+            "pythia-70m-deduped", 128, "float32", memory_budget=0
+        )
+        == 1
+    )
+
+
+def test_plan_llm_batch_size_falls_back_to_table(monkeypatch):
+    monkeypatch.setattr(batch_size_planner, "get_model_dims", lambda model_name: None)
+
+    assert batch_size_planner.plan_llm_batch_size("gemma-2-2b", 128, "bfloat16") == 32
+    assert batch_size_planner.plan_llm_batch_size("gemma-2-2b", 1024, "bfloat16") == 4
+    with pytest.raises(ValueError):
+        batch_size_planner.plan_llm_batch_size("unknown-model", 128, "float32")
+
+
+def test_plan_sae_batch_size_shrinks_with_width():
+    memory_budget = 8 * 1024**3
+    narrow_batch_size = batch_size_planner.plan_sae_batch_size(
+        2304, 16384, 128, torch.bfloat16, "cpu", memory_budget=memory_budget
+    )
+    wide_batch_size = batch_size_planner.plan_sae_batch_size(
+        2304, 2**20, 128, torch.bfloat16, "cpu", memory_budget=memory_budget
+    )
+    assert wide_batch_size < narrow_batch_size
+    assert (
+        wide_batch_size
+        * batch_size_planner.estimate_sae_bytes_per_sequence(2304, 2**20, 128, torch.bfloat16)
+        <= memory_budget
+    )
+
+
+
+def test_probe_batch_size_halves_until_it_fits():
+    attempts = []
+
+    def run_batch(batch_size: int):
+        attempts.append(batch_size)
+        if batch_size > 12:
+            raise torch.OutOfMemoryError("out of memory")
+
+    assert batch_size_planner.probe_batch_size(run_batch, 64) == 8
+    assert attempts == [64, 32, 16, 8]
+
+    with pytest.raises(torch.OutOfMemoryError):
+        batch_size_planner.probe_batch_size(run_batch, 64, min_batch_size=16)
+
+
+def test_probe_llm_batch_size(tiny_model):
+    assert batch_size_planner.probe_llm_batch_size(tiny_model, 8, 4) == 4
+    assert batch_size_planner.ModelDims.from_cfg(tiny_model.cfg).d_model == 16
+
+
+def test_probe_sae_batch_size(tiny_sae, monkeypatch):
+    encoded_batch_sizes = []
+    encode = tiny_sae.encode
+
+    def encode_with_memory_limit(acts_BLD):
+        encoded_batch_sizes.append(acts_BLD.shape[0])
+        if acts_BLD.shape[0] > 2:
+            raise torch.OutOfMemoryError("out of memory")
+        return encode(acts_BLD)
+
+    monkeypatch.setattr(tiny_sae, "encode", encode_with_memory_limit)
+    assert batch_size_planner.probe_sae_batch_size(tiny_sae, 16, 8, 8) == 2
+    assert encoded_batch_sizes == [8, 4, 2]
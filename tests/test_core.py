@@ -1,6 +1,12 @@
 import json
 import os
 import argparse
+from dataclasses import asdict
+from types import SimpleNamespace
+from typing import Optional
+
+import numpy as np
+import pytest
 from evals.core.eval_output import CoreEvalOutput
 from sae_bench_utils.testing_utils import validate_eval_cli_interface
 import torch
@@ -8,6 +14,10 @@ import evals.core.eval_config as eval_config
 import evals.core.main as core
 from sae_bench_utils.sae_selection_utils import get_saes_from_regex
 from sae_bench_utils.testing_utils import validate_eval_output_format_file
+import sae_bench_utils.graphing_utils as graphing_utils
+import sae_bench_utils.token_cache as token_cache
+from custom_saes.custom_sae_config import CustomSAEConfig
+from custom_saes.vanilla_sae import VanillaSAE
 
 test_data_dir = "tests/test_data/core"
 expected_results_filename = os.path.join(test_data_dir, "core_expected_results.json")
@@ -23,6 +33,8 @@ def test_core_cli_interface():
     # Additional required args specific to core eval (but aren't in the config)
     additional_required = {
         "force_rerun",
+        "token_cache_dir",
+        "no_token_cache",
     }
 
     validate_eval_cli_interface(
@@ -71,6 +83,8 @@ def test_end_to_end():
             output_folder=test_data_dir,
             verbose=False,
             force_rerun=True,
+            token_cache_dir=token_cache.DEFAULT_TOKEN_CACHE_DIR,
+            no_token_cache=False,
             compute_kl=test_config.compute_kl,
             compute_ce_loss=test_config.compute_ce_loss,
             compute_l2_norms=test_config.compute_l2_norms,
@@ -78,8 +92,14 @@ def test_end_to_end():
             compute_variance_metrics=test_config.compute_variance_metrics,
             compute_featurewise_density_statistics=test_config.compute_featurewise_density_statistics,
             compute_featurewise_weight_based_metrics=test_config.compute_featurewise_weight_based_metrics,
+            compute_featurewise_max_decoder_cosine_sim=test_config.compute_featurewise_max_decoder_cosine_sim,
+            weight_metrics_block_size=test_config.weight_metrics_block_size,
             exclude_special_tokens_from_reconstruction=test_config.exclude_special_tokens_from_reconstruction,
             llm_dtype=test_config.llm_dtype,
+            max_saes_per_group=test_config.max_saes_per_group,
+            checkpoint_every_n_batches=test_config.checkpoint_every_n_batches,
+            early_stopping_tolerance=test_config.early_stopping_tolerance,
+            early_stopping_min_batches=test_config.early_stopping_min_batches,
         )
     )
 
@@ -143,10 +163,18 @@ def test_feature_metrics():
             output_folder=test_data_dir,
             verbose=False,
             force_rerun=True,
+            token_cache_dir=token_cache.DEFAULT_TOKEN_CACHE_DIR,
+            no_token_cache=False,
             compute_featurewise_density_statistics=test_config.compute_featurewise_density_statistics,
             compute_featurewise_weight_based_metrics=test_config.compute_featurewise_weight_based_metrics,
+            compute_featurewise_max_decoder_cosine_sim=test_config.compute_featurewise_max_decoder_cosine_sim,
+            weight_metrics_block_size=test_config.weight_metrics_block_size,
             exclude_special_tokens_from_reconstruction=test_config.exclude_special_tokens_from_reconstruction,
             llm_dtype=test_config.llm_dtype,
+            max_saes_per_group=test_config.max_saes_per_group,
+            checkpoint_every_n_batches=test_config.checkpoint_every_n_batches,
+            early_stopping_tolerance=test_config.early_stopping_tolerance,
+            early_stopping_min_batches=test_config.early_stopping_min_batches,
         )
     )
 
@@ -167,3 +195,500 @@ def test_feature_metrics():
     # Check that all feature metrics have the same length
     lengths = {len(feature_metrics[field]) for field in expected_fields}
     assert len(lengths) == 1, "All feature metrics should have the same length"
+
+
+def make_tiny_sae(hook_name: str, hook_head_index=None, seed: int = 0) -> VanillaSAE:
+    torch.manual_seed(seed)
+    d_in = 4 if hook_head_index is not None else 16
+    sae = VanillaSAE(d_in=d_in, d_sae=32).to(device="cpu")
+    with torch.no_grad():
+        sae.W_enc.normal_()
+        sae.W_dec.normal_()
+    sae.cfg = CustomSAEConfig(
+        model_name="tiny",
+        d_in=d_in,
+        d_sae=32,
+        hook_layer=int(hook_name.split(".")[1]),
+        hook_name=hook_name,
+        hook_head_index=hook_head_index,
+    )
+    return sae
+
+
+class FakeActivationsStore:
+    """Returns the same token batches after every reset, like a shuffled ActivationsStore."""
+
+    normalize_activations = "none"
+    context_size = 8
+    store_batch_size_prompts = 3
+
+    def __init__(self, d_vocab: int):
+        self.tokens = torch.randint(0, d_vocab, (12, self.context_size))
+        self.position = 0
+
+    def get_batch_tokens(self, batch_size: int) -> torch.Tensor:
+        batch_tokens = self.tokens[self.position : self.position + batch_size]
+        self.position += batch_size
+        return batch_tokens
+
+    def reset_input_dataset(self):
+        self.position = 0
+
+
+@pytest.mark.parametrize(
+    "hook_name, hook_head_index",
+    [
+        ("blocks.1.hook_resid_pre", None),
+        ("blocks.1.hook_resid_post", None),
+        ("blocks.0.attn.hook_z", None),
+        ("blocks.0.attn.hook_z", 2),
+    ],
+)
+def test_get_recons_loss_shared_prefix_matches_full_runs(
+    monkeypatch, tiny_model, hook_name, hook_head_index
+):
+    sae = make_tiny_sae(hook_name, hook_head_index)
+    activation_store = SimpleNamespace(normalize_activations="none")
+    batch_tokens = torch.randint(0, tiny_model.cfg.d_vocab, (3, 8))
+
+    def get_metrics():
+        return core.get_recons_loss(
+            sae,
+            tiny_model,
+            batch_tokens,
+            activation_store,  # type: ignore
+            compute_kl=True,
+            compute_ce_loss=True,
+        )
+
+    assert core.get_shared_prefix_layer(tiny_model, hook_name, {}) is not None
+    shared_prefix_metrics = get_metrics()
+    monkeypatch.setattr(core, "get_shared_prefix_layer", lambda *args: None)
+    full_run_metrics = get_metrics()
+
+    assert shared_prefix_metrics.keys() == full_run_metrics.keys()
+    for metric_name, metric_value in full_run_metrics.items():
+        assert torch.allclose(shared_prefix_metrics[metric_name], metric_value, atol=1e-5)
+    assert not torch.allclose(
+        full_run_metrics["ce_loss_with_sae"], full_run_metrics["ce_loss_without_sae"]
+    )
+
+    # The stacked intervention runs match running each intervention on its own
+    if hook_head_index is None:
+        _, expected_zero_abl_ce_loss = tiny_model.run_with_hooks(
+            batch_tokens,
+            return_type="both",
+            fwd_hooks=[(hook_name, lambda acts, hook: torch.zeros_like(acts))],
+            loss_per_token=True,
+        )
+        _, expected_recons_ce_loss = tiny_model.run_with_hooks(
+            batch_tokens,
+            return_type="both",
+            fwd_hooks=[(hook_name, lambda acts, hook: sae(acts.flatten(2)).reshape(acts.shape))],
+            loss_per_token=True,
+        )
+        assert torch.allclose(
+            shared_prefix_metrics["ce_loss_with_ablation"], expected_zero_abl_ce_loss, atol=1e-5
+        )
+        assert torch.allclose(
+            shared_prefix_metrics["ce_loss_with_sae"], expected_recons_ce_loss, atol=1e-5
+        )
+
+
+def test_downstream_reconstruction_metrics_average_every_token_without_ignore_tokens(tiny_model):
+    sae = make_tiny_sae("blocks.1.hook_resid_post")
+    activation_store = FakeActivationsStore(tiny_model.cfg.d_vocab)
+
+    metrics = core.get_downstream_reconstruction_metrics(
+        sae,
+        tiny_model,
+        activation_store,  # type: ignore
+        compute_kl=True,
+        compute_ce_loss=True,
+        n_batches=2,
+        eval_batch_size_prompts=3,
+        ignore_tokens=set(),
+    )
+
+    # The per-token metrics of every batch, concatenated and averaged
+    activation_store.reset_input_dataset()
+    all_batch_metrics = [
+        core.get_recons_loss(
+            sae,
+            tiny_model,
+            activation_store.get_batch_tokens(3),
+            activation_store,  # type: ignore
+            compute_kl=True,
+            compute_ce_loss=True,
+        )
+        for _ in range(2)
+    ]
+    for metric_name in all_batch_metrics[0]:
+        expected_value = torch.cat(
+            [batch_metrics[metric_name] for batch_metrics in all_batch_metrics]
+        ).mean()
+        assert metrics[metric_name] == pytest.approx(expected_value.item(), rel=1e-5)
+    assert metrics["n_batches"] == 2
+
+
+def test_blockwise_weight_based_metrics_match_full_matrices():
+    sae = make_tiny_sae("blocks.1.hook_resid_post")
+
+    feature_metrics = core.get_featurewise_weight_based_metrics(
+        sae, block_size=5, compute_max_decoder_cosine_sim=True
+    )
+
+    unit_norm_encoders = sae.W_enc / sae.W_enc.norm(dim=0, keepdim=True)
+    unit_norm_decoder = sae.W_dec / sae.W_dec.norm(dim=-1, keepdim=True)
+    decoder_cosine_sims = unit_norm_decoder @ unit_norm_decoder.T
+    decoder_cosine_sims.fill_diagonal_(-float("inf"))
+    max_decoder_cosine_sim, max_decoder_cosine_sim_index = decoder_cosine_sims.max(dim=-1)
+    expected_feature_metrics = {
+        "encoder_bias": sae.b_enc,
+        "encoder_norm": sae.W_enc.norm(dim=0),
+        "encoder_decoder_cosine_sim": (unit_norm_encoders.T * unit_norm_decoder).sum(dim=-1),
+        "max_decoder_cosine_sim": max_decoder_cosine_sim,
+    }
+    for metric_name, expected_values in expected_feature_metrics.items():
+        assert feature_metrics[metric_name].tolist() == pytest.approx(
+            expected_values.tolist(), rel=1e-5, abs=1e-6
+        )
+    assert (
+        feature_metrics["max_decoder_cosine_sim_index"].tolist()
+        == max_decoder_cosine_sim_index.tolist()
+    )
+    assert "max_decoder_cosine_sim" not in core.get_featurewise_weight_based_metrics(sae)
+
+
+def test_vocab_chunked_log_softmax_stats_match_full_vocab():
+    logits = torch.randn(2, 3, 5, 50) * 4
+    reference_logits = torch.randn(3, 5, 50) * 4
+
+    logsumexp, reference_logsumexp, kl_div = core.get_vocab_chunked_log_softmax_stats(
+        lambda vocab_slice: logits[..., vocab_slice],
+        d_vocab=50,
+        vocab_chunk_size=7,
+        get_reference_logits_chunk=lambda vocab_slice: reference_logits[..., vocab_slice],
+    )
+
+    reference_log_probs = reference_logits.log_softmax(dim=-1)
+    expected_kl_div = (
+        reference_log_probs.exp() * (reference_log_probs - logits.log_softmax(dim=-1))
+    ).sum(dim=-1)
+    assert torch.allclose(logsumexp, logits.logsumexp(dim=-1), atol=1e-5)
+    assert reference_logsumexp is not None and kl_div is not None
+    assert torch.allclose(reference_logsumexp, reference_logits.logsumexp(dim=-1), atol=1e-5)
+    assert torch.allclose(kl_div, expected_kl_div, atol=1e-5)
+
+
+def test_get_recons_loss_fused_unembed_matches_full_logits(monkeypatch, tiny_model):
+    hook_name = "blocks.0.hook_resid_post"
+    monkeypatch.setattr(tiny_model.cfg, "output_logits_soft_cap", 2.0)
+    saes = [make_tiny_sae(hook_name, seed=seed) for seed in range(2)]
+    activation_store = SimpleNamespace(normalize_activations="none")
+    batch_tokens = torch.randint(0, tiny_model.cfg.d_vocab, (3, 8))
+
+    def get_metrics():
+        return core.get_recons_loss_multiple_saes(
+            saes,
+            tiny_model,
+            batch_tokens,
+            activation_store,  # type: ignore
+            compute_kl=True,
+            compute_ce_loss=True,
+            vocab_chunk_size=7,
+        )
+
+    fused_unembed_metrics = get_metrics()
+    monkeypatch.setattr(core, "get_shared_prefix_layer", lambda *args: None)
+    full_logits_metrics = get_metrics()
+
+    for fused_metrics, full_metrics in zip(fused_unembed_metrics, full_logits_metrics):
+        assert fused_metrics.keys() == full_metrics.keys()
+        for metric_name, metric_value in full_metrics.items():
+            assert torch.allclose(fused_metrics[metric_name], metric_value, atol=1e-5)
+
+
+def test_multiple_saes_match_single_sae_evals(tiny_model):
+    hook_name = "blocks.1.hook_resid_post"
+    saes = [make_tiny_sae(hook_name, seed=seed) for seed in range(3)]
+    activation_store = FakeActivationsStore(tiny_model.cfg.d_vocab)
+    core_eval_config = eval_config.CoreEvalConfig(
+        batch_size_prompts=3,
+        n_eval_reconstruction_batches=2,
+        n_eval_sparsity_variance_batches=2,
+        compute_kl=True,
+        compute_ce_loss=True,
+        compute_l2_norms=True,
+        compute_sparsity_metrics=True,
+        compute_variance_metrics=True,
+        compute_featurewise_density_statistics=True,
+        compute_featurewise_weight_based_metrics=True,
+    )
+    ignore_tokens = {0}
+
+    all_sae_results = core.run_evals_multiple_saes(
+        saes,
+        activation_store,  # type: ignore
+        tiny_model,
+        core_eval_config,
+        ignore_tokens=ignore_tokens,
+    )
+
+    assert len({core.get_sae_group_key(sae) for sae in saes}) == 1
+    assert len(all_sae_results) == len(saes)
+    for sae, (metrics, feature_metrics) in zip(saes, all_sae_results):
+        activation_store.reset_input_dataset()
+        expected_metrics, expected_feature_metrics = core.run_evals(
+            sae,
+            activation_store,  # type: ignore
+            tiny_model,
+            core_eval_config,
+            ignore_tokens=ignore_tokens,
+        )
+        assert metrics.keys() == expected_metrics.keys()
+        for group_name, group_metrics in expected_metrics.items():
+            for metric_name, expected_value in group_metrics.items():
+                assert metrics[group_name][metric_name] == pytest.approx(expected_value, rel=1e-4)
+        for metric_name, expected_values in expected_feature_metrics.items():
+            assert feature_metrics[metric_name] == pytest.approx(
+                expected_values, rel=1e-4, nan_ok=True
+            )
+
+
+def test_early_stopping_stops_once_confidence_intervals_are_narrow(tiny_model):
+    saes = [make_tiny_sae("blocks.1.hook_resid_post", seed=seed) for seed in range(2)]
+    activation_store = FakeActivationsStore(tiny_model.cfg.d_vocab)
+
+    def run_evals(n_batches: int, early_stopping_tolerance: float):
+        activation_store.reset_input_dataset()
+        core_eval_config = eval_config.CoreEvalConfig(
+            batch_size_prompts=3,
+            n_eval_reconstruction_batches=n_batches,
+            n_eval_sparsity_variance_batches=n_batches,
+            compute_ce_loss=True,
+            compute_sparsity_metrics=True,
+            compute_variance_metrics=True,
+            early_stopping_tolerance=early_stopping_tolerance,
+            early_stopping_min_batches=2,
+        )
+        return core.run_evals_multiple_saes(
+            saes,
+            activation_store,  # type: ignore
+            tiny_model,
+            core_eval_config,
+        )
+
+    # Any interval is narrower than a huge tolerance, so both stages stop after the min batches
+    early_stopped_results = run_evals(n_batches=4, early_stopping_tolerance=1e6)
+    two_batch_results = run_evals(n_batches=2, early_stopping_tolerance=0.0)
+    for (metrics, _), (expected_metrics, _) in zip(early_stopped_results, two_batch_results):
+        assert metrics == expected_metrics
+        assert metrics["token_stats"]["n_batches_eval_reconstruction"] == 2
+        assert metrics["token_stats"]["n_batches_eval_sparsity_variance"] == 2
+        assert metrics["token_stats"]["total_tokens_eval_reconstruction"] == 2 * 3 * 8
+        assert metrics["confidence_intervals"].keys() == {
+            "ce_loss_score_ci_half_width",
+            "explained_variance_ci_half_width",
+            "l0_ci_half_width",
+        }
+
+    # No interval is narrower than a tiny tolerance, so every batch is evaluated
+    for metrics, _ in run_evals(n_batches=4, early_stopping_tolerance=1e-12):
+        assert metrics["token_stats"]["n_batches_eval_reconstruction"] == 4
+        assert metrics["token_stats"]["n_batches_eval_sparsity_variance"] == 4
+        assert all(
+            half_width > 0 for half_width in metrics["confidence_intervals"].values()
+        )
+
+
+def test_feature_metrics_are_saved_to_a_sidecar_file(tmp_path):
+    with open(expected_results_filename) as f:
+        expected_metrics = json.load(f)["eval_result_metrics"]
+    feature_metrics = {
+        "feature_density": [0.5, 1e-7, 0.0],
+        "consistent_activation_heuristic": [2.0, 1.0, -1],
+        "encoder_bias": [0.1, -0.2, 0.3],
+        "encoder_norm": [1.0, 2.0, 3.0],
+        "encoder_decoder_cosine_sim": [0.9, 0.8, 0.7],
+    }
+    result = {
+        "unique_id": "release_blocks_0_hook_resid_post",
+        "sae_set": "release",
+        "sae_id": "blocks.0.hook_resid_post",
+        "eval_cfg": eval_config.CoreEvalConfig(dataset="org/dataset"),
+        "metrics": expected_metrics,
+        "feature_metrics": feature_metrics,
+    }
+
+    json_path = core.save_single_eval_result(result, "eval_id", "1.0.0", "abc123", tmp_path)
+    validate_eval_output_format_file(str(json_path), eval_output_type=CoreEvalOutput)
+
+    with open(json_path) as f:
+        saved_output = json.load(f)
+    assert saved_output["eval_result_details"] == []
+    assert (tmp_path / saved_output["feature_metrics_file"]).exists()
+
+    with graphing_utils.load_core_feature_metrics(str(json_path)) as loaded_feature_metrics:
+        for metric_name, values in feature_metrics.items():
+            assert loaded_feature_metrics[metric_name].tolist() == pytest.approx(values, rel=1e-6)
+
+    # Results saved before the sidecar file existed are still loaded
+    saved_output["feature_metrics_file"] = None
+    saved_output["eval_result_details"] = [
+        asdict(feature_metric) for feature_metric in core.convert_feature_metrics(feature_metrics)
+    ]
+    old_json_path = tmp_path / "old_format.json"
+    with open(old_json_path, "w") as f:
+        json.dump(saved_output, f)
+    with graphing_utils.load_core_feature_metrics(str(old_json_path)) as loaded_feature_metrics:
+        for metric_name, values in feature_metrics.items():
+            assert loaded_feature_metrics[metric_name].tolist() == pytest.approx(values, rel=1e-6)
+
+
+def test_nans_in_feature_metrics_are_replaced_with_negative_one():
+    eval_metrics = {
+        "metrics": {"sparsity": {"l0": float("nan"), "l1": 2.0}},
+        "feature_metrics": {
+            "feature_density": np.array([0.5, np.nan, 0.0], dtype=np.float32),
+            "max_decoder_cosine_sim_index": np.array([2, 0, 1]),
+        },
+    }
+    cleaned_metrics = core.replace_nans_with_negative_one(eval_metrics)
+    assert cleaned_metrics["metrics"] == {"sparsity": {"l0": -1, "l1": 2.0}}
+    assert cleaned_metrics["feature_metrics"]["feature_density"].tolist() == [0.5, -1.0, 0.0]
+    assert cleaned_metrics["feature_metrics"]["max_decoder_cosine_sim_index"].tolist() == [2, 0, 1]
+
+
+def test_completed_eval_results_are_loaded_unless_the_config_changed(tmp_path):
+    with open(expected_results_filename) as f:
+        expected_metrics = json.load(f)["eval_result_metrics"]
+    saved_eval_config = eval_config.CoreEvalConfig(model_name="pythia-70m-deduped")
+    result = {
+        "unique_id": "release_blocks_0_hook_resid_post",
+        "sae_set": "release",
+        "sae_id": "blocks.0.hook_resid_post",
+        "eval_cfg": saved_eval_config,
+        "metrics": expected_metrics,
+        "feature_metrics": {"feature_density": [0.5, 0.25]},
+    }
+    json_path = core.save_single_eval_result(result, "eval_id", "1.0.0", "abc123", tmp_path)
+
+    # Settings that don't change the results, like the model name, which comes from the SAE,
+    # don't invalidate saved results
+    rerun_eval_config = eval_config.CoreEvalConfig(max_saes_per_group=4)
+    assert core.get_eval_result_path(tmp_path, result["unique_id"], rerun_eval_config) == json_path
+    completed_result = core.load_completed_eval_result(
+        json_path, result["unique_id"], rerun_eval_config
+    )
+    assert completed_result is not None
+    assert completed_result["eval_cfg"] == saved_eval_config
+    assert completed_result["metrics"] == expected_metrics
+    assert completed_result["feature_metrics"].keys() == {"feature_density"}
+    assert completed_result["feature_metrics"]["feature_density"].tolist() == [0.5, 0.25]
+
+    changed_eval_config = eval_config.CoreEvalConfig(n_eval_reconstruction_batches=20)
+    assert core.load_completed_eval_result(json_path, "id", changed_eval_config) is None
+    assert core.load_completed_eval_result(tmp_path / "missing.json", "id", rerun_eval_config) is None
+
+
+class InterruptingActivationsStore(FakeActivationsStore):
+    """Raises on the interrupt_at_call-th call of get_batch_tokens(), like a killed run."""
+
+    def __init__(self, d_vocab: int, interrupt_at_call: Optional[int] = None):
+        super().__init__(d_vocab)
+        self.interrupt_at_call = interrupt_at_call
+        self.num_calls = 0
+
+    def get_batch_tokens(self, batch_size: int) -> torch.Tensor:
+        self.num_calls += 1
+        if self.num_calls == self.interrupt_at_call:
+            raise KeyboardInterrupt
+        return super().get_batch_tokens(batch_size)
+
+
+@pytest.mark.parametrize("interrupt_at_call", [2, 4])
+def test_interrupted_evals_resume_from_checkpoint(tmp_path, tiny_model, interrupt_at_call):
+    saes = [make_tiny_sae("blocks.1.hook_resid_post", seed=seed) for seed in range(2)]
+    core_eval_config = eval_config.CoreEvalConfig(
+        batch_size_prompts=3,
+        n_eval_reconstruction_batches=2,
+        n_eval_sparsity_variance_batches=2,
+        compute_kl=True,
+        compute_ce_loss=True,
+        compute_sparsity_metrics=True,
+        compute_variance_metrics=True,
+        compute_featurewise_density_statistics=True,
+    )
+    activation_store = InterruptingActivationsStore(tiny_model.cfg.d_vocab, interrupt_at_call)
+    checkpoint = core.MetricsCheckpoint(tmp_path / "checkpoint.pt", key="key", every_n_batches=1)
+
+    def run_evals(checkpoint: Optional[core.MetricsCheckpoint]):
+        activation_store.reset_input_dataset()
+        return core.run_evals_multiple_saes(
+            saes,
+            activation_store,  # type: ignore
+            tiny_model,
+            core_eval_config,
+            checkpoint=checkpoint,
+        )
+
+    with pytest.raises(KeyboardInterrupt):
+        run_evals(checkpoint)
+    assert checkpoint.path.exists()
+    resumed_results = run_evals(checkpoint)
+
+    # A checkpoint saved under another key is ignored
+    other_checkpoint = core.MetricsCheckpoint(checkpoint.path, key="other", every_n_batches=1)
+    assert other_checkpoint.load("reconstruction") is None
+    uninterrupted_results = run_evals(checkpoint=None)
+
+    for (metrics, feature_metrics), (expected_metrics, expected_feature_metrics) in zip(
+        resumed_results, uninterrupted_results
+    ):
+        for group_name, group_metrics in expected_metrics.items():
+            for metric_name, expected_value in group_metrics.items():
+                assert metrics[group_name][metric_name] == pytest.approx(expected_value, rel=1e-5)
+        for metric_name, expected_values in expected_feature_metrics.items():
+            assert feature_metrics[metric_name] == pytest.approx(
+                expected_values, rel=1e-5, nan_ok=True
+            )
+
+
+def test_cached_and_uncached_token_paths_use_the_same_norm_scaling_factor(
+    monkeypatch, tmp_path, tiny_model
+):
+    # The tiny model has no tokenizer
+    monkeypatch.setattr(core.activation_cache, "get_tokenizer_revision", lambda tokenizer: "tiny")
+
+    sae = make_tiny_sae("blocks.1.hook_resid_post")
+    sae.cfg.normalize_activations = "expected_average_only_in"
+    config = eval_config.CoreEvalConfig(
+        batch_size_prompts=3,
+        n_eval_reconstruction_batches=2,
+        n_eval_sparsity_variance_batches=1,
+    )
+    tokens = FakeActivationsStore(tiny_model.cfg.d_vocab).tokens
+
+    def create_activation_store():
+        activation_store = FakeActivationsStore(tiny_model.cfg.d_vocab)
+        activation_store.tokens = tokens
+        return activation_store
+
+    activation_store = core.get_activation_store(
+        tiny_model, sae, config, create_activation_store  # type: ignore
+    )
+    cached_store = core.get_cached_tokens_store(
+        token_cache.TokenCache(str(tmp_path)),
+        tiny_model,
+        sae,  # type: ignore
+        config,
+        create_activation_store,  # type: ignore
+    )
+
+    assert activation_store.estimated_norm_scaling_factor != 1.0
+    assert cached_store.estimated_norm_scaling_factor == pytest.approx(
+        activation_store.estimated_norm_scaling_factor, rel=1e-6
+    )
+    # Estimating the factor doesn't advance the store's token stream
+    assert torch.equal(activation_store.get_batch_tokens(3), tokens[:3])
@@ -0,0 +1,92 @@
+import torch
+
+import evals.sparse_probing.probe_training as probe_training
+import sae_bench_utils.activation_collection as activation_collection
+from sae_bench_utils.ragged_activations import (
+    RaggedActivations,
+    load_ragged_activations_dict,
+)
+
+
+def make_padded_acts(
+    num_examples: int, seed: int, d_model: int = 4
+) -> tuple[torch.Tensor, torch.Tensor]:
+    generator = torch.Generator().manual_seed(seed)
+    acts_BLD = torch.randn(num_examples, 6, d_model, generator=generator)
+    lengths_B = torch.randint(1, 7, (num_examples,), generator=generator)
+    mask_BL = torch.arange(6)[None, :] < lengths_B[:, None]
+    return acts_BLD * mask_BL[:, :, None], mask_BL
+
+
+def test_ragged_indexing_matches_padded():
+    acts_BLD, mask_BL = make_padded_acts(10, seed=0)
+    ragged = RaggedActivations.from_padded(acts_BLD, mask_BL)
+
+    assert len(ragged) == 10
+    assert ragged.acts_TD.shape == (mask_BL.sum().item(), 4)
+
+    indices = torch.tensor([7, 2, 2, 9])
+    selected = ragged[indices]
+    expected = RaggedActivations.from_padded(acts_BLD[indices], mask_BL[indices])
+    assert torch.equal(selected.acts_TD, expected.acts_TD)
+    assert torch.equal(selected.offsets, expected.offsets)
+
+    sliced = ragged[3:8]
+    expected = RaggedActivations.from_padded(acts_BLD[3:8], mask_BL[3:8])
+    assert torch.equal(sliced.acts_TD, expected.acts_TD)
+    assert torch.equal(sliced.offsets, expected.offsets)
+
+    catted = RaggedActivations.cat([ragged[:4], ragged[4:]])
+    assert torch.equal(catted.acts_TD, ragged.acts_TD)
+    assert torch.equal(catted.offsets, ragged.offsets)
+
+
+def test_ragged_mean_pooling_matches_padded():
+    acts_BLD, mask_BL = make_padded_acts(10, seed=1)
+    padded = {"a": acts_BLD}
+    ragged = load_ragged_activations_dict(padded)
+
+    expected_BD = activation_collection.create_meaned_model_activations(padded)["a"]
+    assert torch.allclose(
+        activation_collection.create_meaned_model_activations(ragged)["a"], expected_BD
+    )
+
+
+def test_ragged_sae_meaned_activations_match_padded(tiny_sae):
+    acts_BLD, _ = make_padded_acts(10, seed=2, d_model=16)
+    acts_BLD = acts_BLD.to(tiny_sae.device)
+    padded = {"a": acts_BLD}
+    ragged = load_ragged_activations_dict(padded)
+
+    expected_BF = activation_collection.get_sae_meaned_activations(padded, tiny_sae, 3)["a"]
+    actual_BF = activation_collection.get_sae_meaned_activations(ragged, tiny_sae, 3)["a"]
+    assert torch.allclose(actual_BF, expected_BF, atol=1e-5)
+
+
+def test_prepare_probe_data_samples_ragged_and_padded_identically():
+    padded = {name: make_padded_acts(8, seed=i)[0] for i, name in enumerate(["a", "b", "c"])}
+    ragged = load_ragged_activations_dict(padded)
+
+    torch.manual_seed(0)
+    padded_acts_BLD, padded_labels = probe_training.prepare_probe_data(padded, "a")
+    torch.manual_seed(0)
+    ragged_acts, ragged_labels = probe_training.prepare_probe_data(ragged, "a")
+
+    assert torch.equal(padded_labels, ragged_labels)
+    assert torch.allclose(
+        ragged_acts.mean_pool(),
+        activation_collection.create_meaned_model_activations({"x": padded_acts_BLD})["x"],
+    )
+
+
+def test_get_llm_activations_ragged_drops_masked_tokens(tiny_model):
+    tokens = torch.randint(0, tiny_model.cfg.d_vocab, (5, 8))
+    acts_BLD = activation_collection.get_llm_activations(
+        tokens, tiny_model, batch_size=2, layer=0, hook_name="blocks.0.hook_resid_post"
+    )
+    ragged = activation_collection.get_llm_activations_ragged(
+        tokens, tiny_model, batch_size=2, layer=0, hook_name="blocks.0.hook_resid_post"
+    )
+
+    assert torch.equal(ragged.lengths, torch.full((5,), 8))
+    assert torch.allclose(ragged.acts_TD, acts_BLD.flatten(0, 1))
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+import torch
+
+import sae_bench_utils.sae_pipeline as sae_pipeline
+from custom_saes.vanilla_sae import VanillaSAE
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_iter_saes_yields_saes_in_order(prefetch):
+    saes = [VanillaSAE(d_in=4, d_sae=8) for _ in range(3)]
+    selected_saes = [(f"sae_{i}", sae) for i, sae in enumerate(saes)]
+
+    loaded_saes = list(
+        sae_pipeline.iter_saes(selected_saes, device="cpu", dtype=torch.float64, prefetch=prefetch)
+    )
+
+    assert [sae_release for sae_release, _, _, _ in loaded_saes] == ["sae_0", "sae_1", "sae_2"]
+    for (_, sae_id, sae, sparsity), expected_sae in zip(loaded_saes, saes):
+        assert sae_id == "custom_sae"
+        assert sae is expected_sae
+        assert sae.W_enc.dtype == torch.float64
+        assert sparsity is None
+
+
+def test_iter_saes_keeps_at_most_two_saes_resident(monkeypatch):
+    num_loaded = 0
+    lock = threading.Lock()
+
+    def load_sae(sae_release, sae_id, device, dtype):
+        nonlocal num_loaded
+        with lock:
+            num_loaded += 1
+        return sae_id, None, None
+
+    monkeypatch.setattr(sae_pipeline, "load_sae", load_sae)
+    selected_saes = [(f"sae_{i}", f"id_{i}") for i in range(6)]
+
+    for sae_idx, (_, sae_id, _, _) in enumerate(
+        sae_pipeline.iter_saes(selected_saes, device="cpu", dtype=torch.float32)
+    ):
+        assert sae_id == f"id_{sae_idx}"
+        # Give the background thread time to load ahead
+        time.sleep(0.05)
+        # Only the SAE being evaluated and the next one are loaded
+        assert num_loaded == min(sae_idx + 2, len(selected_saes))
+        if sae_idx == 3:
+            break
+
+    # Stopping early stops the loader
+    assert num_loaded == 5
+
+
+def test_iter_saes_propagates_load_errors(monkeypatch):
+    def load_sae(sae_release, sae_id, device, dtype):
+        if sae_id == "broken":
+            raise FileNotFoundError(sae_id)
+        return sae_id, None, None
+
+    monkeypatch.setattr(sae_pipeline, "load_sae", load_sae)
+    selected_saes = [("release", "ok"), ("release", "broken"), ("release", "never_loaded")]
+
+    loaded_sae_ids = []
+    with pytest.raises(FileNotFoundError):
+        for _, sae_id, _, _ in sae_pipeline.iter_saes(selected_saes, "cpu", torch.float32):
+            loaded_sae_ids.append(sae_id)
+    assert loaded_sae_ids == ["ok"]
+
+
+def test_result_writer_writes_in_order_and_raises_errors():
+    written = []
+
+    def write(value):
+        time.sleep(0.01)
+        written.append(value)
+
+    with sae_pipeline.ResultWriter() as writer:
+        for value in range(5):
+            writer.submit(write, value)
+    assert written == list(range(5))
+
+    def fail():
+        raise OSError("disk full")
+
+    writer = sae_pipeline.ResultWriter()
+    writer.submit(fail)
+    with pytest.raises(OSError):
+        writer.close()
@@ -1,8 +1,11 @@
 import json
+from types import SimpleNamespace
 import torch
 from evals.sparse_probing.eval_config import SparseProbingEvalConfig
 import evals.sparse_probing.main as sparse_probing
+import sae_bench_utils.activation_collection as activation_collection
 import sae_bench_utils.testing_utils as testing_utils
+from sae_bench_utils.ragged_activations import RaggedActivations
 from sae_bench_utils.sae_selection_utils import select_saes_multiple_patterns
 
 results_filename = "tests/test_data/sparse_probing/sparse_probing_expected_results.json"
@@ -75,3 +78,149 @@ def test_end_to_end_different_seed():
         tolerance,
         keys_to_compare=keys_to_compare,
     )
+
+
+def test_dataset_probes_trained_in_a_worker_match_the_main_process(tmp_path):
+    config = SparseProbingEvalConfig(dataset_names=["dataset"], k_values=[1, 2])
+
+    generator = torch.Generator().manual_seed(0)
+
+    def make_class_activations(num_datapoints: int, dim: int) -> dict[str, torch.Tensor]:
+        return {
+            class_name: torch.randn(num_datapoints, dim, generator=generator)
+            + torch.eye(dim)[class_idx]
+            for class_idx, class_name in enumerate(["a", "b", "c"])
+        }
+
+    probe_inputs = sparse_probing.DatasetProbeInputs(
+        dataset_name="dataset",
+        dataset_seed=sparse_probing.get_dataset_seed(config, "dataset"),
+        llm_train_acts_BD=make_class_activations(40, 6),
+        llm_test_acts_BD=make_class_activations(20, 6),
+        llm_results=None,
+        llm_results_path=str(tmp_path / "llm_results.json"),
+        sae_train_acts_BF=make_class_activations(40, 12),
+        sae_test_acts_BF=make_class_activations(20, 12),
+        sae_test_accuracy=0.5,
+    )
+
+    # Changing the global random state doesn't change the results
+    torch.manual_seed(123)
+    expected_results, expected_stats = sparse_probing.train_dataset_probes(
+        probe_inputs, config, False
+    )
+
+    executor = sparse_probing.create_probe_training_executor(num_workers=1)
+    try:
+        results, stats = executor.submit(
+            sparse_probing.train_dataset_probes, probe_inputs, config, False
+        ).result()
+    finally:
+        executor.shutdown()
+
+    assert results == expected_results
+    for probes_name in ["llm_top_k_probes", "sae_top_k_probes"]:
+        assert stats[probes_name]["num_iterations"] == expected_stats[probes_name]["num_iterations"]
+        assert set(stats[probes_name]["num_iterations"]) == {1, 2}
+        assert stats[probes_name]["training_time_s"] > 0
+    assert results["sae_test_accuracy"] == 0.5
+    assert set(results) == {
+        "sae_test_accuracy",
+        "llm_test_accuracy",
+        "llm_top_1_test_accuracy",
+        "llm_top_2_test_accuracy",
+        "sae_top_1_test_accuracy",
+        "sae_top_2_test_accuracy",
+    }
+
+
+def test_at_most_probe_training_workers_datasets_are_in_flight(monkeypatch, tmp_path):
+    config = SparseProbingEvalConfig(
+        dataset_names=["a", "b", "c", "d"], sae_batch_size=8, probe_training_workers=2
+    )
+    events = []
+
+    def get_dataset_probe_inputs(dataset_name, *args):
+        events.append(("encode", dataset_name))
+        return SimpleNamespace(dataset_name=dataset_name, to=lambda device: dataset_name)
+
+    class LazyFuture:
+        def __init__(self, dataset_name):
+            self.dataset_name = dataset_name
+
+        def result(self):
+            events.append(("collect", self.dataset_name))
+            return {"sae_test_accuracy": 0.5}, {}
+
+    class RecordingExecutor:
+        def submit(self, fn, dataset_name, *args):
+            events.append(("submit", dataset_name))
+            return LazyFuture(dataset_name)
+
+    monkeypatch.setattr(sparse_probing, "get_dataset_probe_inputs", get_dataset_probe_inputs)
+    sae = SimpleNamespace(cfg=SimpleNamespace(hook_layer=0, hook_name="blocks.0.hook_resid_post"))
+
+    results, _ = sparse_probing.run_eval_single_sae(
+        config,
+        sae,  # type: ignore
+        None,  # type: ignore
+        "cpu",
+        str(tmp_path),
+        probe_training_executor=RecordingExecutor(),
+    )
+
+    # The next dataset is encoded while earlier datasets train, but it is only submitted once
+    # a worker's dataset is collected
+    assert events == [
+        ("encode", "a"),
+        ("submit", "a"),
+        ("encode", "b"),
+        ("submit", "b"),
+        ("encode", "c"),
+        ("collect", "a"),
+        ("submit", "c"),
+        ("encode", "d"),
+        ("collect", "b"),
+        ("submit", "d"),
+        ("collect", "c"),
+        ("collect", "d"),
+    ]
+    assert results["sae_test_accuracy"] == 0.5
+
+
+def test_quantization_accuracy_drift_compares_the_sparse_probing_metric(tiny_sae):
+    config = SparseProbingEvalConfig(dataset_names=["dataset"], k_values=[1, 5])
+
+    generator = torch.Generator().manual_seed(0)
+
+    def make_class_activations(num_examples: int) -> dict[str, RaggedActivations]:
+        all_acts = {}
+        for class_idx, class_name in enumerate(["a", "b", "c"]):
+            lengths = torch.randint(1, 6, (num_examples,), generator=generator)
+            offsets = torch.cat([torch.zeros(1, dtype=torch.long), lengths.cumsum(0)])
+            acts_TD = torch.randn(int(offsets[-1]), 16, generator=generator)
+            acts_TD[:, class_idx] += 2.0
+            all_acts[class_name] = RaggedActivations(acts_TD, offsets)
+        return all_acts
+
+    all_train_acts = make_class_activations(40)
+    all_test_acts = make_class_activations(20)
+
+    drift = sparse_probing.get_quantization_accuracy_drift(
+        all_train_acts, all_test_acts, tiny_sae, config, sae_batch_size=8
+    )
+
+    torch.manual_seed(config.random_seed)
+    expected_test_accuracies, _ = sparse_probing.train_top_k_probes(
+        activation_collection.get_sae_meaned_activations(all_train_acts, tiny_sae, 8),
+        activation_collection.get_sae_meaned_activations(all_test_acts, tiny_sae, 8),
+        config,
+    )
+    for k in config.k_values:
+        assert drift[f"sae_top_{k}_test_accuracy"] == sparse_probing.average_test_accuracy(
+            expected_test_accuracies[k]
+        )
+        assert drift[f"sae_top_{k}_test_accuracy_drift"] == (
+            drift[f"sae_top_{k}_test_accuracy_quantized"] - drift[f"sae_top_{k}_test_accuracy"]
+        )
+        assert abs(drift[f"sae_top_{k}_test_accuracy_drift"]) < 0.1
@@ -0,0 +1,108 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+import torch
+
+import sae_bench_utils.token_cache as token_cache
+
+
+class FakeActivationsStore:
+    def __init__(self, tokens_SL: torch.Tensor):
+        self.tokens_SL = tokens_SL
+        self.position = 0
+
+    def get_batch_tokens(self, batch_size: int) -> torch.Tensor:
+        tokens_BL = self.tokens_SL[self.position : self.position + batch_size]
+        self.position += batch_size
+        return tokens_BL
+
+
+def make_key(**kwargs) -> token_cache.TokenCacheKey:
+    key_kwargs = dict(
+        dataset_name="Skylion007/openwebtext",
+        tokenizer_revision="abc",
+        context_size=8,
+        prepend_bos=True,
+        shuffle_seed=42,
+    )
+    key_kwargs.update(kwargs)
+    return token_cache.TokenCacheKey(**key_kwargs)
+
+
+def test_get_cached_tokens_only_tokenizes_on_a_cache_miss(tmp_path):
+    cache = token_cache.TokenCache(str(tmp_path))
+    key = make_key()
+    stream_tokens_SL = torch.randint(0, 50, (40, 8))
+    created_stores = []
+
+    def create_activation_store():
+        created_stores.append(FakeActivationsStore(stream_tokens_SL))
+        return created_stores[-1]
+
+    tokens_SL = token_cache.get_cached_tokens(
+        cache, key, 20, create_activation_store, batch_size=6
+    )
+    assert isinstance(tokens_SL, np.memmap)
+    assert np.array_equal(tokens_SL, stream_tokens_SL[:20].numpy())
+    assert len(created_stores) == 1
+
+    # A shorter request is served from the cached prefix of the stream
+    tokens_SL = token_cache.get_cached_tokens(cache, key, 12, create_activation_store)
+    assert np.array_equal(tokens_SL, stream_tokens_SL[:12].numpy())
+    assert len(created_stores) == 1
+
+    # A longer request or a different key streams the dataset again
+    tokens_SL = token_cache.get_cached_tokens(cache, key, 30, create_activation_store)
+    assert np.array_equal(tokens_SL, stream_tokens_SL[:30].numpy())
+    token_cache.get_cached_tokens(cache, replace(key, prepend_bos=False), 5, create_activation_store)
+    assert len(created_stores) == 3
+
+
+def test_cached_tokens_store_serves_batches_in_order():
+    tokens_SL = np.arange(5 * 4, dtype=np.int32).reshape(5, 4)
+    store = token_cache.CachedTokensStore(
+        tokens_SL,
+        device="cpu",
+        normalize_activations="expected_average_only_in",
+        estimated_norm_scaling_factor=2.0,
+    )
+
+    first_batch_BL = store.get_batch_tokens(3)
+    assert first_batch_BL.dtype == torch.int64
+    assert torch.equal(first_batch_BL, torch.from_numpy(tokens_SL[:3]).long())
+    store.reset_input_dataset()
+    # Like ActivationsStore, the sequences continue after a reset and wrap around at the end
+    assert torch.equal(store.get_batch_tokens(3), torch.from_numpy(tokens_SL[[3, 4, 0]]).long())
+    assert store.context_size == 4
+
+    activations = torch.randn(2, 3)
+    assert torch.allclose(store.unscale(store.apply_norm_scaling_factor(activations)), activations)
+
+
+def test_norm_scaling_factor_is_estimated_once(tmp_path, tiny_model):
+    cache = token_cache.TokenCache(str(tmp_path))
+    tokens_SL = np.random.randint(0, tiny_model.cfg.d_vocab, (6, 8)).astype(np.int32)
+    key = token_cache.NormScalingFactorKey(
+        model_name="tiny",
+        hook_name="blocks.0.hook_resid_post",
+        hook_head_index=None,
+        tokens_key=make_key(),
+        num_sequences=6,
+    )
+
+    def estimate():
+        return token_cache.estimate_norm_scaling_factor(
+            tiny_model, tokens_SL, key.hook_name, 0, None, d_in=16, batch_size=4
+        )
+
+    norm_scaling_factor = token_cache.get_norm_scaling_factor(cache, key, estimate)
+
+    _, activation_cache = tiny_model.run_with_cache(torch.from_numpy(tokens_SL).long())
+    mean_norm = activation_cache[key.hook_name].norm(dim=-1).mean().item()
+    assert norm_scaling_factor == pytest.approx(16**0.5 / mean_norm, rel=1e-5)
+
+    def fail_to_estimate():
+        raise AssertionError("The cached norm scaling factor should be used")
+
+    assert token_cache.get_norm_scaling_factor(cache, key, fail_to_estimate) == norm_scaling_factor
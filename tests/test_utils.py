@@ -1,7 +1,10 @@
 import sae_bench_utils
 import sae_bench_utils.general_utils as general_utils
 import sae_bench_utils.indexing_utils as indexing_utils
+import sae_bench_utils.prefetch_utils as prefetch_utils
+import sae_bench_utils.streaming_stats as streaming_stats
 import sae_bench_utils.testing_utils as testing_utils
+from sae_bench_utils.sparse_activations import SparseLatentActivations
 import torch
 import pytest
 import re
@@ -90,3 +93,103 @@ def test_indexing_utils():
         12,
         13,
     ]  # 2nd highest value in the middle
+
+
+def test_indexing_utils_sparse_matches_dense():
+    x = torch.zeros((3, 20))
+    x[0, 5] = 3.0
+    x[0, 6] = 2.0
+    x[1, 12] = 5.0
+    x[2, 1] = 9.0  # inside the buffer
+    x[2, 15] = 1.0
+
+    rows, cols = x.nonzero(as_tuple=True)
+    sparse_x = SparseLatentActivations(torch.stack([rows, cols], dim=1), x[rows, cols], (3, 20))
+
+    for no_overlap in [False, True]:
+        dense_indices = indexing_utils.get_k_largest_indices(
+            x, k=3, buffer=3, no_overlap=no_overlap
+        )
+        sparse_indices = indexing_utils.get_k_largest_indices(
+            sparse_x, k=3, buffer=3, no_overlap=no_overlap
+        )
+        assert sparse_indices.tolist() == dense_indices.tolist()
+
+    top_indices = indexing_utils.get_k_largest_indices(sparse_x, k=10, buffer=3)
+    assert len(top_indices) == 4  # only nonzero values outside the buffer
+
+    assert torch.equal(
+        indexing_utils.index_with_buffer(sparse_x, top_indices, buffer=3),
+        indexing_utils.index_with_buffer(x, top_indices, buffer=3),
+    )
+
+    iw_indices = indexing_utils.get_iw_sample_indices(sparse_x, k=4, buffer=3)
+    assert sorted(map(tuple, iw_indices.tolist())) == [(0, 5), (0, 6), (1, 12), (2, 15)]
+
+
+@pytest.mark.parametrize("prefetch_depth", [0, 1, 3])
+def test_prefetch_preserves_order(prefetch_depth):
+    assert list(prefetch_utils.prefetch(range(10), prefetch_depth)) == list(range(10))
+
+
+def test_prefetch_propagates_errors_and_stops_early():
+    def failing():
+        yield 1
+        raise RuntimeError("loader failed")
+
+    with pytest.raises(RuntimeError, match="loader failed"):
+        list(prefetch_utils.prefetch(failing(), prefetch_depth=2))
+
+    produced = []
+
+    def counting():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    for item in prefetch_utils.prefetch(counting(), prefetch_depth=2):
+        if item == 3:
+            break
+    assert len(produced) < 1000
+
+
+def test_running_moments_match_full_reduction_and_merge():
+    values_N = torch.randn(1000, dtype=torch.float64) * 3 + 5
+    batches = values_N.split([100, 0, 1, 399, 500])
+
+    moments = streaming_stats.RunningMoments()
+    for batch in batches:
+        moments.update(batch)
+    assert moments.count == 1000
+    assert torch.allclose(moments.mean, values_N.mean())
+    assert torch.allclose(moments.variance, values_N.var(unbiased=False))
+
+    # Accumulators of disjoint parts of a stream, e.g. from other processes, merge exactly
+    first_half, second_half = streaming_stats.RunningMoments(), streaming_stats.RunningMoments()
+    first_half.update(values_N[:300])
+    second_half.update(values_N[300:])
+    merged = first_half.merge(second_half)
+    assert torch.allclose(merged.mean, moments.mean)
+    assert torch.allclose(merged.variance, moments.variance)
+    assert first_half.count == 300
+
+    # Normal-approximation confidence interval of the mean, from the sample variance
+    expected_half_width = streaming_stats.Z_95 * values_N.std() / 1000**0.5
+    assert torch.allclose(moments.confidence_interval_half_width(), expected_half_width)
+    single_value_moments = streaming_stats.RunningMoments()
+    single_value_moments.update(torch.tensor([1.0]))
+    assert single_value_moments.confidence_interval_half_width().item() == float("inf")
+
+    # Per-column statistics, e.g. per latent
+    values_ND = torch.randn(50, 4)
+    column_moments = streaming_stats.RunningMoments()
+    column_moments.update(values_ND[:20])
+    column_moments.update(values_ND[20:])
+    assert torch.allclose(column_moments.mean.float(), values_ND.mean(dim=0))
+
+    # Infinite values give the same mean as a full reduction
+    inf_moments = streaming_stats.RunningMoments()
+    inf_moments.update(torch.tensor([-float("inf"), 1.0]))
+    inf_moments.update(torch.tensor([2.0]))
+    assert inf_moments.mean.item() == -float("inf")
+